@@ -14,4 +14,9 @@ urlpatterns = [
         views.WaChapStatusView.as_view(),
         name="wachap_status",
     ),
+    path(
+        "config/notifications/metrics/",
+        views.NotificationMetricsView.as_view(),
+        name="notification_metrics",
+    ),
 ]
@@ -3,8 +3,11 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.views.generic.edit import UpdateView
 from django.contrib import messages
 from django.urls import reverse_lazy
+from django.views import View
 
 from notification.models import ConfigurationNotification
+from notification.services import metrics
+from notification.services.rate_limiter import queue_wait_stats
 from notification.services.wachap_monitor import wachap_monitor
 from .forms import NotificationConfigAdminForm
 from django.http import JsonResponse
@@ -55,21 +58,45 @@ class NotificationConfigView(AdminRequiredMixin, UpdateView):
         return super().form_valid(form)
 
 
-class WaChapStatusView(AdminRequiredMixin, UpdateView):
+class WaChapStatusView(AdminRequiredMixin, View):
     """
-    Retourne l'état en temps réel de toutes les instances WaChap.
-    Utilisable en AJAX pour afficher un indicateur de santé dans l'UI.
+    Retourne le dernier état connu de toutes les instances WaChap (snapshot
+    publié par le monitoring), avec son âge. Utilisable en AJAX pour afficher
+    un indicateur de santé dans l'UI ; ?refresh=1 (ou un snapshot absent ou
+    trop ancien) demande une vérification en arrière-plan.
     """
 
-    # On hérite de UpdateView pour le mixin uniquement ; on override get()
-    model = ConfigurationNotification
-    form_class = NotificationConfigAdminForm
-    template_name = "admin_app/config_notifications.html"
+    def get(self, request, *args, **kwargs):
+        snapshot = wachap_monitor.get_snapshot()
+        refreshing = False
+        if (
+            snapshot is None
+            or request.GET.get("refresh")
+            or snapshot["age_seconds"] > wachap_monitor.SNAPSHOT_MAX_AGE
+        ):
+            refreshing = wachap_monitor.request_refresh()
+        if snapshot is None:
+            return JsonResponse({"status": "pending", "refreshing": refreshing}, status=202)
+        return JsonResponse({"status": "ok", "refreshing": refreshing, **snapshot})
+
+
+class NotificationMetricsView(AdminRequiredMixin, View):
+    """
+    Métriques JSON des envois de notifications : compteurs par région et par
+    statut sur 1h et 24h glissantes (services.metrics), attente en file par région.
+    """
 
     def get(self, request, *args, **kwargs):
-        try:
-            status = wachap_monitor.check_all_instances()
-            return JsonResponse({"status": "ok", "instances": status})
-        except Exception as e:
-            logger.error(f"Erreur WaChapStatusView: {e}")
-            return JsonResponse({"status": "error", "message": str(e)}, status=500)
+        derniere_heure = metrics.compter(fenetre=3600)
+        dernieres_24h = metrics.compter()
+        if derniere_heure is None or dernieres_24h is None:
+            return JsonResponse(
+                {"status": "error", "message": "Compteurs indisponibles"}, status=503
+            )
+        return JsonResponse(
+            {
+                "status": "ok",
+                "envois": {"1h": derniere_heure, "24h": dernieres_24h},
+                "attente_file": queue_wait_stats(),
+            }
+        )
@@ -59,14 +59,8 @@ class ClientForm(forms.ModelForm):
     def clean_telephone(self):
         telephone = self.cleaned_data.get("telephone")
         if telephone:
+            # Doublons (forme E.164) vérifiés par Client.clean()
             telephone = telephone.strip().replace(" ", "")
-            qs = Client.objects.filter(telephone=telephone)
-            if self.instance and self.instance.pk:
-                qs = qs.exclude(pk=self.instance.pk)
-            if qs.exists():
-                raise forms.ValidationError(
-                    _("Un client avec ce numéro de téléphone existe déjà.")
-                )
         return telephone
 
     def save(self, commit=True):
@@ -1,6 +1,7 @@
 import os
 import logging
 from celery import shared_task
+from django.db import transaction
 from django.utils import timezone
 from django.core.files.base import ContentFile
 from django.conf import settings
@@ -79,3 +80,119 @@ def process_colis_creation(self, task_record_id):
         task_record.completed_at = timezone.now()
         task_record.save()
         raise e
+
+
+ETIQUETTES_TEMPLATE = "chine/etiquette_pdf.html"
+ETIQUETTES_DIR = "etiquettes"
+ETIQUETTES_PAR_PAGE = 4  # grille 2x2 sur A4
+PAGES_PAR_RENDU = 10
+
+
+def colis_etiquettes(lot_id=None, colis_ids=()):
+    if lot_id:
+        colis_qs = Colis.objects.filter(lot_id=lot_id)
+    else:
+        colis_qs = Colis.objects.filter(id__in=colis_ids)
+    return colis_qs.select_related("client", "lot__destination").order_by("id")
+
+
+def pages_etiquettes(colis_list):
+    """Découpage par lots de 4 pour la mise en page A4 (Grille 2x2)."""
+    return [
+        colis_list[i : i + ETIQUETTES_PAR_PAGE]
+        for i in range(0, len(colis_list), ETIQUETTES_PAR_PAGE)
+    ]
+
+
+@shared_task(bind=True)
+def generate_etiquettes_task(self, task_record_id):
+    """
+    Génère en arrière-plan les étiquettes des colis décrits par
+    task_record.parameters (lot_id ou colis_ids) : rendus de PAGES_PAR_RENDU
+    pages, fusionnés en un PDF du stockage média dont le nom est
+    enregistré dans parameters["fichier"].
+    """
+    from core.utils_pdf import render_chunks_to_storage
+
+    task_record = BackgroundTask.objects.get(pk=task_record_id)
+    task_record.status = BackgroundTask.Status.PROCESSING
+    task_record.started_at = timezone.now()
+    task_record.task_id = self.request.id
+    task_record.progress = 0
+    task_record.save()
+
+    try:
+        params = task_record.parameters
+        colis_list = list(
+            colis_etiquettes(lot_id=params.get("lot_id"), colis_ids=params.get("colis_ids") or ())
+        )
+        pages = pages_etiquettes(colis_list)
+        date = timezone.now()
+        contextes = [
+            {"colis_batches": pages[i : i + PAGES_PAR_RENDU], "date": date}
+            for i in range(0, len(pages), PAGES_PAR_RENDU)
+        ]
+
+        def progress(rendus, total):
+            # 100 % seulement une fois le fichier enregistré
+            pourcentage = min(99, int(rendus * 100 / total))
+            BackgroundTask.objects.filter(pk=task_record.pk).update(progress=pourcentage)
+
+        nom = (
+            f"etiquettes_lot_{params['lot_id']}" if params.get("lot_id") else "etiquettes_colis"
+        )
+        fichier = render_chunks_to_storage(
+            ETIQUETTES_TEMPLATE,
+            contextes,
+            f"{ETIQUETTES_DIR}/{nom}_{task_record.pk}.pdf",
+            progress=progress,
+            backend="native",
+        )
+
+        task_record.parameters = {**params, "fichier": fichier, "total": len(colis_list)}
+        task_record.progress = 100
+        task_record.status = BackgroundTask.Status.SUCCESS
+        task_record.completed_at = timezone.now()
+        task_record.save()
+        logger.info(f"Étiquettes : {len(colis_list)} colis, {len(pages)} pages -> {fichier}")
+        return fichier
+
+    except Exception as e:
+        logger.exception("Error in generate_etiquettes_task")
+        task_record.status = BackgroundTask.Status.FAILURE
+        task_record.error_message = str(e)
+        task_record.completed_at = timezone.now()
+        task_record.save()
+        raise e
+
+
+def dispatch_etiquettes(task_record):
+    """
+    Lance la génération via Celery après commit.
+    Si le broker est indisponible, elle est exécutée de manière synchrone.
+    """
+
+    def dispatch():
+        try:
+            generate_etiquettes_task.delay(task_record.pk)
+        except Exception as e:
+            logger.error(f"Label task dispatch failed, running sync: {e}")
+            try:
+                generate_etiquettes_task(task_record.pk)
+            except Exception:
+                # L'échec est déjà tracé dans le BackgroundTask
+                pass
+
+    transaction.on_commit(dispatch)
+
+
+def lancer_etiquettes(user, country, lot_id=None, colis_ids=()):
+    """Crée le BackgroundTask de génération des étiquettes et la lance."""
+    task_record = BackgroundTask.objects.create(
+        name=f"Étiquettes lot {lot_id}" if lot_id else f"Étiquettes de {len(colis_ids)} colis",
+        parameters={"type": "etiquettes", "lot_id": lot_id, "colis_ids": list(colis_ids)},
+        created_by=user,
+        country=country,
+    )
+    dispatch_etiquettes(task_record)
+    return task_record
@@ -32,6 +32,7 @@ from .views import (
     TaskListView,
     TaskDetailView,
     TaskRetryView,
+    TaskFichierView,
     TaskBulkDeleteView,
     AgentListView,
     AgentCreateView,
@@ -59,6 +60,7 @@ urlpatterns = [
     path("notifications/", NotificationListView.as_view(), name="notification_list"),
     path("tasks/<int:pk>/", TaskDetailView.as_view(), name="task_detail"),
     path("tasks/<int:pk>/retry/", TaskRetryView.as_view(), name="task_retry"),
+    path("tasks/<int:pk>/fichier/", TaskFichierView.as_view(), name="task_fichier"),
     path(
         "tasks/retry-notifications/",
         RetryFailedNotificationsView.as_view(),
@@ -1,4 +1,5 @@
 import logging
+import os
 from django.shortcuts import render, redirect, get_object_or_404
 from django.db.models import Count, Q, Sum
 from django.utils import timezone
@@ -15,6 +16,7 @@ from django.views.generic import (
     DeleteView,
 )
 import base64
+from django.conf import settings
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 from django.contrib import messages
@@ -24,15 +26,18 @@ from django.views.generic import edit as delete
 
 from core.models import Client, Lot, Colis, BackgroundTask, Country, AvanceSalaire, User as CoreUser
 from report.models import Depense, TransfertArgent, PaiementAgent
+from report.stats import kpis_pays
+from core.cache import get_or_compute
+from core.phone import normaliser_telephone
+from core.search import rechercher
 from .forms import ClientForm, LotForm, ColisForm, CountryForm, AgentForm, LotNoteForm
-from .tasks import process_colis_creation
-from django.core.cache import cache
+from .tasks import dispatch_etiquettes, process_colis_creation
 
 from django.contrib.auth import get_user_model
 from django.db.models.deletion import ProtectedError
 
 import csv
-from django.http import HttpResponse
+from django.http import FileResponse, Http404
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.db import transaction
@@ -91,68 +96,86 @@ class AdminChineRequiredMixin(RoleRequiredMixin):
 
 
 def get_country_stats(country_code, year=None, month=None):
-    """Fonction utilitaire pour calculer les stats par pays, avec filtre optionnel par date (Mise en cache 1 Heure)"""
-    cache_key = f"stats_{country_code}_{year}_{month}"
-    cached_stats = cache.get(cache_key)
-
-    if cached_stats is not None:
-        return cached_stats
-
-    lots = Lot.objects.filter(destination__code=country_code)
-    colis = Colis.objects.filter(lot__destination__code=country_code)
-    depenses = Depense.objects.filter(pays__code=country_code)
-    transferts = TransfertArgent.objects.filter(pays_expediteur__code=country_code)
-
-    if year and month:
-        if country_code == "CN":
-            # Chine: Fait générateur = Expédition
-            date_filter_lots = {"date_expedition__year": year, "date_expedition__month": month}
-            date_filter_colis = {"lot__date_expedition__year": year, "lot__date_expedition__month": month}
-        else:
-            # Destinations (Mali, RCI): Fait générateur = Arrivée (ou Création si pas encore d'arrivée)
-            date_filter_lots = {"date_arrivee__year": year, "date_arrivee__month": month}
-            date_filter_colis = {"lot__date_arrivee__year": year, "lot__date_arrivee__month": month}
+    """
+    Fonction utilitaire pour calculer les stats par pays, avec filtre optionnel par date.
+    Mise en cache partagée, périmée dès qu'un colis, lot, dépense ou transfert du pays
+    (ou un paiement d'agent) est modifié ; un seul processus recalcule à la fois.
+    """
+    return get_or_compute(
+        f"stats_{country_code}_{year}_{month}",
+        lambda: _compute_country_stats(country_code, year, month),
+        namespaces=(country_code, "agents"),
+    )
 
-        lots = lots.filter(**date_filter_lots)
-        colis = colis.filter(**date_filter_colis)
-        depenses = depenses.filter(date__year=year, date__month=month)
-        transferts = transferts.filter(date__year=year, date__month=month)
 
-    # ... [rest of calculation] ...
-    # (I'll keep the rest as is but I need to make sure I don't break the existing code)
-    # Actually, I should use the specific logic for agents filtering too.
+def _compute_country_stats(country_code, year=None, month=None):
+    # Indicateurs colis / lots / dépenses / transferts (requêtes groupées,
+    # mois clos relus depuis MonthlyCountryStats)
+    kpis = kpis_pays(country_code, year, month)
 
     # Calcul des montants avec déduction des jetons cédés (JC)
-    montant_brut = colis.aggregate(total=Sum("prix_final"))["total"] or 0
-    total_jc = colis.aggregate(total=Sum("montant_jc"))["total"] or 0
-    montant_net_colis = montant_brut - total_jc
-
     stats = {}
-    stats["montant_colis"] = montant_net_colis
-    stats["poids_total"] = colis.aggregate(total=Sum("poids"))["total"] or 0
-    stats["total_transferts"] = transferts.aggregate(total=Sum("montant"))["total"] or 0
+    stats["montant_colis"] = kpis["ca_avion"] + kpis["ca_bateau"]
+    stats["poids_total"] = kpis["poids_total"]
+    stats["total_transferts"] = kpis["total_transferts"]
+    stats["autres_depenses"] = kpis["autres_depenses"]
 
     if country_code in ["ML", "CI"]:
         stats["cout_transport"] = 0
         stats["cout_douane"] = 0
-        stats["autres_depenses"] = depenses.filter(is_china_indicative=False).aggregate(total=Sum("montant"))["total"] or 0
     else:
-        stats["cout_transport"] = lots.aggregate(total=Sum("frais_transport"))["total"] or 0
-        stats["cout_douane"] = lots.aggregate(total=Sum("frais_douane"))["total"] or 0
-        stats["autres_depenses"] = depenses.aggregate(total=Sum("montant"))["total"] or 0
+        stats["cout_transport"] = kpis["frais_transport_avion"] + kpis["frais_transport_bateau"]
+        stats["cout_douane"] = kpis["frais_douane_avion"] + kpis["frais_douane_bateau"]
+
+    # Filtrage des agents par rôle spécifique au pays
+    # On inclut ADMIN_CHINE dans tous les pays car ils peuvent avoir une commission sur tous les bénéfices
+    role_map = {
+        "ML": ["ADMIN_MALI", "AGENT_MALI", "ADMIN_CHINE"],
+        "CI": ["AGENT_RCI", "ADMIN_CHINE"],
+        "CN": ["ADMIN_CHINE", "AGENT_CHINE"],
+    }
+    allowed_roles = role_map.get(country_code, [])
+
+    agents = User.objects.filter(Q(country__code=country_code) | Q(role="ADMIN_CHINE"))
+    if allowed_roles:
+        agents = agents.filter(role__in=allowed_roles)
+    else:
+        agents = agents.exclude(role__in=["CLIENT", "GLOBAL_ADMIN"])
+
+    # Éviter les doublons si l'admin chine est déjà dans le pays (peu probable mais possible)
+    agents = list(agents.distinct())
 
     # Calcul des charges RH du pays (Salaires fixes + Avances) pour la période
     # Cela permet d'aligner la formule sur la "Caisse Nette" du dashboard Mali
+    # Une requête groupée par agent pour les avances et une pour les paiements
+    avances_par_agent = {}
+    paiements_par_agent = {}
     total_avances_pays = 0
     total_salaires_pays = 0
     if year and month:
-        total_avances_pays = AvanceSalaire.objects.filter(
-            agent__country__code=country_code, date__year=year, date__month=month
-        ).aggregate(total=Sum("montant"))["total"] or 0
-        total_salaires_pays = PaiementAgent.objects.filter(
-            agent__country__code=country_code, periode_annee=year, periode_mois=month
-        ).aggregate(total=Sum("montant"))["total"] or 0
-    
+        agent_ids = [agent.pk for agent in agents]
+        filtre_agents = Q(agent__country__code=country_code) | Q(agent_id__in=agent_ids)
+        for agent_id, agent_pays, total in (
+            AvanceSalaire.objects.filter(filtre_agents, date__year=year, date__month=month)
+            .values_list("agent_id", "agent__country__code")
+            .annotate(total=Sum("montant"))
+            .order_by()
+        ):
+            avances_par_agent[agent_id] = total
+            if agent_pays == country_code:
+                total_avances_pays += total
+        for agent_id, agent_pays, total in (
+            PaiementAgent.objects.filter(
+                filtre_agents, periode_annee=year, periode_mois=month
+            )
+            .values_list("agent_id", "agent__country__code")
+            .annotate(total=Sum("montant"))
+            .order_by()
+        ):
+            paiements_par_agent[agent_id] = total
+            if agent_pays == country_code:
+                total_salaires_pays += total
+
     stats["total_rh"] = total_avances_pays + total_salaires_pays
 
     # Total regroupé des charges (hors transport/douane) pour le dashboard
@@ -168,42 +191,19 @@ def get_country_stats(country_code, year=None, month=None):
     )
 
     # ------------------ SEPARATION AVION / BATEAU ------------------
-    colis_avion = colis.filter(lot__type_transport__in=["CARGO", "EXPRESS"])
-    colis_bateau = colis.filter(lot__type_transport="BATEAU")
-    lots_avion = lots.filter(type_transport__in=["CARGO", "EXPRESS"])
-    lots_bateau = lots.filter(type_transport="BATEAU")
-
-    stats["ca_avion"] = (colis_avion.aggregate(total=Sum("prix_final"))["total"] or 0) - (colis_avion.aggregate(total=Sum("montant_jc"))["total"] or 0)
-    stats["ca_bateau"] = (colis_bateau.aggregate(total=Sum("prix_final"))["total"] or 0) - (colis_bateau.aggregate(total=Sum("montant_jc"))["total"] or 0)
-    
-    stats["benefice_brut_avion"] = stats["ca_avion"] - (lots_avion.aggregate(total=Sum("frais_transport"))["total"] or 0) - (lots_avion.aggregate(total=Sum("frais_douane"))["total"] or 0)
-    stats["benefice_brut_bateau"] = stats["ca_bateau"] - (lots_bateau.aggregate(total=Sum("frais_transport"))["total"] or 0) - (lots_bateau.aggregate(total=Sum("frais_douane"))["total"] or 0)
-
-    stats["nb_colis_expedies_avion"] = colis_avion.count()
-    stats["nb_colis_expedies_bateau"] = colis_bateau.count()
-    stats["nb_colis_livres_avion"] = colis_avion.filter(status="LIVRE").count()
-    stats["nb_colis_livres_bateau"] = colis_bateau.filter(status="LIVRE").count()
-    stats["nb_lots"] = lots.count()
-    stats["nb_colis"] = colis.count()
+    stats["ca_avion"] = kpis["ca_avion"]
+    stats["ca_bateau"] = kpis["ca_bateau"]
 
-    # Filtrage des agents par rôle spécifique au pays
-    # On inclut ADMIN_CHINE dans tous les pays car ils peuvent avoir une commission sur tous les bénéfices
-    role_map = {
-        "ML": ["ADMIN_MALI", "AGENT_MALI", "ADMIN_CHINE"],
-        "CI": ["AGENT_RCI", "ADMIN_CHINE"],
-        "CN": ["ADMIN_CHINE", "AGENT_CHINE"],
-    }
-    allowed_roles = role_map.get(country_code, [])
+    stats["benefice_brut_avion"] = stats["ca_avion"] - kpis["frais_transport_avion"] - kpis["frais_douane_avion"]
+    stats["benefice_brut_bateau"] = stats["ca_bateau"] - kpis["frais_transport_bateau"] - kpis["frais_douane_bateau"]
+
+    stats["nb_colis_expedies_avion"] = kpis["nb_colis_expedies_avion"]
+    stats["nb_colis_expedies_bateau"] = kpis["nb_colis_expedies_bateau"]
+    stats["nb_colis_livres_avion"] = kpis["nb_colis_livres_avion"]
+    stats["nb_colis_livres_bateau"] = kpis["nb_colis_livres_bateau"]
+    stats["nb_lots"] = kpis["nb_lots"]
+    stats["nb_colis"] = kpis["nb_colis_expedies_avion"] + kpis["nb_colis_expedies_bateau"]
 
-    agents = User.objects.filter(Q(country__code=country_code) | Q(role="ADMIN_CHINE"))
-    if allowed_roles:
-        agents = agents.filter(role__in=allowed_roles)
-    else:
-        agents = agents.exclude(role__in=["CLIENT", "GLOBAL_ADMIN"])
-    
-    # Éviter les doublons si l'admin chine est déjà dans le pays (peu probable mais possible)
-    agents = agents.distinct()
-    
     agents_remuneration = []
     total_commissions = 0
 
@@ -217,20 +217,9 @@ def get_country_stats(country_code, year=None, month=None):
             montant = (base_calcul * agent.remuneration_value) / 100
             total_commissions += montant
 
-        # Calcul du déjà payé sur la période via PaiementAgent
-        deja_paye = 0
-        avances_total = 0
-        if year and month:
-            paiements = PaiementAgent.objects.filter(
-                agent=agent, periode_annee=year, periode_mois=month
-            )
-            deja_paye = paiements.aggregate(total=Sum("montant"))["total"] or 0
-            
-            # Calcul des avances prises sur ce mois
-            avances = AvanceSalaire.objects.filter(
-                agent=agent, date__year=year, date__month=month
-            )
-            avances_total = avances.aggregate(total=Sum("montant"))["total"] or 0
+        # Déjà payé (PaiementAgent) et avances prises sur la période
+        deja_paye = paiements_par_agent.get(agent.pk, 0)
+        avances_total = avances_par_agent.get(agent.pk, 0)
 
         total_deja_percu = float(deja_paye) + float(avances_total)
         reste_a_payer = max(0, float(montant) - total_deja_percu)
@@ -252,9 +241,6 @@ def get_country_stats(country_code, year=None, month=None):
     stats["agents_remuneration"] = agents_remuneration
     stats["total_commissions"] = total_commissions
 
-    # Mise en cache pour 1 minute (60 secondes) pour permettre une vérification plus rapide en admin
-    cache.set(cache_key, stats, timeout=60)
-
     return stats
 
 
@@ -510,11 +496,7 @@ class ClientListView(LoginRequiredMixin, ListView):
         # Search
         search_query = self.request.GET.get("search")
         if search_query:
-            queryset = queryset.filter(
-                Q(nom__icontains=search_query)
-                | Q(prenom__icontains=search_query)
-                | Q(telephone__icontains=search_query)
-            )
+            queryset = rechercher(queryset, search_query)
         return queryset
 
     def get_context_data(self, **kwargs):
@@ -529,25 +511,19 @@ class ClientExportView(LoginRequiredMixin, ListView):
     model = Client
 
     def get(self, request, *args, **kwargs):
-        response = HttpResponse(content_type="text/csv")
-        response["Content-Disposition"] = 'attachment; filename="clients_export.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow(["Nom", "Prénom", "Téléphone", "Pays (Code)", "Adresse"])
-
-        clients = Client.objects.all()
-        for client in clients:
-            writer.writerow(
-                [
-                    client.nom,
-                    client.prenom,
-                    client.telephone,
-                    client.country.code if client.country else "",
-                    client.adresse,
-                ]
-            )
+        from core.csv_export import CHUNK_SIZE, streaming_csv
 
-        return response
+        # Tuples lus par paquets : ni instance Client, ni requête par pays
+        clients = (
+            Client.objects.order_by("pk")
+            .values_list("nom", "prenom", "telephone", "country__code", "adresse")
+            .iterator(chunk_size=CHUNK_SIZE)
+        )
+        return streaming_csv(
+            "clients_export.csv",
+            ["Nom", "Prénom", "Téléphone", "Pays (Code)", "Adresse"],
+            clients,
+        )
 
 
 class ClientImportView(LoginRequiredMixin, TemplateView):
@@ -642,10 +618,14 @@ class ClientImportView(LoginRequiredMixin, TemplateView):
                             elif self.request.user.country:
                                 country = self.request.user.country
 
-                        # Check existance by Telephone
+                        # Check existance by Telephone (forme E.164, index unique)
+                        telephone_e164 = normaliser_telephone(telephone)
+                        if not telephone_e164:
+                            continue
                         client, created = Client.objects.update_or_create(
-                            telephone=telephone,
+                            telephone_e164=telephone_e164,
                             defaults={
+                                "telephone": telephone,
                                 "nom": nom,
                                 "prenom": prenom,
                                 "country": country,  # Can be None if allowed
@@ -686,11 +666,12 @@ class ClientCreateView(LoginRequiredMixin, CreateView):
             elif self.request.user.country:
                 form.instance.country = self.request.user.country
 
-        response = super().form_valid(form)
+        # Notification Nouveau Client, mise en file (outbox) dans la transaction
+        # de création du compte
+        with transaction.atomic():
+            response = super().form_valid(form)
 
-        # Notification Nouveau Client
-        try:
-            from notification.tasks import send_notification_async
+            from notification.services.notification_service import notification_service
 
             client = self.object
             if client.telephone and client.user:
@@ -714,15 +695,13 @@ class ClientCreateView(LoginRequiredMixin, CreateView):
                     f"——\n"
                     f"*Équipe TS AIR CARGO* 🇨🇳 🇲🇱 🇨🇮"
                 )
-                send_notification_async.delay(
-                    user_id=client.user.id,
+                notification_service.send_notification(
+                    destinataire=client.user,
                     message=message,
                     categorie="compte_cree",
                     titre="Bienvenue — Vos identifiants TS AIR CARGO",
                     region="chine",
                 )
-        except Exception as e:
-            logger.error(f"Erreur trigger notification client {self.object.id}: {e}")
 
         return response
 
@@ -834,53 +813,51 @@ class ClientPasswordResetView(LoginRequiredMixin, View):
         # Vérification du Cooldown (anti-spam 60s)
         from django.core.cache import cache
 
+        # Pose le flag cooldown pour 60s (atomique : échoue s'il existe déjà)
         cache_key = f"pwd_reset_cooldown_client_{client.id}"
-        if cache.get(cache_key):
+        if not cache.add(cache_key, True, timeout=60):
             messages.warning(
                 request,
                 "Veuillez patienter 60 secondes entre chaque demande de réinitialisation.",
             )
             return redirect("chine:client_detail", pk=pk)
 
-        # Définir le flag cooldown pour 60s
-        cache.set(cache_key, True, timeout=60)
-
         # Generate new password (Format standard TS + Phone)
         telephone_propre = client.telephone.replace(" ", "")
         new_password = f"TS{telephone_propre}"
 
-        # Save new password
+        # Nouveau mot de passe et notification WhatsApp (outbox) dans la même transaction
         user = client.user
-        user.set_password(new_password)
-        user.save()
-
-        # Send notification via WhatsApp
         try:
-            from notification.tasks import send_notification_async
-
-            nom_complet = client.user.get_full_name() or client.user.username
-            phone = client.telephone  # Assuming client.telephone is the phone number
-
-            message = (
-                f"Bonjour {user.get_full_name()},\n\n"
-                f"Votre mot de passe a été réinitialisé par un administrateur.\n"
-                f"Voici vos nouveaux identifiants de connexion :\n\n"
-                f"   • Identifiant : *{user.username}* ou *{phone}*\n"
-                f"   • Mot de passe : *{new_password}*\n\n"
-                f"⚠️ *Important :* Veuillez modifier votre mot de passe dès votre prochaine connexion.\n\n"
-                f"🌐 Connectez-vous ici :\n"
-                f"https://ts-aircargo.com/login\n\n"
-                f"——\n"
-                f"*Équipe TS AIR CARGO* 🇨🇳 🇲🇱 🇨🇮"
-            )
+            with transaction.atomic():
+                user.set_password(new_password)
+                user.save()
 
-            send_notification_async.delay(
-                user_id=user.id,
-                message=message,
-                categorie="autre",
-                titre="Réinitialisation de mot de passe",
-                region="chine",
-            )
+                from notification.services.notification_service import notification_service
+
+                nom_complet = client.user.get_full_name() or client.user.username
+                phone = client.telephone  # Assuming client.telephone is the phone number
+
+                message = (
+                    f"Bonjour {user.get_full_name()},\n\n"
+                    f"Votre mot de passe a été réinitialisé par un administrateur.\n"
+                    f"Voici vos nouveaux identifiants de connexion :\n\n"
+                    f"   • Identifiant : *{user.username}* ou *{phone}*\n"
+                    f"   • Mot de passe : *{new_password}*\n\n"
+                    f"⚠️ *Important :* Veuillez modifier votre mot de passe dès votre prochaine connexion.\n\n"
+                    f"🌐 Connectez-vous ici :\n"
+                    f"https://ts-aircargo.com/login\n\n"
+                    f"——\n"
+                    f"*Équipe TS AIR CARGO* 🇨🇳 🇲🇱 🇨🇮"
+                )
+
+                notification_service.send_notification(
+                    destinataire=user,
+                    message=message,
+                    categorie="autre",
+                    titre="Réinitialisation de mot de passe",
+                    region="chine",
+                )
 
             messages.success(
                 request,
@@ -891,9 +868,9 @@ class ClientPasswordResetView(LoginRequiredMixin, View):
             logger.error(
                 f"Erreur lors de la réinitialisation du mot de passe pour {client.id}: {e}"
             )
-            messages.warning(
+            messages.error(
                 request,
-                "Le mot de passe a été réinitialisé mais l'envoi WhatsApp a échoué.",
+                "Erreur lors de la réinitialisation : le mot de passe n'a pas été modifié.",
             )
 
         return redirect("chine:client_detail", pk=pk)
@@ -923,7 +900,7 @@ class LotListView(LoginRequiredMixin, ListView):
         # Search
         search_query = self.request.GET.get("search")
         if search_query:
-            queryset = queryset.filter(Q(numero__icontains=search_query))
+            queryset = rechercher(queryset, search_query)
 
         # Filtre par Date (Mois / Année)
         selected_year = self.request.GET.get("year")
@@ -1050,20 +1027,15 @@ class LotCloseView(LoginRequiredMixin, StrictAgentChineRequiredMixin, View):
     def post(self, request, pk):
         lot = get_object_or_404(Lot, pk=pk)
         if lot.status == "OUVERT":
-            lot.status = "FERME"
-            lot.save()
-            messages.success(request, f"Lot {lot.numero} fermé. Prêt pour expédition.")
+            # Fermeture et mise en file des notifications (outbox) dans la même transaction
+            with transaction.atomic():
+                lot.status = "FERME"
+                lot.save()
 
-            # Notification clients — uniquement si frais transport saisis
-            # et uniquement pour les colis pas encore notifiés (évite doublons si réouverture)
-            if not lot.frais_transport or lot.frais_transport <= 0:
-                messages.warning(
-                    request,
-                    "Lot fermé. ⚠️ Aucune notification envoyée : renseignez les frais de transport d'abord.",
-                )
-            else:
-                try:
-                    from notification.tasks import send_notification_async
+                # Notification clients — uniquement si frais transport saisis
+                # et uniquement pour les colis pas encore notifiés (évite doublons si réouverture)
+                if lot.frais_transport and lot.frais_transport > 0:
+                    from notification.services.notification_service import notification_service
 
                     # Seulement les colis pas encore notifiés (nouveaux ou après réouverture)
                     colis_a_notifier = lot.colis.filter(
@@ -1072,6 +1044,7 @@ class LotCloseView(LoginRequiredMixin, StrictAgentChineRequiredMixin, View):
 
                     # Grouper par client (1 seul message par client)
                     by_client = {}
+                    notifications = []
                     for colis in colis_a_notifier:
                         if not colis.client or not colis.client.user:
                             continue
@@ -1100,21 +1073,26 @@ class LotCloseView(LoginRequiredMixin, StrictAgentChineRequiredMixin, View):
                             f"\u2014\u2014\n"
                             f"*\u00c9quipe TS AIR CARGO* \U0001f1e8\U0001f1f3 \U0001f1f2\U0001f1f1 \U0001f1e8\U0001f1ee"
                         )
-                        send_notification_async.delay(
-                            user_id=user.id,
-                            message=msg,
-                            categorie="lot_ferme",
-                            titre=f"Lot {lot.numero} ferm\u00e9 \u2014 Exp\u00e9dition \u00e0 venir",
-                            region="chine",
+                        notifications.append(
+                            notification_service.build_notification(
+                                destinataire=user,
+                                message=msg,
+                                categorie="lot_ferme",
+                                titre=f"Lot {lot.numero} ferm\u00e9 \u2014 Exp\u00e9dition \u00e0 venir",
+                                region="chine",
+                            )
                         )
 
-                    # Marquer les colis comme notifiés (anti-doublon réouverture)
+                    # Mise en file et marquage des colis notifiés (anti-doublon réouverture)
+                    notification_service.enqueue(notifications)
                     colis_a_notifier.update(notifie_fermeture=True)
 
-                except Exception as e:
-                    logger.error(
-                        f"Erreur trigger notification fermeture lot {lot.id}: {e}"
-                    )
+            messages.success(request, f"Lot {lot.numero} fermé. Prêt pour expédition.")
+            if not lot.frais_transport or lot.frais_transport <= 0:
+                messages.warning(
+                    request,
+                    "Lot fermé. ⚠️ Aucune notification envoyée : renseignez les frais de transport d'abord.",
+                )
 
         return redirect("chine:lot_detail", pk=pk)
 
@@ -1151,21 +1129,20 @@ class LotStatusUpdateView(LoginRequiredMixin, StrictAgentChineRequiredMixin, Vie
                 )
                 return redirect("chine:lot_detail", pk=pk)
 
-            lot.status = "EN_TRANSIT"
-            lot.date_expedition = timezone.now()
-            lot.save()
-            # Also update colis status? Generally yes.
-            lot.colis.update(status="EXPEDIE")
-            messages.success(
-                request, f"Lot {lot.numero} EXPÉDIÉ ! (Mode Lecture Seule activé)"
-            )
+            # Notification Clients — Groupée par client (1 seul message par client),
+            # mise en file (outbox) dans la transaction du changement de statut
+            with transaction.atomic():
+                lot.status = "EN_TRANSIT"
+                lot.date_expedition = timezone.now()
+                lot.save()
+                # Also update colis status? Generally yes.
+                Colis.changer_statut_en_masse(lot.colis.all(), "EXPEDIE", acteur=request.user)
 
-            # Notification Clients — Groupée par client (1 seul message par client)
-            try:
-                from notification.tasks import send_notification_async
+                from notification.services.notification_service import notification_service
 
                 by_client = {}
-                for colis in lot.colis.all():
+                notifications = []
+                for colis in lot.colis.select_related("client__user"):
                     if not colis.client or not colis.client.user:
                         continue
                     cid = colis.client.id
@@ -1198,18 +1175,20 @@ class LotStatusUpdateView(LoginRequiredMixin, StrictAgentChineRequiredMixin, Vie
                         f"\u2014\u2014\n"
                         f"*\u00c9quipe TS AIR CARGO* 🇨🇳 🇲🇱 🇨🇮"
                     )
-                    send_notification_async.delay(
-                        user_id=user.id,
-                        message=msg,
-                        categorie="lot_expedie",
-                        titre=f"Exp\u00e9dition Lot {lot.numero} \u2014 {nb} colis en route",
-                        region="chine",
+                    notifications.append(
+                        notification_service.build_notification(
+                            destinataire=user,
+                            message=msg,
+                            categorie="lot_expedie",
+                            titre=f"Exp\u00e9dition Lot {lot.numero} \u2014 {nb} colis en route",
+                            region="chine",
+                        )
                     )
+                notification_service.enqueue(notifications)
 
-            except Exception as e:
-                logger.error(
-                    f"Erreur trigger notification exp\u00e9dition lot {lot.id}: {e}"
-                )
+            messages.success(
+                request, f"Lot {lot.numero} EXPÉDIÉ ! (Mode Lecture Seule activé)"
+            )
         return redirect("chine:lot_detail", pk=pk)
 
 
@@ -1244,32 +1223,18 @@ class LotDetailView(LoginRequiredMixin, AgentChineRequiredMixin, DetailView):
         )
 
         # Tarif Data for Frontend Calculation
-        # Fetch ALL tarifs for this destination to handle different transport types and Telephone/Elec logic
-        from core.models import Tarif
-
-        tarifs = Tarif.objects.filter(destination=self.object.destination)
-
-        tarif_data = {}
-        for t in tarifs:
-            tarif_data[t.type_transport] = {
-                "prix_kilo": float(t.prix_kilo),
-                "prix_cbm": float(t.prix_cbm),
-                "prix_piece": float(t.prix_piece),
-            }
-
+        # Tous les tarifs de la destination (transports + Téléphone), servis par l'index en mémoire
         import json
-        context["tarif_json"] = json.dumps(tarif_data)
+        from core.tarifs import get_tarif_index
 
-        from core.models import ClientLotTarif
-        from django.db import models
-        special_tarifs = ClientLotTarif.objects.filter(
-            destination=self.object.destination
-        ).filter(
-            models.Q(type_transport=self.object.type_transport) | models.Q(type_transport__isnull=True)
+        tarif_index = get_tarif_index()
+        tarif_data = tarif_index.standard_for_destination(self.object.destination_id)
+        context["tarif_json"] = json.dumps(tarif_data)
+        context["special_tarifs_json"] = json.dumps(
+            tarif_index.special_for_destination(
+                self.object.destination_id, self.object.type_transport
+            )
         )
-        context["special_tarifs_json"] = json.dumps({
-            str(t.client_id): float(t.prix_kilo) for t in special_tarifs
-        })
 
         # Warn if no tarifs at all for this destination
         if not tarif_data and self.object.status == "OUVERT":
@@ -1285,13 +1250,7 @@ class LotDetailView(LoginRequiredMixin, AgentChineRequiredMixin, DetailView):
         # Filtrage par recherche
         q = self.request.GET.get("q")
         if q:
-            colis_queryset = colis_queryset.filter(
-                Q(reference__icontains=q)
-                | Q(client__nom__icontains=q)
-                | Q(client__prenom__icontains=q)
-                | Q(client__telephone__icontains=q)
-                | Q(description__icontains=q)
-            )
+            colis_queryset = rechercher(colis_queryset, q)
 
         paginator = Paginator(colis_queryset, 10)  # 10 colis per page
         page_number = self.request.GET.get("page")
@@ -1363,11 +1322,12 @@ class ColisCreateView(LoginRequiredMixin, StrictAgentChineRequiredMixin, CreateV
                     "Erreur lors de l'enregistrement de la photo (Webcam).",
                 )
 
-        colis.save()
+        # Notification Client V2, mise en file (outbox) dans la transaction
+        # d'enregistrement du colis
+        with transaction.atomic():
+            colis.save()
 
-        # Notification Client V2 (Async)
-        try:
-            from notification.tasks import send_notification_async
+            from notification.services.notification_service import notification_service
 
             if colis.client and colis.client.user:
                 nom_complet = (
@@ -1412,16 +1372,14 @@ class ColisCreateView(LoginRequiredMixin, StrictAgentChineRequiredMixin, CreateV
                     f"*Équipe TS AIR CARGO* 🇨🇳 🇲🇱 🇨🇮"
                 )
 
-                # Envoi asynchrone via Celery
-                send_notification_async.delay(
-                    user_id=colis.client.user.id,
+                # Mise en file (outbox), envoyée par le dispatcher
+                notification_service.send_notification(
+                    destinataire=colis.client.user,
                     message=message,
                     categorie="colis_recu",
                     titre=f"Colis réceptionné — {colis.reference}",
                     region="chine",
                 )
-        except Exception as e:
-            logger.error(f"Erreur trigger notification colis {colis.reference}: {e}")
 
         success_msg = "Colis ajouté avec succès !"
 
@@ -1535,9 +1493,11 @@ class TaskBulkDeleteView(LoginRequiredMixin, TaskMixin, View):
     def post(self, request):
         task_ids = request.POST.getlist("task_ids")
         if task_ids:
-            deleted_count = BackgroundTask.objects.filter(
-                id__in=task_ids, created_by=request.user
-            ).delete()[0]
+            tasks = BackgroundTask.objects.filter(id__in=task_ids, created_by=request.user)
+            for fichier in tasks.values_list("parameters__fichier", flat=True):
+                if fichier:
+                    default_storage.delete(fichier)
+            deleted_count = tasks.delete()[0]
             messages.success(request, f"{deleted_count} tâches supprimées avec succès.")
         else:
             messages.warning(request, "Aucune tâche sélectionnée.")
@@ -1617,12 +1577,9 @@ class NotificationListView(LoginRequiredMixin, TaskMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Statistiques pour les filtres rapides
-        context["stats_notif"] = Notification.objects.aggregate(
-            total=Count("id"),
-            envoye=Count("id", filter=Q(statut="envoye")),
-            echec=Count("id", filter=Q(statut="echec")),
-            echec_permanent=Count("id", filter=Q(statut="echec_permanent")),
-        )
+        from notification.services.notification_service import notification_service
+
+        context["stats_notif"] = notification_service.stats_region("chine")
         return context
 
     def post(self, request, *args, **kwargs):
@@ -1672,6 +1629,26 @@ class TaskDetailView(LoginRequiredMixin, TaskMixin, DetailView):
     context_object_name = "task"
 
 
+class TaskFichierView(LoginRequiredMixin, TaskMixin, View):
+    """Téléchargement du PDF produit par une tâche (étiquettes en masse)."""
+
+    def get(self, request, pk):
+        task_record = get_object_or_404(
+            BackgroundTask,
+            pk=pk,
+            created_by=request.user,
+            status=BackgroundTask.Status.SUCCESS,
+        )
+        fichier = task_record.parameters.get("fichier")
+        if not fichier or not default_storage.exists(fichier):
+            raise Http404("Fichier introuvable")
+        return FileResponse(
+            default_storage.open(fichier, "rb"),
+            content_type="application/pdf",
+            filename=os.path.basename(fichier),
+        )
+
+
 class TaskRetryView(LoginRequiredMixin, TaskMixin, View):
     def post(self, request, pk):
         task_record = get_object_or_404(BackgroundTask, pk=pk, created_by=request.user)
@@ -1679,6 +1656,10 @@ class TaskRetryView(LoginRequiredMixin, TaskMixin, View):
             task_record.status = BackgroundTask.Status.PENDING
             task_record.error_message = None
             task_record.save()
+            if task_record.parameters.get("type") == "etiquettes":
+                dispatch_etiquettes(task_record)
+                messages.success(request, "La tâche a été relancée.")
+                return redirect("chine:task_detail", pk=pk)
             try:
                 process_colis_creation.delay(task_record.pk)
                 messages.success(request, "La tâche a été relancée.")
@@ -2026,41 +2007,60 @@ class PaiementAgentCreateView(LoginRequiredMixin, AdminChineRequiredMixin, View)
 
 
 class ColisEtiquettePDFView(LoginRequiredMixin, StrictAgentChineRequiredMixin, View):
-    """Génération d'étiquettes de colis A4 (6 par page) avec Playwright"""
+    """
+    Génération d'étiquettes de colis A4 (4 par page), dessinées par core.pdf_native.
+    Au-delà de ETIQUETTES_SYNC_MAX_COLIS colis, le PDF est généré en
+    arrière-plan (chine.tasks.generate_etiquettes_task) et l'agent suit la tâche.
+    """
 
     def get(self, request):
         from core.utils_pdf import render_to_pdf_playwright
+        from .tasks import ETIQUETTES_TEMPLATE, colis_etiquettes, lancer_etiquettes, pages_etiquettes
 
         colis_ids_raw = request.GET.get("colis_ids", "")
         colis_ids = [cid.strip() for cid in colis_ids_raw.split(",") if cid.strip()]
         lot_id = request.GET.get("lot_id")
 
-        if lot_id:
-            colis_qs = Colis.objects.filter(lot_id=lot_id).select_related(
-                "client", "lot__destination"
-            )
-        else:
-            colis_qs = Colis.objects.filter(id__in=colis_ids).select_related(
-                "client", "lot__destination"
-            )
+        colis_qs = colis_etiquettes(lot_id=lot_id, colis_ids=colis_ids)
+        nombre = colis_qs.count()
 
-        if not colis_qs.exists():
+        if not nombre:
             messages.error(request, "Aucun colis sélectionné pour l'impression.")
             return redirect(request.META.get("HTTP_REFERER", "chine:dashboard"))
 
-        # Découpage par lots de 4 pour la mise en page A4 (Grille 2x2)
-        colis_list = list(colis_qs)
-        colis_batches = [colis_list[i : i + 4] for i in range(0, len(colis_list), 4)]
+        if nombre > getattr(settings, "ETIQUETTES_SYNC_MAX_COLIS", 40):
+            task_record = lancer_etiquettes(
+                request.user,
+                colis_qs.first().country,
+                lot_id=int(lot_id) if lot_id else None,
+                colis_ids=[int(cid) for cid in colis_ids if cid.isdigit()],
+            )
+            messages.info(
+                request,
+                f"Les étiquettes des {nombre} colis sont en cours de génération. "
+                "Le PDF sera téléchargeable sur cette page dès qu'il sera prêt.",
+            )
+            return redirect("chine:task_detail", pk=task_record.pk)
 
+        colis_list = list(colis_qs)
         context = {
-            "colis_batches": colis_batches,
+            "colis_batches": pages_etiquettes(colis_list),
             "date": timezone.now(),
         }
 
         filename = (
             f"etiquettes_lot_{lot_id}.pdf"
             if lot_id
-            else f"etiquette_colis_{colis_qs.first().reference}.pdf"
+            else f"etiquette_colis_{colis_list[0].reference}.pdf"
         )
 
-        return render_to_pdf_playwright("chine/etiquette_pdf.html", context, request)
+        return render_to_pdf_playwright(
+            ETIQUETTES_TEMPLATE,
+            context,
+            request,
+            filename=filename,
+            cache=True,
+            volatile=("date",),
+            dependances={f"lot:{colis.lot_id}" for colis in colis_list},
+            backend="native",
+        )
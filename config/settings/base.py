@@ -124,6 +124,16 @@ STATICFILES_FINDERS = (
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Rendu PDF Playwright (core.pdf_renderer) : Chromium gardé chaud par processus,
+# contextes (pages) simultanés, rendus avant recyclage d'un contexte, file d'attente
+PDF_RENDERER_CONTEXTS = env.int("PDF_RENDERER_CONTEXTS", default=2)
+PDF_RENDERER_MAX_RENDERS = env.int("PDF_RENDERER_MAX_RENDERS", default=100)
+PDF_RENDERER_QUEUE_SIZE = env.int("PDF_RENDERER_QUEUE_SIZE", default=32)
+# Au-delà, les étiquettes sont générées en arrière-plan (chine.tasks)
+ETIQUETTES_SYNC_MAX_COLIS = env.int("ETIQUETTES_SYNC_MAX_COLIS", default=40)
+# Cache des PDF générés (core.pdf_cache) : taille max dans le stockage média
+PDF_CACHE_MAX_BYTES = env.int("PDF_CACHE_MAX_BYTES", default=500 * 1024 * 1024)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -170,6 +180,29 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Cache partagé entre workers (core.cache) : Redis (base 1) hors DEBUG ou si
+# REDIS_CACHE_URL est défini, cache mémoire local en développement et en tests
+REDIS_CACHE_URL = env(
+    "REDIS_CACHE_URL",
+    default=None
+    if DEBUG
+    else f"redis://{env('REDIS_HOST', default='localhost')}:{env.int('REDIS_PORT', default=6379)}/1",
+)
+if REDIS_CACHE_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_CACHE_URL,
+            "KEY_PREFIX": "ts",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 # INTERNAL IPS for Tailwind Reload
 INTERNAL_IPS = [
     "127.0.0.1",
@@ -180,10 +213,10 @@ from datetime import timedelta  # noqa: E402
 from celery.schedules import crontab  # noqa: E402
 
 CELERY_BEAT_SCHEDULE = {
-    # Vérification des instances WaChap 1 fois par jour à 8h00
+    # Vérification des instances WaChap toutes les 5 minutes (snapshot lu par l'admin)
     "check_wachap_status_periodic": {
         "task": "notification.tasks.check_wachap_status_periodic",
-        "schedule": crontab(hour=8, minute=0),
+        "schedule": timedelta(minutes=5),
     },
     # Vérification de santé du système chaque heure
     "check_system_health_periodic": {
@@ -195,6 +228,16 @@ CELERY_BEAT_SCHEDULE = {
         "task": "notification.tasks.send_parcel_reminders_periodic",
         "schedule": crontab(hour=8, minute=0),
     },
+    # Outbox WhatsApp : envoi des notifications en attente (filet si un réveil est perdu)
+    "dispatch_notifications": {
+        "task": "notification.tasks.dispatch_notifications",
+        "schedule": timedelta(minutes=1),
+    },
+    # Regroupements de notifications de suivi arrivés à échéance
+    "flush_coalesced_notifications": {
+        "task": "notification.tasks.flush_coalesced_notifications",
+        "schedule": timedelta(minutes=1),
+    },
     # File d'attente WhatsApp : retry des notifications en échec toutes les 5 min
     "retry_failed_notifications_periodic": {
         "task": "notification.tasks.retry_failed_notifications_periodic",
@@ -205,11 +248,16 @@ CELERY_BEAT_SCHEDULE = {
         "task": "notification.tasks.send_daily_report_mali",
         "schedule": crontab(hour=23, minute=50),
     },
-    # Nettoyage des anciennes notifications envoyées avec succès (1h00 du matin heure Chine -> 17h00 UTC)
+    # Archivage puis suppression des anciennes notifications terminées (1h00 du matin heure Chine -> 17h00 UTC)
     "cleanup_old_notifications_periodic": {
         "task": "notification.tasks.cleanup_old_notifications_periodic",
         "schedule": crontab(hour=17, minute=0),
     },
+    # Clôture des soldes de caisse journaliers (juste après minuit UTC)
+    "cloturer_caisses_journalieres": {
+        "task": "report.tasks.cloturer_caisses_journalieres",
+        "schedule": crontab(hour=0, minute=10),
+    },
 }
 # Logging
 LOGGING = {
@@ -1,6 +1,7 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+
+from .phone import utilisateur_par_telephone
 
 UserModel = get_user_model()
 
@@ -17,23 +18,15 @@ class PhoneOrUsernameBackend(ModelBackend):
             user = None
 
         # Si on ne le trouve pas par nom d'utilisateur, on cherche par numéro de téléphone
+        # (User.phone ou telephone du profil client, normalisés E.164 et indexés)
+        is_phone = False
         if user is None:
-            try:
-                # On filtre spécifiquement sur le champ phone ou le telephone du profil client
-                user = UserModel.objects.filter(
-                    Q(phone=username) | Q(client_profile__telephone=username)
-                ).first()
-            except Exception:
-                user = None
+            user = utilisateur_par_telephone(username)
+            is_phone = user is not None
 
         if user:
             # RÈGLE MÉTIER : Connexion par téléphone autorisée UNIQUEMENT pour les CLIENTS
-            is_phone = user.phone == username or (
-                hasattr(user, "client_profile")
-                and user.client_profile
-                and user.client_profile.telephone == username
-            )
-            if is_phone and user.username != username:
+            if is_phone:
                 if user.role != "CLIENT":
                     # On refuse silencieusement ici, le formulaire de login captera l'échec et
                     # affichera le bon message d'erreur personnalisé
@@ -0,0 +1,107 @@
+"""
+Cache partagé (Redis en production, LocMemCache en local et en tests).
+
+- Espaces de noms versionnés : chaque pays (ou domaine, ex. "agents") a un
+  compteur de version dans le cache. Les écritures (Colis, Lot, Depense,
+  TransfertArgent... voir core.signals / report.signals) incrémentent le compteur
+  après COMMIT : toutes les entrées calculées avec l'ancienne version sont périmées
+  d'un coup, sans attendre l'expiration d'un TTL.
+- Une seule reconstruction à la fois (single-flight) : le premier processus qui
+  trouve une entrée périmée prend un verrou (cache.add) et recalcule, les autres
+  servent l'ancienne valeur (stale-while-revalidate) ou, à défaut de valeur,
+  attendent brièvement le résultat.
+"""
+
+import logging
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE_KEY = "ns:{}:version"
+LOCK_TIMEOUT = 30  # secondes : durée max d'une reconstruction
+WAIT_TIMEOUT = 5  # secondes : attente max d'une valeur en cours de calcul
+WAIT_INTERVAL = 0.05
+
+
+def namespace_version(namespace):
+    version = cache.get(NAMESPACE_KEY.format(namespace))
+    if version is None:
+        # Valeur initiale horodatée : ne retombe jamais sur une ancienne version après éviction
+        cache.add(NAMESPACE_KEY.format(namespace), int(time.time() * 1000), timeout=None)
+        version = cache.get(NAMESPACE_KEY.format(namespace))
+    return version
+
+
+def namespace_versions(namespaces):
+    keys = [NAMESPACE_KEY.format(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    return tuple(
+        found[key] if key in found else namespace_version(namespace)
+        for key, namespace in zip(keys, namespaces)
+    )
+
+
+def _bump(namespaces):
+    for namespace in namespaces:
+        try:
+            cache.incr(NAMESPACE_KEY.format(namespace))
+        except ValueError:
+            cache.set(NAMESPACE_KEY.format(namespace), int(time.time() * 1000), timeout=None)
+
+
+def bump_namespaces(*namespaces):
+    """Périme les entrées des espaces de noms donnés (après COMMIT de la transaction)."""
+    namespaces = {namespace for namespace in namespaces if namespace}
+    if namespaces:
+        transaction.on_commit(lambda: _bump(namespaces))
+
+
+def get_or_compute(key, compute, *, namespaces=(), fresh_for=300, stale_for=3600):
+    """
+    Retourne la valeur en cache de `key`, calculée par `compute()` si besoin.
+
+    La valeur est fraîche pendant `fresh_for` secondes et tant que les versions
+    des `namespaces` n'ont pas changé ; périmée, elle reste servie jusqu'à
+    `stale_for` secondes pendant qu'un seul processus la recalcule.
+    """
+    versions = namespace_versions(namespaces)
+    entry = cache.get(key)
+    now = time.time()
+
+    if entry is not None:
+        value, entry_versions, fresh_until = entry
+        if entry_versions == versions and now < fresh_until:
+            return value
+        if _acquire(key):
+            return _rebuild(key, compute, versions, fresh_for, stale_for)
+        # Reconstruction en cours ailleurs : on sert la valeur périmée
+        return value
+
+    if _acquire(key):
+        return _rebuild(key, compute, versions, fresh_for, stale_for)
+
+    # Calcul en cours dans un autre processus : on attend son résultat
+    deadline = now + WAIT_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    logger.warning("Cache %s : attente dépassée, calcul local", key)
+    return compute()
+
+
+def _acquire(key):
+    return cache.add(f"lock:{key}", True, timeout=LOCK_TIMEOUT)
+
+
+def _rebuild(key, compute, versions, fresh_for, stale_for):
+    try:
+        value = compute()
+        cache.set(key, (value, versions, time.time() + fresh_for), timeout=stale_for)
+        return value
+    finally:
+        cache.delete(f"lock:{key}")
@@ -0,0 +1,60 @@
+"""
+Exports CSV en streaming.
+
+Les lignes sont lues par paquets (.iterator(chunk_size=...), curseur côté
+serveur sous PostgreSQL) en tuples values_list, sans instancier de modèle, et
+écrites au fil de l'eau dans une StreamingHttpResponse : la mémoire reste
+constante quel que soit le nombre de lignes, et l'en-tête part avant même
+l'exécution de la requête.
+
+    lignes = Client.objects.values_list("nom", "telephone").iterator(chunk_size=CHUNK_SIZE)
+    return streaming_csv("clients.csv", ["Nom", "Téléphone"], lignes)
+"""
+
+import csv
+
+from django.http import StreamingHttpResponse
+
+CHUNK_SIZE = 2000
+LIGNES_PAR_ENVOI = 500
+
+
+class _Echo:
+    """Pseudo-fichier : csv.writer retourne la ligne formatée au lieu de l'écrire."""
+
+    def write(self, value):
+        return value
+
+
+def choix(model, champ):
+    """{valeur: libellé} des choices d'un champ, pour remplacer get_FOO_display()."""
+    return {
+        str(valeur): str(libelle)
+        for valeur, libelle in model._meta.get_field(champ).flatchoices
+    }
+
+
+def streaming_csv(filename, entete, lignes, preambule=()):
+    """
+    StreamingHttpResponse CSV (UTF-8 avec BOM pour Excel). `preambule` : lignes
+    écrites avant l'en-tête (titre, totaux...). Les lignes sont envoyées par
+    paquets de LIGNES_PAR_ENVOI.
+    """
+    writer = csv.writer(_Echo())
+
+    def contenu():
+        yield "\ufeff" + "".join(
+            writer.writerow(ligne) for ligne in (*preambule, entete)
+        )
+        paquet = []
+        for ligne in lignes:
+            paquet.append(writer.writerow(ligne))
+            if len(paquet) == LIGNES_PAR_ENVOI:
+                yield "".join(paquet)
+                paquet = []
+        if paquet:
+            yield "".join(paquet)
+
+    response = StreamingHttpResponse(contenu(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -30,13 +30,9 @@ class LoginForm(AuthenticationForm):
             if hasattr(e, "code") and e.code == "invalid_login":
                 username = self.cleaned_data.get("username")
                 if username:
-                    from django.contrib.auth import get_user_model
-                    from django.db.models import Q
+                    from .phone import utilisateur_par_telephone
 
-                    User = get_user_model()
-                    user = User.objects.filter(
-                        Q(phone=username) | Q(client_profile__telephone=username)
-                    ).first()
+                    user = utilisateur_par_telephone(username)
                     # Si le username fourni correspond à un téléphone en base pour un non-client
                     if user and user.role != "CLIENT" and user.username != username:
                         raise ValidationError(
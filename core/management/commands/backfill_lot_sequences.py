@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from django.db.models.functions import Greatest
+from core.models import Lot, NumeroSequence
+
+
+class Command(BaseCommand):
+    help = "Initialise les séquences de numérotation des lots à partir des lots existants"
+
+    def handle(self, *args, **options):
+        # Plus grand numéro utilisé par préfixe TYPE-YYMM
+        derniers = {}
+        for numero in Lot.objects.values_list("numero", flat=True).iterator():
+            prefix, _sep, seq = numero.rpartition("-")
+            if not prefix:
+                continue
+            try:
+                seq = int(seq)
+            except ValueError:
+                continue
+            derniers[prefix] = max(derniers.get(prefix, 0), seq)
+
+        crees = mis_a_jour = 0
+        for prefix, dernier in sorted(derniers.items()):
+            sequence, created = NumeroSequence.objects.get_or_create(
+                cle=prefix, defaults={"valeur": dernier}
+            )
+            if created:
+                crees += 1
+            else:
+                # Ne jamais reculer une séquence : seulement rattraper l'existant.
+                # Comparaison dans l'UPDATE, les lots créés en parallèle l'ont pu avancer.
+                mis_a_jour += NumeroSequence.objects.filter(
+                    pk=sequence.pk, valeur__lt=dernier
+                ).update(valeur=Greatest(F("valeur"), dernier))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Succès : {crees} séquences créées, {mis_a_jour} mises à jour."
+            )
+        )
@@ -0,0 +1,92 @@
+import os
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.utils import timezone
+from core import pdf_native
+from core.management.commands.benchmark_pdf import _PicMemoire, _rss_arbre_kb
+from core.models import Client, Colis, Country, Lot
+from core.pdf_renderer import PdfRenderer
+
+TEMPLATE = "chine/etiquette_pdf.html"
+
+
+def _colis_factices(nombre):
+    """Colis non enregistrés, avec leurs relations : aucune requête SQL."""
+    chine = Country(code="CN", name="Chine")
+    mali = Country(code="ML", name="Mali")
+    lot = Lot(
+        numero="CARGO-2410-001", country=chine, destination=mali, type_transport="CARGO"
+    )
+    colis = []
+    for i in range(nombre):
+        client = Client(
+            nom="Traoré",
+            prenom=f"Aïssata {i}",
+            telephone=f"+22376{i:06d}",
+            country=mali,
+        )
+        colis.append(
+            Colis(
+                lot=lot,
+                client=client,
+                country=chine,
+                reference=f"TS-2410-{i:06d}",
+                poids=Decimal("2.50"),
+                prix_final=Decimal("25000"),
+                created_at=timezone.now(),
+            )
+        )
+    return colis
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le débit (pages/s) et le pic mémoire de la planche d'étiquettes "
+        "chine/etiquette_pdf.html : Chromium (core.pdf_renderer) contre le moteur "
+        "natif core.pdf_native"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--etiquettes", type=int, default=1000)
+
+    def _mesurer(self, libelle, rendre, pages):
+        avant = _rss_arbre_kb(os.getpid())
+        with _PicMemoire() as memoire:
+            debut = time.perf_counter()
+            pdf_bytes = rendre()
+            duree = time.perf_counter() - debut
+        self.stdout.write(
+            f"{libelle:<10} {pages} pages en {duree:6.2f}s -> {pages / duree:6.1f} pages/s  "
+            f"pic RSS {memoire.pic_kb / 1024:6.0f} Mo (+{(memoire.pic_kb - avant) / 1024:.0f} Mo)  "
+            f"PDF {len(pdf_bytes) / 1024:.0f} Ko"
+        )
+
+    def handle(self, *args, **options):
+        colis = _colis_factices(options["etiquettes"])
+        context = {
+            "colis_batches": [colis[i : i + 4] for i in range(0, len(colis), 4)],
+            "date": timezone.now(),
+        }
+        pages = len(context["colis_batches"])
+
+        pdf_native.render(
+            TEMPLATE, {**context, "colis_batches": context["colis_batches"][:1]}
+        )
+        self._mesurer("Natif", lambda: pdf_native.render(TEMPLATE, context), pages)
+
+        try:
+            renderer = PdfRenderer(contexts=1).start()
+        except Exception as e:
+            self.stderr.write(f"Chromium indisponible : {e}")
+            return
+        try:
+            renderer.render("<html></html>")  # démarrage hors mesure (processus long)
+            html_content = render_to_string(TEMPLATE, context)
+            self._mesurer(
+                "Chromium", lambda: renderer.render(html_content, timeout=600), pages
+            )
+        finally:
+            renderer.stop()
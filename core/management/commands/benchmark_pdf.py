@@ -0,0 +1,109 @@
+import asyncio
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from core.pdf_renderer import PdfRenderer
+from core.utils_pdf import generate_pdf_playwright
+
+HTML = """
+<html><head><style>
+@page { size: A4; margin: 0 }
+.etiquette { width: 33%%; height: 90mm; float: left; border: 1px dashed #999;
+             font-family: sans-serif; padding: 4mm; box-sizing: border-box }
+</style></head><body>%s</body></html>
+"""
+ETIQUETTE = (
+    '<div class="etiquette"><h2>TS-2410-%06d</h2><p>Client Aïssata Traoré</p>'
+    "<p>+223 76 12 34 56 — Bamako</p><p>Poids : 2.5 kg — Cargo</p></div>"
+)
+
+
+def _rss_arbre_kb(pid):
+    """RSS (Ko) du processus et de ses descendants (Chromium), via /proc."""
+    total = 0
+    pids = [pid]
+    while pids:
+        courant = pids.pop()
+        try:
+            with open(f"/proc/{courant}/status") as status:
+                for ligne in status:
+                    if ligne.startswith("VmRSS:"):
+                        total += int(ligne.split()[1])
+            for tache in os.listdir(f"/proc/{courant}/task"):
+                with open(f"/proc/{courant}/task/{tache}/children") as enfants:
+                    pids.extend(int(p) for p in enfants.read().split())
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            continue
+    return total
+
+
+class _PicMemoire:
+    def __init__(self):
+        self.pic_kb = 0
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        def echantillonner():
+            while not self._stop.wait(0.05):
+                self.pic_kb = max(self.pic_kb, _rss_arbre_kb(os.getpid()))
+
+        self._thread = threading.Thread(target=echantillonner, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare la latence (p50/p99) et le pic mémoire du rendu PDF : un Chromium "
+        "lancé par PDF (ancien chemin) contre le pool core.pdf_renderer"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rendus", type=int, default=50)
+        parser.add_argument("--concurrence", type=int, default=4, help="Requêtes simultanées")
+        parser.add_argument("--etiquettes", type=int, default=6, help="Étiquettes par PDF")
+        parser.add_argument("--contextes", type=int, default=2)
+
+    def _mesurer(self, libelle, rendre, options):
+        html = HTML % "".join(ETIQUETTE % i for i in range(options["etiquettes"]))
+        latences = []
+
+        def un_rendu(_i):
+            debut = time.perf_counter()
+            rendre(html)
+            latences.append(time.perf_counter() - debut)
+
+        with _PicMemoire() as memoire:
+            debut = time.perf_counter()
+            with ThreadPoolExecutor(options["concurrence"]) as executor:
+                list(executor.map(un_rendu, range(options["rendus"])))
+            duree = time.perf_counter() - debut
+
+        latences.sort()
+        p99 = latences[min(len(latences) - 1, int(len(latences) * 0.99))]
+        self.stdout.write(
+            f"{libelle:<22} p50 {statistics.median(latences) * 1000:7.0f} ms  "
+            f"p99 {p99 * 1000:7.0f} ms  {len(latences) / duree:5.1f} PDF/s  "
+            f"pic RSS {memoire.pic_kb / 1024:6.0f} Mo"
+        )
+
+    def handle(self, *args, **options):
+        self._mesurer(
+            "Chromium par PDF",
+            lambda html: asyncio.run(generate_pdf_playwright(html)),
+            options,
+        )
+        renderer = PdfRenderer(contexts=options["contextes"]).start()
+        try:
+            renderer.render("<html></html>")  # démarrage hors mesure (processus long)
+            self._mesurer("Pool core.pdf_renderer", renderer.render, options)
+        finally:
+            renderer.stop()
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from core.models import Lot, LotStats
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les agrégats LotStats depuis les colis (correction de dérive)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lot", type=int, help="ID du lot (par défaut : tous)")
+        parser.add_argument("--batch-size", type=int, default=200)
+
+    def handle(self, *args, **options):
+        lot_ids = Lot.objects.order_by("pk").values_list("pk", flat=True)
+        if options["lot"]:
+            lot_ids = lot_ids.filter(pk=options["lot"])
+        lot_ids = list(lot_ids)
+        batch_size = options["batch_size"]
+
+        for start in range(0, len(lot_ids), batch_size):
+            LotStats.recalculer(lot_ids[start : start + batch_size])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Succès : agrégats reconstruits pour {len(lot_ids)} lots.")
+        )
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.tarifs import colis_a_recalculer, reprice_colis
+
+
+class Command(BaseCommand):
+    help = "Recalcule les prix des colis (tarifs en vigueur), filtrés par lot, destination ou client"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lot", type=int, help="ID du lot")
+        parser.add_argument("--destination", type=int, help="ID du pays de destination")
+        parser.add_argument("--client", type=int, help="ID du client")
+        parser.add_argument(
+            "--all", action="store_true", help="Recalculer tous les colis (sans filtre)"
+        )
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        lot_id = options["lot"]
+        destination_id = options["destination"]
+        client_id = options["client"]
+
+        if not (lot_id or destination_id or client_id or options["all"]):
+            raise CommandError(
+                "Précisez --lot, --destination, --client ou --all pour tout recalculer."
+            )
+
+        queryset = colis_a_recalculer(
+            lot_id=lot_id, destination_id=destination_id, client_id=client_id
+        )
+        total = queryset.count()
+        self.stdout.write(f"Trouvé {total} colis à recalculer.")
+
+        def progress(traites, modifies):
+            self.stdout.write(f"  {traites}/{total} traités, {modifies} modifiés")
+
+        modifies = reprice_colis(
+            queryset, chunk_size=options["chunk_size"], progress=progress
+        )
+        self.stdout.write(self.style.SUCCESS(f"Succès : {modifies} colis mis à jour."))
@@ -1,5 +1,15 @@
+from contextvars import ContextVar
+
 from .models import Country
 
+# Utilisateur de la requête en cours (acteur des ColisEvent écrits par Colis.save)
+_current_user = ContextVar("current_user", default=None)
+
+
+def get_current_user():
+    return _current_user.get()
+
+
 class TenantMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -16,5 +26,11 @@ class TenantMiddleware:
             # Anonymous users have no country context
             request.tenant_country = None
 
-        response = self.get_response(request)
+        token = _current_user.set(
+            request.user if request.user.is_authenticated else None
+        )
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_user.reset(token)
         return response
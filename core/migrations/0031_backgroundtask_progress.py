@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 03:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_encaissementcolis'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backgroundtask',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Avancement en pourcentage'),
+        ),
+    ]
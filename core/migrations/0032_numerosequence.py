@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-17 03:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_backgroundtask_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NumeroSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cle', models.CharField(max_length=50, unique=True)),
+                ('valeur', models.PositiveIntegerField(default=0, help_text='Dernier numéro attribué')),
+            ],
+            options={
+                'verbose_name': 'Séquence de numérotation',
+                'verbose_name_plural': 'Séquences de numérotation',
+            },
+        ),
+    ]
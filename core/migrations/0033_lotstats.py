@@ -0,0 +1,72 @@
+# Generated by Django 5.2 on 2026-10-17 03:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def remplir_lot_stats(apps, schema_editor):
+    Colis = apps.get_model("core", "Colis")
+    LotStats = apps.get_model("core", "LotStats")
+    lignes = (
+        Colis.objects.values("lot_id", "status")
+        .annotate(
+            nb_colis=models.Count("id"),
+            poids_total=models.Sum("poids", default=0),
+            cbm_total=models.Sum("cbm", default=0),
+            recettes=models.Sum("prix_final", default=0),
+            montant_jc_total=models.Sum("montant_jc", default=0),
+            nb_payes=models.Count("id", filter=models.Q(est_paye=True)),
+            nb_payes_chine=models.Count("id", filter=models.Q(paye_en_chine=True)),
+        )
+        .order_by()
+    )
+    LotStats.objects.bulk_create(
+        (
+            LotStats(
+                lot_id=ligne["lot_id"],
+                status=ligne["status"],
+                nb_colis=ligne["nb_colis"],
+                poids=ligne["poids_total"],
+                cbm=ligne["cbm_total"],
+                recettes=ligne["recettes"],
+                montant_jc=ligne["montant_jc_total"],
+                nb_payes=ligne["nb_payes"],
+                nb_payes_chine=ligne["nb_payes_chine"],
+            )
+            for ligne in lignes.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_numerosequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LotStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=20)),
+                ('nb_colis', models.IntegerField(default=0)),
+                ('poids', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cbm', models.DecimalField(decimal_places=4, default=0, max_digits=14)),
+                ('recettes', models.DecimalField(decimal_places=2, default=0, help_text='Somme des prix finaux', max_digits=16)),
+                ('montant_jc', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('nb_payes', models.IntegerField(default=0, help_text='Colis marqués payés')),
+                ('nb_payes_chine', models.IntegerField(default=0, help_text='Colis encaissés en Chine')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('lot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='core.lot')),
+            ],
+            options={
+                'verbose_name': 'Statistiques de lot',
+                'verbose_name_plural': 'Statistiques de lots',
+                'indexes': [models.Index(fields=['status', 'lot'], name='core_lotsta_status_231b62_idx')],
+                'constraints': [models.UniqueConstraint(fields=('lot', 'status'), name='unique_lotstats_per_status')],
+            },
+        ),
+        migrations.RunPython(remplir_lot_stats, migrations.RunPython.noop),
+    ]
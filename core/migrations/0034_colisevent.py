@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-17 03:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0033_lotstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ColisEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_event', models.CharField(choices=[('STATUT', 'Changement de statut'), ('PAIEMENT', 'Paiement')], default='STATUT', max_length=10)),
+                ('from_status', models.CharField(blank=True, max_length=20)),
+                ('to_status', models.CharField(blank=True, max_length=20)),
+                ('montant', models.DecimalField(blank=True, decimal_places=2, help_text='Net du colis (transition) ou montant encaissé (paiement)', max_digits=12, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('acteur', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('colis', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='events', to='core.colis')),
+                ('destination', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.country')),
+                ('lot', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.lot')),
+            ],
+            options={
+                'verbose_name': 'Événement colis',
+                'verbose_name_plural': 'Événements colis',
+                'indexes': [models.Index(fields=['destination', 'created_at'], name='core_colise_destina_5ae3e0_idx'), models.Index(fields=['acteur', 'created_at'], name='core_colise_acteur__b59dbd_idx'), models.Index(fields=['colis', 'created_at'], name='core_colise_colis_i_491bc0_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,130 @@
+# Generated by Django 5.2 on 2026-10-17 03:53
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+# Copie figée de core.search à la date de la migration : le module peut
+# évoluer sans changer les documents écrits ici.
+NON_ALPHANUM = re.compile(r"[^a-z0-9]+")
+NON_CHIFFRE = re.compile(r"\D+")
+
+
+def normaliser(texte):
+    texte = unicodedata.normalize("NFKD", str(texte or ""))
+    texte = "".join(c for c in texte if not unicodedata.combining(c)).lower()
+    return NON_ALPHANUM.sub(" ", texte).strip()
+
+
+def chiffres(telephone):
+    return NON_CHIFFRE.sub("", telephone or "")
+
+
+def document_client(client):
+    return " ".join(
+        filter(None, (normaliser(client.nom), normaliser(client.prenom), chiffres(client.telephone)))
+    )
+
+
+def document_colis(colis, client_document):
+    return " ".join(
+        filter(
+            None,
+            (
+                normaliser(colis.reference),
+                normaliser(colis.description),
+                normaliser(colis.poids),
+                client_document,
+            ),
+        )
+    )
+
+
+def document_lot(lot):
+    return normaliser(lot.numero)
+
+INDEX_TRIGRAMME = (
+    ("core_client", "core_client_search_trgm"),
+    ("core_colis", "core_colis_search_trgm"),
+    ("core_lot", "core_lot_search_trgm"),
+)
+
+
+def remplir_search_documents(apps, schema_editor):
+    Client = apps.get_model("core", "Client")
+    Colis = apps.get_model("core", "Colis")
+    Lot = apps.get_model("core", "Lot")
+
+    documents_clients = {}
+    clients = []
+    for client in Client.objects.only("nom", "prenom", "telephone").iterator():
+        client.search_document = document_client(client)
+        documents_clients[client.pk] = client.search_document
+        clients.append(client)
+    Client.objects.bulk_update(clients, ["search_document"], batch_size=1000)
+
+    lots = []
+    for lot in Lot.objects.only("numero").iterator():
+        lot.search_document = document_lot(lot)
+        lots.append(lot)
+    Lot.objects.bulk_update(lots, ["search_document"], batch_size=1000)
+
+    batch = []
+    for colis in Colis.objects.only(
+        "reference", "description", "poids", "client_id"
+    ).iterator(chunk_size=2000):
+        colis.search_document = document_colis(
+            colis, documents_clients.get(colis.client_id, "")
+        )
+        batch.append(colis)
+        if len(batch) >= 2000:
+            Colis.objects.bulk_update(batch, ["search_document"])
+            batch = []
+    Colis.objects.bulk_update(batch, ["search_document"])
+
+
+def creer_index_trigramme(apps, schema_editor):
+    """Index GIN pg_trgm (LIKE '%mot%' indexé) : PostgreSQL uniquement."""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table, index in INDEX_TRIGRAMME:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {index} ON {table} "
+            "USING gin (search_document gin_trgm_ops)"
+        )
+
+
+def supprimer_index_trigramme(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for _table, index in INDEX_TRIGRAMME:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {index}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0034_colisevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='colis',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='lot',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(remplir_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(creer_index_trigramme, supprimer_index_trigramme),
+    ]
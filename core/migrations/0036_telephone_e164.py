@@ -0,0 +1,68 @@
+# Generated by Django 5.2 on 2026-10-17 09:12
+
+import re
+
+from django.db import migrations, models
+
+# Copie figée de core.phone à la date de la migration
+SEPARATEURS = re.compile(r"[\s\-()]+")
+E164 = re.compile(r"\+\d+")
+
+
+def normaliser_telephone(phone):
+    if not phone:
+        return None
+    clean = SEPARATEURS.sub("", str(phone))
+    if clean.startswith("00"):
+        clean = "+" + clean[2:]
+    elif not clean.startswith("+"):
+        clean = "+" + clean
+    return clean if E164.fullmatch(clean) else None
+
+
+def _remplir(Model, source, cible):
+    """
+    Remplit la colonne normalisée. En cas de doublon, seule la plus ancienne
+    ligne garde le numéro normalisé (les autres restent à NULL, le numéro
+    saisi n'est pas modifié) : l'index unique peut ensuite être créé.
+    """
+    vus = set()
+    batch = []
+    for obj in Model.objects.only(source).order_by("pk").iterator(chunk_size=2000):
+        e164 = normaliser_telephone(getattr(obj, source))
+        if e164 in vus:
+            e164 = None
+        elif e164:
+            vus.add(e164)
+        setattr(obj, cible, e164)
+        batch.append(obj)
+        if len(batch) >= 2000:
+            Model.objects.bulk_update(batch, [cible])
+            batch = []
+    Model.objects.bulk_update(batch, [cible])
+
+
+def remplir_telephones_e164(apps, schema_editor):
+    _remplir(apps.get_model("core", "User"), "phone", "phone_e164")
+    _remplir(apps.get_model("core", "Client"), "telephone", "telephone_e164")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0035_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='telephone_e164',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='phone_e164',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True),
+        ),
+        migrations.RunPython(remplir_telephones_e164, migrations.RunPython.noop),
+    ]
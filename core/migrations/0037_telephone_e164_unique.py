@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0036_telephone_e164'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='client',
+            name='telephone_e164',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='phone_e164',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True, unique=True),
+        ),
+    ]
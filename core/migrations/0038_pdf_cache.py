@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-17 04:26
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0037_telephone_e164_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PdfCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cle', models.CharField(max_length=64, unique=True)),
+                ('fichier', models.CharField(max_length=255)),
+                ('template', models.CharField(max_length=200)),
+                ('taille', models.PositiveIntegerField()),
+                ('dependances', models.TextField(blank=True)),
+                ('nombre_acces', models.PositiveIntegerField(default=0)),
+                ('dernier_acces', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'PDF en cache',
+                'verbose_name_plural': 'PDF en cache',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-17 04:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0038_pdf_cache'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='encaissementcolis',
+            index=models.Index(fields=['date'], name='core_encais_date_c9ca96_idx'),
+        ),
+    ]
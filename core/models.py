@@ -1,8 +1,69 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.dispatch import Signal
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
-import uuid
+from decimal import Decimal
+import threading
+
+from .phone import normaliser_telephone
+from .search import document_client, document_colis, document_lot
+
+# Envoyé après Colis.bulk_update_suivi (colis_list) : les save() individuels
+# passent par post_save, les mises à jour en masse par ce signal.
+colis_bulk_updated = Signal()
+# Envoyé quand les agrégats LotStats de lots changent (lot_ids)
+lot_stats_updated = Signal()
+
+
+def _maj_champ_derive(instance, champ, valeur, kwargs, champs_source):
+    """Met à jour un champ calculé avant save() (et l'ajoute à update_fields si besoin)."""
+    setattr(instance, champ, valeur)
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and champs_source.intersection(update_fields):
+        kwargs["update_fields"] = {*update_fields, champ}
+
+
+def _maj_search_document(instance, document, kwargs, champs_source):
+    _maj_champ_derive(instance, "search_document", document, kwargs, champs_source)
+
+
+def _telephone_modifie(instance, source):
+    """
+    Numéro saisi modifié depuis le chargement (ou instance nouvelle). La forme
+    E.164 n'est recalculée que dans ce cas : un doublon historique laissé à
+    NULL par la migration 0036 le reste tant que son numéro ne change pas.
+    """
+    if instance._state.adding:
+        return True
+    if source in instance.get_deferred_fields():
+        return False
+    return getattr(instance, source) != getattr(instance, "_telephone_origine", None)
+
+
+def _maj_telephone_e164(instance, source, cible, kwargs):
+    if _telephone_modifie(instance, source):
+        _maj_champ_derive(
+            instance, cible, normaliser_telephone(getattr(instance, source)), kwargs, {source}
+        )
+
+
+def _verifier_telephone_unique(instance, source, cible, message):
+    """Doublon E.164 signalé sur le champ saisi, avant la contrainte unique."""
+    if not _telephone_modifie(instance, source):
+        return
+    e164 = normaliser_telephone(getattr(instance, source))
+    doublons = type(instance)._default_manager.filter(**{cible: e164})
+    if instance.pk:
+        doublons = doublons.exclude(pk=instance.pk)
+    if e164 and doublons.exists():
+        raise ValidationError({source: message})
+
+
+def _telephone_origine(instance, source):
+    if source not in instance.get_deferred_fields():
+        instance._telephone_origine = getattr(instance, source)
 
 
 class Country(models.Model):
@@ -39,6 +100,10 @@ class User(AbstractUser):
         Country, on_delete=models.SET_NULL, null=True, blank=True, related_name="users"
     )
     phone = models.CharField(max_length=20, blank=True)
+    # phone au format E.164 (core.phone), pour la connexion par téléphone
+    phone_e164 = models.CharField(
+        max_length=20, null=True, blank=True, unique=True, editable=False
+    )
     remuneration_mode = models.CharField(
         max_length=20,
         choices=RemunerationMode.choices,
@@ -55,6 +120,26 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.username} ({self.role})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        _telephone_origine(instance, "phone")
+        return instance
+
+    def clean(self):
+        super().clean()
+        _verifier_telephone_unique(
+            self,
+            "phone",
+            "phone_e164",
+            _("Un utilisateur avec ce numéro de téléphone existe déjà."),
+        )
+
+    def save(self, *args, **kwargs):
+        _maj_telephone_e164(self, "phone", "phone_e164", kwargs)
+        super().save(*args, **kwargs)
+        _telephone_origine(self, "phone")
+
 
 class TenantAwareModel(models.Model):
     country = models.ForeignKey(
@@ -74,6 +159,10 @@ class Client(TenantAwareModel):
     telephone = models.CharField(
         max_length=20, help_text=_("Format: +223... ou +225...")
     )
+    # telephone au format E.164 (core.phone) : un seul client par numéro
+    telephone_e164 = models.CharField(
+        max_length=20, null=True, blank=True, unique=True, editable=False
+    )
     adresse = models.TextField(blank=True)
     user = models.OneToOneField(
         User,
@@ -82,12 +171,128 @@ class Client(TenantAwareModel):
         blank=True,
         related_name="client_profile",
     )
+    search_document = models.TextField(blank=True, default="", editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.nom} {self.prenom} ({self.telephone})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if "search_document" not in instance.get_deferred_fields():
+            instance._search_origine = instance.search_document
+        _telephone_origine(instance, "telephone")
+        return instance
+
+    def clean(self):
+        super().clean()
+        _verifier_telephone_unique(
+            self,
+            "telephone",
+            "telephone_e164",
+            _("Un client avec ce numéro de téléphone existe déjà."),
+        )
+
+    def save(self, *args, **kwargs):
+        _maj_telephone_e164(self, "telephone", "telephone_e164", kwargs)
+        _maj_search_document(
+            self, document_client(self), kwargs, {"nom", "prenom", "telephone"}
+        )
+        ancien = getattr(self, "_search_origine", None)
+        super().save(*args, **kwargs)
+        if ancien is not None and ancien != self.search_document:
+            # Le document des colis inclut celui du client
+            colis = list(
+                self.colis.only("pk", "reference", "description", "poids", "client_id")
+            )
+            for c in colis:
+                c.search_document = document_colis(c, self.search_document)
+            Colis.objects.bulk_update(colis, ["search_document"], batch_size=500)
+        self._search_origine = self.search_document
+        _telephone_origine(self, "telephone")
+
+
+class NumeroSequence(models.Model):
+    """
+    Compteur par préfixe pour la numérotation des lots (ex: "CARGO-2402")
+    et des références de colis (ex: "TS-2402").
+    Une allocation verrouille et incrémente une seule ligne (select_for_update),
+    sans balayer l'historique ni risquer deux numéros identiques. Sous
+    PostgreSQL, l'incrément est une seule requête (UPDATE ... RETURNING) : la
+    ligne reste verrouillée jusqu'au COMMIT de l'appelant, qui alloue donc le
+    plus tard possible (juste avant l'INSERT, voir Colis.save).
+    """
+
+    cle = models.CharField(max_length=50, unique=True)
+    valeur = models.PositiveIntegerField(
+        default=0, help_text=_("Dernier numéro attribué")
+    )
+
+    class Meta:
+        verbose_name = _("Séquence de numérotation")
+        verbose_name_plural = _("Séquences de numérotation")
+
+    def __str__(self):
+        return f"{self.cle} : {self.valeur}"
+
+    @classmethod
+    def allouer(cls, cle, nombre=1, initial=0):
+        """
+        Réserve `nombre` numéros consécutifs pour `cle` et retourne le premier.
+        `initial` (valeur ou callable) n'est utilisé qu'à la création de la séquence.
+        Un numéro alloué puis non utilisé (rollback de l'appelant) laisse un trou.
+        """
+        from django.db import connection
+
+        if connection.vendor == "postgresql":
+            return cls._allouer_postgresql(connection, cle, nombre, initial)
+        with _sequence_lock(), transaction.atomic():
+            sequence, _created = cls.objects.select_for_update().get_or_create(
+                cle=cle, defaults={"valeur": initial}
+            )
+            premier = sequence.valeur + 1
+            sequence.valeur += nombre
+            sequence.save(update_fields=["valeur"])
+        return premier
+
+    @classmethod
+    def _allouer_postgresql(cls, connection, cle, nombre, initial):
+        """Incrément en une requête, création de la séquence au premier appel."""
+        table = cls._meta.db_table
+        incrementer = (
+            f"UPDATE {table} SET valeur = valeur + %s WHERE cle = %s RETURNING valeur"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(incrementer, [nombre, cle])
+            ligne = cursor.fetchone()
+            if ligne is None:
+                cursor.execute(
+                    f"INSERT INTO {table} (cle, valeur) VALUES (%s, %s) "
+                    "ON CONFLICT (cle) DO NOTHING",
+                    [cle, initial() if callable(initial) else initial],
+                )
+                cursor.execute(incrementer, [nombre, cle])
+                ligne = cursor.fetchone()
+        return ligne[0] - nombre + 1
+
+
+_sqlite_sequence_lock = threading.Lock()
+
+
+def _sequence_lock():
+    """
+    SQLite ignore select_for_update : on sérialise les allocations du processus
+    (SQLite n'accepte de toute façon qu'un écrivain à la fois).
+    """
+    from contextlib import nullcontext
+    from django.db import connection
+
+    if connection.vendor == "sqlite":
+        return _sqlite_sequence_lock
+    return nullcontext()
+
 
 class Lot(TenantAwareModel):
     class TypeTransport(models.TextChoices):
@@ -110,6 +315,7 @@ class Lot(TenantAwareModel):
         blank=True,
         help_text=_("Généré automatiquement (ex: CARGO-2402-001)"),
     )
+    search_document = models.TextField(blank=True, default="", editable=False)
     destination = models.ForeignKey(
         Country,
         on_delete=models.PROTECT,
@@ -136,19 +342,26 @@ class Lot(TenantAwareModel):
         if not self.numero:
             # Auto-generate number: TYPE-YYMM-SEQ
             prefix = f"{self.type_transport}-{timezone.now().strftime('%y%m')}"
-            last_lot = (
-                Lot.objects.filter(numero__startswith=prefix).order_by("numero").last()
+            seq = NumeroSequence.allouer(
+                prefix, initial=lambda: Lot.dernier_numero_existant(prefix)
             )
-            if last_lot:
-                try:
-                    seq = int(last_lot.numero.split("-")[-1]) + 1
-                except ValueError:
-                    seq = 1
-            else:
-                seq = 1
             self.numero = f"{prefix}-{seq:03d}"
+        _maj_search_document(self, document_lot(self), kwargs, {"numero"})
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def dernier_numero_existant(prefix):
+        """Plus grand numéro de séquence déjà utilisé pour ce préfixe (0 si aucun)."""
+        dernier = 0
+        for numero in Lot.objects.filter(numero__startswith=f"{prefix}-").values_list(
+            "numero", flat=True
+        ):
+            try:
+                dernier = max(dernier, int(numero.split("-")[-1]))
+            except ValueError:
+                continue
+        return dernier
+
     # Frais globaux
     frais_transport = models.DecimalField(
         max_digits=12,
@@ -368,89 +581,501 @@ class Colis(TenantAwareModel):
     date_encaissement = models.DateField(null=True, blank=True, help_text=_("Date à laquelle le paiement a été encaissé"))
 
     reference = models.CharField(max_length=50, unique=True, editable=False)
+    search_document = models.TextField(blank=True, default="", editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    def save(self, *args, **kwargs):
-        if not self.reference:
-            import uuid
+    REFERENCE_MAX_TENTATIVES = 3
+    # Champs agrégés dans LotStats
+    STATS_FIELDS = (
+        "lot_id",
+        "status",
+        "poids",
+        "cbm",
+        "prix_final",
+        "montant_jc",
+        "est_paye",
+        "paye_en_chine",
+    )
+    # Champs déterminant la recette de caisse du colis (report.caisse)
+    CAISSE_FIELDS = (
+        "status",
+        "date_encaissement",
+        "date_livraison",
+        "paye_en_chine",
+        "est_paye",
+        "prix_final",
+        "montant_jc",
+        "reste_a_payer",
+        "updated_at",
+    )
 
-            # Génère une réf courte avec préfixe TS
-            uid = str(uuid.uuid4()).split("-")[0].upper()
-            self.reference = f"TS-{uid}"
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # État en base, pour mettre à jour LotStats par différence au prochain save()
+        if not instance.get_deferred_fields().intersection(cls.STATS_FIELDS):
+            instance._stats_origine = instance.stats_snapshot()
+        if not instance.get_deferred_fields().intersection(cls.CAISSE_FIELDS):
+            instance._caisse_origine = instance.caisse_snapshot()
+        return instance
 
+    def stats_snapshot(self):
+        return {field: getattr(self, field) for field in self.STATS_FIELDS}
+
+    def caisse_snapshot(self):
+        """
+        {formule de caisse: (jour, montant net) encaissé pour ce colis, ou None}
+        pour les formules calculées sur les colis (report.caisse).
+        """
+        if self.status != "LIVRE":
+            return {"livraison": None, "paiement": None}
+
+        def montant(*valeurs):
+            return sum(
+                (Decimal(str(valeur or 0)) * signe for valeur, signe in valeurs),
+                Decimal("0"),
+            ).quantize(Decimal("0.01"))
+
+        jour = self._meta.get_field("date_encaissement").to_python(
+            self.date_encaissement
+        ) or self._meta.get_field("date_livraison").to_python(self.date_livraison)
+        if self.paye_en_chine:
+            livraison = (jour, Decimal("0"))
+        else:
+            livraison = (
+                jour,
+                montant((self.prix_final, 1), (self.montant_jc, -1), (self.reste_a_payer, -1)),
+            )
+        paiement = None
+        if self.est_paye and self.updated_at:
+            paiement = (
+                timezone.localdate(self.updated_at),
+                montant((self.prix_final, 1), (self.montant_jc, -1)),
+            )
+        return {"livraison": livraison, "paiement": paiement}
+
+    def save(self, *args, **kwargs):
         # Recalculer les prix automatiquement
         self.recalculate_prices()
 
-        super().save(*args, **kwargs)
+        creation = self._state.adding
+        ancien = None if creation else getattr(self, "_stats_origine", None)
+        nouveau = self.stats_snapshot()
+        update_fields = kwargs.get("update_fields")
+        if ancien is not None and update_fields is not None:
+            # Seuls les champs sauvegardés changent en base
+            sauvegardes = {self._meta.get_field(name).attname for name in update_fields}
+            nouveau = {
+                field: nouveau[field] if field in sauvegardes else ancien[field]
+                for field in self.STATS_FIELDS
+            }
+
+        with transaction.atomic():
+            self._save_with_reference(*args, **kwargs)
+            if creation or ancien is not None:
+                LotStats.appliquer(ancien, nouveau)
+                if creation or ancien["status"] != nouveau["status"]:
+                    ColisEvent.transition(
+                        self, ancien["status"] if ancien else ""
+                    ).save()
+            else:
+                # État d'origine inconnu (champs différés) : recalcul complet du lot
+                LotStats.recalculer([self.lot_id])
+        self._stats_origine = nouveau
+        self._caisse_origine = self.caisse_snapshot()
+
+    @classmethod
+    def changer_statut_en_masse(cls, queryset, status, acteur=None):
+        """
+        Passe les colis du queryset au statut donné (un seul UPDATE), journalise
+        les transitions (ColisEvent, en masse) et met à jour LotStats.
+        Retourne le nombre de colis modifiés.
+        """
+        with transaction.atomic():
+            lignes = list(
+                queryset.exclude(status=status)
+                .select_for_update(of=("self",))
+                .values_list(
+                    "pk", "lot_id", "lot__destination_id", "status", "prix_final", "montant_jc"
+                )
+            )
+            if not lignes:
+                return 0
+            cls.objects.filter(pk__in=[ligne[0] for ligne in lignes]).update(
+                status=status
+            )
+            acteur = acteur or ColisEvent.acteur_courant()
+            now = timezone.now()
+            ColisEvent.objects.bulk_create(
+                ColisEvent(
+                    colis_id=pk,
+                    lot_id=lot_id,
+                    destination_id=destination_id,
+                    type_event=ColisEvent.Type.STATUT,
+                    from_status=ancien_status,
+                    to_status=status,
+                    acteur=acteur,
+                    montant=(prix_final or 0) - (montant_jc or 0),
+                    created_at=now,
+                )
+                for pk, lot_id, destination_id, ancien_status, prix_final, montant_jc in lignes
+            )
+            LotStats.recalculer({ligne[1] for ligne in lignes})
+        return len(lignes)
+
+    @classmethod
+    def bulk_update_suivi(cls, colis_list, fields, events=()):
+        """
+        bulk_update qui garde le suivi à jour : écrit les ColisEvent fournis,
+        recalcule LotStats des lots concernés et notifie colis_bulk_updated,
+        dans la même transaction.
+        """
+        with transaction.atomic():
+            cls.objects.bulk_update(colis_list, fields)
+            ColisEvent.objects.bulk_create(events)
+            if {cls._meta.get_field(name).attname for name in fields}.intersection(
+                cls.STATS_FIELDS
+            ):
+                LotStats.recalculer({c.lot_id for c in colis_list})
+            colis_bulk_updated.send(sender=cls, colis_list=colis_list)
+        for colis in colis_list:
+            colis._caisse_origine = colis.caisse_snapshot()
+
+    def _save_with_reference(self, *args, **kwargs):
+        champs_recherche = {"reference", "description", "poids", "client"}
+        if self.reference:
+            _maj_search_document(self, document_colis(self), kwargs, champs_recherche)
+            return super().save(*args, **kwargs)
+
+        # Référence séquentielle TS-YYMM-NNNNNN ; en cas de collision (séquence
+        # réinitialisée, saisie manuelle...), on réessaie avec un nouveau numéro
+        for tentative in range(self.REFERENCE_MAX_TENTATIVES):
+            self.reference = Colis.allouer_references()[0]
+            _maj_search_document(self, document_colis(self), kwargs, champs_recherche)
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                return
+            except IntegrityError:
+                collision = Colis.objects.filter(reference=self.reference).exists()
+                self.reference = ""
+                if not collision or tentative == self.REFERENCE_MAX_TENTATIVES - 1:
+                    raise
+
+    @staticmethod
+    def allouer_references(nombre=1):
+        """
+        Réserve `nombre` références consécutives du mois en une seule allocation.
+        À utiliser pour les saisies en masse (imports, bulk_create) qui
+        contournent save() : `colis.reference = refs[i]`.
+        """
+        prefix = f"TS-{timezone.now().strftime('%y%m')}"
+        premier = NumeroSequence.allouer(
+            prefix,
+            nombre=nombre,
+            initial=lambda: Colis.derniere_reference_existante(prefix),
+        )
+        return [f"{prefix}-{seq:06d}" for seq in range(premier, premier + nombre)]
+
+    @staticmethod
+    def derniere_reference_existante(prefix):
+        """Plus grand numéro déjà utilisé pour ce préfixe (0 si aucun)."""
+        dernier = 0
+        for reference in Colis.objects.filter(
+            reference__startswith=f"{prefix}-"
+        ).values_list("reference", flat=True):
+            try:
+                dernier = max(dernier, int(reference.split("-")[-1]))
+            except ValueError:
+                continue
+        return dernier
 
     def recalculate_prices(self):
         """
         Recalcule le prix_transport et le prix_final en fonction du lot,
         du type de colis et des tarifs en vigueur.
+        Les tarifs sont lus depuis l'index en mémoire (core.tarifs) : aucune requête
+        n'est faite si le lot est déjà chargé.
         """
-        # 1. Vérifier s'il existe un tarif spécial (conventionnel) pour ce client vers cette destination (global)
-        # On vérifie si un tarif a le type de transport du lot OU si le type de transport du tarif est vide (applicable à tout)
-        # On utilise _base_manager pour s'assurer de trouver les tarifs même si le tenant (country) est différent
-        special_tarif = ClientLotTarif._base_manager.filter(
-            client=self.client, destination=self.lot.destination
-        ).filter(
-            models.Q(type_transport=self.lot.type_transport) | models.Q(type_transport__isnull=True)
-        ).first()
-
-        from decimal import Decimal
-        poids_dec = Decimal(str(self.poids or 0))
-        cbm_dec = Decimal(str(self.cbm or 0))
-
-        if special_tarif and self.lot.type_transport != "BATEAU":
-            # Si un tarif spécial est défini (Cargo/Express uniquement), il s'applique en priorité
-            self.prix_transport = poids_dec * special_tarif.prix_kilo
-            self.prix_final = self.prix_transport
-            return
+        from .tarifs import get_tarif_index
+
+        lot = self.lot
+        self.prix_transport, self.prix_final = get_tarif_index().compute_prices(
+            client_id=self.client_id,
+            destination_id=lot.destination_id,
+            type_transport=lot.type_transport,
+            type_colis=self.type_colis,
+            poids=self.poids,
+            cbm=self.cbm,
+            nombre_pieces=self.nombre_pieces,
+            prix_kilo_manuel=self.prix_kilo_manuel,
+        )
+
+    def __str__(self):
+        return f"Carton {self.reference} - {self.client}"
+
+
+class LotStats(models.Model):
+    """
+    Agrégats d'un lot par statut de colis (nombre, poids, volume, recettes,
+    colis payés), maintenus à chaque sauvegarde / suppression de colis.
+    Lus par les listes de lots des pays de destination sans parcourir les colis.
+    Les mises à jour en masse (QuerySet.update, bulk_update) appellent recalculer().
+    `manage.py rebuild_lot_stats` corrige toute dérive.
+    """
+
+    lot = models.ForeignKey(Lot, on_delete=models.CASCADE, related_name="stats")
+    status = models.CharField(max_length=20)
+    nb_colis = models.IntegerField(default=0)
+    poids = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cbm = models.DecimalField(max_digits=14, decimal_places=4, default=0)
+    recettes = models.DecimalField(
+        max_digits=16, decimal_places=2, default=0, help_text=_("Somme des prix finaux")
+    )
+    montant_jc = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    nb_payes = models.IntegerField(default=0, help_text=_("Colis marqués payés"))
+    nb_payes_chine = models.IntegerField(
+        default=0, help_text=_("Colis encaissés en Chine")
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Statistiques de lot")
+        verbose_name_plural = _("Statistiques de lots")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["lot", "status"], name="unique_lotstats_per_status"
+            )
+        ]
+        indexes = [models.Index(fields=["status", "lot"])]
 
-        # 2. Recherche du tarif standard pour la destination et le type de transport du lot
-        # On utilise _base_manager ici aussi pour contourner tout filtrage automatique par pays
+    def __str__(self):
+        return f"Lot {self.lot_id} / {self.status} : {self.nb_colis} colis"
+
+    @staticmethod
+    def _valeurs(snapshot, signe):
+        return {
+            "nb_colis": signe,
+            "poids": signe * (snapshot["poids"] or 0),
+            "cbm": signe * (snapshot["cbm"] or 0),
+            "recettes": signe * (snapshot["prix_final"] or 0),
+            "montant_jc": signe * (snapshot["montant_jc"] or 0),
+            "nb_payes": signe * int(bool(snapshot["est_paye"])),
+            "nb_payes_chine": signe * int(bool(snapshot["paye_en_chine"])),
+        }
+
+    @classmethod
+    def _ajouter(cls, snapshot, signe):
+        valeurs = cls._valeurs(snapshot, signe)
+        lignes = cls.objects.filter(
+            lot_id=snapshot["lot_id"], status=snapshot["status"]
+        ).update(
+            **{champ: models.F(champ) + delta for champ, delta in valeurs.items()},
+            updated_at=timezone.now(),
+        )
+        if lignes or signe < 0:
+            return
         try:
-            tarif = Tarif._base_manager.get(
-                destination=self.lot.destination, type_transport=self.lot.type_transport
+            with transaction.atomic():
+                cls.objects.create(
+                    lot_id=snapshot["lot_id"], status=snapshot["status"], **valeurs
+                )
+        except IntegrityError:
+            # Ligne créée entre-temps par une autre transaction
+            cls._ajouter(snapshot, signe)
+
+    @classmethod
+    def appliquer(cls, ancien, nouveau):
+        """Retire l'ancien état d'un colis et ajoute le nouveau (None = absent)."""
+        if ancien == nouveau:
+            return
+        if ancien is not None:
+            cls._ajouter(ancien, -1)
+        if nouveau is not None:
+            cls._ajouter(nouveau, 1)
+        lot_stats_updated.send(
+            sender=cls,
+            lot_ids={s["lot_id"] for s in (ancien, nouveau) if s is not None},
+        )
+
+    @classmethod
+    def recalculer(cls, lot_ids):
+        """
+        Reconstruit les agrégats des lots donnés depuis leurs colis.
+
+        Les lots et leurs lignes d'agrégats sont verrouillés avant la lecture
+        des colis : un recalcul concurrent attend, et un _ajouter() concurrent
+        applique son delta après l'écriture, sur des totaux qui ne l'incluent pas.
+        """
+        lot_ids = sorted({lot_id for lot_id in lot_ids if lot_id})
+        if not lot_ids:
+            return
+        with transaction.atomic():
+            list(
+                Lot.objects.select_for_update()
+                .filter(pk__in=lot_ids)
+                .order_by("pk")
+                .values_list("pk", flat=True)
             )
-        except (Tarif.DoesNotExist, Tarif.MultipleObjectsReturned):
-            # En cas de multiple, on prend le premier pour ne pas bloquer
-            tarif = Tarif._base_manager.filter(
-                destination=self.lot.destination, type_transport=self.lot.type_transport
-            ).first()
-
-        if self.type_colis == "MANUEL" and self.prix_kilo_manuel:
-            self.prix_transport = poids_dec * self.prix_kilo_manuel
-        elif self.type_colis == "TELEPHONE":
-            # Pour le téléphone, on utilise le tarif spécifique téléphone s'il existe
-            try:
-                tarif_tel = Tarif.objects.get(
-                    destination=self.lot.destination, type_transport="TELEPHONE"
+            existantes = set(
+                cls.objects.select_for_update()
+                .filter(lot_id__in=lot_ids)
+                .order_by("pk")
+                .values_list("lot_id", "status")
+            )
+            lignes = (
+                Colis.objects.filter(lot_id__in=lot_ids)
+                .values("lot_id", "status")
+                .annotate(
+                    nb_colis=models.Count("id"),
+                    poids_total=models.Sum("poids", default=0),
+                    cbm_total=models.Sum("cbm", default=0),
+                    recettes=models.Sum("prix_final", default=0),
+                    montant_jc_total=models.Sum("montant_jc", default=0),
+                    nb_payes=models.Count("id", filter=models.Q(est_paye=True)),
+                    nb_payes_chine=models.Count(
+                        "id", filter=models.Q(paye_en_chine=True)
+                    ),
                 )
-                self.prix_transport = Decimal(str(self.nombre_pieces or 1)) * tarif_tel.prix_piece
-            except Tarif.DoesNotExist:
-                if tarif:
-                    self.prix_transport = Decimal(str(self.nombre_pieces or 1)) * tarif.prix_piece
-                else:
-                    self.prix_transport = Decimal('0')
-        elif self.lot.type_transport == "BATEAU":
-            if tarif:
-                self.prix_transport = cbm_dec * tarif.prix_cbm
-            else:
-                self.prix_transport = Decimal('0')
-        else:
-            # Cargo / Express
-            if tarif:
-                self.prix_transport = poids_dec * tarif.prix_kilo
-            else:
-                self.prix_transport = Decimal('0')
+                .order_by()
+            )
+            stats = [
+                cls(
+                    lot_id=ligne["lot_id"],
+                    status=ligne["status"],
+                    nb_colis=ligne["nb_colis"],
+                    poids=ligne["poids_total"],
+                    cbm=ligne["cbm_total"],
+                    recettes=ligne["recettes"],
+                    montant_jc=ligne["montant_jc_total"],
+                    nb_payes=ligne["nb_payes"],
+                    nb_payes_chine=ligne["nb_payes_chine"],
+                    updated_at=timezone.now(),
+                )
+                for ligne in lignes
+            ]
+            cls.objects.bulk_create(
+                stats,
+                update_conflicts=True,
+                unique_fields=["lot", "status"],
+                update_fields=[
+                    "nb_colis",
+                    "poids",
+                    "cbm",
+                    "recettes",
+                    "montant_jc",
+                    "nb_payes",
+                    "nb_payes_chine",
+                    "updated_at",
+                ],
+            )
+            # Statuts qui n'ont plus de colis
+            vides = existantes - {(stat.lot_id, stat.status) for stat in stats}
+            if vides:
+                filtre = models.Q()
+                for lot_id, status in vides:
+                    filtre |= models.Q(lot_id=lot_id, status=status)
+                cls.objects.filter(filtre).delete()
+            lot_stats_updated.send(sender=cls, lot_ids=set(lot_ids))
 
-        # Par défaut, le prix final est égal au prix transport
-        self.prix_final = self.prix_transport
+
+class ColisEvent(models.Model):
+    """
+    Journal (en ajout seul) des transitions de statut et des paiements des colis.
+    Les clés ne portent pas de contrainte en base : l'historique survit à la
+    suppression d'un colis ou d'un lot. Indexé pour des lectures par plage de
+    dates (activité du jour, rendement par agent, tableaux de bord destination).
+    """
+
+    class Type(models.TextChoices):
+        STATUT = "STATUT", _("Changement de statut")
+        PAIEMENT = "PAIEMENT", _("Paiement")
+
+    colis = models.ForeignKey(
+        Colis, on_delete=models.DO_NOTHING, db_constraint=False, related_name="events"
+    )
+    lot = models.ForeignKey(
+        Lot, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+    destination = models.ForeignKey(
+        Country,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        related_name="+",
+    )
+    type_event = models.CharField(
+        max_length=10, choices=Type.choices, default=Type.STATUT
+    )
+    from_status = models.CharField(max_length=20, blank=True)
+    to_status = models.CharField(max_length=20, blank=True)
+    acteur = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    montant = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        help_text=_("Net du colis (transition) ou montant encaissé (paiement)"),
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = _("Événement colis")
+        verbose_name_plural = _("Événements colis")
+        indexes = [
+            models.Index(fields=["destination", "created_at"]),
+            models.Index(fields=["acteur", "created_at"]),
+            models.Index(fields=["colis", "created_at"]),
+        ]
 
     def __str__(self):
-        return f"Carton {self.reference} - {self.client}"
+        return f"Colis {self.colis_id} : {self.from_status} -> {self.to_status}"
+
+    @staticmethod
+    def acteur_courant():
+        from .middleware import get_current_user
+
+        return get_current_user()
+
+    @classmethod
+    def transition(cls, colis, from_status, acteur=None, destination_id=None):
+        """Événement (non sauvegardé) pour le statut actuel de `colis`."""
+        if destination_id is None:
+            destination_id = colis.lot.destination_id
+        return cls(
+            colis_id=colis.pk,
+            lot_id=colis.lot_id,
+            destination_id=destination_id,
+            type_event=cls.Type.STATUT,
+            from_status=from_status or "",
+            to_status=colis.status,
+            acteur=acteur or cls.acteur_courant(),
+            montant=(colis.prix_final or 0) - (colis.montant_jc or 0),
+        )
+
+    @classmethod
+    def paiement(cls, colis, montant, acteur=None, destination_id=None):
+        """Événement (non sauvegardé) d'encaissement de `montant` sur `colis`."""
+        if destination_id is None:
+            destination_id = colis.lot.destination_id
+        return cls(
+            colis_id=colis.pk,
+            lot_id=colis.lot_id,
+            destination_id=destination_id,
+            type_event=cls.Type.PAIEMENT,
+            from_status=colis.status,
+            to_status=colis.status,
+            acteur=acteur or cls.acteur_courant(),
+            montant=montant,
+        )
 
 
 class Tarif(TenantAwareModel):
@@ -513,6 +1138,9 @@ class BackgroundTask(TenantAwareModel):
         max_length=20, choices=Status.choices, default=Status.PENDING
     )
     parameters = models.JSONField(default=dict, blank=True)
+    progress = models.PositiveSmallIntegerField(
+        default=0, help_text=_("Avancement en pourcentage")
+    )
     error_message = models.TextField(null=True, blank=True)
 
     # Timing
@@ -573,7 +1201,34 @@ class EncaissementColis(models.Model):
         verbose_name = _("Encaissement Colis")
         verbose_name_plural = _("Encaissements Colis")
         ordering = ["-date", "-created_at"]
+        # Journal des encaissements par période (report.EncaissementExportView)
+        indexes = [models.Index(fields=["date"])]
 
     def __str__(self):
         return f"Paiement {self.montant} pour {self.colis.reference} le {self.date}"
 
+
+
+class PdfCache(models.Model):
+    """
+    Index du cache des PDF générés (core.pdf_cache) : un fichier du stockage
+    média par contenu HTML distinct, évincé du moins récemment utilisé au plus
+    récent quand PDF_CACHE_MAX_BYTES est dépassé.
+    """
+
+    cle = models.CharField(max_length=64, unique=True)
+    fichier = models.CharField(max_length=255)
+    template = models.CharField(max_length=200)
+    taille = models.PositiveIntegerField()
+    # Étiquettes " lot:12 lot:15 " : invalidation à la modification des lots
+    dependances = models.TextField(blank=True)
+    nombre_acces = models.PositiveIntegerField(default=0)
+    dernier_acces = models.DateTimeField(default=timezone.now, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("PDF en cache")
+        verbose_name_plural = _("PDF en cache")
+
+    def __str__(self):
+        return f"{self.template} ({self.taille // 1024} Ko)"
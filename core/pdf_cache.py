@@ -0,0 +1,113 @@
+"""
+Cache des PDF générés, adressé par contenu.
+
+La clé d'un PDF est le hash (sha256) du nom du template, du format, du moteur
+de rendu et du HTML rendu : mêmes données, même HTML, même PDF. Une modification des données
+(colis, lot, dépenses du jour ou du mois...) change le HTML, donc la clé, et
+le PDF est régénéré ; un PDF en cache n'est jamais périmé. Les valeurs
+volatiles du contexte (date d'impression...) sont exclues du hash : un PDF
+servi depuis le cache garde la date de sa génération.
+
+Les fichiers sont dans le stockage média (CACHE_DIR), indexés par PdfCache.
+Les entrées étiquetées "lot:<id>" sont supprimées dès que le lot ou ses colis
+changent (core.signals), les autres s'évincent du moins récemment utilisé au
+plus récent au-delà de PDF_CACHE_MAX_BYTES.
+"""
+
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import PdfCache
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = "pdf_cache"
+
+
+def cle(template_src, html_content, format="A4", landscape=False, backend="chromium"):
+    empreinte = hashlib.sha256()
+    for partie in (template_src, format, str(landscape), backend, html_content):
+        empreinte.update(partie.encode("utf-8"))
+        empreinte.update(b"\0")
+    return empreinte.hexdigest()
+
+
+def lire(cle_pdf):
+    """Contenu du PDF en cache, ou None."""
+    entree = PdfCache.objects.filter(cle=cle_pdf).first()
+    if entree is None:
+        return None
+    try:
+        with default_storage.open(entree.fichier, "rb") as fichier:
+            contenu = fichier.read()
+    except (FileNotFoundError, OSError):
+        # Fichier disparu du stockage : l'entrée est retirée, le PDF sera régénéré
+        entree.delete()
+        return None
+    PdfCache.objects.filter(pk=entree.pk).update(
+        nombre_acces=F("nombre_acces") + 1, dernier_acces=timezone.now()
+    )
+    return contenu
+
+
+def enregistrer(cle_pdf, pdf_bytes, template_src, dependances=()):
+    """Met le PDF en cache puis évince au-delà de PDF_CACHE_MAX_BYTES."""
+    nom = default_storage.save(f"{CACHE_DIR}/{cle_pdf[:2]}/{cle_pdf}.pdf", ContentFile(pdf_bytes))
+    _, cree = PdfCache.objects.get_or_create(
+        cle=cle_pdf,
+        defaults={
+            "fichier": nom,
+            "template": template_src,
+            "taille": len(pdf_bytes),
+            "dependances": f" {' '.join(dependances)} " if dependances else "",
+        },
+    )
+    if not cree:
+        # Rendu concurrent du même PDF : le premier enregistré est gardé
+        default_storage.delete(nom)
+    evincer()
+
+
+def _supprimer(entrees):
+    for entree in entrees:
+        try:
+            default_storage.delete(entree.fichier)
+        except OSError as e:
+            logger.warning(f"[PdfCache] Suppression de {entree.fichier} impossible: {e}")
+    PdfCache.objects.filter(pk__in=[e.pk for e in entrees]).delete()
+
+
+def invalider(*etiquettes):
+    """Supprime les PDF dépendant de l'une des étiquettes (ex. "lot:12")."""
+    entrees = []
+    for etiquette in etiquettes:
+        entrees.extend(PdfCache.objects.filter(dependances__contains=f" {etiquette} "))
+    if entrees:
+        _supprimer(entrees)
+    return len(entrees)
+
+
+def invalider_lots(lot_ids):
+    return invalider(*(f"lot:{lot_id}" for lot_id in lot_ids))
+
+
+def evincer(max_bytes=None):
+    """Supprime les PDF les moins récemment utilisés jusqu'à repasser sous max_bytes."""
+    max_bytes = max_bytes if max_bytes is not None else settings.PDF_CACHE_MAX_BYTES
+    total = PdfCache.objects.aggregate(total=Sum("taille"))["total"] or 0
+    if total <= max_bytes:
+        return 0
+    a_supprimer = []
+    for entree in PdfCache.objects.order_by("dernier_acces", "pk").iterator():
+        if total <= max_bytes:
+            break
+        a_supprimer.append(entree)
+        total -= entree.taille
+    _supprimer(a_supprimer)
+    return len(a_supprimer)
@@ -0,0 +1,711 @@
+"""
+Rendu PDF natif (ReportLab), sans navigateur.
+
+Pour les documents de structure simple (planches d'étiquettes 2x2, rapports
+journaliers tabulaires), un Chromium est très lourd. Ce module dessine
+directement le PDF, page par page, à partir du même contexte que le template
+HTML : les vues choisissent le moteur avec
+render_to_pdf_playwright(..., backend="native").
+
+Chaque template pris en charge a sa fonction de dessin, enregistrée avec
+@dessin(template_src). Les valeurs passent par les mêmes filtres Django que
+les templates (dates, intcomma, floatformat...) : les textes sont identiques,
+seule la mise en page est reproduite à la main. Les polices sont les polices
+standard PDF (Helvetica, WinAnsi) : un texte hors cp1252 (nom en caractères
+chinois...) lève TexteNonEncodable, et core.utils_pdf.render_pdf rend alors
+le document avec Chromium.
+
+    pdf_bytes = pdf_native.render("chine/etiquette_pdf.html", context)
+"""
+
+import io
+from xml.sax.saxutils import escape
+
+from django.contrib.humanize.templatetags.humanize import intcomma
+from django.template.defaultfilters import date as date_filter
+from django.template.defaultfilters import floatformat
+from django.utils import formats, timezone
+from reportlab.graphics import renderPDF
+from reportlab.graphics.barcode.code128 import Code128
+from reportlab.graphics.barcode.qr import QrCodeWidget
+from reportlab.graphics.shapes import Drawing
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+from reportlab.lib.pagesizes import A4, landscape as paysage
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import mm
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from .templatetags.currency_tags import currency_no_symbol
+
+DESSINS = {}
+
+GRAS = "Helvetica-Bold"
+NORMAL = "Helvetica"
+PX = 0.75  # 1px CSS = 0.75pt
+
+
+class TexteNonEncodable(ValueError):
+    """Texte que les polices standard PDF ne savent pas dessiner."""
+
+
+def _encodable(texte):
+    """Le texte tel quel, ou TexteNonEncodable s'il sortirait en ■■■."""
+    try:
+        texte.encode("cp1252")
+    except UnicodeEncodeError as exc:
+        raise TexteNonEncodable(texte) from exc
+    return texte
+
+
+def dessin(template_src):
+    """Enregistre la fonction qui dessine `template_src` : f(context, buffer, taille)."""
+
+    def enregistrer(fonction):
+        DESSINS[template_src] = fonction
+        return fonction
+
+    return enregistrer
+
+
+def supporte(template_src):
+    return template_src in DESSINS
+
+
+def render(template_src, context, format="A4", landscape=False):
+    """Dessine le document et retourne le PDF (bytes)."""
+    if template_src not in DESSINS:
+        raise ValueError(f"Pas de rendu natif pour {template_src}")
+    taille = A4 if format == "A4" else format
+    buffer = io.BytesIO()
+    DESSINS[template_src](context, buffer, paysage(taille) if landscape else taille)
+    return buffer.getvalue()
+
+
+def _texte(valeur):
+    """Valeur affichée comme {{ valeur }} (localisée, None -> "None")."""
+    return str(formats.localize(valeur))
+
+
+def _ajuster(texte, police, taille, largeur, minimum=6):
+    """Plus grande taille <= `taille` à laquelle le texte tient sur une ligne."""
+    while taille > minimum and stringWidth(texte, police, taille) > largeur:
+        taille -= 0.5
+    return taille
+
+
+# ----------------------------------------------------------------------
+# Étiquettes colis (chine/etiquette_pdf.html) : grille 2x2 sur A4
+# ----------------------------------------------------------------------
+
+BLEU_BORDURE = colors.HexColor("#374151")
+OR = colors.HexColor("#B45309")
+FOND_ENTETE = colors.HexColor("#FFFBEB")
+FOND_LIBELLE = colors.HexColor("#f9fafb")
+VERT = colors.HexColor("#059669")
+ROUGE = colors.HexColor("#DC2626")
+
+MARGE_PAGE = 3 * mm
+ECART_COLONNES = 3 * mm
+ECART_LIGNES = 40 * mm
+HAUTEUR_GRILLE = 280 * mm  # max-height de .page-grid
+ENTETE = 13 * mm
+PIED = 34 * mm
+QR = 30 * mm
+QR_URL = "https://ts-aircargo.com/login"
+
+
+def _lignes_etiquette(colis):
+    if colis.type_colis == "TELEPHONE":
+        quantite = f"{_texte(colis.nombre_pieces)} PCS"
+    elif colis.lot.type_transport == "BATEAU":
+        quantite = f"{_texte(colis.cbm or '0')} CBM"
+    else:
+        quantite = f"{_texte(colis.poids or '0')} KG"
+    if colis.paye_en_chine:
+        statut, couleur = "PAYÉ EN CHINE", VERT
+    elif colis.est_paye:
+        statut, couleur = "PAYÉ MALI", colors.black
+    else:
+        statut, couleur = "NON PAYÉ", ROUGE
+    # (libellé, valeur, taille, couleur) comme .label-cell / .value-cell
+    return [
+        ("Référence", colis.reference, 12, colors.black),
+        (
+            "Client",
+            f"{colis.client.nom.upper()} {colis.client.prenom.upper()}",
+            12,
+            colors.black,
+        ),
+        ("Téléphone", colis.client.telephone, 12, colors.black),
+        ("Poids/Qté", quantite, 12, colors.black),
+        ("Prix Total", f"{currency_no_symbol(colis.prix_final or '0')} FCFA", 13, OR),
+        ("Transport", colis.lot.get_type_transport_display().upper(), 12, colors.black),
+        ("Type", colis.get_type_colis_display().upper(), 12, colors.black),
+        ("Statut", statut, 11 if couleur != colors.black else 12, couleur),
+        ("Réception", date_filter(colis.created_at, "d/m/Y"), 12, colors.black),
+    ]
+
+
+def _qr_form(pdf):
+    """Le QR de suivi est identique sur toutes les étiquettes : dessiné une fois."""
+    widget = QrCodeWidget(QR_URL, barBorder=0)
+    x0, y0, x1, y1 = widget.getBounds()
+    cote = QR - 4 * mm  # quiet zone de 2mm
+    drawing = Drawing(
+        cote, cote, transform=[cote / (x1 - x0), 0, 0, cote / (y1 - y0), 0, 0]
+    )
+    drawing.add(widget)
+    pdf.beginForm("qr_suivi")
+    renderPDF.draw(drawing, pdf, 0, 0)
+    pdf.endForm()
+
+
+def _etiquette(pdf, colis, x, haut, largeur, hauteur):
+    # .etiquette-cell : pointillés, padding 2mm
+    pdf.setDash(3, 2)
+    pdf.setLineWidth(1)
+    pdf.setStrokeColor(colors.black)
+    pdf.rect(x, haut - hauteur, largeur, hauteur)
+    pdf.setDash()
+    x += 2 * mm
+    largeur -= 4 * mm
+    haut -= 2 * mm
+    hauteur -= 4 * mm
+
+    # .label-box
+    pdf.setStrokeColor(BLEU_BORDURE)
+    pdf.setLineWidth(1.5)
+    pdf.rect(x, haut - hauteur, largeur, hauteur)
+
+    # .header-box
+    boite = largeur - 3 * mm
+    pdf.setStrokeColor(OR)
+    pdf.setFillColor(FOND_ENTETE)
+    pdf.setLineWidth(2)
+    pdf.rect(x + 1.5 * mm, haut - ENTETE + 1.5 * mm, boite, ENTETE - 3 * mm, fill=1)
+    titre = _encodable(f"TS AIR CARGO — {colis.lot.destination.name.upper()}")
+    taille = _ajuster(titre, GRAS, 14, boite - 2 * mm)
+    pdf.setFillColor(colors.black)
+    pdf.setFont(GRAS, taille)
+    pdf.drawCentredString(x + largeur / 2, haut - ENTETE / 2 - taille * 0.35, titre)
+
+    # .info-table : 9 lignes dans la hauteur restante
+    lignes = _lignes_etiquette(colis)
+    y = haut - ENTETE
+    hauteur_ligne = (hauteur - ENTETE - PIED - 1 * mm) / len(lignes)
+    colonne = largeur * 0.35
+    pdf.setLineWidth(1)
+    pdf.setStrokeColor(BLEU_BORDURE)
+    for libelle, valeur, taille, couleur in lignes:
+        pdf.setFillColor(FOND_LIBELLE)
+        pdf.rect(x, y - hauteur_ligne, colonne, hauteur_ligne, stroke=0, fill=1)
+        pdf.line(x, y, x + largeur, y)
+        pdf.line(x + colonne, y, x + colonne, y - hauteur_ligne)
+        base = y - hauteur_ligne / 2 - 3.5
+        pdf.setFillColor(colors.black)
+        pdf.setFont(GRAS, _ajuster(libelle.upper(), GRAS, 10, colonne - 6 * mm))
+        pdf.drawString(x + 3 * mm, base, libelle.upper())
+        valeur = _encodable(str(valeur))
+        pdf.setFillColor(couleur)
+        pdf.setFont(GRAS, _ajuster(valeur, GRAS, taille, largeur - colonne - 6 * mm))
+        pdf.drawString(x + colonne + 3 * mm, base, valeur)
+        y -= hauteur_ligne
+
+    # .footer-box : mentions, code-barres de la référence, QR de suivi
+    y -= 1 * mm
+    pdf.setStrokeColor(BLEU_BORDURE)
+    pdf.setLineWidth(1.5)
+    pdf.line(x, y, x + largeur, y)
+    pdf.setFillColor(colors.black)
+    pdf.setFont(GRAS, 8)
+    pdf.drawString(x + 2 * mm, y - 2 * mm - 8, "LOGISTIQUE TS AIR CARGO")
+    pdf.drawString(x + 2 * mm, y - 2 * mm - 17.6, "CHINE - MALI - CÔTE D'IVOIRE")
+    pdf.setFont(NORMAL, 7)
+    pdf.drawString(x + 2 * mm, y - 2 * mm - 30, "Suivi : https://ts-aircargo.com")
+    zone = largeur - QR - 4 * mm
+    code = Code128(colis.reference, barHeight=9 * mm, barWidth=0.9, quiet=False)
+    if code.width > zone:
+        code = Code128(
+            colis.reference,
+            barHeight=9 * mm,
+            barWidth=0.9 * zone / code.width,
+            quiet=False,
+        )
+    code.drawOn(pdf, x + 2 * mm, y - 2 * mm - 30 - 4 - 9 * mm)
+    pdf.saveState()
+    pdf.translate(x + largeur - QR, y - QR)  # padding 2mm + quiet zone 2mm
+    pdf.doForm("qr_suivi")
+    pdf.restoreState()
+
+
+@dessin("chine/etiquette_pdf.html")
+def etiquettes(context, buffer, taille):
+    largeur_page, hauteur_page = taille
+    pdf = canvas.Canvas(buffer, pagesize=taille, pageCompression=1)
+    pdf.setTitle("Étiquettes Logistiques TS AIR CARGO")
+    _qr_form(pdf)
+    largeur = (largeur_page - 2 * MARGE_PAGE - ECART_COLONNES) / 2
+    hauteur = (HAUTEUR_GRILLE - ECART_LIGNES) / 2
+    for page in context["colis_batches"]:
+        for i, colis in enumerate(page):
+            x = MARGE_PAGE + (i % 2) * (largeur + ECART_COLONNES)
+            haut = hauteur_page - MARGE_PAGE - (i // 2) * (hauteur + ECART_LIGNES)
+            _etiquette(pdf, colis, x, haut, largeur, hauteur)
+        pdf.showPage()
+    pdf.save()
+
+
+# ----------------------------------------------------------------------
+# Rapports journaliers (mali/ivoire pdf/rapport_jour.html)
+# ----------------------------------------------------------------------
+
+PRIMAIRE = colors.HexColor("#166534")
+PRIMAIRE_CLAIR = colors.HexColor("#f0fdf4")
+BORDURE = colors.HexColor("#e5e7eb")
+TEXTE = colors.HexColor("#1f2937")
+GRIS = colors.HexColor("#6b7280")
+GRIS_CLAIR = colors.HexColor("#9ca3af")
+BORDURE_SYNTHESE = colors.HexColor("#bbf7d0")
+FOND_TH = colors.HexColor("#f9fafb")
+ROUGE_RAPPORT = colors.HexColor("#dc2626")
+BLEU = colors.HexColor("#1e40af")
+
+
+def _style(nom, taille, police=NORMAL, couleur=TEXTE, **kwargs):
+    return ParagraphStyle(
+        nom,
+        fontName=police,
+        fontSize=taille,
+        leading=taille * 1.5,
+        textColor=couleur,
+        **kwargs,
+    )
+
+
+CORPS = _style("corps", 11 * PX)
+CELLULE = _style("cellule", 10 * PX)
+ENTETE_TABLEAU = _style("th", 9 * PX, GRAS, GRIS, splitLongWords=0)
+
+
+_variantes = {}
+
+
+def _p(texte, style=CELLULE, **kwargs):
+    if kwargs:
+        # Une variante de style par combinaison, pas une par cellule
+        cle = (style.name, *sorted(kwargs.items(), key=lambda item: item[0]))
+        if cle not in _variantes:
+            _variantes[cle] = ParagraphStyle(
+                "-".join(map(str, cle)), parent=style, **kwargs
+            )
+        style = _variantes[cle]
+    return Paragraph(_encodable(texte), style)
+
+
+def _montant_mali(valeur):
+    return intcomma(floatformat(valeur, 0))
+
+
+def _cellules_mali(colis, context):
+    bateau = context["report_type"] == "bateau"
+    reste = colis.reste_a_payer or 0
+    return [
+        _p(escape(f"{colis.client.nom.upper()} {colis.client.prenom}"), fontName=GRAS),
+        _p(
+            f"{escape(colis.reference)}<br/><font size='{8 * PX}' color='#9ca3af'>"
+            f"{escape(_texte(colis.lot.numero))}</font>"
+        ),
+        _p(
+            f"{_texte(colis.cbm)} m³" if bateau else f"{_texte(colis.poids)} kg",
+            alignment=TA_CENTER,
+        ),
+        _p(
+            escape(colis.get_mode_paiement_display() or "—"),
+            fontSize=8 * PX,
+            alignment=TA_CENTER,
+        ),
+        _p(_montant_mali(colis.prix_final), fontName=GRAS, alignment=TA_RIGHT),
+        _p(
+            _montant_mali(reste) if reste > 0 else "-",
+            fontName=GRAS,
+            alignment=TA_RIGHT,
+            textColor=ROUGE_RAPPORT if reste > 0 else TEXTE,
+        ),
+        _p(
+            _montant_mali(colis.montant_jc) if colis.montant_jc > 0 else "-",
+            fontName=GRAS,
+            alignment=TA_RIGHT,
+            textColor=GRIS,
+        ),
+        _p(
+            _montant_mali(colis.montant_paye_jour),
+            fontName=GRAS,
+            alignment=TA_RIGHT,
+            textColor=PRIMAIRE,
+        ),
+    ]
+
+
+def _cellules_ivoire(colis, context):
+    return [
+        _p(escape(f"{colis.client.nom.upper()} {colis.client.prenom}"), fontName=GRAS),
+        _p(escape(colis.reference)),
+        _p(escape(_texte(colis.lot.numero))),
+        _p(intcomma(colis.prix_final), fontName=GRAS, alignment=TA_RIGHT),
+        _p(
+            intcomma(colis.montant_jc) if colis.montant_jc > 0 else "-",
+            fontName=GRAS,
+            alignment=TA_RIGHT,
+            textColor=GRIS,
+        ),
+        _p(
+            f"{intcomma(colis.net_price)} FCFA",
+            fontName=GRAS,
+            fontSize=11 * PX,
+            alignment=TA_RIGHT,
+            textColor=PRIMAIRE,
+        ),
+    ]
+
+
+RAPPORT_MALI = {
+    "colonnes": [
+        ("Client", 22, None),
+        ("Réf. Colis", 15, None),
+        ("Poids/Vol", 10, TA_CENTER),
+        ("Mode", 10, TA_CENTER),
+        ("Total Brut", 11, TA_RIGHT),
+        ("Reste", 10, TA_RIGHT),
+        ("Remise(JC)", 10, TA_RIGHT),
+        ("Net Encaissé", 12, TA_RIGHT),
+    ],
+    "cellules": _cellules_mali,
+    "montant": _montant_mali,
+    "pays": " Mali",
+    "ligne_total": True,
+}
+RAPPORT_IVOIRE = {
+    "colonnes": [
+        ("Client", 25, None),
+        ("Réf. Colis", 20, None),
+        ("N° Lot", 15, None),
+        ("Brut", 15, TA_RIGHT),
+        ("JC", 10, TA_RIGHT),
+        ("Net Encaissé", 15, TA_RIGHT),
+    ],
+    "cellules": _cellules_ivoire,
+    "montant": intcomma,
+    "pays": "",
+    "ligne_total": False,
+}
+
+
+def _bloc(contenu, largeur, fond, bordure=None, rayon=0, padding=0, extra=()):
+    table = Table(
+        [[contenu]], colWidths=[largeur], cornerRadii=[rayon] * 4 if rayon else None
+    )
+    style = [
+        ("BACKGROUND", (0, 0), (-1, -1), fond),
+        ("LEFTPADDING", (0, 0), (-1, -1), padding),
+        ("RIGHTPADDING", (0, 0), (-1, -1), padding),
+        ("TOPPADDING", (0, 0), (-1, -1), padding),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), padding),
+    ]
+    if bordure:
+        style.append(("BOX", (0, 0), (-1, -1), 0.75, bordure))
+    table.setStyle(TableStyle(style + list(extra)))
+    return table
+
+
+def _synthese(context, variante, largeur):
+    montant = variante["montant"]
+    pays = variante["pays"]
+    ligne = _style("synthese", 12 * PX)
+    droite = _style("synthese-montant", 12 * PX, GRAS, alignment=TA_RIGHT)
+    lignes = [
+        [
+            _p(
+                "Synthèse Financière de la Journée",
+                _style("titre-synthese", 14 * PX, GRAS, PRIMAIRE, alignment=TA_CENTER),
+            ),
+            "",
+        ],
+        [
+            _p("Solde Précédent (Report Veille)", ligne),
+            _p(f"{montant(context['solde_veille'])} FCFA", droite),
+        ],
+        [
+            _p("Recettes Journalières (Encaissements)", ligne),
+            _p(
+                f"+ {montant(context['total_encaissements'])} FCFA",
+                droite,
+                textColor=PRIMAIRE,
+            ),
+        ],
+        [
+            _p(f"Dépenses Journalières{pays}", ligne),
+            _p(
+                f"- {montant(context['total_depenses'])} FCFA",
+                droite,
+                textColor=ROUGE_RAPPORT,
+            ),
+        ],
+        [
+            _p("Transferts Journaliers", ligne),
+            _p(
+                f"- {montant(context['total_transferts'])} FCFA", droite, textColor=BLEU
+            ),
+        ],
+        [
+            _p(
+                f"SOLDE DE CAISSE FINAL{pays.upper()}",
+                _style("total-synthese", 14 * PX, GRAS, PRIMAIRE),
+            ),
+            _p(
+                f"{montant(context['solde_final'])} FCFA",
+                droite,
+                fontSize=14 * PX,
+                textColor=PRIMAIRE,
+            ),
+        ],
+    ]
+    table = Table(lignes, colWidths=[largeur * 0.6 - 20, largeur * 0.4 - 20])
+    table.setStyle(
+        TableStyle(
+            [
+                ("SPAN", (0, 0), (1, 0)),
+                ("LINEBELOW", (0, 0), (-1, 0), 0.75, BORDURE_SYNTHESE),
+                ("BOTTOMPADDING", (0, 0), (-1, 0), 7.5),
+                ("LINEABOVE", (0, -1), (-1, -1), 1.5, PRIMAIRE),
+                ("TOPPADDING", (0, -1), (-1, -1), 7.5),
+                ("LEFTPADDING", (0, 0), (-1, -1), 0),
+                ("RIGHTPADDING", (0, 0), (-1, -1), 0),
+            ]
+        )
+    )
+    return _bloc(
+        table, largeur, PRIMAIRE_CLAIR, BORDURE_SYNTHESE, rayon=7.5, padding=15
+    )
+
+
+def _badge(texte):
+    badge = Table(
+        [[_p(texte, _style("badge", 12 * PX, GRAS, PRIMAIRE))]],
+        cornerRadii=[4.5] * 4,
+    )
+    badge.setStyle(
+        TableStyle(
+            [
+                ("BACKGROUND", (0, 0), (-1, -1), PRIMAIRE_CLAIR),
+                ("LEFTPADDING", (0, 0), (-1, -1), 11),
+                ("RIGHTPADDING", (0, 0), (-1, -1), 11),
+                ("TOPPADDING", (0, 0), (-1, -1), 7.5),
+                ("BOTTOMPADDING", (0, 0), (-1, -1), 7.5),
+            ]
+        )
+    )
+    return badge
+
+
+def _tableau(context, variante, largeur):
+    colonnes = variante["colonnes"]
+    entete = [
+        _p(titre.upper(), ENTETE_TABLEAU, alignment=alignement or 0)
+        for titre, _largeur, alignement in colonnes
+    ]
+    lignes = [entete]
+    colis_livres = list(context["colis_livres"])
+    for colis in colis_livres:
+        lignes.append(variante["cellules"](colis, context))
+    style = [
+        ("BACKGROUND", (0, 0), (-1, 0), FOND_TH),
+        ("LINEBELOW", (0, 0), (-1, 0), 1.5, BORDURE),
+        ("LINEBELOW", (0, 1), (-1, -1), 0.75, BORDURE),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ("LEFTPADDING", (0, 0), (-1, -1), 7.5),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 7.5),
+        ("TOPPADDING", (0, 0), (-1, 0), 7.5),
+        ("BOTTOMPADDING", (0, 0), (-1, 0), 7.5),
+        ("TOPPADDING", (0, 1), (-1, -1), 9),
+        ("BOTTOMPADDING", (0, 1), (-1, -1), 9),
+    ]
+    if not colis_livres:
+        lignes.append(
+            [
+                _p(
+                    "Aucun encaissement enregistré pour cette période.",
+                    CELLULE,
+                    alignment=TA_CENTER,
+                    textColor=GRIS,
+                )
+            ]
+            + [""] * (len(colonnes) - 1)
+        )
+        style += [
+            ("SPAN", (0, 1), (-1, 1)),
+            ("TOPPADDING", (0, 1), (-1, 1), 30),
+            ("BOTTOMPADDING", (0, 1), (-1, 1), 30),
+        ]
+    elif variante["ligne_total"]:
+        total = _style("total", 10 * PX, GRAS)
+        lignes.append(
+            [
+                _p("TOTAL :", total),
+                "",
+                _p(floatformat(context["total_poids"], 1), total, alignment=TA_CENTER),
+                _p("TOTAL NET ENCAISSÉ :", total, alignment=TA_RIGHT),
+                "",
+                "",
+                _p(
+                    f"{_montant_mali(context['total_encaissements'])} FCFA",
+                    total,
+                    alignment=TA_RIGHT,
+                    textColor=PRIMAIRE,
+                ),
+                "",
+            ]
+        )
+        style += [
+            ("SPAN", (0, -1), (1, -1)),
+            ("SPAN", (3, -1), (5, -1)),
+            ("SPAN", (6, -1), (7, -1)),
+            ("BACKGROUND", (0, -1), (-1, -1), FOND_TH),
+            ("LINEABOVE", (0, -1), (-1, -1), 1.5, BORDURE),
+            ("TOPPADDING", (0, -1), (-1, -1), 7.5),
+            ("BOTTOMPADDING", (0, -1), (-1, -1), 7.5),
+        ]
+    table = Table(
+        lignes,
+        colWidths=[largeur * part / 100 for _titre, part, _alignement in colonnes],
+        repeatRows=1,
+    )
+    table.setStyle(TableStyle(style))
+    return table
+
+
+def _rapport_jour(context, buffer, taille, variante):
+    marge = 15 * mm
+    largeur = taille[0] - 2 * marge
+    date = context["date"]
+    user = context["user"]
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=taille,
+        leftMargin=marge,
+        rightMargin=marge,
+        topMargin=marge,
+        bottomMargin=marge,
+        title=f"{context['titre_rapport']} - {date_filter(date, 'd M Y')}",
+    )
+    maintenant = timezone.localtime()
+
+    entete = [
+        _p(
+            "TS AIR CARGO MALI",
+            _style("h1", 24 * PX, GRAS, colors.white, alignment=TA_CENTER),
+        ),
+        _p(
+            escape(context["titre_rapport"]),
+            _style("h1-p", 14 * PX, NORMAL, colors.white, alignment=TA_CENTER),
+        ),
+    ]
+    label = "<font name='Helvetica-Bold' size='{}' color='#166534'>{}</font>"
+    meta = Table(
+        [
+            [
+                _p(
+                    f"{label.format(10 * PX, 'DATE :')} {escape(date_filter(date, 'l d F Y'))}<br/>"
+                    f"{label.format(10 * PX, 'GÉNÉRÉ PAR :')} "
+                    f"{escape(user.get_full_name() or user.username)}",
+                    _style("meta", 12 * PX),
+                ),
+                _p(
+                    f"{label.format(10 * PX, 'RÉFÉRENCE :')} RPT-{date_filter(date, 'Ymd')}-"
+                    f"{escape(context['report_type'].upper())}<br/>"
+                    f"{label.format(10 * PX, 'HEURE :')} {date_filter(maintenant, 'H:i')}",
+                    _style("meta-droite", 12 * PX, alignment=TA_RIGHT),
+                ),
+            ]
+        ],
+        colWidths=[largeur / 2] * 2,
+    )
+    meta.setStyle(
+        TableStyle(
+            [
+                ("LEFTPADDING", (0, 0), (-1, -1), 4),
+                ("RIGHTPADDING", (0, 0), (-1, -1), 4),
+            ]
+        )
+    )
+
+    story = [
+        _bloc(entete, largeur, PRIMAIRE, rayon=6, padding=19),
+        Spacer(0, 22),
+        meta,
+        Spacer(0, 19),
+    ]
+    if context["report_type"] == "global":
+        story += [_synthese(context, variante, largeur), Spacer(0, 22)]
+    elif variante["ligne_total"]:
+        unite = "m³" if context["report_type"] == "bateau" else "kg"
+        story += [
+            _badge(
+                f"POIDS/VOL TOTAL : {floatformat(context['total_poids'], 2)} {unite}"
+            ),
+            Spacer(0, 15),
+        ]
+    story += [
+        _bloc(
+            _p(
+                "DÉTAIL DES LIVRAISONS &amp; ENCAISSEMENTS",
+                _style("h3", 15 * PX, GRAS, PRIMAIRE),
+            ),
+            largeur,
+            colors.white,
+            padding=0,
+            extra=[
+                ("LINEBELOW", (0, 0), (-1, -1), 2.25, PRIMAIRE),
+                ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+            ],
+        ),
+        Spacer(0, 11),
+        _tableau(context, variante, largeur),
+    ]
+    if not variante["ligne_total"] and context["colis_livres"]:
+        badge = _badge(
+            f"TOTAL NET ENCAISSÉ : {variante['montant'](context['total_encaissements'])} FCFA"
+        )
+        badge.hAlign = "RIGHT"
+        story += [Spacer(0, 11), badge]
+    story += [
+        Spacer(0, 30),
+        _bloc(
+            _p(
+                "Document généré automatiquement par le système TS Air Cargo.<br/>"
+                f"Date d'impression : {date_filter(maintenant, 'd/m/Y à H:i')}",
+                _style(
+                    "footer", 10 * PX, "Helvetica-Oblique", GRIS, alignment=TA_CENTER
+                ),
+            ),
+            largeur,
+            colors.white,
+            extra=[
+                ("LINEABOVE", (0, 0), (-1, -1), 0.75, BORDURE),
+                ("TOPPADDING", (0, 0), (-1, -1), 15),
+            ],
+        ),
+    ]
+    doc.build(story)
+
+
+@dessin("mali/pdf/rapport_jour.html")
+def rapport_jour_mali(context, buffer, taille):
+    _rapport_jour(context, buffer, taille, RAPPORT_MALI)
+
+
+@dessin("ivoire/pdf/rapport_jour.html")
+def rapport_jour_ivoire(context, buffer, taille):
+    _rapport_jour(context, buffer, taille, RAPPORT_IVOIRE)
@@ -0,0 +1,208 @@
+"""
+Rendu PDF Playwright avec un Chromium gardé chaud, un par processus.
+
+Lancer Chromium à chaque PDF coûte environ une seconde et des centaines de Mo
+de mémoire transitoire. PdfRenderer garde un navigateur ouvert dans un thread
+dédié du processus (worker gunicorn ou Celery), qui possède sa propre boucle
+asyncio. Ce thread fait tourner N contextes pré-lancés, chacun avec sa page ;
+ils forment le pool de pages borné. Les vues déposent leurs rendus dans une
+file bornée, et le premier contexte libre les prend.
+
+Un contexte est recyclé (fermé puis recréé) après `max_renders` rendus ou
+après une erreur de rendu ; le navigateur est relancé s'il a planté.
+
+    pdf_bytes = get_renderer().render(html, format="A4", landscape=False)
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import os
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PDF_OPTIONS = {
+    "print_background": True,
+    "margin": {"top": "0mm", "right": "0mm", "bottom": "0mm", "left": "0mm"},
+    "display_header_footer": False,
+    "prefer_css_page_size": True,
+}
+VIEWPORT = {"width": 1280, "height": 720}
+
+
+class RendererSaturated(Exception):
+    """File d'attente des rendus pleine."""
+
+
+class PdfRenderer:
+    def __init__(self, contexts=2, max_renders=100, queue_size=32, render_timeout=30):
+        self.contexts = contexts
+        self.max_renders = max_renders
+        self.queue_size = queue_size
+        self.render_timeout = render_timeout
+        self.renders = 0
+        self.recycles = 0
+        self.browser_launches = 0
+        self._loop = None
+        self._queue = None
+        self._browser = None
+        self._browser_lock = None
+        self._ready = threading.Event()
+        self._start_error = None
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # Côté appelant (threads des requêtes)
+    # ------------------------------------------------------------------
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="pdf-renderer", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._start_error:
+            raise self._start_error
+        return self
+
+    def render(self, html_content, format="A4", landscape=False, timeout=None):
+        """Rend le HTML en PDF (bytes) ; bloque jusqu'au résultat."""
+        future = concurrent.futures.Future()
+        job = (html_content, {"format": format, "landscape": landscape}, future)
+        submitted = concurrent.futures.Future()
+
+        def submit():
+            try:
+                self._queue.put_nowait(job)
+                submitted.set_result(True)
+            except asyncio.QueueFull:
+                submitted.set_result(False)
+
+        self._loop.call_soon_threadsafe(submit)
+        if not submitted.result():
+            raise RendererSaturated(f"{self.queue_size} rendus PDF déjà en attente")
+        try:
+            return future.result(timeout or self.render_timeout * 2)
+        except concurrent.futures.TimeoutError:
+            future.cancel()  # encore en file : ne sera pas rendu
+            raise
+
+    def stop(self):
+        if self._loop and self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(10)
+            self._thread.join(10)
+
+    # ------------------------------------------------------------------
+    # Thread du renderer (boucle asyncio dédiée)
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._serve())
+        finally:
+            self._loop.close()
+
+    async def _serve(self):
+        from playwright.async_api import async_playwright
+
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._browser_lock = asyncio.Lock()
+        try:
+            self._playwright = await async_playwright().start()
+            await self._ensure_browser()
+        except Exception as e:
+            self._start_error = e
+            if getattr(self, "_playwright", None):
+                await self._playwright.stop()
+            self._ready.set()
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(i)) for i in range(self.contexts)
+        ]
+        self._ready.set()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        if self._browser:
+            await self._browser.close()
+        await self._playwright.stop()
+
+    async def _shutdown(self):
+        for worker in self._workers:
+            worker.cancel()
+
+    async def _ensure_browser(self):
+        async with self._browser_lock:
+            if self._browser is None or not self._browser.is_connected():
+                self._browser = await self._playwright.chromium.launch(headless=True)
+                self.browser_launches += 1
+            return self._browser
+
+    async def _new_page(self):
+        browser = await self._ensure_browser()
+        context = await browser.new_context(viewport=VIEWPORT)
+        return browser, context, await context.new_page()
+
+    async def _worker(self, index):
+        browser = context = page = None
+        renders = 0
+        while True:
+            html_content, options, future = await self._queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                if context is None or not browser.is_connected():
+                    # Premier rendu, ou navigateur tombé depuis le dernier rendu
+                    await self._close(context)
+                    browser, context, page = await self._new_page()
+                # networkidle : polices et images chargées avant l'impression
+                await page.set_content(
+                    html_content, wait_until="networkidle", timeout=self.render_timeout * 1000
+                )
+                pdf_bytes = await page.pdf(**options, **PDF_OPTIONS)
+                future.set_result(pdf_bytes)
+                renders += 1
+                self.renders += 1
+            except Exception as e:
+                logger.warning(f"[PDF] Rendu en échec (contexte {index} recyclé): {e}")
+                future.set_exception(e)
+                renders = self.max_renders
+            if renders >= self.max_renders:
+                await self._close(context)
+                context = page = None
+                renders = 0
+                self.recycles += 1
+
+    @staticmethod
+    async def _close(context):
+        try:
+            if context is not None:
+                await context.close()
+        except Exception:
+            pass  # navigateur déjà tombé : relancé au prochain rendu
+
+
+_renderer = None
+_renderer_pid = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer():
+    """Renderer du processus courant (recréé après un fork)."""
+    global _renderer, _renderer_pid
+    with _renderer_lock:
+        if (
+            _renderer is None
+            or _renderer_pid != os.getpid()
+            or not _renderer._thread.is_alive()
+        ):
+            _renderer = PdfRenderer(
+                contexts=getattr(settings, "PDF_RENDERER_CONTEXTS", 2),
+                max_renders=getattr(settings, "PDF_RENDERER_MAX_RENDERS", 100),
+                queue_size=getattr(settings, "PDF_RENDERER_QUEUE_SIZE", 32),
+            ).start()
+            _renderer_pid = os.getpid()
+            atexit.register(_renderer.stop)
+        return _renderer
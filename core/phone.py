@@ -0,0 +1,63 @@
+"""
+Numéros de téléphone normalisés (E.164 : +<indicatif><numéro>).
+
+Mêmes règles que l'envoi WhatsApp (WaChapService.format_phone) : espaces, tirets
+et parenthèses retirés, préfixe international 00 remplacé par +, + ajouté sinon.
+User.phone_e164 et Client.telephone_e164 portent cette forme (index unique) :
+connexion, détection des doublons et imports font une recherche exacte dessus.
+"""
+
+import re
+
+SEPARATEURS = re.compile(r"[\s\-()]+")
+E164 = re.compile(r"\+\d+")
+
+# Indicatif -> région WaChap (mali par défaut)
+REGIONS_INDICATIF = {
+    "+86": "chine",
+    "+225": "cote_divoire",
+}
+
+
+def format_e164(phone):
+    """'00223 76-12-34-56' -> '+22376123456'"""
+    clean = SEPARATEURS.sub("", str(phone))
+    if clean.startswith("00"):
+        return "+" + clean[2:]
+    if not clean.startswith("+"):
+        return "+" + clean
+    return clean
+
+
+def normaliser_telephone(phone):
+    """Forme E.164 du numéro, ou None s'il ne s'agit pas d'un numéro."""
+    if not phone:
+        return None
+    e164 = format_e164(phone)
+    return e164 if E164.fullmatch(e164) else None
+
+
+def region_telephone(phone):
+    e164 = normaliser_telephone(phone) or ""
+    for indicatif, region in REGIONS_INDICATIF.items():
+        if e164.startswith(indicatif):
+            return region
+    return "mali"
+
+
+def utilisateur_par_telephone(phone):
+    """Utilisateur dont le numéro (User.phone ou profil client) correspond, sinon None."""
+    from .models import Client, User
+
+    e164 = normaliser_telephone(phone)
+    if not e164:
+        return None
+    user = User.objects.filter(phone_e164=e164).first()
+    if user is None:
+        client = (
+            Client.objects.filter(telephone_e164=e164, user__isnull=False)
+            .select_related("user")
+            .first()
+        )
+        user = client.user if client else None
+    return user
@@ -0,0 +1,101 @@
+"""
+Recherche plein texte sur les clients, colis et lots.
+
+Chaque Client / Colis / Lot porte un document de recherche dénormalisé
+(search_document), mis à jour à chaque save() :
+  - texte en minuscules, sans accents, ponctuation remplacée par des espaces ;
+  - téléphone réduit à ses chiffres ;
+  - Colis : référence, description, poids + document du client ;
+  - Lot : numéro (la recherche par client passe par les colis du lot).
+
+Chaque mot de la requête doit se trouver dans le document (ET entre les mots).
+Sur PostgreSQL, un index GIN pg_trgm (migration core 0035) sert ces LIKE '%mot%'
+sans parcourir la table ; SQLite (développement) lit la colonne séquentiellement.
+"""
+
+import re
+import unicodedata
+
+from django.db.models import Q
+
+NON_ALPHANUM = re.compile(r"[^a-z0-9]+")
+NON_CHIFFRE = re.compile(r"\D+")
+
+
+def normaliser(texte):
+    """'Élodie N'Diaye' -> 'elodie n diaye'"""
+    texte = unicodedata.normalize("NFKD", str(texte or ""))
+    texte = "".join(c for c in texte if not unicodedata.combining(c)).lower()
+    return NON_ALPHANUM.sub(" ", texte).strip()
+
+
+def chiffres(telephone):
+    return NON_CHIFFRE.sub("", telephone or "")
+
+
+def mots(query):
+    return normaliser(query).split()
+
+
+def document_client(client):
+    return " ".join(
+        filter(None, (normaliser(client.nom), normaliser(client.prenom), chiffres(client.telephone)))
+    )
+
+
+def document_colis(colis, client_document=None):
+    if client_document is None:
+        client_document = colis.client.search_document or document_client(colis.client)
+    return " ".join(
+        filter(
+            None,
+            (
+                normaliser(colis.reference),
+                normaliser(colis.description),
+                normaliser(colis.poids),
+                client_document,
+            ),
+        )
+    )
+
+
+def document_lot(lot):
+    return normaliser(lot.numero)
+
+
+def filtre_recherche(query, prefix=""):
+    """Q combinant tous les mots de la requête sur `{prefix}search_document`."""
+    filtre = Q()
+    for mot in mots(query):
+        filtre &= Q(**{f"{prefix}search_document__contains": mot})
+    return filtre
+
+
+def rechercher(queryset, query):
+    """Filtre un queryset de Client, Colis ou Lot par son document de recherche."""
+    if not query:
+        return queryset
+    return queryset.filter(filtre_recherche(query))
+
+
+def rechercher_lots(queryset, query, colis_queryset=None):
+    """
+    Lots dont chaque mot se trouve dans le numéro ou dans un de leurs colis
+    (référence, client...). Sous-requêtes : n'altère pas les agrégats du queryset.
+    """
+    if not query:
+        return queryset
+    from .models import Colis
+
+    if colis_queryset is None:
+        colis_queryset = Colis.objects.all()
+    for mot in mots(query):
+        queryset = queryset.filter(
+            Q(search_document__contains=mot)
+            | Q(
+                pk__in=colis_queryset.filter(search_document__contains=mot).values(
+                    "lot_id"
+                )
+            )
+        )
+    return queryset
@@ -0,0 +1,74 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_namespaces
+from .pdf_cache import invalider_lots
+from .models import (
+    AvanceSalaire,
+    ClientLotTarif,
+    Colis,
+    ColisEvent,
+    EncaissementColis,
+    Lot,
+    LotStats,
+    Tarif,
+    lot_stats_updated,
+)
+from .tarifs import invalidate_tarif_index
+
+
+@receiver(post_save, sender=Tarif)
+@receiver(post_delete, sender=Tarif)
+@receiver(post_save, sender=ClientLotTarif)
+@receiver(post_delete, sender=ClientLotTarif)
+def tarif_changed(sender, **kwargs):
+    """
+    Invalide l'index des tarifs (local et partagé) après COMMIT : vidé plus
+    tôt, il serait reconstruit avec des tarifs pas encore validés, et gardé
+    même après un ROLLBACK.
+    """
+    transaction.on_commit(invalidate_tarif_index)
+
+
+@receiver(post_delete, sender=Colis)
+def colis_deleted(sender, instance, **kwargs):
+    """Retire le colis supprimé des agrégats de son lot (dans la transaction de suppression)."""
+    ancien = getattr(instance, "_stats_origine", None) or instance.stats_snapshot()
+    LotStats.appliquer(ancien, None)
+
+
+@receiver(post_save, sender=EncaissementColis)
+def encaissement_created(sender, instance, created, **kwargs):
+    """Journalise chaque encaissement individuel (les bulk_create journalisent eux-mêmes)."""
+    if created:
+        ColisEvent.paiement(
+            instance.colis, instance.montant, acteur=instance.enregistre_par
+        ).save()
+
+
+@receiver(lot_stats_updated)
+def lots_modifies(sender, lot_ids, **kwargs):
+    """
+    Colis ajoutés, modifiés ou supprimés : périme le cache des pays de
+    destination et les PDF (manifestes, étiquettes) des lots.
+    """
+    bump_namespaces(
+        *Lot.objects.filter(pk__in=lot_ids).values_list("destination__code", flat=True)
+    )
+    lot_ids = list(lot_ids)
+    transaction.on_commit(lambda: invalider_lots(lot_ids))
+
+
+@receiver(post_save, sender=Lot)
+@receiver(post_delete, sender=Lot)
+def lot_modifie(sender, instance, **kwargs):
+    if instance.destination_id:
+        bump_namespaces(instance.destination.code)
+    transaction.on_commit(lambda: invalider_lots([instance.pk]))
+
+
+@receiver(post_save, sender=AvanceSalaire)
+@receiver(post_delete, sender=AvanceSalaire)
+def avance_modifiee(sender, **kwargs):
+    bump_namespaces("agents")
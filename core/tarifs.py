@@ -0,0 +1,342 @@
+"""
+Index des tarifs en mémoire (par processus).
+
+Tous les tarifs standards (Tarif) et conventionnels (ClientLotTarif) sont chargés
+une seule fois en deux requêtes, puis servis depuis la mémoire : le calcul du prix
+d'un colis ne touche plus la base de données.
+
+Le recalcul en masse des prix (reprice_colis) s'appuie sur le même index et
+réécrit les colis par lots avec bulk_update.
+
+Invalidation :
+  - Les signaux post_save / post_delete de Tarif et ClientLotTarif (core.signals)
+    vident l'index local et incrémentent un compteur de version dans le cache Django.
+  - Chaque processus (workers gunicorn, workers Celery) compare sa version locale au
+    compteur partagé et reconstruit son index s'il est périmé.
+  - Par sécurité (QuerySet.update(), cache non partagé...), l'index est de toute façon
+    reconstruit après INDEX_MAX_AGE secondes.
+"""
+
+import threading
+import time
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+VERSION_CACHE_KEY = "tarif_index_version"
+INDEX_MAX_AGE = 300  # secondes
+REPRICE_CHUNK_SIZE = 500
+CENTIME = Decimal("0.01")
+
+
+class TarifSnapshot(NamedTuple):
+    pk: int
+    prix_kilo: Decimal
+    prix_cbm: Decimal
+    prix_piece: Decimal
+
+
+class TarifSpecialSnapshot(NamedTuple):
+    pk: int
+    prix_kilo: Decimal
+
+
+class TarifIndex:
+    """
+    Vue figée des tarifs, indexée par :
+      - (destination_id, type_transport) pour les tarifs standards
+      - (client_id, destination_id, type_transport) pour les tarifs conventionnels
+        (type_transport=None : applicable à tous les transports)
+
+    En cas de doublons, le plus ancien (pk le plus petit) l'emporte, comme le
+    faisaient les anciens .first() sans ordre explicite.
+    """
+
+    def __init__(self, tarifs=(), tarifs_speciaux=()):
+        self._standard = {}
+        self._special = {}
+
+        for pk, destination_id, type_transport, prix_kilo, prix_cbm, prix_piece in tarifs:
+            key = (destination_id, type_transport)
+            current = self._standard.get(key)
+            if current is None or pk < current.pk:
+                self._standard[key] = TarifSnapshot(pk, prix_kilo, prix_cbm, prix_piece)
+
+        for pk, client_id, destination_id, type_transport, prix_kilo in tarifs_speciaux:
+            key = (client_id, destination_id, type_transport)
+            current = self._special.get(key)
+            if current is None or pk < current.pk:
+                self._special[key] = TarifSpecialSnapshot(pk, prix_kilo)
+
+    @classmethod
+    def load(cls):
+        """Construit l'index depuis la base (2 requêtes, sans instancier de modèles)."""
+        from .models import ClientLotTarif, Tarif
+
+        tarifs = Tarif._base_manager.values_list(
+            "pk", "destination_id", "type_transport", "prix_kilo", "prix_cbm", "prix_piece"
+        )
+        tarifs_speciaux = ClientLotTarif._base_manager.values_list(
+            "pk", "client_id", "destination_id", "type_transport", "prix_kilo"
+        )
+        return cls(list(tarifs), list(tarifs_speciaux))
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def standard(self, destination_id, type_transport) -> Optional[TarifSnapshot]:
+        return self._standard.get((destination_id, type_transport))
+
+    def special(self, client_id, destination_id, type_transport) -> Optional[TarifSpecialSnapshot]:
+        """Tarif conventionnel du client : spécifique au transport ou générique."""
+        candidates = [
+            t
+            for t in (
+                self._special.get((client_id, destination_id, type_transport)),
+                self._special.get((client_id, destination_id, None)),
+            )
+            if t is not None
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda t: t.pk)
+
+    def standard_for_destination(self, destination_id):
+        """Dict {type_transport: {prix_kilo, prix_cbm, prix_piece}} pour le calculateur JS."""
+        return {
+            type_transport: {
+                "prix_kilo": float(t.prix_kilo),
+                "prix_cbm": float(t.prix_cbm),
+                "prix_piece": float(t.prix_piece),
+            }
+            for (dest_id, type_transport), t in self._standard.items()
+            if dest_id == destination_id
+        }
+
+    def special_for_destination(self, destination_id, type_transport):
+        """Dict {client_id (str): prix_kilo} des tarifs conventionnels applicables."""
+        client_ids = {
+            client_id
+            for (client_id, dest_id, _), _t in self._special.items()
+            if dest_id == destination_id
+        }
+        result = {}
+        for client_id in client_ids:
+            tarif = self.special(client_id, destination_id, type_transport)
+            if tarif is not None:
+                result[str(client_id)] = float(tarif.prix_kilo)
+        return result
+
+    # ------------------------------------------------------------------
+    # Calcul
+    # ------------------------------------------------------------------
+
+    def compute_prices(
+        self,
+        *,
+        client_id,
+        destination_id,
+        type_transport,
+        type_colis,
+        poids,
+        cbm,
+        nombre_pieces,
+        prix_kilo_manuel,
+    ):
+        """
+        Retourne (prix_transport, prix_final) selon les règles de tarification :
+          1. Tarif conventionnel du client (Cargo/Express uniquement)
+          2. Prix au kilo manuel (TypeColis MANUEL)
+          3. Tarif téléphone (prix par pièce)
+          4. Tarif standard Bateau (CBM) ou Cargo/Express (kg)
+        """
+        poids_dec = Decimal(str(poids or 0))
+        cbm_dec = Decimal(str(cbm or 0))
+
+        special_tarif = self.special(client_id, destination_id, type_transport)
+        if special_tarif and type_transport != "BATEAU":
+            prix_transport = poids_dec * special_tarif.prix_kilo
+            return prix_transport, prix_transport
+
+        tarif = self.standard(destination_id, type_transport)
+
+        if type_colis == "MANUEL" and prix_kilo_manuel:
+            prix_transport = poids_dec * prix_kilo_manuel
+        elif type_colis == "TELEPHONE":
+            tarif_tel = self.standard(destination_id, "TELEPHONE") or tarif
+            if tarif_tel:
+                prix_transport = Decimal(str(nombre_pieces or 1)) * tarif_tel.prix_piece
+            else:
+                prix_transport = Decimal("0")
+        elif type_transport == "BATEAU":
+            prix_transport = cbm_dec * tarif.prix_cbm if tarif else Decimal("0")
+        else:
+            prix_transport = poids_dec * tarif.prix_kilo if tarif else Decimal("0")
+
+        # Par défaut, le prix final est égal au prix transport
+        return prix_transport, prix_transport
+
+
+_lock = threading.Lock()
+_state = {"index": None, "version": None, "built_at": 0.0}
+
+
+def _current_version():
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        # Valeur initiale horodatée : ne retombe jamais sur une ancienne version après éviction
+        cache.add(VERSION_CACHE_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+def get_tarif_index() -> TarifIndex:
+    """Retourne l'index du processus, reconstruit s'il est périmé."""
+    version = _current_version()
+    state = _state
+    if (
+        state["index"] is not None
+        and state["version"] == version
+        and time.monotonic() - state["built_at"] < INDEX_MAX_AGE
+    ):
+        return state["index"]
+
+    with _lock:
+        if (
+            state["index"] is None
+            or state["version"] != version
+            or time.monotonic() - state["built_at"] >= INDEX_MAX_AGE
+        ):
+            state["index"] = TarifIndex.load()
+            state["version"] = version
+            state["built_at"] = time.monotonic()
+        return state["index"]
+
+
+def clear_local_tarif_index():
+    """Vide l'index du processus courant (reconstruit au prochain accès)."""
+    with _lock:
+        _state["index"] = None
+        _state["version"] = None
+
+
+def invalidate_tarif_index():
+    """Invalide l'index dans tous les processus (incrément de la version partagée)."""
+    clear_local_tarif_index()
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, int(time.time() * 1000), timeout=None)
+
+
+def reprice_colis(queryset, chunk_size=REPRICE_CHUNK_SIZE, progress=None):
+    """
+    Recalcule prix_transport / prix_final de tous les colis du queryset.
+
+    Les lignes sont lues en values_list (sans instancier de modèles), les prix sont
+    calculés en mémoire via l'index des tarifs, et seuls les colis dont le prix change
+    sont réécrits, par paquets de `chunk_size` (bulk_update).
+
+    `progress(traites, modifies)` est appelé après chaque paquet.
+    Retourne le nombre de colis modifiés.
+    """
+    from .models import Colis, LotStats
+
+    index = get_tarif_index()
+    rows = queryset.order_by().values_list(
+        "pk",
+        "lot_id",
+        "client_id",
+        "lot__destination_id",
+        "lot__type_transport",
+        "type_colis",
+        "poids",
+        "cbm",
+        "nombre_pieces",
+        "prix_kilo_manuel",
+        "prix_transport",
+        "prix_final",
+    )
+
+    now = timezone.now()
+    batch = []
+    lots = set()
+    traites = 0
+    modifies = 0
+
+    def flush():
+        nonlocal modifies
+        if batch:
+            with transaction.atomic():
+                Colis.objects.bulk_update(
+                    batch, ["prix_transport", "prix_final", "updated_at"]
+                )
+                LotStats.recalculer(lots)
+            modifies += len(batch)
+            batch.clear()
+            lots.clear()
+        if progress:
+            progress(traites, modifies)
+
+    for (
+        pk,
+        lot_id,
+        client_id,
+        destination_id,
+        type_transport,
+        type_colis,
+        poids,
+        cbm,
+        nombre_pieces,
+        prix_kilo_manuel,
+        ancien_transport,
+        ancien_final,
+    ) in rows.iterator(chunk_size=chunk_size):
+        prix_transport, prix_final = index.compute_prices(
+            client_id=client_id,
+            destination_id=destination_id,
+            type_transport=type_transport,
+            type_colis=type_colis,
+            poids=poids,
+            cbm=cbm,
+            nombre_pieces=nombre_pieces,
+            prix_kilo_manuel=prix_kilo_manuel,
+        )
+        prix_transport = prix_transport.quantize(CENTIME)
+        prix_final = prix_final.quantize(CENTIME)
+        traites += 1
+
+        if prix_transport != ancien_transport or prix_final != ancien_final:
+            batch.append(
+                Colis(
+                    pk=pk,
+                    prix_transport=prix_transport,
+                    prix_final=prix_final,
+                    updated_at=now,
+                )
+            )
+            lots.add(lot_id)
+        if traites % chunk_size == 0:
+            flush()
+
+    if batch or traites % chunk_size:
+        flush()
+    return modifies
+
+
+def colis_a_recalculer(lot_id=None, destination_id=None, client_id=None):
+    """Queryset des colis à recalculer, filtré par lot, destination et/ou client."""
+    from .models import Colis
+
+    queryset = Colis.objects.all()
+    if lot_id:
+        queryset = queryset.filter(lot_id=lot_id)
+    if destination_id:
+        queryset = queryset.filter(lot__destination_id=destination_id)
+    if client_id:
+        queryset = queryset.filter(client_id=client_id)
+    return queryset
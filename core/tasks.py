@@ -0,0 +1,86 @@
+import logging
+from celery import shared_task
+from django.db import transaction
+from django.utils import timezone
+from core.models import BackgroundTask
+from core.tarifs import colis_a_recalculer, reprice_colis
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True)
+def reprice_colis_task(self, task_record_id):
+    """
+    Recalcule en arrière-plan les prix des colis décrits par task_record.parameters
+    (lot_id, destination_id, client_id). L'avancement est enregistré dans le
+    BackgroundTask après chaque paquet.
+    """
+    task_record = BackgroundTask.objects.get(pk=task_record_id)
+    task_record.status = BackgroundTask.Status.PROCESSING
+    task_record.started_at = timezone.now()
+    task_record.task_id = self.request.id
+    task_record.progress = 0
+    task_record.save()
+
+    try:
+        params = task_record.parameters
+        queryset = colis_a_recalculer(
+            lot_id=params.get("lot_id"),
+            destination_id=params.get("destination_id"),
+            client_id=params.get("client_id"),
+        )
+        total = queryset.count()
+
+        def progress(traites, modifies):
+            pourcentage = int(traites * 100 / total) if total else 100
+            BackgroundTask.objects.filter(pk=task_record.pk).update(progress=pourcentage)
+
+        modifies = reprice_colis(queryset, progress=progress)
+
+        task_record.parameters = {**params, "total": total, "modifies": modifies}
+        task_record.progress = 100
+        task_record.status = BackgroundTask.Status.SUCCESS
+        task_record.completed_at = timezone.now()
+        task_record.save()
+        logger.info(f"Recalcul des prix : {modifies}/{total} colis modifiés")
+        return modifies
+
+    except Exception as e:
+        logger.exception("Error in reprice_colis_task")
+        task_record.status = BackgroundTask.Status.FAILURE
+        task_record.error_message = str(e)
+        task_record.completed_at = timezone.now()
+        task_record.save()
+        raise e
+
+
+def lancer_recalcul_prix(user, country, lot_id=None, destination_id=None, client_id=None):
+    """
+    Crée le BackgroundTask et lance le recalcul via Celery.
+    Si le broker est indisponible, le recalcul est exécuté de manière synchrone.
+    """
+    task_record = BackgroundTask.objects.create(
+        name="Recalcul des prix",
+        parameters={
+            "lot_id": lot_id,
+            "destination_id": destination_id,
+            "client_id": client_id,
+        },
+        created_by=user,
+        country=country,
+    )
+
+    def dispatch():
+        try:
+            reprice_colis_task.delay(task_record.pk)
+        except Exception as e:
+            logger.error(f"Reprice task dispatch failed, running sync: {e}")
+            try:
+                reprice_colis_task(task_record.pk)
+            except Exception:
+                # L'échec est déjà tracé dans le BackgroundTask
+                pass
+
+    # Après commit : le worker doit voir le nouveau tarif (et l'index invalidé)
+    transaction.on_commit(dispatch)
+    return task_record
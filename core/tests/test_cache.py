@@ -0,0 +1,68 @@
+import pytest
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from chine.views import get_country_stats
+from core.cache import bump_namespaces, get_or_compute
+from core.models import Client, Colis, Country, Lot
+
+User = get_user_model()
+
+
+class Compteur:
+    def __init__(self):
+        self.appels = 0
+
+    def __call__(self):
+        self.appels += 1
+        return self.appels
+
+
+class TestGetOrCompute:
+    def setup_method(self):
+        cache.clear()
+
+    @pytest.mark.django_db
+    def test_version_perimee_recalculee_une_seule_fois(self, django_capture_on_commit_callbacks):
+        compute = Compteur()
+        assert get_or_compute("cle", compute, namespaces=("ML",)) == 1
+        assert get_or_compute("cle", compute, namespaces=("ML",)) == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            bump_namespaces("CI")
+        assert get_or_compute("cle", compute, namespaces=("ML",)) == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            bump_namespaces("ML")
+        assert get_or_compute("cle", compute, namespaces=("ML",)) == 2
+        assert compute.appels == 2
+
+    def test_valeur_perimee_servie_pendant_la_reconstruction(self):
+        compute = Compteur()
+        get_or_compute("cle", compute, fresh_for=0)
+        # Un autre processus détient le verrou de reconstruction
+        cache.add("lock:cle", True)
+        assert get_or_compute("cle", compute, fresh_for=0) == 1
+        assert compute.appels == 1
+
+        cache.delete("lock:cle")
+        assert get_or_compute("cle", compute, fresh_for=0) == 2
+
+
+@pytest.mark.django_db
+def test_stats_pays_perimees_par_les_ecritures(django_capture_on_commit_callbacks):
+    cache.clear()
+    chine = Country.objects.create(code="CN", name="Chine")
+    mali = Country.objects.create(code="ML", name="Mali")
+    user = User.objects.create_user(username="agent", password="password")
+    client = Client.objects.create(nom="Test", telephone="123", country=mali)
+    lot = Lot.objects.create(destination=mali, country=chine, created_by=user)
+    assert get_country_stats("ML")["nb_colis"] == 0
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Colis.objects.create(
+            lot=lot, client=client, country=chine, poids=Decimal("2"), type_colis="MANUEL",
+            prix_kilo_manuel=Decimal("1000"),
+        )
+    assert get_country_stats("ML")["nb_colis"] == 1
+    assert get_country_stats("ML")["montant_colis"] == Decimal("2000")
@@ -0,0 +1,161 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from core.models import Client, Colis, Country, EncaissementColis, Lot
+from report.caisse import (
+    ENCAISSEMENT,
+    FORMULES,
+    PAIEMENT,
+    cloturer_jusqua,
+    recalculer,
+    solde_historique,
+    solde_veille,
+)
+from report.models import DailyCashBalance, Depense, TransfertArgent
+
+User = get_user_model()
+
+
+def soldes(pays, formule="livraison"):
+    return list(
+        DailyCashBalance.objects.filter(pays=pays, formule=formule)
+        .order_by("date")
+        .values_list("date", "solde_ouverture", "solde_cloture")
+    )
+
+
+@pytest.mark.django_db
+class TestDailyCashBalance:
+    def setup_method(self):
+        self.today = timezone.now().date()
+        self.chine = Country.objects.create(code="CN", name="Chine")
+        self.mali = Country.objects.create(code="ML", name="Mali")
+        self.user = User.objects.create_user(username="agent", password="password")
+        self.client = Client.objects.create(nom="Test", telephone="123", country=self.mali)
+        self.lot = Lot.objects.create(
+            destination=self.mali, country=self.chine, created_by=self.user
+        )
+
+    def jour(self, decalage):
+        return self.today - timedelta(days=decalage)
+
+    def livrer(self, poids, decalage, **kwargs):
+        return Colis.objects.create(
+            lot=self.lot,
+            client=self.client,
+            country=self.chine,
+            poids=Decimal(poids),
+            type_colis="MANUEL",
+            prix_kilo_manuel=Decimal("1000"),
+            status="LIVRE",
+            date_encaissement=self.jour(decalage),
+            **kwargs,
+        )
+
+    def depense(self, montant, decalage):
+        return Depense.objects.create(
+            date=self.jour(decalage),
+            description="Loyer",
+            montant=Decimal(montant),
+            enregistre_par=self.user,
+            pays=self.mali,
+        )
+
+    def assert_coherent(self, formule="livraison"):
+        """Les lignes patchées sont identiques à une reconstruction complète."""
+        patchees = soldes(self.mali, formule)
+        recalculer(self.mali.pk, patchees[0][0], formule)
+        assert soldes(self.mali, formule) == patchees
+
+    def test_solde_veille_identique_au_calcul_complet(self):
+        self.livrer("3", 5)
+        self.livrer("1", 0)  # encaissé aujourd'hui : pas dans la veille
+        self.depense("500", 3)
+        TransfertArgent.objects.create(
+            date=self.jour(2),
+            montant=Decimal("1000"),
+            enregistre_par=self.user,
+            pays_expediteur=self.mali,
+        )
+
+        assert solde_veille(self.mali, self.today) == Decimal("1500")
+        assert solde_veille(self.mali, self.today) == solde_historique(
+            self.mali.pk, self.today
+        )
+        # Date passée (ligne clôturée) et date future (jours ouverts ajoutés)
+        assert solde_veille(self.mali, self.jour(3)) == Decimal("3000")
+        assert solde_veille(self.mali, self.today + timedelta(days=2)) == Decimal("2500")
+
+    def test_saisies_antidatees_patchent_les_jours_suivants(self):
+        cloturer_jusqua(self.mali.pk, self.jour(10))
+        colis = self.livrer("2", 6)
+        depense = self.depense("300", 4)
+        assert solde_veille(self.mali, self.today) == Decimal("1700")
+        assert len(soldes(self.mali)) == 10
+
+        # Changement de date d'encaissement : deux jours touchés
+        colis = Colis.objects.get(pk=colis.pk)
+        colis.date_encaissement = self.jour(8)
+        colis.save()
+        depense.montant = Decimal("400")
+        depense.date = self.jour(2)
+        depense.save()
+        assert solde_veille(self.mali, self.jour(5)) == Decimal("2000")
+        assert solde_veille(self.mali, self.today) == Decimal("1600")
+        self.assert_coherent()
+
+        # Mise à jour en masse (encaissement partiel)
+        colis.reste_a_payer = Decimal("500")
+        Colis.bulk_update_suivi([colis], ["reste_a_payer"])
+        depense.delete()
+        assert solde_veille(self.mali, self.today) == Decimal("1500")
+        self.assert_coherent()
+
+        # Saisie antérieure au suivi : l'ouverture de la première ligne est décalée
+        self.depense("100", 30)
+        assert solde_veille(self.mali, self.today) == Decimal("1400")
+        self.assert_coherent()
+
+    def test_chaque_formule_garde_sa_definition(self):
+        for formule in FORMULES:
+            cloturer_jusqua(self.mali.pk, self.jour(10), formule)
+        # Livré (encaissé il y a 5 jours), payé et modifié aujourd'hui
+        colis = self.livrer("3", 5, est_paye=True)
+        EncaissementColis.objects.create(
+            colis=colis, montant=Decimal("2000"), date=self.jour(4), enregistre_par=self.user
+        )
+        Depense.objects.create(
+            date=self.jour(3),
+            description="Achat Chine",
+            montant=Decimal("700"),
+            enregistre_par=self.user,
+            pays=self.mali,
+            is_china_indicative=True,
+        )
+        attendus = {"livraison": Decimal("3000"), ENCAISSEMENT: Decimal("2000")}
+        attendus[PAIEMENT] = Decimal("-700")  # payé aujourd'hui, dépenses indicatives comprises
+        for formule, attendu in attendus.items():
+            assert solde_veille(self.mali, self.today, formule) == attendu
+            assert solde_historique(self.mali.pk, self.today, formule) == attendu
+
+        # Paiement d'un jour passé (updated_at) puis nouvelle modification aujourd'hui
+        Colis.objects.filter(pk=colis.pk).update(
+            updated_at=timezone.now() - timedelta(days=2)
+        )
+        recalculer(self.mali.pk, self.jour(10), PAIEMENT)
+        assert solde_veille(self.mali, self.today, PAIEMENT) == Decimal("2300")
+        colis = Colis.objects.get(pk=colis.pk)
+        colis.description = "Sacs"
+        colis.save()  # updated_at = aujourd'hui : sort de la veille
+        assert solde_veille(self.mali, self.today, PAIEMENT) == Decimal("-700")
+        self.assert_coherent(PAIEMENT)
+
+        # Encaissement antidaté (save et bulk_create)
+        encaissement = EncaissementColis.objects.get(colis=colis)
+        encaissement.date = self.jour(8)
+        encaissement.montant = Decimal("2500")
+        encaissement.save()
+        assert solde_veille(self.mali, self.jour(6), ENCAISSEMENT) == Decimal("2500")
+        self.assert_coherent(ENCAISSEMENT)
@@ -0,0 +1,60 @@
+import pytest
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from core.models import Client, Colis, ColisEvent, Country, EncaissementColis, Lot, LotStats
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestColisEvent:
+    def setup_method(self):
+        self.chine = Country.objects.create(code="CN", name="Chine")
+        self.mali = Country.objects.create(code="ML", name="Mali")
+        self.agent = User.objects.create_user(username="agent", password="password")
+        self.client = Client.objects.create(nom="Test", telephone="123", country=self.mali)
+        self.lot = Lot.objects.create(
+            destination=self.mali, country=self.chine, created_by=self.agent
+        )
+        self.colis = [
+            Colis.objects.create(
+                lot=self.lot, client=self.client, poids=Decimal("1"), country=self.chine
+            )
+            for _i in range(3)
+        ]
+
+    def transitions(self):
+        return list(
+            ColisEvent.objects.filter(type_event="STATUT")
+            .order_by("pk")
+            .values_list("from_status", "to_status")
+        )
+
+    def test_creation_et_transition_en_masse(self):
+        assert self.transitions() == [("", "RECU")] * 3
+
+        modifies = Colis.changer_statut_en_masse(
+            self.lot.colis.all(), "EXPEDIE", acteur=self.agent
+        )
+        assert modifies == 3
+        assert self.transitions()[3:] == [("RECU", "EXPEDIE")] * 3
+        assert ColisEvent.objects.filter(
+            destination=self.mali, acteur=self.agent, to_status="EXPEDIE"
+        ).count() == 3
+        assert LotStats.objects.get(lot=self.lot, status="EXPEDIE").nb_colis == 3
+
+        # Déjà au statut : rien à journaliser
+        assert Colis.changer_statut_en_masse(self.lot.colis.all(), "EXPEDIE") == 0
+
+    def test_paiement_et_historique_apres_suppression(self):
+        colis = self.colis[0]
+        EncaissementColis.objects.create(
+            colis=colis, montant=Decimal("5000"), enregistre_par=self.agent
+        )
+        paiement = ColisEvent.objects.get(type_event="PAIEMENT")
+        assert paiement.montant == Decimal("5000")
+        assert paiement.acteur == self.agent
+
+        colis_id = colis.pk
+        colis.delete()
+        assert ColisEvent.objects.filter(colis_id=colis_id).count() == 2
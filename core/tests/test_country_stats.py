@@ -0,0 +1,120 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from chine.views import get_country_stats
+from core.models import Client, Colis, Country, Lot
+from report.models import Depense, MonthlyCountryStats
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestCountryStats:
+    def setup_method(self):
+        cache.clear()
+        self.chine = Country.objects.create(code="CN", name="Chine")
+        self.mali = Country.objects.create(code="ML", name="Mali")
+        self.user = User.objects.create_user(username="agent", password="password")
+        self.client = Client.objects.create(nom="Test", telephone="123", country=self.mali)
+        # Lot arrivé le mois dernier (mois clos)
+        self.arrivee = timezone.now().replace(day=1) - timedelta(days=5)
+        self.lot = Lot.objects.create(
+            destination=self.mali,
+            country=self.chine,
+            created_by=self.user,
+            frais_transport=Decimal("300"),
+            date_arrivee=self.arrivee,
+        )
+        self.colis = [
+            Colis.objects.create(
+                lot=self.lot,
+                client=self.client,
+                country=self.chine,
+                poids=Decimal(poids),
+                type_colis="MANUEL",
+                prix_kilo_manuel=Decimal("1000"),
+                status=status,
+            )
+            for poids, status in (("2", "LIVRE"), ("3", "ARRIVE"))
+        ]
+
+    def stats_mois_clos(self):
+        # Entrée du tableau de bord seulement : les versions des pays restent
+        cache.delete(f"stats_ML_{self.arrivee.year}_{self.arrivee.month}")
+        return get_country_stats("ML", self.arrivee.year, self.arrivee.month)
+
+    def archive_perimee(self):
+        archive = MonthlyCountryStats.objects.get(pays=self.mali)
+        return archive.generation_calculee != archive.generation
+
+    def test_mois_clos_enregistre_puis_relu(self, django_assert_max_num_queries):
+        stats = self.stats_mois_clos()
+        assert stats["montant_colis"] == Decimal("5000")
+        assert stats["nb_colis_livres_avion"] == 1
+        assert stats["benefice_brut_avion"] == Decimal("4700")
+        assert MonthlyCountryStats.objects.filter(pays=self.mali).count() == 1
+
+        # Relecture : archive + agents, sans recalcul des colis et lots
+        with django_assert_max_num_queries(4):
+            assert self.stats_mois_clos()["montant_colis"] == Decimal("5000")
+
+    def test_archive_invalidee_par_les_modifications(self):
+        self.stats_mois_clos()
+
+        colis = Colis.objects.get(pk=self.colis[1].pk)
+        colis.status = "LIVRE"
+        colis.save()
+        assert self.archive_perimee()
+        assert self.stats_mois_clos()["nb_colis_livres_avion"] == 2
+
+        Depense.objects.create(
+            date=self.arrivee.date(),
+            description="Loyer",
+            montant=Decimal("500"),
+            enregistre_par=self.user,
+            pays=self.mali,
+        )
+        assert self.archive_perimee()
+        assert self.stats_mois_clos()["autres_depenses"] == Decimal("500")
+
+        Colis.changer_statut_en_masse(self.lot.colis.all(), "PERDU")
+        assert self.stats_mois_clos()["nb_colis_livres_avion"] == 0
+
+    def test_ecriture_mois_ouvert_sans_recalcul(
+        self, django_assert_max_num_queries, django_capture_on_commit_callbacks
+    ):
+        self.stats_mois_clos()
+        with django_capture_on_commit_callbacks(execute=True):
+            lot_ouvert = Lot.objects.create(
+                destination=self.mali, country=self.chine, created_by=self.user
+            )
+            Colis.objects.create(
+                lot=lot_ouvert, client=self.client, country=self.chine, poids=Decimal("1")
+            )
+        assert not self.archive_perimee()
+        with django_assert_max_num_queries(4):
+            assert self.stats_mois_clos()["montant_colis"] == Decimal("5000")
+
+    def test_calcul_concurrent_d_une_invalidation_non_enregistre(self, monkeypatch):
+        from report import stats as stats_module
+
+        calcul = stats_module.kpis_periode
+
+        def calcul_puis_livraison(*args):
+            kpis = calcul(*args)
+            # Livraison validée pendant le calcul, avant son enregistrement
+            colis = Colis.objects.get(pk=self.colis[1].pk)
+            colis.status = "LIVRE"
+            colis.save()
+            return kpis
+
+        monkeypatch.setattr(stats_module, "kpis_periode", calcul_puis_livraison)
+        assert self.stats_mois_clos()["nb_colis_livres_avion"] == 1
+        monkeypatch.setattr(stats_module, "kpis_periode", calcul)
+
+        assert self.archive_perimee()
+        assert self.stats_mois_clos()["nb_colis_livres_avion"] == 2
+        assert MonthlyCountryStats.objects.get().nb_colis_livres_avion == 2
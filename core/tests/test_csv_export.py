@@ -0,0 +1,128 @@
+import csv
+import datetime
+import io
+
+import pytest
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from core.models import Client, Colis, Country, EncaissementColis, Lot
+from report.models import Depense
+
+User = get_user_model()
+
+
+def lire_csv(response):
+    assert isinstance(response, StreamingHttpResponse)
+    contenu = b"".join(response.streaming_content).decode("utf-8")
+    assert contenu.startswith("\ufeff")  # BOM pour Excel
+    return list(csv.reader(io.StringIO(contenu[1:])))
+
+
+@pytest.mark.django_db
+def test_export_clients_en_une_requete(client, django_assert_num_queries):
+    mali = Country.objects.create(code="ML", name="Mali")
+    ivoire = Country.objects.create(code="CI", name="Côte d'Ivoire")
+    for i in range(30):
+        Client.objects.create(
+            nom=f"Traoré {i}",
+            telephone=f"+2237612{i:04d}",
+            country=mali if i % 2 else ivoire,
+        )
+    client.force_login(User.objects.create_user(username="agent", password="x"))
+
+    response = client.get(reverse("chine:client_export"))
+    with django_assert_num_queries(1):  # tuples values_list, pays joint
+        lignes = lire_csv(response)
+    assert lignes[0] == ["Nom", "Prénom", "Téléphone", "Pays (Code)", "Adresse"]
+    assert len(lignes) == 31
+    assert lignes[1][3] == "CI" and lignes[2][3] == "ML"
+
+
+@pytest.mark.django_db
+def test_journal_encaissements_et_rapport_financier(client):
+    chine = Country.objects.create(code="CN", name="Chine")
+    mali = Country.objects.create(code="ML", name="Mali")
+    ivoire = Country.objects.create(code="CI", name="Côte d'Ivoire")
+    agent = User.objects.create_user(
+        username="caissier", password="x", role="AGENT_MALI", country=mali
+    )
+    acheteur = Client.objects.create(
+        nom="Traoré", telephone="+22376123456", country=mali
+    )
+    for destination, jour, montant in (
+        (mali, 3, "15000"),
+        (mali, 20, "5000"),
+        (ivoire, 3, "9000"),
+        (mali, 40, "1000"),  # mois suivant
+    ):
+        lot = Lot.objects.create(
+            destination=destination, country=chine, created_by=agent
+        )
+        colis = Colis.objects.create(
+            lot=lot,
+            client=acheteur,
+            country=chine,
+            poids=Decimal("2"),
+            description="Sacs",
+        )
+        EncaissementColis.objects.create(
+            colis=colis,
+            montant=Decimal(montant),
+            date=datetime.date(2026, 9, 1) + datetime.timedelta(days=jour),
+            methode="ORANGE_MONEY",
+            enregistre_par=agent,
+        )
+    Depense.objects.create(
+        description="Carburant",
+        montant=Decimal("2500"),
+        date=datetime.date(2026, 9, 5),
+        pays=mali,
+        enregistre_par=agent,
+    )
+    client.force_login(
+        User.objects.create_user(
+            username="traore", password="x", role="CLIENT", country=mali
+        )
+    )
+    for nom in ("mali:encaissement_export", "mali:colis_export"):
+        response = client.get(reverse(nom), {"destination": "CI"})
+        assert response.status_code == 302  # réservé aux agents de destination
+    client.force_login(agent)
+
+    lignes = lire_csv(
+        client.get(reverse("mali:encaissement_export"), {"year": 2026, "month": 9})
+    )
+    assert [ligne[6] for ligne in lignes[1:]] == ["15000.00", "5000.00"]
+    assert lignes[1][7] == "Orange Money"
+    assert lignes[1][8] == "caissier"
+
+    # Plage explicite, destination imposée par le pays de l'agent
+    lignes = lire_csv(
+        client.get(
+            reverse("mali:encaissement_export"),
+            {"debut": "2026-09-10", "fin": "2026-10-31", "destination": "CI"},
+        )
+    )
+    assert [ligne[6] for ligne in lignes[1:]] == ["5000.00", "1000.00"]
+
+    lignes = lire_csv(
+        client.get(
+            reverse("mali:colis_export"), {"debut": "2026-01-01", "fin": "2100-01-01"}
+        )
+    )
+    assert len(lignes) == 4  # en-tête + les 3 colis à destination du Mali
+
+    lignes = lire_csv(
+        client.get(
+            reverse("mali:rapport_export"), {"year": 2026, "month": 9, "format": "csv"}
+        )
+    )
+    assert lignes[0] == ["Rapport Financier", "9/2026"]
+    assert lignes[4][0] == "Total Dépenses" and Decimal(lignes[4][1]) == 2500
+    assert lignes[-1][:3] == [
+        "2026-09-05",
+        Depense().get_categorie_display(),
+        "Carburant",
+    ]
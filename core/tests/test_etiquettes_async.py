@@ -0,0 +1,86 @@
+import io
+
+import pytest
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from pypdf import PdfReader
+from chine import tasks
+from core import pdf_native, utils_pdf
+from core.models import BackgroundTask, Client, Colis, Country, Lot
+
+User = get_user_model()
+
+
+def sans_navigateur():
+    raise AssertionError("Les étiquettes sont dessinées par core.pdf_native")
+
+
+@pytest.mark.django_db
+def test_gros_lot_genere_en_arriere_plan(
+    client, settings, tmp_path, monkeypatch, django_capture_on_commit_callbacks
+):
+    settings.MEDIA_ROOT = tmp_path
+    settings.ETIQUETTES_SYNC_MAX_COLIS = 8
+    settings.COMPRESS_ENABLED = False
+    monkeypatch.setattr(tasks, "PAGES_PAR_RENDU", 2)
+    monkeypatch.setattr(utils_pdf, "get_renderer", sans_navigateur)
+    monkeypatch.setattr(
+        tasks.generate_etiquettes_task,
+        "delay",
+        lambda pk: tasks.generate_etiquettes_task(pk),
+    )
+    chine = Country.objects.create(code="CN", name="Chine")
+    mali = Country.objects.create(code="ML", name="Mali")
+    agent = User.objects.create_superuser(username="agent", password="x")
+    client_cargo = Client.objects.create(
+        nom="Traoré", telephone="+22376123456", country=mali
+    )
+    petit = Lot.objects.create(destination=mali, country=chine, created_by=agent)
+    gros = Lot.objects.create(destination=mali, country=chine, created_by=agent)
+    for lot, nombre in ((petit, 3), (gros, 21)):
+        for _ in range(nombre):
+            Colis.objects.create(
+                lot=lot,
+                client=client_cargo,
+                country=chine,
+                poids=Decimal("2"),
+                description="Sacs",
+            )
+    client.force_login(agent)
+    url = reverse("chine:colis_print_pdf")
+
+    # Petite sélection : PDF rendu dans la requête
+    response = client.get(url, {"lot_id": petit.pk})
+    assert response["Content-Type"] == "application/pdf"
+    assert not BackgroundTask.objects.exists()
+
+    # 21 colis = 6 pages, dessinées en 3 morceaux de 2 pages puis fusionnées
+    dessins = []
+    render = pdf_native.render
+    monkeypatch.setattr(
+        pdf_native,
+        "render",
+        lambda *args, **kw: dessins.append(1) or render(*args, **kw),
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.get(url, {"lot_id": gros.pk})
+    task_record = BackgroundTask.objects.get()
+    assert response.url == reverse("chine:task_detail", args=[task_record.pk])
+    assert task_record.status == BackgroundTask.Status.SUCCESS
+    assert task_record.progress == 100
+    assert task_record.parameters["total"] == 21
+    assert len(dessins) == 3
+    with default_storage.open(task_record.parameters["fichier"], "rb") as fichier:
+        assert len(PdfReader(fichier).pages) == 6
+
+    detail = client.get(reverse("chine:task_detail", args=[task_record.pk]))
+    assert (
+        reverse("chine:task_fichier", args=[task_record.pk]).encode() in detail.content
+    )
+    telechargement = client.get(reverse("chine:task_fichier", args=[task_record.pk]))
+    assert (
+        len(PdfReader(io.BytesIO(b"".join(telechargement.streaming_content))).pages)
+        == 6
+    )
@@ -0,0 +1,77 @@
+import pytest
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from core.models import Client, Colis, Country, Lot, LotStats
+
+User = get_user_model()
+
+
+def stats_par_statut(lot):
+    return {
+        s.status: (s.nb_colis, s.poids, s.recettes, s.nb_payes)
+        for s in LotStats.objects.filter(lot=lot, nb_colis__gt=0)
+    }
+
+
+@pytest.mark.django_db
+class TestLotStats:
+    def setup_method(self):
+        self.chine = Country.objects.create(code="CN", name="Chine")
+        self.mali = Country.objects.create(code="ML", name="Mali")
+        self.user = User.objects.create_user(username="agent", password="password")
+        self.client = Client.objects.create(nom="Test", telephone="123", country=self.mali)
+        self.lot = Lot.objects.create(
+            destination=self.mali, country=self.chine, created_by=self.user
+        )
+
+    def creer_colis(self, poids, **kwargs):
+        return Colis.objects.create(
+            lot=self.lot, client=self.client, poids=Decimal(poids), country=self.chine, **kwargs
+        )
+
+    def test_maintenu_a_chaque_transition(self):
+        a = self.creer_colis("2", est_paye=True)
+        b = self.creer_colis("3")
+        assert stats_par_statut(self.lot) == {
+            "RECU": (2, Decimal("5.00"), Decimal("0.00"), 1)
+        }
+
+        # Transition rechargée depuis la base (cas des vues)
+        b = Colis.objects.get(pk=b.pk)
+        b.status = "EXPEDIE"
+        b.save()
+        a.status = "EXPEDIE"
+        a.save(update_fields=["status"])
+        assert stats_par_statut(self.lot) == {
+            "EXPEDIE": (2, Decimal("5.00"), Decimal("0.00"), 1)
+        }
+
+        b.delete()
+        assert stats_par_statut(self.lot) == {
+            "EXPEDIE": (1, Decimal("2.00"), Decimal("0.00"), 1)
+        }
+
+    def test_recalcul_apres_update_en_masse(self):
+        self.creer_colis("2")
+        self.creer_colis("3")
+        self.lot.colis.update(status="ARRIVE")
+        LotStats.recalculer([self.lot.pk])
+        incremental = stats_par_statut(self.lot)
+        assert incremental == {"ARRIVE": (2, Decimal("5.00"), Decimal("0.00"), 0)}
+        # Lignes mises à jour en place, statuts vidés supprimés
+        ligne = LotStats.objects.get(lot=self.lot)
+        self.creer_colis("1")
+        LotStats.objects.filter(pk=ligne.pk).update(nb_colis=99)
+        LotStats.recalculer([self.lot.pk])
+        assert LotStats.objects.get(lot=self.lot, status="ARRIVE").pk == ligne.pk
+        assert stats_par_statut(self.lot) == {
+            "ARRIVE": (2, Decimal("5.00"), Decimal("0.00"), 0),
+            "RECU": (1, Decimal("1.00"), Decimal("0.00"), 0),
+        }
+        Colis.objects.filter(status="RECU").delete()
+        LotStats.recalculer([self.lot.pk])
+        assert not LotStats.objects.filter(lot=self.lot, status="RECU").exists()
+
+        # Les listes de lots lisent les agrégats en une requête
+        lots = Lot.objects.filter(destination=self.mali, stats__status="ARRIVE")
+        assert list(lots) == [self.lot]
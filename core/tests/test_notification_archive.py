@@ -0,0 +1,47 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from notification.models import Notification, NotificationArchive
+from notification.services import archive
+from notification.tasks import cleanup_old_notifications_periodic
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+def test_archivage_par_fichiers_puis_restauration(settings, tmp_path, monkeypatch):
+    settings.MEDIA_ROOT = tmp_path
+    monkeypatch.setattr(archive, "LIGNES_PAR_FICHIER", 4)
+    monkeypatch.setattr(archive, "TAILLE_SUPPRESSION", 3)
+    user = User.objects.create_user(username="client", password="x")
+    ancienne = timezone.now() - timezone.timedelta(days=30)
+    Notification.objects.bulk_create(
+        Notification(
+            destinataire=user if i % 2 else None,
+            telephone_destinataire=f"+2237600000{i}",
+            message=f"Message {i} — colis arrivé",
+            statut="echec" if i == 9 else "envoye",
+        )
+        for i in range(10)
+    )
+    Notification.objects.update(date_creation=ancienne)
+    recente = Notification.objects.create(message="Récente", statut="envoye")
+
+    cleanup_old_notifications_periodic()
+
+    # 9 notifications terminées archivées en 3 fichiers ; l'échec et la récente restent
+    assert sorted(Notification.objects.values_list("pk", flat=True)) == sorted(
+        [recente.pk, Notification.objects.get(statut="echec").pk]
+    )
+    manifestes = list(NotificationArchive.objects.all())
+    assert [m.nombre for m in manifestes] == [4, 4, 1]
+    assert all((tmp_path / m.fichier).exists() for m in manifestes)
+
+    trouvees = list(archive.rechercher(telephone="+22376000003"))
+    assert [n["message"] for n in trouvees] == ["Message 3 — colis arrivé"]
+
+    user.delete()
+    assert archive.restaurer(archive.rechercher(depuis=ancienne)) == 9
+    restauree = Notification.objects.get(telephone_destinataire="+22376000003")
+    assert restauree.destinataire is None
+    assert restauree.date_creation == ancienne
@@ -0,0 +1,86 @@
+import pytest
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.contrib.auth import get_user_model
+from notification.models import ConfigurationNotification, Notification, NotificationEvent
+from notification.services import coalescing
+from notification.services.notification_service import notification_service
+from notification.tasks import dispatch_notifications
+
+User = get_user_model()
+
+DEBUT = datetime(2026, 3, 2, 8, 0, tzinfo=dt_timezone.utc)
+
+# Journée chargée : (minute, client, catégorie, titre)
+JOURNEE = [
+    (0, 0, "colis_recu", "Colis TS-1 reçu"),
+    (2, 0, "colis_recu", "Colis TS-2 reçu"),
+    (3, 1, "colis_recu", "Colis TS-3 reçu"),
+    (6, 0, "colis_recu", "Colis TS-4 reçu"),
+    (7, 1, "autre", "Paiement reçu"),
+    (9, 1, "colis_recu", "Colis TS-5 reçu"),
+    (240, 0, "lot_ferme", "Lot L-1 fermé"),
+    (240, 1, "lot_ferme", "Lot L-1 fermé"),
+    (241, 0, "lot_ferme", "Lot L-2 fermé"),
+    (300, 0, "lot_expedie", "Lot L-1 expédié"),
+    (300, 1, "lot_expedie", "Lot L-1 expédié"),
+    (302, 0, "lot_expedie", "Lot L-2 expédié"),
+    (480, 0, "lot_arrive", "Lot L-1 arrivé"),
+    (485, 0, "colis_livre", "Colis TS-1 livré"),
+]
+
+
+@pytest.mark.django_db
+class TestRegroupement:
+    def setup_method(self):
+        self.clients = [
+            User.objects.create_user(username=f"client{i}", password="x", phone=f"+2237600000{i}")
+            for i in range(2)
+        ]
+
+    def _simuler_journee(self, fenetre):
+        config = ConfigurationNotification.get_solo()
+        config.fenetre_regroupement_minutes = fenetre
+        config.save()
+        evenements = {}
+        for minute, client, categorie, titre in JOURNEE:
+            evenements.setdefault(minute, []).append(
+                notification_service.build_notification(
+                    self.clients[client], titre, categorie=categorie, titre=titre
+                )
+            )
+        for minute in range(JOURNEE[-1][0] + fenetre + 1):
+            now = DEBUT + timedelta(minutes=minute)
+            if minute in evenements:
+                immediates, _delai = coalescing.buffer(evenements[minute], now=now)
+                Notification.objects.bulk_create(immediates)
+            coalescing.flush(now=now)
+        assert not NotificationEvent.objects.exists()
+        return list(Notification.objects.order_by("pk"))
+
+    def test_sans_regroupement_un_message_par_evenement(self):
+        assert len(self._simuler_journee(fenetre=0)) == len(JOURNEE)
+
+    def test_journee_chargee_regroupee(self):
+        notifications = self._simuler_journee(fenetre=10)
+
+        assert len(notifications) == 8
+        recaps = [n for n in notifications if n.categorie == "recapitulatif"]
+        assert len(recaps) == 5
+        matin = recaps[0]
+        assert matin.destinataire == self.clients[0]
+        assert "3 nouvelles" in matin.message
+        assert "Colis TS-1 reçu" in matin.message and "Colis TS-4 reçu" in matin.message
+        # Les autres catégories partent sans attendre
+        assert notifications[0].categorie == "autre"
+
+    def test_enqueue_programme_le_regroupement(
+        self, monkeypatch, django_capture_on_commit_callbacks
+    ):
+        monkeypatch.setattr(dispatch_notifications, "delay", lambda *a, **k: None)
+        with django_capture_on_commit_callbacks() as callbacks:
+            succes, notification = notification_service.send_notification(
+                self.clients[0], "Colis reçu", categorie="colis_recu"
+            )
+        assert succes and notification is None
+        assert NotificationEvent.objects.count() == 1
+        assert len(callbacks) == 1
@@ -0,0 +1,55 @@
+import time
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from notification.models import Notification
+from notification.services import metrics
+from notification.services.alert_system import alert_system
+
+User = get_user_model()
+
+
+@pytest.fixture(autouse=True)
+def compteurs():
+    metrics.get_counters().reset()
+    yield
+    metrics.get_counters().reset()
+
+
+def test_fenetre_glissante_par_minute():
+    maintenant = time.time()
+    metrics.incrementer("mali", "envoye", 5, now=maintenant - 2 * 3600)
+    metrics.incrementer("mali", "echec_permanent", 2, now=maintenant - 30 * 3600)  # hors 24h
+    metrics.incrementer("mali", "envoye", now=maintenant)
+
+    stats = metrics.compter(("mali",), now=maintenant)["mali"]
+    assert stats == {"envoye": 6, "echec_permanent": 0, "total": 6}
+    assert metrics.compter(("mali",), fenetre=3600, now=maintenant)["mali"]["total"] == 1
+
+
+@pytest.mark.django_db
+def test_alerte_et_endpoint_lisent_les_compteurs(client, monkeypatch, django_assert_num_queries):
+    for i in range(12):
+        notification = Notification(region="chine", message="Bonjour")
+        # Échecs temporaires relancés : seul l'état final compte
+        notification.marquer_comme_echec("HTTP 500", save=False)
+        notification.marquer_comme_echec("HTTP 500", save=False)
+        if i < 4:
+            notification.marquer_comme_envoye(f"id-{i}", save=False)
+        else:
+            notification.marquer_comme_echec("HTTP 500", "permanent", save=False)
+    assert metrics.totaux() == {"envoye": 4, "echec_permanent": 8, "total": 12}
+
+    alertes = []
+    monkeypatch.setattr(alert_system, "send_critical_alert", lambda **k: alertes.append(k))
+    with django_assert_num_queries(0):
+        alert_system._check_failure_rate()
+    assert "66.7%" in alertes[0]["message"]
+
+    admin = User.objects.create_superuser(username="admin", password="x")
+    client.force_login(admin)
+    data = client.get(reverse("admin_app:notification_metrics")).json()
+    assert data["envois"]["24h"]["chine"] == {
+        "envoye": 4, "echec_permanent": 8, "total": 12
+    }
@@ -0,0 +1,140 @@
+import pytest
+from django.contrib.auth import get_user_model
+from notification.models import Notification
+from notification.services.notification_service import notification_service
+from notification.services.wachap_service import wachap_service
+from notification.tasks import dispatch_notifications
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestOutbox:
+    def setup_method(self):
+        self.envois = []
+
+    def _envoyer(self, phone, message, **kwargs):
+        self.envois.append(phone)
+        if phone == "+22300000000":
+            return False, "HTTP 500", None
+        return True, "ok", f"id-{len(self.envois)}"
+
+    def test_mise_en_file_puis_dispatch_par_lots(
+        self, monkeypatch, django_capture_on_commit_callbacks
+    ):
+        monkeypatch.setattr(wachap_service, "send_message_with_type", self._envoyer)
+        monkeypatch.setattr(
+            wachap_service,
+            "check_numbers_registered",
+            lambda phones, region=None: dict.fromkeys(phones, False),
+        )
+        monkeypatch.setattr(dispatch_notifications, "delay", lambda *a, **k: None)
+        users = [
+            User.objects.create_user(username="a", password="x", phone="+22376000001"),
+            User.objects.create_user(username="b", password="x", phone="+22300000000"),
+            User.objects.create_user(username="c", password="x"),
+        ]
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            notification_service.enqueue(
+                [notification_service.build_notification(u, "Bonjour") for u in users]
+            )
+        assert len(callbacks) == 1
+        assert self.envois == []
+        assert Notification.objects.filter(statut="en_attente").count() == 3
+
+        dispatch_notifications(batch_size=2)
+
+        statuts = dict(Notification.objects.values_list("destinataire__username", "statut"))
+        assert statuts == {"a": "envoye", "b": "echec_permanent", "c": "echec_permanent"}
+        assert Notification.objects.get(destinataire=users[0]).message_id_externe == "id-1"
+        assert self.envois == ["+22376000001", "+22300000000"]
+
+    def test_lot_reclame_avant_envoi_et_bail_expire_repris(self, monkeypatch):
+        from django.utils import timezone
+
+        etats = []
+        deliver_many = notification_service.deliver_many
+
+        def deliver(notifications, **kwargs):
+            # Réclamation validée avant l'envoi : les lignes sont déjà 'en_cours'
+            etats.append(
+                sorted(
+                    Notification.objects.filter(statut="en_cours").values_list(
+                        "message", flat=True
+                    )
+                )
+            )
+            return deliver_many(notifications, **kwargs)
+
+        monkeypatch.setattr(notification_service, "deliver_many", deliver)
+        monkeypatch.setattr(
+            wachap_service,
+            "send_message_with_type",
+            lambda phone, message, **kwargs: (True, "ok", "id"),
+        )
+        user = User.objects.create_user(username="a", password="x", phone="+22376000001")
+        notification_service.enqueue(
+            [notification_service.build_notification(user, "Bonjour")], coalesce=False
+        )
+        # Lot d'un worker mort pendant l'envoi : repris une fois le bail expiré
+        perdu = notification_service.build_notification(user, "Perdu")
+        perdu.statut = "en_cours"
+        perdu.prochaine_tentative = timezone.now() - timezone.timedelta(seconds=1)
+        perdu.save()
+        en_cours = notification_service.build_notification(user, "En cours")
+        en_cours.statut = "en_cours"
+        en_cours.prochaine_tentative = timezone.now() + timezone.timedelta(minutes=5)
+        en_cours.save()
+
+        dispatch_notifications()
+
+        assert etats == [["Bonjour", "En cours", "Perdu"]]
+        assert dict(Notification.objects.values_list("message", "statut")) == {
+            "Bonjour": "envoye",
+            "Perdu": "envoye",
+            "En cours": "en_cours",
+        }
+        assert Notification.objects.get(message="Perdu").prochaine_tentative is None
+
+
+@pytest.mark.django_db
+def test_expedition_annulee_si_la_mise_en_file_echoue(client, monkeypatch, settings):
+    from django.urls import reverse
+    from core.models import Client, Colis, Country, Lot
+
+    chine = Country.objects.create(code="CN", name="Chine")
+    mali = Country.objects.create(code="ML", name="Mali")
+    agent = User.objects.create_user(
+        username="agent", password="x", role="AGENT_CHINE", country=chine
+    )
+    lot = Lot.objects.create(
+        destination=mali,
+        country=chine,
+        created_by=agent,
+        status="FERME",
+        frais_transport=100000,
+        nb_colis=1,
+    )
+    acheteur = Client.objects.create(
+        nom="Traoré", telephone="+22376123456", country=mali
+    )
+    acheteur.user = User.objects.create_user(username="traore", password="x")
+    acheteur.save()
+    Colis.objects.create(
+        lot=lot, client=acheteur, country=chine, poids=2, description="Sacs"
+    )
+
+    def panne(notifications, coalesce=True):
+        raise RuntimeError("base indisponible")
+
+    monkeypatch.setattr(notification_service, "enqueue", panne)
+    settings.COMPRESS_ENABLED = False  # page 500
+    client.force_login(agent)
+    with pytest.raises(RuntimeError):
+        client.post(reverse("chine:lot_ship", args=[lot.pk]))
+
+    # Statut et notifications dans la même transaction : rien n'est validé
+    lot.refresh_from_db()
+    assert lot.status == "FERME"
+    assert set(lot.colis.values_list("status", flat=True)) == {"RECU"}
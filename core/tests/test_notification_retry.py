@@ -0,0 +1,96 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from core.models import Client, Country
+from notification import tasks
+from notification.models import Notification
+from notification.services.wachap_service import wachap_service
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+def test_balayage_par_lots_sans_double_envoi(monkeypatch):
+    envois = []
+
+    def send_many(messages, reserved=False, concurrency=None):
+        envois.extend(m["phone"] for m in messages)
+        return [(True, "ok", f"id-{len(envois)}") for _ in messages]
+
+    monkeypatch.setattr(wachap_service, "send_many", send_many)
+    monkeypatch.setattr(tasks, "RETRY_CHUNK_SIZE", 2)
+    lots = []
+    monkeypatch.setattr(
+        tasks.retry_failed_notifications_chunk, "delay", lambda *args: lots.append(args)
+    )
+
+    # Numéro corrigé dans le profil client depuis l'échec
+    user = User.objects.create_user(username="client", password="x", phone="+22376000000")
+    Client.objects.create(
+        user=user, nom="Keïta", telephone="+22376999999",
+        country=Country.objects.create(code="ML", name="Mali"),
+    )
+    hier = timezone.now() - timezone.timedelta(days=1)
+    Notification.objects.bulk_create(
+        Notification(
+            destinataire=user if i == 0 else None,
+            telephone_destinataire=f"+2237600000{i}",
+            message="Bonjour",
+            statut="echec",
+            nombre_tentatives=1,
+            prochaine_tentative=hier,
+        )
+        for i in range(5)
+    )
+
+    tasks.retry_failed_notifications_periodic()
+    assert [len(ids) for ids, _force in lots] == [2, 2, 1]
+
+    # Deux balayages qui se chevauchent : les lignes déjà relancées sont ignorées
+    for args in lots + lots:
+        tasks.retry_failed_notifications_chunk(*args)
+
+    assert len(envois) == 5
+    assert "+22376999999" in envois
+    assert set(Notification.objects.values_list("statut", "nombre_tentatives")) == {
+        ("envoye", 2)
+    }
+
+
+@pytest.mark.django_db
+def test_relance_sans_creneau_differee_sans_consommer_de_tentative(monkeypatch):
+    envois = []
+    reprises = []
+    monkeypatch.setattr(
+        wachap_service,
+        "send_many",
+        lambda messages, reserved=False, concurrency=None: envois.append(reserved)
+        or [(True, "ok", "id") for _ in messages],
+    )
+    creneaux = iter([(True, 0), (False, 8.2)])
+    monkeypatch.setattr(wachap_service, "reserve", lambda *a, **k: next(creneaux))
+    monkeypatch.setattr(
+        tasks.retry_failed_notifications_chunk,
+        "apply_async",
+        lambda args, countdown: reprises.append((args, countdown)),
+    )
+    hier = timezone.now() - timezone.timedelta(days=1)
+    notifications = Notification.objects.bulk_create(
+        Notification(
+            telephone_destinataire=f"+2237600000{i}",
+            message="Bonjour",
+            statut="echec",
+            nombre_tentatives=1,
+            prochaine_tentative=hier,
+        )
+        for i in range(2)
+    )
+
+    tasks.retry_failed_notifications_chunk([n.pk for n in notifications])
+
+    assert envois == [True]  # créneaux réservés par la tâche
+    envoyee, differee = Notification.objects.order_by("pk")
+    assert (envoyee.statut, envoyee.nombre_tentatives) == ("envoye", 2)
+    assert (differee.statut, differee.nombre_tentatives) == ("echec", 1)
+    assert differee.prochaine_tentative > timezone.now()
+    assert reprises == [(([differee.pk], False), 9)]
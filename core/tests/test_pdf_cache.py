@@ -0,0 +1,77 @@
+import pytest
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from core import pdf_cache, utils_pdf
+from core.models import Client, Colis, Country, Lot, PdfCache
+
+User = get_user_model()
+
+
+class FakeRenderer:
+    def __init__(self):
+        self.rendus = 0
+
+    def render(self, html_content, format="A4", landscape=False):
+        self.rendus += 1
+        return f"%PDF-{self.rendus}".encode() * 100
+
+
+@pytest.mark.django_db
+def test_manifeste_servi_depuis_le_cache_puis_invalide(
+    settings, tmp_path, monkeypatch, django_capture_on_commit_callbacks
+):
+    settings.MEDIA_ROOT = tmp_path
+    renderer = FakeRenderer()
+    monkeypatch.setattr(utils_pdf, "get_renderer", lambda: renderer)
+    chine = Country.objects.create(code="CN", name="Chine")
+    mali = Country.objects.create(code="ML", name="Mali")
+    agent = User.objects.create_user(username="agent", password="x")
+    lot = Lot.objects.create(destination=mali, country=chine, created_by=agent)
+    client = Client.objects.create(nom="Traoré", telephone="+22376123456", country=mali)
+    colis = Colis.objects.create(
+        lot=lot, client=client, country=chine, poids=Decimal("2.5"), description="Chaussures"
+    )
+
+    def manifeste():
+        context = {
+            "lot": lot,
+            "colis_list": lot.colis.select_related("client"),
+            "total_poids": Decimal("2.5"),
+            "total_colis": 1,
+            "user": agent,
+            "date_impression": timezone.now(),
+        }
+        return utils_pdf.render_to_pdf_playwright(
+            "mali/pdf/manifeste_lot.html",
+            context,
+            cache=True,
+            volatile=("date_impression",),
+            dependances=(f"lot:{lot.pk}",),
+        ).content
+
+    premier = manifeste()
+    assert manifeste() == premier  # date d'impression différente, même PDF
+    assert renderer.rendus == 1
+    assert PdfCache.objects.get().nombre_acces == 1
+
+    # Colis modifié : les PDF du lot sont supprimés et régénérés
+    with django_capture_on_commit_callbacks(execute=True):
+        colis.poids = Decimal("3")
+        colis.save()
+    assert not PdfCache.objects.exists()
+    assert manifeste() != premier
+    assert renderer.rendus == 2
+
+
+@pytest.mark.django_db
+def test_eviction_lru(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    for i in range(3):
+        pdf_cache.enregistrer(pdf_cache.cle("t.html", str(i)), b"x" * 1000, "t.html")
+    assert pdf_cache.lire(pdf_cache.cle("t.html", "0")) is not None  # le plus ancien, relu
+
+    assert pdf_cache.evincer(max_bytes=2000) == 1
+    assert pdf_cache.lire(pdf_cache.cle("t.html", "1")) is None
+    assert pdf_cache.lire(pdf_cache.cle("t.html", "0")) == b"x" * 1000
+    assert len(list((tmp_path / "pdf_cache").rglob("*.pdf"))) == 2
@@ -0,0 +1,147 @@
+import io
+
+import pytest
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+from pypdf import PdfReader
+from core import pdf_native, utils_pdf
+from core.models import Client, Colis, Country, Lot
+
+User = get_user_model()
+
+
+def texte_pdf(pdf_bytes):
+    texte = " ".join(
+        page.extract_text() for page in PdfReader(io.BytesIO(pdf_bytes)).pages
+    )
+    return texte.replace("\xa0", " ")
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "template", ["mali/pdf/rapport_jour.html", "ivoire/pdf/rapport_jour.html"]
+)
+def test_rapport_jour_natif_reprend_les_textes_du_template(template):
+    chine = Country.objects.create(code="CN", name="Chine")
+    mali = Country.objects.create(code="ML", name="Mali")
+    agent = User.objects.create_user(
+        username="agent", password="x", first_name="Moussa"
+    )
+    lot = Lot.objects.create(destination=mali, country=chine, created_by=agent)
+    client = Client.objects.create(
+        nom="Traoré", prenom="Awa", telephone="+22376123456", country=mali
+    )
+    for prix in (Decimal("125000"), Decimal("7500")):
+        colis = Colis.objects.create(
+            lot=lot,
+            client=client,
+            country=chine,
+            poids=Decimal("2.5"),
+            description="Sacs",
+        )
+        Colis.objects.filter(pk=colis.pk).update(prix_final=prix)  # hors tarif
+    colis_livres = Colis.objects.select_related("client", "lot").annotate(
+        net_price=F("prix_final") - F("montant_jc"), montant_paye_jour=F("prix_final")
+    )
+    context = {
+        "date": timezone.now().date(),
+        "report_type": "global",
+        "titre_rapport": "Rapport Journalier Global",
+        "colis_livres": colis_livres,
+        "total_encaissements": Decimal("132500"),
+        "total_jc": 0,
+        "total_depenses": Decimal("15000"),
+        "total_transferts": Decimal("50000"),
+        "total_poids": Decimal("5"),
+        "solde_veille": Decimal("1000000"),
+        "solde_final": Decimal("1067500"),
+        "user": agent,
+    }
+
+    texte = texte_pdf(pdf_native.render(template, context))
+    html = render_to_string(template, context)
+    for attendu in (
+        f"RPT-{context['date']:%Y%m%d}-GLOBAL",
+        "Synthèse Financière de la Journée",
+        "TRAORÉ Awa",
+        colis_livres[0].reference,
+        "125\xa0000",
+        "1\xa0067\xa0500",
+    ):
+        assert attendu in html
+        assert (
+            attendu.replace("\xa0", " ") in texte
+        )  # espaces insécables extraits en espaces
+
+
+@pytest.mark.django_db
+def test_etiquettes_natives_sans_navigateur(monkeypatch):
+    monkeypatch.setattr(
+        utils_pdf, "get_renderer", lambda: pytest.fail("Chromium sollicité")
+    )
+    chine = Country.objects.create(code="CN", name="Chine")
+    mali = Country.objects.create(code="ML", name="Mali")
+    agent = User.objects.create_user(username="agent", password="x")
+    lot = Lot.objects.create(destination=mali, country=chine, created_by=agent)
+    client = Client.objects.create(
+        nom="Traoré", prenom="Awa", telephone="+22376123456", country=mali
+    )
+    colis = [
+        Colis.objects.create(
+            lot=lot,
+            client=client,
+            country=chine,
+            poids=Decimal("2"),
+            description="Sacs",
+        )
+        for _ in range(5)
+    ]
+
+    response = utils_pdf.render_to_pdf_playwright(
+        "chine/etiquette_pdf.html",
+        {"colis_batches": [colis[:4], colis[4:]], "date": timezone.now()},
+        backend="native",
+    )
+    lecteur = PdfReader(io.BytesIO(response.content))
+    assert len(lecteur.pages) == 2
+    texte = lecteur.pages[1].extract_text()
+    assert colis[4].reference in texte
+    assert "TS AIR CARGO — MALI" in texte
+    assert "NON PAYÉ" in texte
+
+    with pytest.raises(ValueError):
+        pdf_native.render("mali/pdf/manifeste_lot.html", {})
+
+
+@pytest.mark.django_db
+def test_nom_chinois_rendu_par_chromium(monkeypatch):
+    rendus = []
+
+    class Renderer:
+        def render(self, html_content, format="A4", landscape=False):
+            rendus.append(html_content)
+            return b"%PDF-chromium"
+
+    monkeypatch.setattr(utils_pdf, "get_renderer", Renderer)
+    chine = Country.objects.create(code="CN", name="Chine")
+    mali = Country.objects.create(code="ML", name="Mali")
+    agent = User.objects.create_user(username="agent", password="x")
+    lot = Lot.objects.create(destination=mali, country=chine, created_by=agent)
+    client = Client.objects.create(
+        nom="王", prenom="小明", telephone="+22376123456", country=mali
+    )
+    colis = Colis.objects.create(
+        lot=lot, client=client, country=chine, poids=Decimal("2"), description="Sacs"
+    )
+    context = {"colis_batches": [[colis]], "date": timezone.now()}
+
+    with pytest.raises(pdf_native.TexteNonEncodable):
+        pdf_native.render("chine/etiquette_pdf.html", context)
+    response = utils_pdf.render_to_pdf_playwright(
+        "chine/etiquette_pdf.html", context, backend="native"
+    )
+    assert response.content == b"%PDF-chromium"
+    assert "王" in rendus[0]
@@ -0,0 +1,102 @@
+import threading
+
+import pytest
+from playwright import async_api
+from core.pdf_renderer import PdfRenderer
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.closed = False
+
+    async def new_page(self):
+        return FakePage(self)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+
+    async def set_content(self, html, **kwargs):
+        if html == "crash":
+            self.context.browser.connected = False
+        if not self.context.browser.connected:
+            raise RuntimeError("Target closed")
+        self.html = html
+
+    async def pdf(self, **kwargs):
+        return f"%PDF {self.html} {kwargs['format']}".encode()
+
+
+class FakeBrowser:
+    def __init__(self, launches):
+        self.connected = True
+        self.contexts = []
+        launches.append(self)
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, **kwargs):
+        self.contexts.append(FakeContext(self))
+        return self.contexts[-1]
+
+    async def close(self):
+        self.connected = False
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.launches = []
+        self.chromium = self
+
+    async def launch(self, **kwargs):
+        return FakeBrowser(self.launches)
+
+    async def start(self):
+        return self
+
+    async def stop(self):
+        pass
+
+
+@pytest.fixture
+def playwright(monkeypatch):
+    fake = FakePlaywright()
+    monkeypatch.setattr(async_api, "async_playwright", lambda: fake)
+    return fake
+
+
+def test_pool_reutilise_puis_recycle_les_contextes(playwright):
+    renderer = PdfRenderer(contexts=2, max_renders=3).start()
+    try:
+        resultats = []
+        threads = [
+            threading.Thread(target=lambda i=i: resultats.append(renderer.render(f"doc{i}")))
+            for i in range(12)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(resultats) == sorted(f"%PDF doc{i} A4".encode() for i in range(12))
+        # Un seul Chromium ; chaque contexte est recyclé tous les 3 rendus
+        assert len(playwright.launches) == 1
+        assert renderer.renders == 12
+        assert renderer.recycles >= 3
+        contexts = playwright.launches[0].contexts
+        assert len(contexts) == renderer.recycles + sum(not c.closed for c in contexts)
+        assert sum(not c.closed for c in contexts) <= 2
+
+        # Plantage du navigateur : le rendu échoue, Chromium est relancé ensuite
+        with pytest.raises(RuntimeError):
+            renderer.render("crash")
+        assert renderer.render("apres", format="A5") == b"%PDF apres A5"
+        assert len(playwright.launches) == 2
+    finally:
+        renderer.stop()
@@ -0,0 +1,83 @@
+import pytest
+from django.contrib.auth import authenticate, get_user_model
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+from chine.forms import ClientForm
+from core.models import Client, Country
+from core.phone import normaliser_telephone, region_telephone
+
+User = get_user_model()
+
+
+def test_normaliser_telephone():
+    assert normaliser_telephone("+223 76 12-34-56") == "+22376123456"
+    assert normaliser_telephone("00225 (07) 123456") == "+22507123456"
+    assert normaliser_telephone("22376123456") == "+22376123456"
+    assert normaliser_telephone("agent.mali") is None
+    assert normaliser_telephone("") is None
+    assert region_telephone("0086 138 0000 0000") == "chine"
+    assert region_telephone("+225 07 12 34 56") == "cote_divoire"
+    assert region_telephone("+223 76 12 34 56") == "mali"
+
+
+@pytest.mark.django_db
+class TestTelephoneE164:
+    def setup_method(self):
+        self.mali = Country.objects.create(code="ML", name="Mali")
+        self.user = User.objects.create_user(
+            username="aissata.traore", password="password", role="CLIENT"
+        )
+        self.client = Client.objects.create(
+            nom="Traoré", telephone="+223 76 12 34 56", country=self.mali, user=self.user
+        )
+
+    def test_colonne_normalisee_et_unique(self):
+        assert Client.objects.get(pk=self.client.pk).telephone_e164 == "+22376123456"
+        with pytest.raises(IntegrityError):
+            Client.objects.create(nom="Doublon", telephone="0022376123456", country=self.mali)
+
+    def test_connexion_par_telephone_quel_que_soit_le_format(self):
+        assert authenticate(username="0022376123456", password="password") == self.user
+        assert authenticate(username="+223 76 12 34 56", password="password") == self.user
+
+        agent = User.objects.create_user(
+            username="agent", password="password", role="AGENT_MALI", phone="+22370000000"
+        )
+        assert authenticate(username="agent", password="password") == agent
+        assert authenticate(username="+22370000000", password="password") is None
+
+    def test_doublon_detecte_par_le_formulaire(self):
+        form = ClientForm(
+            data={"nom": "Doublon", "telephone": "0022376123456", "country": self.mali.pk}
+        )
+        assert not form.is_valid()
+        assert "telephone" in form.errors
+
+    def test_doublon_historique_modifiable(self):
+        """Un doublon laissé à NULL par la migration se modifie sans IntegrityError"""
+        Client.objects.bulk_create(
+            [Client(nom="Ancien", telephone="0022376123456", country=self.mali)]
+        )
+        ancien = Client.objects.get(nom="Ancien")
+        assert ancien.telephone_e164 is None
+
+        form = ClientForm(
+            data={"nom": "Ancien Renommé", "telephone": "0022376123456", "country": self.mali.pk},
+            instance=ancien,
+        )
+        assert form.is_valid(), form.errors
+        form.save()
+        ancien.refresh_from_db()
+        assert (ancien.nom, ancien.telephone_e164) == ("Ancien Renommé", None)
+
+        # Nouveau numéro : normalisé et vérifié
+        ancien.telephone = "+223 70 00 00 00"
+        ancien.save()
+        assert Client.objects.get(pk=ancien.pk).telephone_e164 == "+22370000000"
+
+    def test_doublon_utilisateur_detecte_par_clean(self):
+        autre = User(username="agent2", phone="00223 76 12 34 56")
+        User.objects.filter(pk=self.user.pk).update(phone_e164="+22376123456")
+        with pytest.raises(ValidationError) as exc:
+            autre.full_clean(exclude=["password"])
+        assert "phone" in exc.value.message_dict
@@ -0,0 +1,58 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from notification.models import Notification
+from notification.services.notification_service import notification_service
+from notification.services.rate_limiter import MemoryTokenBucket, queue_wait_stats
+from notification.services.wachap_service import wachap_service
+from notification.tasks import dispatch_notifications
+
+User = get_user_model()
+
+
+def test_token_bucket_rafale_puis_debit():
+    bucket = MemoryTokenBucket()
+    # 3 jetons, 1 jeton/seconde
+    assert [bucket.reserve("acc", 1, 3, 0, now=100)[0] for _ in range(3)] == [True] * 3
+    # Seau vide : prochain jeton dans 1s, non réservé sans attente permise
+    assert bucket.reserve("acc", 1, 3, 0, now=100) == (False, 1)
+    # Réservé si l'appelant accepte d'attendre, le suivant attend 2s
+    assert bucket.reserve("acc", 1, 3, 1, now=100) == (True, 1)
+    assert bucket.reserve("acc", 1, 3, 0, now=100) == (False, 2)
+    assert bucket.reserve("acc", 1, 3, 0, now=102)[0] is True
+    # Les comptes sont indépendants
+    assert bucket.reserve("autre", 1, 3, 0, now=100) == (True, 0)
+
+
+@pytest.mark.django_db
+def test_dispatch_differe_a_l_heure_du_prochain_creneau(monkeypatch):
+    cache.clear()
+    envois = []
+    reprises = []
+    monkeypatch.setattr(
+        wachap_service,
+        "send_message_with_type",
+        lambda phone, message, **kwargs: envois.append(phone) or (True, "ok", "id"),
+    )
+    creneaux = iter([(True, 0), (False, 12.3)])
+    monkeypatch.setattr(wachap_service, "reserve", lambda *a, **k: next(creneaux))
+    monkeypatch.setattr(
+        dispatch_notifications, "apply_async", lambda *a, **k: reprises.append(k["countdown"])
+    )
+    monkeypatch.setattr(dispatch_notifications, "delay", lambda *a, **k: None)
+    users = [
+        User.objects.create_user(username=f"u{i}", password="x", phone=f"+2237600000{i}")
+        for i in range(2)
+    ]
+    notification_service.enqueue(
+        [notification_service.build_notification(u, "Bonjour", region="mali") for u in users]
+    )
+
+    dispatch_notifications()
+
+    assert envois == ["+22376000000"]
+    differee = Notification.objects.get(destinataire=users[1])
+    assert differee.statut == "en_attente"
+    assert differee.prochaine_tentative is not None
+    assert reprises == [13]
+    assert queue_wait_stats()["mali"]["count"] == 1
@@ -0,0 +1,55 @@
+import pytest
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from core.models import Client, Colis, Country, Lot
+from core.search import normaliser, rechercher, rechercher_lots
+
+User = get_user_model()
+
+
+def test_normaliser():
+    assert normaliser("Élodie N'Diaye") == "elodie n diaye"
+    assert normaliser("  TS-2410-000123 ") == "ts 2410 000123"
+
+
+@pytest.mark.django_db
+class TestSearchDocument:
+    def setup_method(self):
+        self.chine = Country.objects.create(code="CN", name="Chine")
+        self.mali = Country.objects.create(code="ML", name="Mali")
+        self.user = User.objects.create_user(username="agent", password="password")
+        self.client = Client.objects.create(
+            nom="Traoré", prenom="Aïssata", telephone="+223 76 12 34 56", country=self.mali
+        )
+        self.lot = Lot.objects.create(
+            destination=self.mali, country=self.chine, created_by=self.user
+        )
+        self.colis = Colis.objects.create(
+            lot=self.lot,
+            client=self.client,
+            country=self.chine,
+            poids=Decimal("2.5"),
+            description="Chaussures",
+        )
+
+    def test_recherche_accents_telephone_et_reference(self):
+        colis = Colis.objects.all()
+        assert list(rechercher(colis, "aissata TRAORE")) == [self.colis]
+        assert list(rechercher(colis, "76123456")) == [self.colis]
+        assert list(rechercher(colis, self.colis.reference.lower())) == [self.colis]
+        assert list(rechercher(colis, "chaussures dupont")) == []
+
+    def test_document_des_colis_suit_le_client(self):
+        client = Client.objects.get(pk=self.client.pk)
+        client.nom = "Keïta"
+        client.save(update_fields=["nom"])
+        assert list(rechercher(Colis.objects.all(), "keita")) == [self.colis]
+        assert not rechercher(Colis.objects.all(), "traore").exists()
+
+    def test_recherche_lots_par_numero_ou_client(self):
+        autre = Lot.objects.create(
+            destination=self.mali, country=self.chine, created_by=self.user
+        )
+        lots = Lot.objects.all()
+        assert list(rechercher_lots(lots, "traore")) == [self.lot]
+        assert list(rechercher_lots(lots, autre.numero)) == [autre]
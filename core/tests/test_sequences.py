@@ -0,0 +1,122 @@
+import io
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from core.models import Client, Colis, Country, Lot, NumeroSequence
+
+User = get_user_model()
+
+
+@pytest.mark.django_db(transaction=True)
+class TestNumeroSequence:
+    def setup_method(self):
+        self.chine = Country.objects.create(code="CN", name="Chine")
+        self.user = User.objects.create_user(username="agent", password="password")
+
+    def creer_lot(self, type_transport=Lot.TypeTransport.CARGO):
+        try:
+            return Lot.objects.create(
+                type_transport=type_transport, country=self.chine, created_by=self.user
+            ).numero
+        finally:
+            connection.close()
+
+    def test_reprend_apres_numeros_existants(self):
+        """La séquence démarre après le plus grand numéro du mois (tri numérique)"""
+        prefix = f"CARGO-{timezone.now().strftime('%y%m')}"
+        for seq in (9, 1000):
+            Lot.objects.create(
+                numero=f"{prefix}-{seq:03d}", country=self.chine, created_by=self.user
+            )
+        assert self.creer_lot() == f"{prefix}-1001"
+
+    def test_allocation_concurrente_sans_collision(self):
+        """Des centaines d'allocations parallèles donnent des numéros distincts"""
+
+        def allouer(_i):
+            try:
+                return NumeroSequence.allouer("CARGO-TEST")
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            numeros = list(pool.map(allouer, range(300)))
+
+        assert sorted(numeros) == list(range(1, 301))
+        assert NumeroSequence.objects.get(cle="CARGO-TEST").valeur == 300
+
+    @pytest.mark.skipif(
+        connection.vendor == "sqlite",
+        reason="SQLite en mémoire : un seul écrivain, les INSERT parallèles se bloquent",
+    )
+    def test_creation_concurrente_sans_collision(self):
+        """Des centaines de lots créés en parallèle reçoivent des numéros distincts"""
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            numeros = list(pool.map(lambda _i: self.creer_lot(), range(200)))
+
+        assert len(set(numeros)) == 200
+        prefix = f"CARGO-{timezone.now().strftime('%y%m')}"
+        assert NumeroSequence.objects.get(cle=prefix).valeur == 200
+
+    def test_backfill_ne_recule_jamais(self):
+        prefix = f"CARGO-{timezone.now().strftime('%y%m')}"
+        Lot.objects.create(numero=f"{prefix}-010", country=self.chine, created_by=self.user)
+        Lot.objects.create(numero="EXPRESS-2401-007", country=self.chine, created_by=self.user)
+        NumeroSequence.objects.update_or_create(cle=prefix, defaults={"valeur": 50})
+        NumeroSequence.objects.create(cle="EXPRESS-2401", valeur=3)
+
+        call_command("backfill_lot_sequences", stdout=io.StringIO())
+
+        assert NumeroSequence.objects.get(cle=prefix).valeur == 50
+        assert NumeroSequence.objects.get(cle="EXPRESS-2401").valeur == 7
+
+    @pytest.mark.skipif(
+        connection.vendor != "postgresql", reason="UPDATE ... RETURNING : PostgreSQL"
+    )
+    def test_allocation_postgresql_en_une_requete(self, django_assert_num_queries):
+        """Création au premier appel, puis un seul UPDATE ... RETURNING par allocation"""
+        assert NumeroSequence.allouer("CARGO-PG", initial=lambda: 5) == 6
+        with django_assert_num_queries(1):
+            assert NumeroSequence.allouer("CARGO-PG", nombre=3) == 7
+        assert NumeroSequence.objects.get(cle="CARGO-PG").valeur == 9
+
+
+@pytest.mark.django_db
+class TestReferenceColis:
+    def setup_method(self):
+        self.chine = Country.objects.create(code="CN", name="Chine")
+        self.user = User.objects.create_user(username="agent", password="password")
+        self.client = Client.objects.create(
+            nom="Test", telephone="123456", country=self.chine
+        )
+        self.lot = Lot.objects.create(country=self.chine, created_by=self.user)
+
+    def creer_colis(self, **kwargs):
+        return Colis.objects.create(
+            lot=self.lot, client=self.client, country=self.chine, **kwargs
+        )
+
+    def test_references_monotones_par_mois(self):
+        prefix = f"TS-{timezone.now().strftime('%y%m')}"
+        refs = [self.creer_colis().reference for _i in range(3)]
+        assert refs == [f"{prefix}-000001", f"{prefix}-000002", f"{prefix}-000003"]
+
+    def test_preallocation_en_un_bloc(self):
+        self.creer_colis()
+        prefix = f"TS-{timezone.now().strftime('%y%m')}"
+        refs = Colis.allouer_references(100)
+        assert refs[0] == f"{prefix}-000002"
+        assert refs[-1] == f"{prefix}-000101"
+        assert len(set(refs)) == 100
+
+    def test_collision_reessaie(self):
+        """Une référence déjà prise (séquence réinitialisée) n'interrompt pas la saisie"""
+        premier = self.creer_colis()
+        prefix = f"TS-{timezone.now().strftime('%y%m')}"
+        NumeroSequence.objects.filter(cle=prefix).update(valeur=0)
+        second = self.creer_colis()
+        assert second.reference != premier.reference
+        assert second.pk
@@ -0,0 +1,96 @@
+import pytest
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from core.models import Country, Lot, Colis, Client, Tarif, ClientLotTarif
+from core.tarifs import get_tarif_index, invalidate_tarif_index
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestTarifIndex:
+    def setup_method(self):
+        invalidate_tarif_index()
+        self.chine = Country.objects.create(code="CN", name="Chine")
+        self.mali = Country.objects.create(code="ML", name="Mali")
+        self.user = User.objects.create_user(
+            username="test_client", password="password", role="CLIENT"
+        )
+        self.client = Client.objects.create(
+            user=self.user, nom="Test", prenom="Client", telephone="123456", country=self.mali
+        )
+        self.tarif_cargo = Tarif.objects.create(
+            type_transport=Lot.TypeTransport.CARGO,
+            prix_kilo=Decimal("10000"),
+            prix_cbm=Decimal("0"),
+            country=self.chine,
+            destination=self.mali,
+        )
+        self.lot = Lot.objects.create(
+            destination=self.mali,
+            type_transport=Lot.TypeTransport.CARGO,
+            country=self.chine,
+            created_by=self.user,
+        )
+
+    def test_calcul_sans_requete(self, django_assert_num_queries):
+        """Une fois l'index chargé, le calcul du prix ne touche plus la base"""
+        get_tarif_index()
+        colis = Colis(lot=self.lot, client_id=self.client.pk, poids=Decimal("2"), country=self.chine)
+        with django_assert_num_queries(0):
+            colis.recalculate_prices()
+        assert colis.prix_transport == Decimal("20000")
+        assert colis.prix_final == Decimal("20000")
+
+    def test_tarif_conventionnel_invalide_index(self, django_capture_on_commit_callbacks):
+        """La création d'un tarif client est visible immédiatement"""
+        get_tarif_index()
+        with django_capture_on_commit_callbacks(execute=True):
+            ClientLotTarif.objects.create(
+                client=self.client,
+                destination=self.mali,
+                type_transport=None,
+                prix_kilo=Decimal("8000"),
+                admin_mali=self.user,
+            )
+        colis = Colis(lot=self.lot, client_id=self.client.pk, poids=Decimal("2"), country=self.chine)
+        colis.recalculate_prices()
+        assert colis.prix_transport == Decimal("16000")
+
+    def test_tarif_annule_absent_de_l_index(self):
+        """Un tarif client annulé par ROLLBACK n'entre pas dans l'index du processus"""
+        get_tarif_index()
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                ClientLotTarif.objects.create(
+                    client=self.client,
+                    destination=self.mali,
+                    type_transport=None,
+                    prix_kilo=Decimal("8000"),
+                    admin_mali=self.user,
+                )
+                get_tarif_index()
+                raise RuntimeError
+        colis = Colis(lot=self.lot, client_id=self.client.pk, poids=Decimal("2"), country=self.chine)
+        colis.recalculate_prices()
+        assert colis.prix_transport == Decimal("20000")
+
+    def test_reprice_colis(self):
+        """Le recalcul en masse applique le nouveau tarif et ignore les colis inchangés"""
+        from core.tarifs import reprice_colis
+
+        for poids in ("1", "2", "3"):
+            Colis.objects.create(
+                lot=self.lot, client=self.client, poids=Decimal(poids), country=self.chine
+            )
+        assert reprice_colis(Colis.objects.all()) == 0
+
+        Tarif.objects.filter(pk=self.tarif_cargo.pk).update(prix_kilo=Decimal("12000"))
+        invalidate_tarif_index()
+        assert reprice_colis(Colis.objects.all(), chunk_size=2) == 3
+        assert sorted(Colis.objects.values_list("prix_final", flat=True)) == [
+            Decimal("12000"),
+            Decimal("24000"),
+            Decimal("36000"),
+        ]
@@ -0,0 +1,21 @@
+from notification.services.wachap_service import WaChapService
+from notification.wachap_stub import WaChapStubServer
+
+
+def test_send_many_parallele_borne_par_compte():
+    messages = [
+        {"phone": f"+22376{i:06d}", "message": f"m{i}", "region": region}
+        for i, region in enumerate(["mali", "cote_divoire"] * 10)
+    ]
+    with WaChapStubServer(latency=0.05) as stub:
+        service = WaChapService(base_url=stub.url, config=stub.config())
+        results = service.send_many(messages, concurrency=3)
+
+    assert len(results) == 20
+    assert all(success for success, _msg, message_id in results)
+    assert len({message_id for _s, _m, message_id in results}) == 20
+    assert stub.sent() == 20
+    # Concurrence bornée par compte, connexions keep-alive réutilisées
+    assert set(stub.max_in_flight) == {"stub-mali", "stub-ci"}
+    assert max(stub.max_in_flight.values()) <= 3
+    assert stub.connections <= 6
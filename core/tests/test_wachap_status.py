@@ -0,0 +1,39 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from notification.services import wachap_monitor as monitor_module
+from notification.tasks import refresh_wachap_status
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+def test_statut_servi_depuis_le_snapshot(client, monkeypatch):
+    cache.clear()
+    appels_http = []
+    monkeypatch.setattr(
+        monitor_module.requests, "get", lambda *a, **k: appels_http.append(a) or 1 / 0
+    )
+    taches = []
+    monkeypatch.setattr(refresh_wachap_status, "delay", lambda: taches.append(1))
+    client.force_login(User.objects.create_superuser(username="admin", password="x"))
+    url = reverse("admin_app:wachap_status")
+
+    # Pas encore de snapshot : une seule vérification demandée pour tous les admins
+    for _ in range(3):
+        response = client.get(url)
+        assert response.status_code == 202
+    assert taches == [1]
+    assert appels_http == []
+
+    # La tâche publie le snapshot et libère le verrou
+    refresh_wachap_status()
+    data = client.get(url).json()
+    assert data["status"] == "ok"
+    assert data["age_seconds"] == 0
+    assert data["refreshing"] is False
+    assert set(data["instances"]) == {"chine", "mali", "cote_divoire", "system"}
+
+    client.get(url, {"refresh": 1})
+    assert taches == [1, 1]
@@ -0,0 +1,61 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from notification.models import Notification, WhatsAppRegistration
+from notification.services.notification_service import notification_service
+from notification.services.wachap_service import wachap_service
+from notification.tasks import (
+    dispatch_notifications,
+    retry_failed_notifications_chunk,
+    retry_failed_notifications_periodic,
+)
+from notification.wachap_stub import WaChapStubServer
+
+User = get_user_model()
+
+INCONNUS = {f"+2237000000{i}" for i in range(3)}
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    with WaChapStubServer(latency=0, unregistered=INCONNUS) as stub:
+        monkeypatch.setattr(wachap_service, "BASE_URL", stub.url)
+        monkeypatch.setattr(wachap_service, "_config", stub.config())
+        yield stub
+
+
+@pytest.mark.django_db
+def test_verifications_groupees_et_mises_en_cache(stub, monkeypatch):
+    monkeypatch.setattr(dispatch_notifications, "delay", lambda *a, **k: None)
+    monkeypatch.setattr(
+        retry_failed_notifications_chunk, "delay", retry_failed_notifications_chunk
+    )
+    hier = timezone.now() - timezone.timedelta(days=1)
+    for phone in [*sorted(INCONNUS), "+22376000001", "+22376000002"]:
+        Notification.objects.create(
+            telephone_destinataire=phone, message="Bonjour", statut="echec",
+            prochaine_tentative=hier,
+        )
+
+    retry_failed_notifications_periodic()
+
+    # Une seule vérification pour les 3 échecs du compte Mali
+    assert stub.requests["stub-mali", "check"] == 1
+    assert Notification.objects.filter(statut="envoye").count() == 2
+    assert set(
+        Notification.objects.filter(statut="echec_permanent").values_list(
+            "telephone_destinataire", flat=True
+        )
+    ) == INCONNUS
+    assert WhatsAppRegistration.fresh(INCONNUS) == dict.fromkeys(INCONNUS, False)
+
+    # Numéro connu comme non inscrit : ni envoi ni nouvelle vérification
+    envois = stub.sent()
+    user = User.objects.create_user(username="u", password="x", phone="+22370000000")
+    notification_service.enqueue([notification_service.build_notification(user, "Re")])
+    dispatch_notifications()
+
+    notification = Notification.objects.get(destinataire=user)
+    assert notification.statut == "echec_permanent"
+    assert stub.sent() == envois
+    assert stub.requests["stub-mali", "check"] == 1
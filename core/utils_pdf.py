@@ -1,12 +1,24 @@
-import os
-import asyncio
+import io
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
 from django.template.loader import render_to_string
 from django.http import HttpResponse
 from playwright.async_api import async_playwright
+from pypdf import PdfReader, PdfWriter
+
+from . import pdf_cache, pdf_native
+from .pdf_renderer import get_renderer
 
 
 async def generate_pdf_playwright(html_content, format="A4", landscape=False):
-    """Génère un PDF à partir d'un contenu HTML en utilisant Playwright."""
+    """
+    Génère un PDF à partir d'un contenu HTML en lançant un Chromium dédié
+    (référence du benchmark ; les vues passent par core.pdf_renderer).
+    """
     async with async_playwright() as p:
         # Utilise un navigateur déjà installé ou tente de le lancer
         browser = await p.chromium.launch(headless=True)
@@ -31,6 +43,34 @@ async def generate_pdf_playwright(html_content, format="A4", landscape=False):
         return pdf_bytes
 
 
+def render_pdf(
+    template_src,
+    context_dict,
+    html_content=None,
+    format="A4",
+    landscape=False,
+    backend="chromium",
+    request=None,
+):
+    """
+    PDF (bytes) du template avec le moteur choisi : "chromium" (HTML rendu par
+    le Chromium du processus, core.pdf_renderer) ou "native" (dessiné par
+    core.pdf_native, sans navigateur, pour les templates qu'il sait dessiner).
+    Un document natif dont un texte sort de cp1252 (nom chinois...) est rendu
+    par Chromium.
+    """
+    if backend == "native":
+        try:
+            return pdf_native.render(
+                template_src, context_dict, format=format, landscape=landscape
+            )
+        except pdf_native.TexteNonEncodable:
+            pass
+    if html_content is None:
+        html_content = render_to_string(template_src, context_dict, request=request)
+    return get_renderer().render(html_content, format=format, landscape=landscape)
+
+
 def render_to_pdf_playwright(
     template_src,
     context_dict,
@@ -38,30 +78,89 @@ def render_to_pdf_playwright(
     format="A4",
     landscape=False,
     filename="document.pdf",
+    cache=False,
+    volatile=(),
+    dependances=(),
+    backend="chromium",
 ):
     """
     Fonction utilitaire pour rendre un template Django en PDF via Playwright.
     Supporte maintenant le formatage et l'orientation.
-    """
-    html_content = render_to_string(template_src, context_dict, request=request)
 
-    # Exécute la boucle asynchrone pour Playwright
-    try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    backend="native" : document dessiné par core.pdf_native au lieu de Chromium
+    (planches d'étiquettes, rapports journaliers), voir render_pdf.
 
-    if loop.is_running():
-        # Cas rare en Django synchrone mais possible avec certains serveurs
-        import nest_asyncio
+    cache=True : le PDF est servi depuis core.pdf_cache si le même HTML a déjà
+    été rendu ; `volatile` liste les clés du contexte exclues de la clé
+    (date d'impression...), `dependances` les étiquettes d'invalidation ("lot:12").
+    """
+    html_content = None
+    if backend != "native":
+        html_content = render_to_string(template_src, context_dict, request=request)
+    pdf_bytes = cle_pdf = None
 
-        nest_asyncio.apply()
+    if cache:
+        html_stable = html_content
+        if volatile or html_stable is None:
+            # Le HTML sert aussi de clé au moteur natif : mêmes données, même PDF
+            html_stable = render_to_string(
+                template_src, {**context_dict, **dict.fromkeys(volatile)}, request=request
+            )
+        cle_pdf = pdf_cache.cle(template_src, html_stable, format, landscape, backend)
+        pdf_bytes = pdf_cache.lire(cle_pdf)
 
-    pdf_bytes = loop.run_until_complete(
-        generate_pdf_playwright(html_content, format=format, landscape=landscape)
-    )
+    if pdf_bytes is None:
+        pdf_bytes = render_pdf(
+            template_src, context_dict, html_content, format, landscape, backend, request
+        )
+        if cle_pdf:
+            pdf_cache.enregistrer(cle_pdf, pdf_bytes, template_src, dependances)
 
     response = HttpResponse(pdf_bytes, content_type="application/pdf")
     response["Content-Disposition"] = f'inline; filename="{filename}"'
     return response
+
+
+def render_chunks_to_storage(
+    template_src, contexts, name, format="A4", landscape=False, progress=None, backend="chromium"
+):
+    """
+    Rend le template une fois par contexte (un morceau de quelques pages
+    chacun) en parallèle sur les contextes du renderer, puis fusionne les PDF
+    dans l'ordre en un seul fichier enregistré dans le stockage média.
+    Retourne le nom du fichier.
+
+    progress(morceaux_fusionnes, total) est appelé après chaque morceau.
+    """
+    contexts = list(contexts)
+    writer = PdfWriter()
+
+    def append(done, pdf_bytes):
+        writer.append(PdfReader(io.BytesIO(pdf_bytes)))
+        if progress:
+            progress(done, len(contexts))
+
+    if backend == "native":
+        # Dessin en Python pur : des threads n'iraient pas plus vite (GIL)
+        for done, context in enumerate(contexts, 1):
+            append(
+                done, render_pdf(template_src, context, None, format, landscape, backend)
+            )
+    else:
+        # HTML rendu dans le thread appelant : les threads ne touchent pas à la base
+        html_parts = [render_to_string(template_src, context) for context in contexts]
+        renderer = get_renderer()
+
+        def render(html_content):
+            return renderer.render(html_content, format=format, landscape=landscape)
+
+        # Pas plus de rendus en vol que de contextes : la file reste aux requêtes
+        workers = getattr(settings, "PDF_RENDERER_CONTEXTS", 2)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for done, pdf_bytes in enumerate(executor.map(render, html_parts), 1):
+                append(done, pdf_bytes)
+
+    with tempfile.SpooledTemporaryFile(max_size=10 * 1024 * 1024) as fichier:
+        writer.write(fichier)
+        fichier.seek(0)
+        return default_storage.save(name, File(fichier, name=name))
@@ -6,7 +6,7 @@ from django.contrib.auth import get_user_model
 from django.contrib import messages
 from django.urls import reverse_lazy
 from core.models import Colis, Client as ClientModel
-from django.db.models import Q
+from core.search import rechercher
 
 User = get_user_model()
 
@@ -59,9 +59,7 @@ class ClientParcelListView(LoginRequiredMixin, ClientRequiredMixin, ListView):
 
         q = self.request.GET.get("q")
         if q:
-            queryset = queryset.filter(
-                Q(reference__icontains=q) | Q(description__icontains=q)
-            )
+            queryset = rechercher(queryset, q)
         return queryset
 
 
@@ -29,6 +29,8 @@ from report.views import (
     TransfertListView,
     TransfertCreateView,
     RapportExportView,
+    ColisExportView,
+    EncaissementExportView,
 )
 
 app_name = "ivoire"
@@ -126,4 +128,14 @@ urlpatterns = [
         RapportExportView.as_view(),
         name="rapport_export",
     ),
+    path(
+        "finance/colis/export/",
+        ColisExportView.as_view(),
+        name="colis_export",
+    ),
+    path(
+        "finance/encaissements/export/",
+        EncaissementExportView.as_view(),
+        name="encaissement_export",
+    ),
 ]
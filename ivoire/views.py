@@ -5,11 +5,14 @@ from django.http import HttpResponse
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.utils import timezone
 from django.urls import reverse_lazy
-from django.db.models import Q, Count, Sum, Value, F
-from django.db.models.functions import Concat
+from django.db.models import Q, Sum, F
+from django.db import transaction
 from core.mixins import DestinationAgentRequiredMixin
 from core.models import Country, Lot, Colis, Client
 from report.models import Depense
+from report.caisse import PAIEMENT
+from report.caisse import solde_veille as solde_caisse_veille
+from core.search import rechercher, rechercher_lots
 from django.contrib import messages
 
 from notification.models import ConfigurationNotification
@@ -163,37 +166,8 @@ class AujourdhuiView(LoginRequiredMixin, DestinationAgentRequiredMixin, Template
         from report.models import TransfertArgent
 
         # --- 1. SOLDE VEILLE (Report) ---
-        # Calcul : Total Recettes (depuis début) - Total Dépenses (depuis début) jusqu'à hier
-        from django.db.models import Sum, F
-
-        recettes_globales = (
-            Colis.objects.filter(
-                lot__destination=mali,
-                status="LIVRE",
-                est_paye=True,
-                updated_at__date__lt=today,  # Avant aujourd'hui
-            ).aggregate(total=Sum(F("prix_final") - F("montant_jc")))["total"]
-            or 0
-        )
-
-        depenses_globales = (
-            Depense.objects.filter(pays=mali, date__lt=today).aggregate(
-                total=Sum("montant")
-            )["total"]
-            or 0
-        )
-
-        # Les transferts sont considérés comme des dépenses (sorties de caisse)
-        transferts_globaux = (
-            TransfertArgent.objects.filter(
-                pays_expediteur=mali, date__lt=today
-            ).aggregate(total=Sum("montant"))["total"]
-            or 0
-        )
-
-        context["solde_veille"] = recettes_globales - (
-            depenses_globales + transferts_globaux
-        )
+        # Clôture de la veille (DailyCashBalance) : Recettes - Dépenses - Transferts
+        context["solde_veille"] = solde_caisse_veille(mali, today, PAIEMENT)
 
         # --- 2. ACTIVITÉ DU JOUR (Cargo, Express, Bateau) ---
         colis_livres_jour = Colis.objects.filter(
@@ -290,51 +264,33 @@ class LotsEnTransitView(LoginRequiredMixin, DestinationAgentRequiredMixin, ListV
     context_object_name = "lots"
     paginate_by = 20
 
+    def search_lots(self, queryset, country):
+        """Filtre les lots par numéro ou client (sous-requête : n'altère pas les agrégats)"""
+        return rechercher_lots(
+            queryset,
+            self.request.GET.get("q"),
+            Colis.objects.filter(lot__destination=country),
+        )
+
     def get_queryset(self):
         mali = self.get_current_country()
         if not mali:
             return Lot.objects.none()
 
         # Un lot apparaît en transit s'il a au moins un colis EXPEDIE
+        # Agrégats lus dans LotStats (une ligne par lot et statut)
         queryset = (
-            Lot.objects.filter(destination=mali, colis__status="EXPEDIE")
+            Lot.objects.filter(destination=mali, stats__status="EXPEDIE")
             .select_related("destination")
-            .prefetch_related("colis")
             .annotate(
                 # On ne compte que les colis en transit pour ce lot dans cette vue
-                nb_colis_transit=Count("colis", filter=Q(colis__status="EXPEDIE")),
-                poids_total_transit=Sum(
-                    "colis__poids", filter=Q(colis__status="EXPEDIE")
-                ),
-                total_recettes_transit=Sum(
-                    "colis__prix_final", filter=Q(colis__status="EXPEDIE")
-                ),
+                nb_colis_transit=Sum("stats__nb_colis"),
+                poids_total_transit=Sum("stats__poids"),
+                total_recettes_transit=Sum("stats__recettes"),
             )
             .filter(nb_colis_transit__gt=0)
-            .distinct()
         )
-
-        query = self.request.GET.get("q")
-        if query:
-            queryset = (
-                queryset.annotate(
-                    nom_complet=Concat(
-                        "colis__client__nom", Value(" "), "colis__client__prenom"
-                    ),
-                    prenom_complet=Concat(
-                        "colis__client__prenom", Value(" "), "colis__client__nom"
-                    ),
-                )
-                .filter(
-                    Q(numero__icontains=query)
-                    | Q(colis__client__nom__icontains=query)
-                    | Q(colis__client__prenom__icontains=query)
-                    | Q(colis__client__telephone__icontains=query)
-                    | Q(nom_complet__icontains=query)
-                    | Q(prenom_complet__icontains=query)
-                )
-                .distinct()
-            )
+        queryset = self.search_lots(queryset, mali)
 
         return queryset.order_by("-date_expedition")
 
@@ -342,7 +298,10 @@ class LotsEnTransitView(LoginRequiredMixin, DestinationAgentRequiredMixin, ListV
         context = super().get_context_data(**kwargs)
         context["q"] = self.request.GET.get("q", "")
         # On peut aussi ajouter total_lots car il semble utilisé dans le template
-        context["total_lots"] = self.get_queryset().count()
+        paginator = context.get("paginator")
+        context["total_lots"] = (
+            paginator.count if paginator else len(context["object_list"])
+        )
         return context
 
 
@@ -358,44 +317,17 @@ class LotsArrivesView(LotsEnTransitView):
 
         # Un lot apparaît en arrivés s'il a au moins un colis ARRIVE
         queryset = (
-            Lot.objects.filter(destination=mali, colis__status="ARRIVE")
+            Lot.objects.filter(destination=mali, stats__status="ARRIVE")
             .select_related("destination")
-            .prefetch_related("colis")
             .annotate(
                 # On ne compte que les colis arrivés pour ce lot dans cette vue
-                nb_colis_arrive=Count("colis", filter=Q(colis__status="ARRIVE")),
-                poids_total_arrive=Sum(
-                    "colis__poids", filter=Q(colis__status="ARRIVE")
-                ),
-                total_recettes_arrive=Sum(
-                    "colis__prix_final", filter=Q(colis__status="ARRIVE")
-                ),
+                nb_colis_arrive=Sum("stats__nb_colis"),
+                poids_total_arrive=Sum("stats__poids"),
+                total_recettes_arrive=Sum("stats__recettes"),
             )
             .filter(nb_colis_arrive__gt=0)
-            .distinct()
         )
-
-        query = self.request.GET.get("q")
-        if query:
-            queryset = (
-                queryset.annotate(
-                    nom_complet=Concat(
-                        "colis__client__nom", Value(" "), "colis__client__prenom"
-                    ),
-                    prenom_complet=Concat(
-                        "colis__client__prenom", Value(" "), "colis__client__nom"
-                    ),
-                )
-                .filter(
-                    Q(numero__icontains=query)
-                    | Q(colis__client__nom__icontains=query)
-                    | Q(colis__client__prenom__icontains=query)
-                    | Q(colis__client__telephone__icontains=query)
-                    | Q(nom_complet__icontains=query)
-                    | Q(prenom_complet__icontains=query)
-                )
-                .distinct()
-            )
+        queryset = self.search_lots(queryset, mali)
 
         return queryset.order_by("-date_arrivee", "-created_at")
 
@@ -405,6 +337,13 @@ class LotsLivresView(LotsEnTransitView):
 
     template_name = "ivoire/lots_livres.html"
 
+    def search_lots(self, queryset, country):
+        return rechercher_lots(
+            queryset,
+            self.request.GET.get("q"),
+            Colis.objects.filter(lot__destination=country),
+        )
+
     def get_queryset(self):
         mali = self.get_current_country()
         if not mali:
@@ -412,49 +351,29 @@ class LotsLivresView(LotsEnTransitView):
 
         # Un lot apparaît en livrés s'il a au moins un colis LIVRE ou PERDU
         queryset = (
-            Lot.objects.filter(destination=mali, colis__status__in=["LIVRE", "PERDU"])
+            Lot.objects.filter(destination=mali, stats__status__in=["LIVRE", "PERDU"])
             .select_related("destination")
-            .prefetch_related("colis")
             .annotate(
-                nb_colis_livre=Count(
-                    "colis", filter=Q(colis__status__in=["LIVRE", "PERDU"])
-                ),
-                total_recettes_livre=Sum(
-                    "colis__prix_final", filter=Q(colis__status__in=["LIVRE", "PERDU"])
-                )
-                - Sum(
-                    "colis__montant_jc", filter=Q(colis__status__in=["LIVRE", "PERDU"])
-                ),
+                nb_colis_livre=Sum("stats__nb_colis"),
+                total_recettes_livre=Sum("stats__recettes") - Sum("stats__montant_jc"),
             )
             .filter(nb_colis_livre__gt=0)
-            .distinct()
         )
 
         # Filtrage par mois/année
         month = self.request.GET.get("month")
         year = self.request.GET.get("year")
+        colis_periode = None
         if month and year:
-            queryset = queryset.filter(
-                colis__updated_at__month=month, colis__updated_at__year=year
+            colis_periode = Colis.objects.filter(
+                updated_at__month=month, updated_at__year=year
             )
         elif year:
-            queryset = queryset.filter(colis__updated_at__year=year)
+            colis_periode = Colis.objects.filter(updated_at__year=year)
+        if colis_periode is not None:
+            queryset = queryset.filter(pk__in=colis_periode.values("lot_id"))
 
-        query = self.request.GET.get("q")
-        if query:
-            queryset = (
-                queryset.annotate(
-                    nom_complet=Concat(
-                        "colis__client__nom", Value(" "), "colis__client__prenom"
-                    ),
-                )
-                .filter(
-                    Q(numero__icontains=query)
-                    | Q(colis__client__nom__icontains=query)
-                    | Q(colis__client__telephone__icontains=query)
-                )
-                .distinct()
-            )
+        queryset = self.search_lots(queryset, mali)
 
         return queryset.order_by("-updated_at")
 
@@ -468,7 +387,7 @@ class LotDetailView(LoginRequiredMixin, DestinationAgentRequiredMixin, DetailVie
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        from django.db.models import Sum, Q
+        from django.db.models import Sum
 
         # Calculs financiers sur TOUS les colis du lot (indépendamment de la recherche)
         aggregates = self.object.colis.aggregate(
@@ -497,20 +416,7 @@ class LotDetailView(LoginRequiredMixin, DestinationAgentRequiredMixin, DetailVie
 
         qc = self.request.GET.get("qc")
         if qc:
-            from django.db.models import Value
-            from django.db.models.functions import Concat
-
-            colis_queryset = colis_queryset.annotate(
-                nom_complet=Concat("client__nom", Value(" "), "client__prenom"),
-                prenom_complet=Concat("client__prenom", Value(" "), "client__nom"),
-            ).filter(
-                Q(reference__icontains=qc)
-                | Q(client__nom__icontains=qc)
-                | Q(client__prenom__icontains=qc)
-                | Q(client__telephone__icontains=qc)
-                | Q(nom_complet__icontains=qc)
-                | Q(prenom_complet__icontains=qc)
-            )
+            colis_queryset = rechercher(colis_queryset, qc)
             context["qc"] = qc
 
         paginator = Paginator(colis_queryset, 20)
@@ -545,13 +451,7 @@ class LotTransitDetailView(LotDetailView):
 
         qc = self.request.GET.get("qc")
         if qc:
-            colis_qs = colis_qs.annotate(
-                nom_complet=Concat("client__nom", Value(" "), "client__prenom"),
-            ).filter(
-                Q(reference__icontains=qc)
-                | Q(client__nom__icontains=qc)
-                | Q(nom_complet__icontains=qc)
-            )
+            colis_qs = rechercher(colis_qs, qc)
 
         from django.core.paginator import Paginator
 
@@ -581,13 +481,7 @@ class LotArriveDetailView(LotDetailView):
         colis_qs = self.object.colis.filter(status="ARRIVE")
         qc = self.request.GET.get("qc")
         if qc:
-            colis_qs = colis_qs.annotate(
-                nom_complet=Concat("client__nom", Value(" "), "client__prenom"),
-            ).filter(
-                Q(reference__icontains=qc)
-                | Q(client__nom__icontains=qc)
-                | Q(nom_complet__icontains=qc)
-            )
+            colis_qs = rechercher(colis_qs, qc)
 
         from django.core.paginator import Paginator
 
@@ -649,12 +543,13 @@ class ColisArriveView(LoginRequiredMixin, DestinationAgentRequiredMixin, View):
             )
             return redirect("ivoire:lot_transit_detail", pk=colis.lot.pk)
 
-        colis.status = "ARRIVE"
-        colis.save()
+        # Notification immédiate au client avec rappel du prix, mise en file
+        # (outbox) dans la transaction du pointage
+        with transaction.atomic():
+            colis.status = "ARRIVE"
+            colis.save()
 
-        # Notification immédiate au client avec rappel du prix
-        try:
-            from notification.tasks import send_notification_async
+            from notification.services.notification_service import notification_service
             from django.contrib.humanize.templatetags.humanize import intcomma
 
             if colis.client and colis.client.user:
@@ -678,19 +573,13 @@ class ColisArriveView(LoginRequiredMixin, DestinationAgentRequiredMixin, View):
                     f"\u2014\u2014\n"
                     f"*\u00c9quipe TS AIR CARGO* 🇨🇳 🇲🇱 🇨🇮"
                 )
-                send_notification_async.delay(
-                    user_id=colis.client.user.id,
+                notification_service.send_notification(
+                    destinataire=colis.client.user,
                     message=notif_msg,
                     categorie="colis_arrive",
                     titre=f"Colis {colis.reference} arrivé — {fmt_prix} FCFA à régler",
                     region="cote_divoire",
                 )
-        except Exception as e:
-            import logging as _log
-
-            _log.getLogger(__name__).error(
-                f"Erreur notif pointage colis {colis.pk}: {e}"
-            )
 
         if request.headers.get("HX-Request"):
             from django.shortcuts import render
@@ -773,9 +662,9 @@ class NotifyArrivalsView(LoginRequiredMixin, DestinationAgentRequiredMixin, View
                 by_client[c.client.id] = {"user": c.client.user, "colis": []}
             by_client[c.client.id]["colis"].append(c)
 
-        count_clients = 0
-        from notification.tasks import send_notification_async
+        from notification.services.notification_service import notification_service
 
+        notifications = []
         for cid, data in by_client.items():
             user = data["user"]
             colis_list = data["colis"]
@@ -790,21 +679,24 @@ class NotifyArrivalsView(LoginRequiredMixin, DestinationAgentRequiredMixin, View
                 f"Merci de passer pour le retrait."
             )
 
-            send_notification_async.delay(
-                user_id=user.id,
-                message=message,
-                categorie="colis_arrive",
-                titre=f"Arrivée de {nb} colis",
-                region="cote_divoire",
+            notifications.append(
+                notification_service.build_notification(
+                    destinataire=user,
+                    message=message,
+                    categorie="colis_arrive",
+                    titre=f"Arrivée de {nb} colis",
+                    region="cote_divoire",
+                )
             )
 
-            # Marquer comme notifié
-            lot.colis.filter(id__in=[c.id for c in colis_list]).update(
-                whatsapp_notified=True
-            )
-            count_clients += 1
+        # Mise en file et marquage notifié dans la même transaction
+        with transaction.atomic():
+            notification_service.enqueue(notifications)
+            lot.colis.filter(
+                id__in=[c.id for data in by_client.values() for c in data["colis"]]
+            ).update(whatsapp_notified=True)
 
-        messages.success(request, f"Notifications envoyées à {count_clients} clients.")
+        messages.success(request, f"Notifications envoyées à {len(notifications)} clients.")
         return redirect("ivoire:lot_transit_detail", pk=pk)
 
 
@@ -832,9 +724,9 @@ class NotifyArrivalsView(LoginRequiredMixin, DestinationAgentRequiredMixin, View
                 by_client[c.client.id] = {"user": c.client.user, "colis": []}
             by_client[c.client.id]["colis"].append(c)
 
-        count_clients = 0
-        from notification.tasks import send_notification_async
+        from notification.services.notification_service import notification_service
 
+        notifications = []
         for cid, data in by_client.items():
             user = data["user"]
             colis_list = data["colis"]
@@ -865,21 +757,24 @@ class NotifyArrivalsView(LoginRequiredMixin, DestinationAgentRequiredMixin, View
                 f"*\u00c9quipe TS AIR CARGO* 🇨🇳 🇲🇱 🇨🇮"
             )
 
-            send_notification_async.delay(
-                user_id=user.id,
-                message=message,
-                categorie="colis_arrive",
-                titre=f"{'Colis arrivé' if nb == 1 else f'{nb} colis arrivés'} — {fmt_total} FCFA à régler",
-                region="cote_divoire",
+            notifications.append(
+                notification_service.build_notification(
+                    destinataire=user,
+                    message=message,
+                    categorie="colis_arrive",
+                    titre=f"{'Colis arrivé' if nb == 1 else f'{nb} colis arrivés'} — {fmt_total} FCFA à régler",
+                    region="cote_divoire",
+                )
             )
 
-            # Marquer comme notifié
-            lot.colis.filter(id__in=[c.id for c in colis_list]).update(
-                whatsapp_notified=True
-            )
-            count_clients += 1
+        # Mise en file et marquage notifié dans la même transaction
+        with transaction.atomic():
+            notification_service.enqueue(notifications)
+            lot.colis.filter(
+                id__in=[c.id for data in by_client.values() for c in data["colis"]]
+            ).update(whatsapp_notified=True)
 
-        messages.success(request, f"Notifications envoyées à {count_clients} clients.")
+        messages.success(request, f"Notifications envoyées à {len(notifications)} clients.")
         return redirect("ivoire:lot_transit_detail", pk=pk)
 
 
@@ -911,12 +806,13 @@ class ColisLivreView(LoginRequiredMixin, DestinationAgentRequiredMixin, View):
         if status_paiement == "PAYE":
             colis.est_paye = True
 
-        colis.status = "LIVRE"
-        colis.save()
+        # Livraison et notification (outbox) dans la même transaction
+        with transaction.atomic():
+            colis.status = "LIVRE"
+            colis.save()
 
-        # Notification Livraison (Async)
-        try:
-            from notification.tasks import send_notification_async
+            # Notification Livraison (Async)
+            from notification.services.notification_service import notification_service
 
             if colis.client and colis.client.user:
                 nom_livre = (
@@ -932,17 +828,13 @@ class ColisLivreView(LoginRequiredMixin, DestinationAgentRequiredMixin, View):
                     f"\u2014\u2014\n"
                     f"*\u00c9quipe TS AIR CARGO* 🇨🇳 🇲🇱 🇨🇮"
                 )
-                send_notification_async.delay(
-                    user_id=colis.client.user.id,
+                notification_service.send_notification(
+                    destinataire=colis.client.user,
                     message=message,
                     categorie="colis_livre",
                     titre=f"Livraison effectuée - {colis.reference}",
                     region="cote_divoire",
                 )
-        except Exception as e:
-            from chine.views import logger
-
-            logger.error(f"Erreur trigger notification livraison {colis.id}: {e}")
 
         if request.headers.get("HX-Request"):
             from django.shortcuts import render
@@ -1005,21 +897,7 @@ class ColisAttentePaiementView(
 
         query = self.request.GET.get("q")
         if query:
-            queryset = (
-                queryset.annotate(
-                    nom_complet=Concat("client__nom", Value(" "), "client__prenom"),
-                    prenom_complet=Concat("client__prenom", Value(" "), "client__nom"),
-                )
-                .filter(
-                    Q(reference__icontains=query)
-                    | Q(client__nom__icontains=query)
-                    | Q(client__prenom__icontains=query)
-                    | Q(client__telephone__icontains=query)
-                    | Q(nom_complet__icontains=query)
-                    | Q(prenom_complet__icontains=query)
-                )
-                .distinct()
-            )
+            queryset = rechercher(queryset, query)
         return queryset
 
     def get_context_data(self, **kwargs):
@@ -1099,33 +977,11 @@ class RapportJourPDFView(LoginRequiredMixin, DestinationAgentRequiredMixin, View
 
         if report_type == "global":
             # Solde Veille
-            recettes_globales_veille = (
-                Colis.objects.filter(
-                    lot__destination__code="ML",
-                    status="LIVRE",
-                    est_paye=True,
-                    updated_at__date__lt=today,
-                ).aggregate(total=Sum(F("prix_final") - F("montant_jc")))["total"]
-                or 0
-            )
-            depenses_globales_veille = (
-                Depense.objects.filter(pays__code="ML", date__lt=today).aggregate(
-                    total=Sum("montant")
-                )["total"]
-                or 0
+            solde_veille = solde_caisse_veille(
+                Country.objects.get(code="ML"), today, PAIEMENT
             )
             from report.models import TransfertArgent
 
-            transferts_globaux_veille = (
-                TransfertArgent.objects.filter(
-                    pays_expediteur__code="ML", date__lt=today
-                ).aggregate(total=Sum("montant"))["total"]
-                or 0
-            )
-            solde_veille = recettes_globales_veille - (
-                depenses_globales_veille + transferts_globaux_veille
-            )
-
             # Dépenses Jour
             total_depenses = (
                 Depense.objects.filter(pays__code="ML", date=today).aggregate(
@@ -1169,15 +1025,21 @@ class RapportJourPDFView(LoginRequiredMixin, DestinationAgentRequiredMixin, View
             "user": request.user,
         }
 
-        # Génération du PDF avec Playwright
+        # Génération du PDF (tableau simple : moteur natif, sans navigateur)
         from core.utils_pdf import render_to_pdf_playwright
 
         # Vérifier si le template attend 'colis_livres' ou 'colis_list'
         context["colis_livres"] = colis_qs
 
         filename = f"rapport_jour_{report_type}_{today}.pdf"
+        # Journée passée : servie depuis le cache tant que ses données ne changent pas
         return render_to_pdf_playwright(
-            "ivoire/pdf/rapport_jour.html", context, request, filename=filename
+            "ivoire/pdf/rapport_jour.html",
+            context,
+            request,
+            filename=filename,
+            cache=today < timezone.now().date(),
+            backend="native",
         )
 
 
@@ -1204,7 +1066,13 @@ class LotTransitPDFView(LoginRequiredMixin, DestinationAgentRequiredMixin, View)
 
         filename = f"manifeste_lot_{lot.numero}.pdf"
         return render_to_pdf_playwright(
-            "ivoire/pdf/manifeste_lot.html", context, request, filename=filename
+            "ivoire/pdf/manifeste_lot.html",
+            context,
+            request,
+            filename=filename,
+            cache=True,
+            volatile=("date_impression",),
+            dependances=(f"lot:{lot.pk}",),
         )
 
 
@@ -1261,15 +1129,10 @@ class IvoireNotificationListView(LoginRequiredMixin, DestinationAgentRequiredMix
         return queryset
 
     def get_context_data(self, **kwargs):
-        from notification.models import Notification
+        from notification.services.notification_service import notification_service
 
         context = super().get_context_data(**kwargs)
-        context["stats_notif"] = Notification.objects.filter(region="cote_divoire").aggregate(
-            total=Count("id"),
-            envoye=Count("id", filter=Q(statut="envoye")),
-            echec=Count("id", filter=Q(statut="echec")),
-            echec_permanent=Count("id", filter=Q(statut="echec_permanent")),
-        )
+        context["stats_notif"] = notification_service.stats_region("cote_divoire")
         return context
 
     def post(self, request, *args, **kwargs):
@@ -52,6 +52,8 @@ from report.views import (
     TransfertCreateView,
     TransfertUpdateView,
     RapportExportView,
+    ColisExportView,
+    EncaissementExportView,
 )
 
 app_name = "mali"
@@ -172,6 +174,16 @@ urlpatterns = [
         RapportExportView.as_view(),
         name="rapport_export",
     ),
+    path(
+        "finance/colis/export/",
+        ColisExportView.as_view(),
+        name="colis_export",
+    ),
+    path(
+        "finance/encaissements/export/",
+        EncaissementExportView.as_view(),
+        name="encaissement_export",
+    ),
     # Mali Admin Space
     path("admin/", MaliAdminDashboardView.as_view(), name="admin_dashboard"),
     path("admin/agents/", MaliAgentListView.as_view(), name="admin_agents"),
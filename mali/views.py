@@ -4,6 +4,7 @@ from django.shortcuts import get_object_or_404, redirect, render
 from django.http import HttpResponse
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.utils import timezone
+from django.db import transaction
 from django.urls import reverse, reverse_lazy
 from django.db.models import (
     Q,
@@ -17,12 +18,14 @@ from django.db.models import (
     Case,
     When,
 )
-from django.db.models.functions import Concat, Coalesce
+from django.db.models.functions import Coalesce
 from core.mixins import DestinationAgentRequiredMixin, AdminMaliRequiredMixin
 from core.models import (
     Country,
     Lot,
+    LotStats,
     Colis,
+    ColisEvent,
     Client,
     User,
     AvanceSalaire,
@@ -30,6 +33,9 @@ from core.models import (
     EncaissementColis,
 )
 from report.models import Depense, TransfertArgent, PaiementAgent
+from report.caisse import ENCAISSEMENT, patcher_encaissements
+from report.caisse import solde_veille as solde_caisse_veille
+from core.search import rechercher, rechercher_lots
 from django.contrib import messages
 
 from notification.models import ConfigurationNotification
@@ -47,26 +53,6 @@ from decimal import Decimal
 logger = logging.getLogger(__name__)
 
 
-def apply_flexible_search(queryset, query, search_fields):
-    """
-    Applique une recherche flexible : chaque mot de la requête doit se trouver
-    dans au moins un des champs de recherche (Logique AND entre les mots).
-    """
-    if not query:
-        return queryset
-
-    words = query.split()
-    for word in words:
-        q_obj = Q()
-        for field in search_fields:
-            if "__icontains" not in field:
-                q_obj |= Q(**{f"{field}__icontains": word})
-            else:
-                q_obj |= Q(**{field: word})
-        queryset = queryset.filter(q_obj)
-    return queryset.distinct()
-
-
 class DashboardView(LoginRequiredMixin, DestinationAgentRequiredMixin, TemplateView):
     template_name = "mali/dashboard.html"
 
@@ -264,49 +250,10 @@ class AujourdhuiView(LoginRequiredMixin, DestinationAgentRequiredMixin, Template
         from report.models import TransfertArgent
 
         # --- 1. SOLDE VEILLE (Report) ---
-        # Calcul : Total Recettes (depuis début) - Total Dépenses (depuis début) jusqu'à hier
+        # Clôture de la veille (DailyCashBalance) : Recettes - Dépenses - Transferts
         from django.db.models import Case, When, Value, DecimalField
 
-        recettes_globales = (
-            Colis.objects.filter(
-                lot__destination=mali,
-                status="LIVRE",
-            )
-            .filter(
-                Q(date_encaissement__lt=today)
-                | Q(date_encaissement__isnull=True, date_livraison__lt=today)
-                | Q(date_encaissement__isnull=True, date_livraison__isnull=True)
-            )
-            .aggregate(
-                total=Sum(
-                    Case(
-                        When(paye_en_chine=True, then=Value(0)),
-                        default=F("prix_final") - F("montant_jc") - F("reste_a_payer"),
-                        output_field=DecimalField(),
-                    )
-                )
-            )["total"]
-            or 0
-        )
-
-        depenses_globales = (
-            Depense.objects.filter(
-                pays=mali, is_china_indicative=False, date__lt=today
-            ).aggregate(total=Sum("montant"))["total"]
-            or 0
-        )
-
-        # Les transferts sont considérés comme des dépenses (sorties de caisse)
-        transferts_globaux = (
-            TransfertArgent.objects.filter(
-                pays_expediteur=mali, date__lt=today
-            ).aggregate(total=Sum("montant"))["total"]
-            or 0
-        )
-
-        context["solde_veille"] = recettes_globales - (
-            depenses_globales + transferts_globaux
-        )
+        context["solde_veille"] = solde_caisse_veille(mali, today)
 
         # --- 2. ACTIVITÉ DU JOUR (Cargo, Express, Bateau) ---
         # On définit le périmètre du jour : date_encaissement OU repli historique
@@ -481,64 +428,47 @@ class LotsEnTransitView(LoginRequiredMixin, DestinationAgentRequiredMixin, ListV
     context_object_name = "lots"
     paginate_by = 20
 
+    def search_lots(self, queryset, country):
+        """Filtre les lots par numéro ou client (sous-requête : n'altère pas les agrégats)"""
+        return rechercher_lots(
+            queryset,
+            self.request.GET.get("q"),
+            Colis.objects.filter(lot__destination=country),
+        )
+
+    @staticmethod
+    def annotate_benefice(queryset, recettes_field):
+        return queryset.annotate(
+            benefice_calcule=ExpressionWrapper(
+                Coalesce(F(recettes_field), 0.0, output_field=DecimalField())
+                - Coalesce(F("frais_transport"), 0.0, output_field=DecimalField())
+                - Coalesce(F("frais_douane"), 0.0, output_field=DecimalField()),
+                output_field=DecimalField(),
+            )
+        )
+
     def get_queryset(self):
         mali = self.get_current_country()
         if not mali:
             return Lot.objects.none()
 
         # Un lot apparaît en transit s'il a au moins un colis EXPEDIE
+        # Agrégats lus dans LotStats (une ligne par lot et statut)
         queryset = (
-            Lot.objects.filter(destination=mali, colis__status="EXPEDIE")
+            Lot.objects.filter(destination=mali, stats__status="EXPEDIE")
             .select_related("destination")
-            .prefetch_related("colis")
             .annotate(
                 # On ne compte que les colis en transit pour ce lot dans cette vue
-                nb_colis_transit=Count("colis", filter=Q(colis__status="EXPEDIE")),
-                poids_total_transit=Sum(
-                    "colis__poids", filter=Q(colis__status="EXPEDIE")
-                ),
-                total_recettes_transit=Sum(
-                    "colis__prix_final", filter=Q(colis__status="EXPEDIE")
-                ),
+                nb_colis_transit=Sum("stats__nb_colis"),
+                poids_total_transit=Sum("stats__poids"),
+                total_recettes_transit=Sum("stats__recettes"),
                 # Nombre de colis déjà payés en Chine dans ce lot (parmi les colis en transit)
-                nb_colis_payes_chine=Count(
-                    "colis",
-                    filter=Q(colis__status="EXPEDIE", colis__est_paye=True),
-                ),
-            )
-            .annotate(
-                benefice_calcule=ExpressionWrapper(
-                    Coalesce(
-                        F("total_recettes_transit"), 0.0, output_field=DecimalField()
-                    )
-                    - Coalesce(F("frais_transport"), 0.0, output_field=DecimalField())
-                    - Coalesce(F("frais_douane"), 0.0, output_field=DecimalField()),
-                    output_field=DecimalField(),
-                )
+                nb_colis_payes_chine=Sum("stats__nb_payes"),
             )
             .filter(nb_colis_transit__gt=0)
-            .distinct()
         )
-
-        query = self.request.GET.get("q")
-        if query:
-            queryset = queryset.annotate(
-                nom_complet=Concat(
-                    "colis__client__nom", Value(" "), "colis__client__prenom"
-                ),
-                prenom_complet=Concat(
-                    "colis__client__prenom", Value(" "), "colis__client__nom"
-                ),
-            )
-            search_fields = [
-                "numero",
-                "colis__client__nom",
-                "colis__client__prenom",
-                "colis__client__telephone",
-                "nom_complet",
-                "prenom_complet",
-            ]
-            queryset = apply_flexible_search(queryset, query, search_fields)
+        queryset = self.annotate_benefice(queryset, "total_recettes_transit")
+        queryset = self.search_lots(queryset, mali)
 
         return queryset.order_by("-date_expedition")
 
@@ -546,7 +476,10 @@ class LotsEnTransitView(LoginRequiredMixin, DestinationAgentRequiredMixin, ListV
         context = super().get_context_data(**kwargs)
         context["q"] = self.request.GET.get("q", "")
         # On peut aussi ajouter total_lots car il semble utilisé dans le template
-        context["total_lots"] = self.get_queryset().count()
+        paginator = context.get("paginator")
+        context["total_lots"] = (
+            paginator.count if paginator else len(context["object_list"])
+        )
         return context
 
 
@@ -563,57 +496,20 @@ class LotsArrivesView(LotsEnTransitView):
 
         # Un lot apparaît en arrivés s'il a au moins un colis ARRIVE
         queryset = (
-            Lot.objects.filter(destination=mali, colis__status="ARRIVE")
+            Lot.objects.filter(destination=mali, stats__status="ARRIVE")
             .select_related("destination")
-            .prefetch_related("colis")
             .annotate(
                 # On ne compte que les colis arrivés pour ce lot dans cette vue
-                nb_colis_arrive=Count("colis", filter=Q(colis__status="ARRIVE")),
-                poids_total_arrive=Sum(
-                    "colis__poids", filter=Q(colis__status="ARRIVE")
-                ),
-                total_recettes_arrive=Sum(
-                    "colis__prix_final", filter=Q(colis__status="ARRIVE")
-                ),
+                nb_colis_arrive=Sum("stats__nb_colis"),
+                poids_total_arrive=Sum("stats__poids"),
+                total_recettes_arrive=Sum("stats__recettes"),
                 # Nombre de colis déjà payés en Chine (parmi les colis arrivés)
-                nb_colis_payes_chine=Count(
-                    "colis",
-                    filter=Q(colis__status="ARRIVE", colis__est_paye=True),
-                ),
-            )
-            .annotate(
-                benefice_calcule=ExpressionWrapper(
-                    Coalesce(
-                        F("total_recettes_arrive"), 0.0, output_field=DecimalField()
-                    )
-                    - Coalesce(F("frais_transport"), 0.0, output_field=DecimalField())
-                    - Coalesce(F("frais_douane"), 0.0, output_field=DecimalField()),
-                    output_field=DecimalField(),
-                )
+                nb_colis_payes_chine=Sum("stats__nb_payes"),
             )
             .filter(nb_colis_arrive__gt=0)
-            .distinct()
         )
-
-        query = self.request.GET.get("q")
-        if query:
-            queryset = queryset.annotate(
-                nom_complet=Concat(
-                    "colis__client__nom", Value(" "), "colis__client__prenom"
-                ),
-                prenom_complet=Concat(
-                    "colis__client__prenom", Value(" "), "colis__client__nom"
-                ),
-            )
-            search_fields = [
-                "numero",
-                "colis__client__nom",
-                "colis__client__prenom",
-                "colis__client__telephone",
-                "nom_complet",
-                "prenom_complet",
-            ]
-            queryset = apply_flexible_search(queryset, query, search_fields)
+        queryset = self.annotate_benefice(queryset, "total_recettes_arrive")
+        queryset = self.search_lots(queryset, mali)
 
         return queryset.order_by("-date_arrivee", "-created_at")
 
@@ -624,6 +520,13 @@ class LotsLivresView(LotsEnTransitView):
     paginate_by = 10
     template_name = "mali/lots_livres.html"
 
+    def search_lots(self, queryset, country):
+        return rechercher_lots(
+            queryset,
+            self.request.GET.get("q"),
+            Colis.objects.filter(lot__destination=country),
+        )
+
     def get_queryset(self):
         mali = self.get_current_country()
         if not mali:
@@ -631,65 +534,32 @@ class LotsLivresView(LotsEnTransitView):
 
         # Un lot apparaît en livrés s'il a au moins un colis LIVRE ou PERDU
         queryset = (
-            Lot.objects.filter(destination=mali, colis__status__in=["LIVRE", "PERDU"])
+            Lot.objects.filter(destination=mali, stats__status__in=["LIVRE", "PERDU"])
             .select_related("destination")
-            .prefetch_related("colis")
             .annotate(
-                nb_colis_livre=Count(
-                    "colis", filter=Q(colis__status__in=["LIVRE", "PERDU"])
-                ),
-                total_recettes_livre=Sum(
-                    "colis__prix_final", filter=Q(colis__status__in=["LIVRE", "PERDU"])
-                )
-                - Sum(
-                    "colis__montant_jc", filter=Q(colis__status__in=["LIVRE", "PERDU"])
-                ),
+                nb_colis_livre=Sum("stats__nb_colis"),
+                total_recettes_livre=Sum("stats__recettes") - Sum("stats__montant_jc"),
                 # Nombre de colis payés en Chine parmi les livrés/perdus
-                nb_colis_payes_chine=Count(
-                    "colis",
-                    filter=Q(
-                        colis__status__in=["LIVRE", "PERDU"], colis__paye_en_chine=True
-                    ),
-                ),
-            )
-            .annotate(
-                benefice_calcule=ExpressionWrapper(
-                    Coalesce(
-                        F("total_recettes_livre"), 0.0, output_field=DecimalField()
-                    )
-                    - Coalesce(F("frais_transport"), 0.0, output_field=DecimalField())
-                    - Coalesce(F("frais_douane"), 0.0, output_field=DecimalField()),
-                    output_field=DecimalField(),
-                )
+                nb_colis_payes_chine=Sum("stats__nb_payes_chine"),
             )
             .filter(nb_colis_livre__gt=0)
-            .distinct()
         )
+        queryset = self.annotate_benefice(queryset, "total_recettes_livre")
 
         # Filtrage par mois/année
         month = self.request.GET.get("month")
         year = self.request.GET.get("year")
+        livraisons = None
         if month and year:
-            queryset = queryset.filter(
-                colis__date_livraison__month=month, colis__date_livraison__year=year
+            livraisons = Colis.objects.filter(
+                date_livraison__month=month, date_livraison__year=year
             )
         elif year:
-            queryset = queryset.filter(colis__date_livraison__year=year)
+            livraisons = Colis.objects.filter(date_livraison__year=year)
+        if livraisons is not None:
+            queryset = queryset.filter(pk__in=livraisons.values("lot_id"))
 
-        query = self.request.GET.get("q")
-        if query:
-            queryset = queryset.annotate(
-                nom_complet=Concat(
-                    "colis__client__nom", Value(" "), "colis__client__prenom"
-                ),
-            )
-            search_fields = [
-                "numero",
-                "colis__client__nom",
-                "colis__client__telephone",
-                "nom_complet",
-            ]
-            queryset = apply_flexible_search(queryset, query, search_fields)
+        queryset = self.search_lots(queryset, mali)
 
         return queryset.order_by("-updated_at")
 
@@ -837,20 +707,7 @@ class LotDetailView(LoginRequiredMixin, DestinationAgentRequiredMixin, DetailVie
 
         qc = self.request.GET.get("qc")
         if qc:
-            colis_queryset = colis_queryset.annotate(
-                nom_complet=Concat("client__nom", Value(" "), "client__prenom"),
-                prenom_complet=Concat("client__prenom", Value(" "), "client__nom"),
-            )
-            search_fields = [
-                "reference",
-                "client__nom",
-                "client__prenom",
-                "client__telephone",
-                "poids",
-                "nom_complet",
-                "prenom_complet",
-            ]
-            colis_queryset = apply_flexible_search(colis_queryset, qc, search_fields)
+            colis_queryset = rechercher(colis_queryset, qc)
             context["qc"] = qc
 
         paginator = Paginator(colis_queryset, 20)
@@ -885,20 +742,7 @@ class LotTransitDetailView(LotDetailView):
 
         qc = self.request.GET.get("qc")
         if qc:
-            colis_qs = colis_qs.annotate(
-                nom_complet=Concat("client__nom", Value(" "), "client__prenom"),
-                prenom_complet=Concat("client__prenom", Value(" "), "client__nom"),
-            )
-            search_fields = [
-                "reference",
-                "client__nom",
-                "client__prenom",
-                "client__telephone",
-                "poids",
-                "nom_complet",
-                "prenom_complet",
-            ]
-            colis_qs = apply_flexible_search(colis_qs, qc, search_fields)
+            colis_qs = rechercher(colis_qs, qc)
         from django.core.paginator import Paginator
 
         paginator = Paginator(colis_qs.order_by("-created_at"), 20)
@@ -927,15 +771,7 @@ class LotArriveDetailView(LotDetailView):
         colis_qs = self.object.colis.all()
         qc = self.request.GET.get("qc")
         if qc:
-            colis_qs = colis_qs.annotate(
-                nom_complet=Concat("client__nom", Value(" "), "client__prenom"),
-            ).filter(
-                Q(reference__icontains=qc)
-                | Q(client__nom__icontains=qc)
-                | Q(nom_complet__icontains=qc)
-                | Q(client__telephone__icontains=qc)
-                | Q(poids__icontains=qc)
-            )
+            colis_qs = rechercher(colis_qs, qc)
 
         from django.core.paginator import Paginator
 
@@ -971,15 +807,7 @@ class LotLivreDetailView(LotDetailView):
 
         qc = self.request.GET.get("qc")
         if qc:
-            colis_qs = colis_qs.annotate(
-                nom_complet=Concat("client__nom", Value(" "), "client__prenom"),
-            ).filter(
-                Q(reference__icontains=qc)
-                | Q(client__nom__icontains=qc)
-                | Q(nom_complet__icontains=qc)
-                | Q(client__telephone__icontains=qc)
-                | Q(poids__icontains=qc)
-            )
+            colis_qs = rechercher(colis_qs, qc)
 
         from django.core.paginator import Paginator
 
@@ -1018,12 +846,13 @@ class ColisArriveView(LoginRequiredMixin, DestinationAgentRequiredMixin, View):
             )
             return redirect("mali:lot_transit_detail", pk=colis.lot.pk)
 
-        colis.status = "ARRIVE"
-        colis.save()
+        # Notification immédiate au client avec rappel du prix, mise en file
+        # (outbox) dans la transaction du pointage
+        with transaction.atomic():
+            colis.status = "ARRIVE"
+            colis.save()
 
-        # Notification immédiate au client avec rappel du prix
-        try:
-            from notification.tasks import send_notification_async
+            from notification.services.notification_service import notification_service
             from django.contrib.humanize.templatetags.humanize import intcomma
 
             if colis.client and colis.client.user:
@@ -1047,19 +876,13 @@ class ColisArriveView(LoginRequiredMixin, DestinationAgentRequiredMixin, View):
                     f"\u2014\u2014\n"
                     f"*\u00c9quipe TS AIR CARGO* 🇨🇳 🇲🇱 🇨🇮"
                 )
-                send_notification_async.delay(
-                    user_id=colis.client.user.id,
+                notification_service.send_notification(
+                    destinataire=colis.client.user,
                     message=notif_msg,
                     categorie="colis_arrive",
                     titre=f"Colis {colis.reference} arrivé — {fmt_prix} FCFA à régler",
                     region="mali",
                 )
-        except Exception as e:
-            import logging as _log
-
-            _log.getLogger(__name__).error(
-                f"Erreur notif pointage colis {colis.pk}: {e}"
-            )
 
         if request.headers.get("HX-Request"):
             from django.shortcuts import render
@@ -1119,13 +942,11 @@ class ColisArriveBulkView(LoginRequiredMixin, DestinationAgentRequiredMixin, Vie
         # Get list of colis objects before updating status
         colis_list = list(colis_qs.select_related("client", "client__user"))
 
-        # Mettre à jour le statut en masse
-        colis_qs.update(status="ARRIVE")
-
         # Grouper les notifications par client pour envoi combiné
-        from notification.tasks import send_notification_async
+        from notification.services.notification_service import notification_service
 
         by_client = {}
+        notifications = []
         for c in colis_list:
             if not c.client or not c.client.user:
                 continue
@@ -1170,26 +991,25 @@ class ColisArriveBulkView(LoginRequiredMixin, DestinationAgentRequiredMixin, Vie
                 f"*\u00c9quipe TS AIR CARGO* 🇨🇳 🇲🇱 🇨🇮"
             )
 
-            try:
-                send_notification_async.delay(
-                    user_id=user.id,
+            notifications.append(
+                notification_service.build_notification(
+                    destinataire=user,
                     message=message,
                     categorie="colis_arrive",
                     titre=f"{'Colis arrivé' if nb == 1 else f'{nb} colis arrivés'} — {fmt_total} FCFA à régler",
                     region="mali",
                 )
+            )
 
-                # Marquer comme notifié (sinon NotifyArrivalsView spammerait à nouveau)
-                Colis.objects.filter(id__in=[c.id for c in client_colis]).update(
-                    whatsapp_notified=True
-                )
-
-            except Exception as e:
-                import logging as _log
-
-                _log.getLogger(__name__).error(
-                    f"Erreur notif bulk pointage colis lot {lot.pk}: {e}"
-                )
+        # Statut en masse (journal ColisEvent et agrégats du lot), mise en file
+        # (outbox) et marquage notifié (sinon NotifyArrivalsView spammerait à
+        # nouveau) dans la même transaction
+        with transaction.atomic():
+            Colis.changer_statut_en_masse(colis_qs, "ARRIVE", acteur=request.user)
+            notification_service.enqueue(notifications)
+            Colis.objects.filter(
+                id__in=[c.id for data in by_client.values() for c in data["colis"]]
+            ).update(whatsapp_notified=True)
 
         if request.headers.get("HX-Request"):
             from django.http import HttpResponse
@@ -1268,9 +1088,9 @@ class NotifyArrivalsView(LoginRequiredMixin, AdminMaliRequiredMixin, View):
                 by_client[c.client.id] = {"user": c.client.user, "colis": []}
             by_client[c.client.id]["colis"].append(c)
 
-        count_clients = 0
-        from notification.tasks import send_notification_async
+        from notification.services.notification_service import notification_service
 
+        notifications = []
         for cid, data in by_client.items():
             user = data["user"]
             colis_list = data["colis"]
@@ -1301,21 +1121,24 @@ class NotifyArrivalsView(LoginRequiredMixin, AdminMaliRequiredMixin, View):
                 f"*\u00c9quipe TS AIR CARGO* 🇨🇳 🇲🇱 🇨🇮"
             )
 
-            send_notification_async.delay(
-                user_id=user.id,
-                message=message,
-                categorie="colis_arrive",
-                titre=f"{'Colis arrivé' if nb == 1 else f'{nb} colis arrivés'} — {fmt_total} FCFA à régler",
-                region="mali",
+            notifications.append(
+                notification_service.build_notification(
+                    destinataire=user,
+                    message=message,
+                    categorie="colis_arrive",
+                    titre=f"{'Colis arrivé' if nb == 1 else f'{nb} colis arrivés'} — {fmt_total} FCFA à régler",
+                    region="mali",
+                )
             )
 
-            # Marquer comme notifié
-            lot.colis.filter(id__in=[c.id for c in colis_list]).update(
-                whatsapp_notified=True
-            )
-            count_clients += 1
+        # Mise en file et marquage notifié dans la même transaction
+        with transaction.atomic():
+            notification_service.enqueue(notifications)
+            lot.colis.filter(
+                id__in=[c.id for data in by_client.values() for c in data["colis"]]
+            ).update(whatsapp_notified=True)
 
-        messages.success(request, f"Notifications envoyées à {count_clients} clients.")
+        messages.success(request, f"Notifications envoyées à {len(notifications)} clients.")
         return redirect("mali:lot_transit_detail", pk=pk)
 
 
@@ -1401,30 +1224,29 @@ class ColisLivreView(LoginRequiredMixin, DestinationAgentRequiredMixin, View):
                 request.POST.get("date_encaissement") or timezone.now().date()
             )
 
-        colis.save()
-
-        # Création de l'encaissement si un montant a été versé
-        new_paid = (
-            (colis.prix_final or 0)
-            - (colis.montant_jc or 0)
-            - (colis.reste_a_payer or 0)
-        )
-        amount_paid = new_paid - old_paid
-
-        if amount_paid > 0 and not colis.paye_en_chine:
-            EncaissementColis.objects.create(
-                colis=colis,
-                montant=amount_paid,
-                date=colis.date_encaissement or timezone.now().date(),
-                methode=colis.mode_paiement or "ESPECE",
-                enregistre_par=request.user,
-            )
+        # Livraison, encaissement et notification (outbox) dans la même transaction
+        with transaction.atomic():
+            colis.save()
 
-        # Notification... (unchanged logic)
+            # Création de l'encaissement si un montant a été versé
+            new_paid = (
+                (colis.prix_final or 0)
+                - (colis.montant_jc or 0)
+                - (colis.reste_a_payer or 0)
+            )
+            amount_paid = new_paid - old_paid
+
+            if amount_paid > 0 and not colis.paye_en_chine:
+                EncaissementColis.objects.create(
+                    colis=colis,
+                    montant=amount_paid,
+                    date=colis.date_encaissement or timezone.now().date(),
+                    methode=colis.mode_paiement or "ESPECE",
+                    enregistre_par=request.user,
+                )
 
-        # Notification Livraison (Async)
-        try:
-            from notification.tasks import send_notification_async
+            # Notification Livraison (Async)
+            from notification.services.notification_service import notification_service
 
             if colis.client and colis.client.user:
                 nom_livre = (
@@ -1440,17 +1262,13 @@ class ColisLivreView(LoginRequiredMixin, DestinationAgentRequiredMixin, View):
                     f"\u2014\u2014\n"
                     f"*\u00c9quipe TS AIR CARGO* 🇨🇳 🇲🇱 🇨🇮"
                 )
-                send_notification_async.delay(
-                    user_id=colis.client.user.id,
+                notification_service.send_notification(
+                    destinataire=colis.client.user,
                     message=message,
                     categorie="colis_livre",
                     titre=f"Livraison effectuée - {colis.reference}",
                     region="mali",
                 )
-        except Exception as e:
-            from chine.views import logger
-
-            logger.error(f"Erreur trigger notification livraison {colis.id}: {e}")
 
         if request.headers.get("HX-Request"):
             from django.shortcuts import render
@@ -1570,23 +1388,15 @@ class ColisLivreBulkView(LoginRequiredMixin, DestinationAgentRequiredMixin, View
                     if date_encaissement:
                         c.date_encaissement = date_encaissement
 
-        Colis.objects.bulk_update(
-            colis_list,
-            [
-                "status",
-                "mode_livraison",
-                "est_paye",
-                "reste_a_payer",
-                "mode_paiement",
-                "infos_recepteur",
-                "date_livraison",
-                "date_encaissement",
-            ],
-        )
-
         # Création des encaissements en masse
         encaissements_to_create = []
+        events = []
         for c in colis_list:
+            events.append(
+                ColisEvent.transition(
+                    c, "ARRIVE", acteur=request.user, destination_id=lot.destination_id
+                )
+            )
             new_paid = (
                 (c.prix_final or 0) - (c.montant_jc or 0) - (c.reste_a_payer or 0)
             )
@@ -1601,14 +1411,17 @@ class ColisLivreBulkView(LoginRequiredMixin, DestinationAgentRequiredMixin, View
                         enregistre_par=request.user,
                     )
                 )
-
-        if encaissements_to_create:
-            EncaissementColis.objects.bulk_create(encaissements_to_create)
+                events.append(
+                    ColisEvent.paiement(
+                        c, diff, acteur=request.user, destination_id=lot.destination_id
+                    )
+                )
 
         # Grouper les notifications
-        from notification.tasks import send_notification_async
+        from notification.services.notification_service import notification_service
 
         by_client = {}
+        notifications = []
         for c in colis_list:
             if not c.client or not c.client.user:
                 continue
@@ -1644,16 +1457,38 @@ class ColisLivreBulkView(LoginRequiredMixin, DestinationAgentRequiredMixin, View
                 f"*\u00c9quipe TS AIR CARGO* 🇨🇳 🇲🇱 🇨🇮"
             )
 
-            try:
-                send_notification_async.delay(
-                    user_id=user.id,
+            notifications.append(
+                notification_service.build_notification(
+                    destinataire=user,
                     message=message,
                     categorie="colis_livre",
                     titre=f"Livraison effectuée - {nb} colis",
                     region="mali",
                 )
-            except Exception as e:
-                logger.error(f"Erreur notif bulk livraison lot {lot.pk}: {e}")
+            )
+
+        # Livraisons, encaissements et notifications (outbox) dans la même transaction
+        with transaction.atomic():
+            Colis.bulk_update_suivi(
+                colis_list,
+                [
+                    "status",
+                    "mode_livraison",
+                    "est_paye",
+                    "reste_a_payer",
+                    "mode_paiement",
+                    "infos_recepteur",
+                    "date_livraison",
+                    "date_encaissement",
+                ],
+                events=events,
+            )
+            if encaissements_to_create:
+                EncaissementColis.objects.bulk_create(encaissements_to_create)
+                patcher_encaissements(
+                    {(e.colis_id, e.date) for e in encaissements_to_create}
+                )
+            notification_service.enqueue(notifications)
 
         if request.headers.get("HX-Request"):
             import json
@@ -1692,7 +1527,7 @@ class ColisSortieBulkView(LoginRequiredMixin, DestinationAgentRequiredMixin, Vie
             c.est_paye = False
             c.reste_a_payer = max(0, (c.prix_final or 0) - (c.montant_jc or 0))
 
-        Colis.objects.bulk_update(
+        Colis.bulk_update_suivi(
             colis_list,
             [
                 "status",
@@ -1702,6 +1537,12 @@ class ColisSortieBulkView(LoginRequiredMixin, DestinationAgentRequiredMixin, Vie
                 "est_paye",
                 "reste_a_payer",
             ],
+            events=[
+                ColisEvent.transition(
+                    c, "ARRIVE", acteur=request.user, destination_id=lot.destination_id
+                )
+                for c in colis_list
+            ],
         )
 
         if request.headers.get("HX-Request"):
@@ -1772,8 +1613,7 @@ class ColisAttentePaiementView(
 
         query = self.request.GET.get("q")
         if query:
-            # (Recherche multi-mots gérée par le reste du code)
-            queryset = apply_flexible_search(queryset, query)
+            queryset = rechercher(queryset, query)
 
         return queryset
 
@@ -1844,14 +1684,17 @@ class ColisEncaissementBulkView(
 
         colis_qs = Colis.objects.filter(
             id__in=colis_ids, status="LIVRE", est_paye=False
-        )
+        ).select_related("lot")
         colis_list = list(colis_qs)
 
         now = timezone.now()
         encaissements_to_create = []
+        events = []
         for c in colis_list:
             # Montant payé = ce qui restait à payer
             amount_paid = c.reste_a_payer or 0
+            if amount_paid > 0:
+                events.append(ColisEvent.paiement(c, amount_paid, acteur=request.user))
 
             c.est_paye = True
             c.reste_a_payer = 0
@@ -1859,7 +1702,7 @@ class ColisEncaissementBulkView(
             c.date_encaissement = date_encaissement
             c.updated_at = timezone.now()
 
-        Colis.objects.bulk_update(
+        Colis.bulk_update_suivi(
             colis_list,
             [
                 "est_paye",
@@ -1868,10 +1711,12 @@ class ColisEncaissementBulkView(
                 "date_encaissement",
                 "updated_at",
             ],
+            events=events,
         )
 
         if encaissements_to_create:
             EncaissementColis.objects.bulk_create(encaissements_to_create)
+            patcher_encaissements({(e.colis_id, e.date) for e in encaissements_to_create})
 
         messages.success(
             request,
@@ -1962,32 +1807,11 @@ class RapportJourPDFView(LoginRequiredMixin, DestinationAgentRequiredMixin, View
 
         if report_type == "global":
             # Solde Veille cumulé (Recettes - Dépenses - Transferts jusqu'à hier)
-            recettes_globales_veille = (
-                EncaissementColis.objects.filter(
-                    colis__lot__destination__code="ML", date__lt=today
-                ).aggregate(total=Sum("montant"))["total"]
-                or 0
-            )
-
-            # Dépenses cumulées Mali uniquement (Exclut indicatif Chine)
-            depenses_globales_veille = (
-                Depense.objects.filter(
-                    pays__code="ML", is_china_indicative=False, date__lt=today
-                ).aggregate(total=Sum("montant"))["total"]
-                or 0
+            solde_veille = solde_caisse_veille(
+                Country.objects.get(code="ML"), today, ENCAISSEMENT
             )
             from report.models import TransfertArgent
 
-            transferts_globaux_veille = (
-                TransfertArgent.objects.filter(
-                    pays_expediteur__code="ML", date__lt=today
-                ).aggregate(total=Sum("montant"))["total"]
-                or 0
-            )
-            solde_veille = recettes_globales_veille - (
-                depenses_globales_veille + transferts_globaux_veille
-            )
-
             # Dépenses Jour Mali uniquement
             total_depenses = (
                 Depense.objects.filter(
@@ -2033,15 +1857,21 @@ class RapportJourPDFView(LoginRequiredMixin, DestinationAgentRequiredMixin, View
             "user": request.user,
         }
 
-        # Génération du PDF avec Playwright
+        # Génération du PDF (tableau simple : moteur natif, sans navigateur)
         from core.utils_pdf import render_to_pdf_playwright
 
         # Vérifier si le template attend 'colis_livres' ou 'colis_list'
         context["colis_livres"] = colis_qs
 
         filename = f"rapport_jour_{report_type}_{today}.pdf"
+        # Journée passée : servie depuis le cache tant que ses données ne changent pas
         return render_to_pdf_playwright(
-            "mali/pdf/rapport_jour.html", context, request, filename=filename
+            "mali/pdf/rapport_jour.html",
+            context,
+            request,
+            filename=filename,
+            cache=today < timezone.now().date(),
+            backend="native",
         )
 
 
@@ -2069,7 +1899,13 @@ class LotTransitPDFView(LoginRequiredMixin, DestinationAgentRequiredMixin, View)
         filename = f"manifeste_lot_{lot.numero}.pdf"
         # Utilisation de l'orientation paysage si nécessaire pour les manifestes (souvent plus large)
         return render_to_pdf_playwright(
-            "mali/pdf/manifeste_lot.html", context, request, filename=filename
+            "mali/pdf/manifeste_lot.html",
+            context,
+            request,
+            filename=filename,
+            cache=True,
+            volatile=("date_impression",),
+            dependances=(f"lot:{lot.pk}",),
         )
 
 
@@ -2127,15 +1963,10 @@ class MaliNotificationListView(
         return queryset
 
     def get_context_data(self, **kwargs):
-        from notification.models import Notification
+        from notification.services.notification_service import notification_service
 
         context = super().get_context_data(**kwargs)
-        context["stats_notif"] = Notification.objects.filter(region="mali").aggregate(
-            total=Count("id"),
-            envoye=Count("id", filter=Q(statut="envoye")),
-            echec=Count("id", filter=Q(statut="echec")),
-            echec_permanent=Count("id", filter=Q(statut="echec_permanent")),
-        )
+        context["stats_notif"] = notification_service.stats_region("mali")
         return context
 
     def post(self, request, *args, **kwargs):
@@ -2348,20 +2179,23 @@ class MaliClientLotTarifCreateView(AdminMaliRequiredMixin, CreateView):
             form.instance.destination = self.request.user.country
             tarif = form.save()
 
-        # Recalculer les prix de TOUS les colis du client vers CETTE destination
+        # Recalculer les prix de TOUS les colis du client vers CETTE destination (en arrière-plan)
         from core.models import Colis
+        from core.tasks import lancer_recalcul_prix
 
-        colis_list = Colis.objects.filter(
+        count = Colis.objects.filter(
             client=tarif.client, lot__destination=tarif.destination
+        ).count()
+        lancer_recalcul_prix(
+            self.request.user,
+            self.request.user.country,
+            destination_id=tarif.destination_id,
+            client_id=tarif.client_id,
         )
-        count = colis_list.count()
-        for colis in colis_list:
-            colis.recalculate_prices()
-            colis.save()
 
         messages.success(
             self.request,
-            f"Le tarif GLOBAL de {tarif.prix_kilo} FCFA/kg a été appliqué aux {count} colis de {tarif.client} dans le système.",
+            f"Le tarif GLOBAL de {tarif.prix_kilo} FCFA/kg est en cours d'application aux {count} colis de {tarif.client} dans le système.",
         )
         # Redirection vers la même page pour voir la liste mise à jour
         return redirect("mali:admin_client_lot_tarif", lot_pk=self.lot.pk)
@@ -2391,14 +2225,14 @@ class MaliClientLotTarifDeleteView(AdminMaliRequiredMixin, View):
         tarif.delete()
 
         # Recalculer les prix pour ce client dans TOUT le système (reviendra au tarif standard)
-        from core.models import Colis
+        from core.tasks import lancer_recalcul_prix
 
-        colis_list = Colis.objects.filter(
-            client=client, lot__destination=request.user.country
+        lancer_recalcul_prix(
+            request.user,
+            request.user.country,
+            destination_id=request.user.country.pk,
+            client_id=client.pk,
         )
-        for colis in colis_list:
-            colis.recalculate_prices()
-            colis.save()
 
         messages.warning(
             request,
@@ -2674,7 +2508,7 @@ class MaliCorrectionLotListView(AdminMaliRequiredMixin, ListView):
         )
         search = self.request.GET.get("q")
         if search:
-            qs = qs.filter(numero__icontains=search)
+            qs = rechercher(qs, search)
         tab = self.request.GET.get("tab", "arrive")
         if tab == "transit":
             qs = qs.filter(colis__status="EXPEDIE").distinct()
@@ -2693,7 +2527,7 @@ class MaliCorrectionLotListView(AdminMaliRequiredMixin, ListView):
         qs_base = Lot.objects.filter(destination=mali)
         search = self.request.GET.get("q")
         if search:
-            qs_base = qs_base.filter(numero__icontains=search)
+            qs_base = rechercher(qs_base, search)
         context["count_transit"] = (
             qs_base.filter(colis__status="EXPEDIE").distinct().count()
         )
@@ -2730,9 +2564,7 @@ class MaliCorrectionLotDetailView(AdminMaliRequiredMixin, DetailView):
 
         search = self.request.GET.get("q")
         if search:
-            colis_qs = apply_flexible_search(
-                colis_qs, search, ["reference", "client__nom", "client__telephone"]
-            )
+            colis_qs = rechercher(colis_qs, search)
 
         from django.core.paginator import Paginator
 
@@ -2761,27 +2593,25 @@ class MaliActionRevertView(AdminMaliRequiredMixin, View):
             colis.montant_jc = 0
             colis.sortie_sous_garantie = False
             colis.sortie_autorisee_par = ""
-            colis.save()
+            # Correction et notification d'excuse (outbox) dans la même transaction
+            with transaction.atomic():
+                colis.save()
 
-            # Notification d'excuse
-            if colis.client and colis.client.user:
-                try:
-                    from notification.tasks import send_notification_async
+                if colis.client and colis.client.user:
+                    from notification.services.notification_service import notification_service
 
                     message = (
                         f"Cher client, une erreur s'est glissée dans le suivi de votre colis {colis.reference}. "
                         "Il n'est pas encore arrivé. Nous vous prions de nous excuser. "
                         "Vous recevrez une nouvelle notification dès qu'il sera disponible."
                     )
-                    send_notification_async.delay(
-                        user_id=colis.client.user.id,
+                    notification_service.send_notification(
+                        destinataire=colis.client.user,
                         message=message,
                         categorie="autre",
                         titre=f"Correction Suivi - {colis.reference}",
                         region="mali",
                     )
-                except Exception:
-                    pass
 
             messages.success(
                 request, f"Le carton {colis.reference} est repassé en TRANSIT."
@@ -2797,27 +2627,25 @@ class MaliActionRevertView(AdminMaliRequiredMixin, View):
             colis.montant_jc = 0
             colis.sortie_sous_garantie = False
             colis.sortie_autorisee_par = ""
-            colis.save()
+            # Correction et notification d'excuse (outbox) dans la même transaction
+            with transaction.atomic():
+                colis.save()
 
-            # Notification d'excuse
-            if colis.client and colis.client.user:
-                try:
-                    from notification.tasks import send_notification_async
+                if colis.client and colis.client.user:
+                    from notification.services.notification_service import notification_service
 
                     message = (
                         f"Cher client, une erreur s'est glissée dans le suivi de votre colis {colis.reference}. "
                         "Celui-ci est marqué comme 'Non Livré' pour correction. "
                         "Nous vous prions de nous excuser pour ce désagrément."
                     )
-                    send_notification_async.delay(
-                        user_id=colis.client.user.id,
+                    notification_service.send_notification(
+                        destinataire=colis.client.user,
                         message=message,
                         categorie="autre",
                         titre=f"Correction Livraison - {colis.reference}",
                         region="mali",
                     )
-                except Exception:
-                    pass
 
             messages.warning(
                 request,
@@ -2891,19 +2719,21 @@ class MaliColisAddToArrivalView(AdminMaliRequiredMixin, View):
                 except Exception:
                     pass
 
-            colis.save()
+            # Ajout du colis et notification (outbox) dans la même transaction
+            with transaction.atomic():
+                colis.save()
 
-            # Si un prix final est saisi manuellement, on l'utilise (après le save pour éviter l'écrasement auto)
-            if data.get("prix_final"):
-                colis.prix_final = data["prix_final"]
-                colis.prix_transport = data["prix_final"]
-                Colis.objects.filter(pk=colis.pk).update(
-                    prix_final=colis.prix_final, prix_transport=colis.prix_transport
-                )
+                # Si un prix final est saisi manuellement, on l'utilise (après le save pour éviter l'écrasement auto)
+                if data.get("prix_final"):
+                    colis.prix_final = data["prix_final"]
+                    colis.prix_transport = data["prix_final"]
+                    Colis.objects.filter(pk=colis.pk).update(
+                        prix_final=colis.prix_final, prix_transport=colis.prix_transport
+                    )
+                    LotStats.recalculer([colis.lot_id])
 
-            # Essaie d'envoyer la notification WhatsApp si configurée
-            try:
-                from notification.tasks import send_notification_async
+                # Notification WhatsApp si configurée
+                from notification.services.notification_service import notification_service
 
                 if colis.client and colis.client.user:
                     message = (
@@ -2913,15 +2743,13 @@ class MaliColisAddToArrivalView(AdminMaliRequiredMixin, View):
                         "Vous pouvez passer le récupérer à l'agence."
                     )
 
-                    send_notification_async.delay(
-                        user_id=colis.client.user.id,
+                    notification_service.send_notification(
+                        destinataire=colis.client.user,
                         message=message,
                         categorie="lot_arrive",
                         titre=f"Arrivée Colis {colis.reference}",
                         region="mali",
                     )
-            except Exception:
-                pass  # Notification non bloquante
 
             messages.success(
                 request,
@@ -2951,10 +2779,11 @@ class MaliCalculatePriceView(LoginRequiredMixin, AdminMaliRequiredMixin, View):
             return JsonResponse({'error': 'Paramètres manquants'}, status=400)
 
         try:
-            from core.models import Client, Lot, Colis
+            from core.models import Lot, Colis
             from decimal import Decimal
-            client = Client.objects.get(pk=client_id)
-            lot = Lot.objects.get(pk=lot_id)
+            # Seuls la destination et le transport du lot sont utiles : les tarifs
+            # viennent de l'index en mémoire (aucune requête pour le calcul)
+            lot = Lot.objects.only("destination_id", "type_transport").get(pk=lot_id)
             
             # Conversion sécurisée (évite erreurs si virgule ou vide) - Utilise Decimal pour éviter TypeError avec les modèles
             try:
@@ -2967,7 +2796,7 @@ class MaliCalculatePriceView(LoginRequiredMixin, AdminMaliRequiredMixin, View):
                 n_val = 1
 
             temp_colis = Colis(
-                client=client,
+                client_id=int(client_id),
                 lot=lot,
                 type_colis=type_colis,
                 poids=p_val,
@@ -0,0 +1,69 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils import timezone
+from notification.models import NotificationArchive
+from notification.services import archive
+
+
+def _date(valeur, fin=False):
+    """'2026-03-02' ou '2026-03-02T14:00' -> datetime (fin de journée si fin=True)."""
+    moment = parse_datetime(valeur)
+    if moment is None:
+        jour = parse_date(valeur)
+        if jour is None:
+            raise CommandError(f"Date invalide : {valeur}")
+        moment = timezone.datetime.combine(
+            jour, timezone.datetime.max.time() if fin else timezone.datetime.min.time()
+        )
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+class Command(BaseCommand):
+    help = (
+        "Consulte les archives de notifications (gzip JSONL) : liste des fichiers, "
+        "recherche, restauration dans la table Notification"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["liste", "recherche", "restaure"])
+        parser.add_argument("--telephone", help="Numéro destinataire (tel qu'enregistré)")
+        parser.add_argument("--destinataire", type=int, help="ID de l'utilisateur destinataire")
+        parser.add_argument("--depuis", help="Date de création min (AAAA-MM-JJ[THH:MM])")
+        parser.add_argument("--jusqua", help="Date de création max (AAAA-MM-JJ[THH:MM])")
+        parser.add_argument("--id", type=int, nargs="+", dest="ids", help="ID des notifications")
+        parser.add_argument("--limite", type=int, default=100, help="Résultats affichés (recherche)")
+
+    def handle(self, *args, **options):
+        if options["action"] == "liste":
+            for manifeste in NotificationArchive.objects.all():
+                self.stdout.write(
+                    f"{manifeste.fichier}  {manifeste.nombre} notifications  "
+                    f"#{manifeste.premier_id}-#{manifeste.dernier_id}  "
+                    f"{manifeste.date_min:%Y-%m-%d} → {manifeste.date_max:%Y-%m-%d}  "
+                    f"{manifeste.taille / 1024:.0f} Ko"
+                )
+            return
+
+        criteres = {
+            "telephone": options["telephone"],
+            "destinataire_id": options["destinataire"],
+            "depuis": _date(options["depuis"]) if options["depuis"] else None,
+            "jusqua": _date(options["jusqua"], fin=True) if options["jusqua"] else None,
+            "ids": options["ids"],
+        }
+        if not any(criteres.values()):
+            raise CommandError("Indiquez au moins un critère (--telephone, --id, --depuis...)")
+        notifications = archive.rechercher(**criteres)
+
+        if options["action"] == "restaure":
+            count = archive.restaurer(notifications)
+            self.stdout.write(self.style.SUCCESS(f"Succès : {count} notifications restaurées."))
+            return
+
+        for i, notification in enumerate(notifications):
+            if i >= options["limite"]:
+                self.stdout.write(f"... (limite de {options['limite']} résultats atteinte)")
+                break
+            self.stdout.write(json.dumps(notification, ensure_ascii=False))
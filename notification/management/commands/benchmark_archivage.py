@@ -0,0 +1,76 @@
+import tempfile
+import time
+
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from notification.models import Notification, NotificationArchive
+from notification.services import archive
+
+TITRE = "benchmark-archivage"
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le débit de l'archivage (lecture par plages, gzip JSONL, suppression "
+        "par lots) face à un DELETE unique, sur des notifications factices "
+        "(archives écrites dans un répertoire temporaire)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lignes", type=int, default=1_000_000)
+        parser.add_argument("--par-fichier", type=int)
+        parser.add_argument("--taille-suppression", type=int)
+
+    def _remplir(self, lignes):
+        anciennete = timezone.now() - timezone.timedelta(days=400)
+        lot = []
+        for i in range(lignes):
+            lot.append(
+                Notification(
+                    telephone_destinataire=f"+223760{i % 100000:05d}",
+                    titre=TITRE,
+                    message=f"Votre colis TS-{i} est arrivé. Merci de passer le récupérer.",
+                    statut="envoye",
+                    region="mali",
+                )
+            )
+            if len(lot) == 5_000:
+                Notification.objects.bulk_create(lot)
+                lot = []
+        Notification.objects.bulk_create(lot)
+        Notification.objects.filter(titre=TITRE).update(date_creation=anciennete)
+
+    def handle(self, *args, **options):
+        lignes = options["lignes"]
+        avant = timezone.now() - timezone.timedelta(days=365)
+        factices = Notification.objects.filter(titre=TITRE)
+
+        self._remplir(lignes)
+        debut = time.perf_counter()
+        supprimees, _ = factices.filter(date_creation__lte=avant).delete()
+        duree = time.perf_counter() - debut
+        self.stdout.write(
+            f"{'DELETE unique':<22} {supprimees} lignes en {duree:.2f}s "
+            f"-> {supprimees / duree:.0f} lignes/s"
+        )
+
+        self._remplir(lignes)
+        with tempfile.TemporaryDirectory() as repertoire:
+            debut = time.perf_counter()
+            manifestes = archive.archiver(
+                avant,
+                queryset=factices,
+                par_fichier=options["par_fichier"],
+                taille_suppression=options["taille_suppression"],
+                storage=FileSystemStorage(location=repertoire),
+            )
+            duree = time.perf_counter() - debut
+        archivees = sum(m.nombre for m in manifestes)
+        taille = sum(m.taille for m in manifestes)
+        self.stdout.write(
+            f"{'Archivage par lots':<22} {archivees} lignes en {duree:.2f}s "
+            f"-> {archivees / duree:.0f} lignes/s ({len(manifestes)} fichiers, "
+            f"{taille / 1024 / 1024:.1f} Mo compressés)"
+        )
+        NotificationArchive.objects.filter(pk__in=[m.pk for m in manifestes]).delete()
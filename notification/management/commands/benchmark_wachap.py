@@ -0,0 +1,56 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from notification.services.wachap_service import WaChapService
+from notification.wachap_stub import WaChapStubServer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le débit (messages/seconde) de la boucle d'envoi séquentielle et de "
+        "WaChapService.send_many, contre un serveur WaChap bouchon local"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=200)
+        parser.add_argument(
+            "--latence", type=float, default=0.05, help="Latence simulée de l'API (s)"
+        )
+        parser.add_argument(
+            "--concurrence",
+            type=int,
+            default=WaChapService.CONCURRENCY_PER_ACCOUNT,
+            help="Envois simultanés par compte pour send_many",
+        )
+
+    def handle(self, *args, **options):
+        logging.getLogger("notification.services.wachap_service").setLevel(logging.WARNING)
+        regions = ["mali", "cote_divoire", "chine"]
+        messages = [
+            {
+                "phone": f"+223760{i:05d}",
+                "message": f"Message {i}",
+                "region": regions[i % len(regions)],
+            }
+            for i in range(options["messages"])
+        ]
+
+        for libelle, envoyer in (
+            ("Boucle séquentielle", lambda s: [s.send_message_with_type(**m) for m in messages]),
+            (
+                "send_many",
+                lambda s: s.send_many(messages, concurrency=options["concurrence"]),
+            ),
+        ):
+            with WaChapStubServer(latency=options["latence"]) as stub:
+                service = WaChapService(base_url=stub.url, config=stub.config())
+                debut = time.perf_counter()
+                resultats = envoyer(service)
+                duree = time.perf_counter() - debut
+                ok = sum(1 for success, _msg, _id in resultats if success)
+                self.stdout.write(
+                    f"{libelle:<20} {ok}/{len(messages)} envoyés en {duree:.2f}s "
+                    f"-> {len(messages) / duree:.1f} msg/s "
+                    f"({stub.connections} connexions TCP)"
+                )
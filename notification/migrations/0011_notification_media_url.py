@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 03:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0010_notification_region_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='media_url',
+            field=models.URLField(blank=True, max_length=500, verbose_name='Image jointe'),
+        ),
+    ]
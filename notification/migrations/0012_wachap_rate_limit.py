@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-17 04:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0011_notification_media_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configurationnotification',
+            name='wachap_messages_par_minute',
+            field=models.PositiveIntegerField(default=20, help_text="Débit soutenu maximum d'un compte WaChap (0 = illimité)", verbose_name='Messages par minute et par compte'),
+        ),
+        migrations.AddField(
+            model_name='configurationnotification',
+            name='wachap_rafale_max',
+            field=models.PositiveIntegerField(default=5, help_text="Nombre de messages envoyables d'un coup avant d'appliquer le débit", verbose_name='Rafale maximum'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-17 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0012_wachap_rate_limit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WhatsAppRegistration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('telephone', models.CharField(max_length=20, unique=True, verbose_name='Téléphone (E.164)')),
+                ('is_on_whatsapp', models.BooleanField(verbose_name='Inscrit sur WhatsApp')),
+                ('checked_at', models.DateTimeField(verbose_name='Vérifié le')),
+            ],
+            options={
+                'verbose_name': 'Inscription WhatsApp',
+                'verbose_name_plural': 'Inscriptions WhatsApp',
+            },
+        ),
+    ]
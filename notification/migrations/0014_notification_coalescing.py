@@ -0,0 +1,50 @@
+# Generated by Django 5.2 on 2026-10-17 04:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0037_telephone_e164_unique'),
+        ('notification', '0013_whatsappregistration'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='configurationnotification',
+            name='fenetre_regroupement_minutes',
+            field=models.PositiveIntegerField(default=10, help_text="Les notifications de suivi d'un client reçues dans cette fenêtre sont envoyées en un seul récapitulatif (0 = désactivé)", verbose_name='Fenêtre de regroupement (minutes)'),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='categorie',
+            field=models.CharField(choices=[('colis_recu', 'Colis Reçu (Chine)'), ('lot_expedie', 'Lot Expédié'), ('lot_arrive', 'Lot Arrivé'), ('colis_livre', 'Colis Livré'), ('rappel_colis', 'Rappel Colis'), ('recapitulatif', 'Récapitulatif de suivi'), ('rapport_journalier', 'Rapport Journalier Mali'), ('otp', 'Code OTP'), ('alerte_admin', 'Alerte Admin'), ('alerte_dev', 'Alerte Développeur'), ('autre', 'Autre')], default='autre', max_length=50),
+        ),
+        migrations.CreateModel(
+            name='NotificationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('famille', models.CharField(max_length=20)),
+                ('region', models.CharField(blank=True, max_length=50, null=True, verbose_name='Région WaChap')),
+                ('categorie', models.CharField(max_length=50)),
+                ('titre', models.CharField(blank=True, max_length=200)),
+                ('message', models.TextField()),
+                ('telephone_destinataire', models.CharField(blank=True, max_length=20)),
+                ('email_destinataire', models.EmailField(blank=True, max_length=254)),
+                ('date_creation', models.DateTimeField(default=django.utils.timezone.now)),
+                ('envoyer_apres', models.DateTimeField()),
+                ('colis', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.colis')),
+                ('destinataire', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_events', to=settings.AUTH_USER_MODEL)),
+                ('lot', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.lot')),
+            ],
+            options={
+                'ordering': ['date_creation'],
+                'indexes': [models.Index(fields=['envoyer_apres'], name='notificatio_envoyer_c3bddd_idx')],
+            },
+        ),
+    ]
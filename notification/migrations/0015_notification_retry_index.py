@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-17 04:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0037_telephone_e164_unique'),
+        ('notification', '0014_notification_coalescing'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['statut', 'prochaine_tentative', 'region'], name='notificatio_statut_b7f009_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-17 04:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0015_notification_retry_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fichier', models.CharField(max_length=255, unique=True)),
+                ('nombre', models.PositiveIntegerField(verbose_name='Notifications archivées')),
+                ('premier_id', models.BigIntegerField()),
+                ('dernier_id', models.BigIntegerField()),
+                ('date_min', models.DateTimeField(verbose_name='Création la plus ancienne')),
+                ('date_max', models.DateTimeField(verbose_name='Création la plus récente')),
+                ('taille', models.PositiveBigIntegerField(verbose_name='Taille (octets)')),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Archive de notifications',
+                'verbose_name_plural': 'Archives de notifications',
+                'ordering': ['premier_id'],
+            },
+        ),
+    ]
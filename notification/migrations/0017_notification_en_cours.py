@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 04:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0016_notification_archive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='statut',
+            field=models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', "En cours d'envoi"), ('envoye', 'Envoyé'), ('echec', 'Échec'), ('echec_permanent', 'Échec Permanent')], default='en_attente', max_length=20),
+        ),
+    ]
@@ -3,6 +3,8 @@ from django.conf import settings
 from django.utils import timezone
 from django.core.cache import cache
 
+from .services import metrics
+
 
 class ConfigurationNotification(models.Model):
     """
@@ -45,6 +47,25 @@ class ConfigurationNotification(models.Model):
         help_text="Utilisé pour les OTP et alertes administrateur",
     )
 
+    # Limite de débit par compte WaChap (token bucket, services.rate_limiter)
+    wachap_messages_par_minute = models.PositiveIntegerField(
+        "Messages par minute et par compte",
+        default=20,
+        help_text="Débit soutenu maximum d'un compte WaChap (0 = illimité)",
+    )
+    wachap_rafale_max = models.PositiveIntegerField(
+        "Rafale maximum",
+        default=5,
+        help_text="Nombre de messages envoyables d'un coup avant d'appliquer le débit",
+    )
+
+    # Regroupement des notifications de suivi (services.coalescing)
+    fenetre_regroupement_minutes = models.PositiveIntegerField(
+        "Fenêtre de regroupement (minutes)",
+        default=10,
+        help_text="Les notifications de suivi d'un client reçues dans cette fenêtre sont envoyées en un seul récapitulatif (0 = désactivé)",
+    )
+
     # Configuration des rappels
     rappels_actifs = models.BooleanField(
         "Activer les rappels automatiques", default=False
@@ -180,6 +201,7 @@ class Notification(models.Model):
 
     STATUT_CHOICES = [
         ("en_attente", "En attente"),
+        ("en_cours", "En cours d'envoi"),
         ("envoye", "Envoyé"),
         ("echec", "Échec"),
         ("echec_permanent", "Échec Permanent"),
@@ -191,6 +213,7 @@ class Notification(models.Model):
         ("lot_arrive", "Lot Arrivé"),
         ("colis_livre", "Colis Livré"),
         ("rappel_colis", "Rappel Colis"),
+        ("recapitulatif", "Récapitulatif de suivi"),
         ("rapport_journalier", "Rapport Journalier Mali"),
         ("otp", "Code OTP"),
         ("alerte_admin", "Alerte Admin"),
@@ -220,6 +243,7 @@ class Notification(models.Model):
     )
     titre = models.CharField(max_length=200, blank=True)
     message = models.TextField()
+    media_url = models.URLField("Image jointe", max_length=500, blank=True)
 
     # Liaison métier (Loose coupling ou FKs si possible)
     # On utilise des FKs nullable pour garder l'intégrité référentielle mais ne pas bloquer si l'app 'chine' change
@@ -258,18 +282,31 @@ class Notification(models.Model):
             models.Index(fields=["categorie"]),
             models.Index(fields=["date_creation"]),
             models.Index(fields=["region"]),
+            # Balayage des relances (retry_failed_notifications_periodic)
+            models.Index(fields=["statut", "prochaine_tentative", "region"]),
         ]
 
     def __str__(self):
         return f"{self.get_type_notification_display()} - {self.destinataire} ({self.get_statut_display()})"
 
-    def marquer_comme_envoye(self, message_id):
+    # Champs modifiés par marquer_comme_envoye / marquer_comme_echec (bulk_update)
+    CHAMPS_ENVOI = [
+        "statut",
+        "message_id_externe",
+        "date_envoi",
+        "erreur_envoi",
+        "prochaine_tentative",
+    ]
+
+    def marquer_comme_envoye(self, message_id, save=True):
         self.statut = "envoye"
-        self.message_id_externe = message_id
+        self.message_id_externe = message_id or ""
         self.date_envoi = timezone.now()
-        self.save()
+        metrics.incrementer(self.region, self.statut)
+        if save:
+            self.save()
 
-    def marquer_comme_echec(self, erreur, erreur_type="temporaire"):
+    def marquer_comme_echec(self, erreur, erreur_type="temporaire", save=True):
         self.erreur_envoi = str(erreur)
         if erreur_type == "permanent" or self.nombre_tentatives >= 5:
             self.statut = "echec_permanent"
@@ -280,4 +317,113 @@ class Notification(models.Model):
             self.prochaine_tentative = timezone.now() + timezone.timedelta(
                 seconds=delay
             )
-        self.save()
+        if self.statut == "echec_permanent":
+            metrics.incrementer(self.region, self.statut)
+        if save:
+            self.save()
+
+
+class WhatsAppRegistration(models.Model):
+    """
+    Cache de l'inscription WhatsApp d'un numéro (/whatsapp/contacts/check),
+    valable REGISTRATION_TTL : évite de revérifier un numéro à chaque échec
+    et permet de ne plus envoyer aux numéros connus comme non inscrits.
+    """
+
+    REGISTRATION_TTL = timezone.timedelta(days=7)
+
+    telephone = models.CharField("Téléphone (E.164)", max_length=20, unique=True)
+    is_on_whatsapp = models.BooleanField("Inscrit sur WhatsApp")
+    checked_at = models.DateTimeField("Vérifié le")
+
+    class Meta:
+        verbose_name = "Inscription WhatsApp"
+        verbose_name_plural = "Inscriptions WhatsApp"
+
+    def __str__(self):
+        return f"{self.telephone} ({'inscrit' if self.is_on_whatsapp else 'non inscrit'})"
+
+    @classmethod
+    def fresh(cls, telephones):
+        """{telephone: is_on_whatsapp} des numéros vérifiés il y a moins de REGISTRATION_TTL."""
+        return dict(
+            cls.objects.filter(
+                telephone__in=set(telephones),
+                checked_at__gte=timezone.now() - cls.REGISTRATION_TTL,
+            ).values_list("telephone", "is_on_whatsapp")
+        )
+
+    @classmethod
+    def store(cls, statuses):
+        """Enregistre {telephone: is_on_whatsapp} (une requête, upsert)."""
+        now = timezone.now()
+        cls.objects.bulk_create(
+            [
+                cls(telephone=telephone, is_on_whatsapp=is_on, checked_at=now)
+                for telephone, is_on in statuses.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["telephone"],
+            update_fields=["is_on_whatsapp", "checked_at"],
+        )
+
+
+class NotificationEvent(models.Model):
+    """
+    Notification de suivi mise en attente de regroupement (services.coalescing) :
+    les événements d'un même client et d'une même famille (expédition, arrivée)
+    sont envoyés ensemble à `envoyer_apres` en un seul message.
+    """
+
+    destinataire = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="notification_events",
+    )
+    famille = models.CharField(max_length=20)
+    region = models.CharField("Région WaChap", max_length=50, blank=True, null=True)
+    categorie = models.CharField(max_length=50)
+    titre = models.CharField(max_length=200, blank=True)
+    message = models.TextField()
+    telephone_destinataire = models.CharField(max_length=20, blank=True)
+    email_destinataire = models.EmailField(blank=True)
+    colis = models.ForeignKey(
+        "core.Colis", on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    lot = models.ForeignKey(
+        "core.Lot", on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    date_creation = models.DateTimeField(default=timezone.now)
+    envoyer_apres = models.DateTimeField()
+
+    class Meta:
+        ordering = ["date_creation"]
+        indexes = [models.Index(fields=["envoyer_apres"])]
+
+    def __str__(self):
+        return f"{self.destinataire} - {self.famille} ({self.titre})"
+
+
+class NotificationArchive(models.Model):
+    """
+    Manifeste d'un fichier d'archive de notifications (services.archive) :
+    un fichier gzip JSONL (une notification par ligne) dans le stockage média,
+    couvrant une plage d'identifiants et de dates de création.
+    """
+
+    fichier = models.CharField(max_length=255, unique=True)
+    nombre = models.PositiveIntegerField("Notifications archivées")
+    premier_id = models.BigIntegerField()
+    dernier_id = models.BigIntegerField()
+    date_min = models.DateTimeField("Création la plus ancienne")
+    date_max = models.DateTimeField("Création la plus récente")
+    taille = models.PositiveBigIntegerField("Taille (octets)")
+    date_creation = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["premier_id"]
+        verbose_name = "Archive de notifications"
+        verbose_name_plural = "Archives de notifications"
+
+    def __str__(self):
+        return f"{self.fichier} ({self.nombre} notifications)"
@@ -7,6 +7,7 @@ from django.core.cache import cache
 from django.core.mail import send_mail, EmailMessage
 from django.core.mail.backends.smtp import EmailBackend
 from ..models import Notification, ConfigurationNotification
+from . import metrics
 from .wachap_service import wachap_service
 
 logger = logging.getLogger(__name__)
@@ -110,22 +111,33 @@ class AlertSystem:
             logger.error(f"Erreur check_and_alert: {e}")
 
     def _check_failure_rate(self):
-        """Vérifie le taux d'échec global des notifications (24h)"""
-        last_24h = timezone.now() - timedelta(days=1)
+        """
+        Vérifie le taux d'échec global des envois (24h glissantes) : part des
+        notifications terminées en échec permanent, les relances en cours ne
+        comptent pas. Lu dans les compteurs par minute (services.metrics) ;
+        repli sur la table si les compteurs sont indisponibles.
+        """
+        stats = metrics.totaux()
+        if stats is not None:
+            total = stats["total"]
+            failed = stats["echec_permanent"]
+        else:
+            last_24h = timezone.now() - timedelta(days=1)
+            terminees = Notification.objects.filter(
+                date_creation__gte=last_24h, statut__in=metrics.STATUTS
+            )
+            total = terminees.count()
+            failed = terminees.filter(statut="echec_permanent").count()
 
-        total = Notification.objects.filter(date_creation__gte=last_24h).count()
         if total < 10:
             return  # Pas assez de données
 
-        failed = Notification.objects.filter(
-            date_creation__gte=last_24h, statut__in=["echec", "echec_permanent"]
-        ).count()
-
         rate = (failed / total) * 100
 
         if rate >= self.FAILURE_RATE_THRESHOLD:
             cache_key = "alert_failure_rate"
-            if not cache.get(cache_key):
+            # cache.add est atomique : un seul worker envoie l'alerte par période
+            if cache.add(cache_key, True, self.ALERT_COOLDOWN_MINUTES * 60):
                 self.send_critical_alert(
                     title="Taux d'échec élevé",
                     message=(
@@ -134,7 +146,6 @@ class AlertSystem:
                     ),
                     alert_type="CRITICAL",
                 )
-                cache.set(cache_key, True, self.ALERT_COOLDOWN_MINUTES * 60)
 
     def send_critical_alert(
         self, title, message, alert_type="CRITICAL", error_details=None
@@ -0,0 +1,209 @@
+"""
+Archivage des anciennes notifications (rétention de la table Notification).
+
+Les notifications terminées plus anciennes que la rétention sont lues par
+plages d'identifiants croissants (.iterator(), mémoire constante), écrites dans
+des fichiers gzip JSONL du stockage média (ARCHIVE_DIR, un fichier par tranche
+de `par_fichier` lignes), chaque fichier est décrit par un manifeste
+NotificationArchive, puis ses lignes sont supprimées par petits lots (une
+transaction courte chacun). Un fichier est toujours enregistré avant que ses
+lignes soient supprimées : une interruption ne perd rien, au pire le
+prochain passage réarchive les lignes restantes dans un nouveau fichier.
+
+    archiver(timezone.now() - timezone.timedelta(days=7))
+    rechercher(telephone="+22376123456")
+    restaurer(rechercher(telephone="+22376123456"))
+"""
+
+import gzip
+import json
+import logging
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Notification, NotificationArchive
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = "notifications/archives"
+STATUTS_ARCHIVES = ("envoye", "echec_permanent")
+LIGNES_PAR_FICHIER = 100_000
+TAILLE_LECTURE = 2_000
+TAILLE_SUPPRESSION = 1_000
+
+CHAMPS = [f.attname for f in Notification._meta.concrete_fields]
+
+
+def archiver(
+    avant,
+    statuts=STATUTS_ARCHIVES,
+    queryset=None,
+    par_fichier=None,
+    taille_suppression=None,
+    storage=None,
+):
+    """
+    Archive puis supprime les notifications `statuts` créées avant `avant`
+    (queryset : restriction supplémentaire). Retourne les manifestes créés.
+    """
+    storage = storage or default_storage
+    par_fichier = par_fichier or LIGNES_PAR_FICHIER
+    taille_suppression = taille_suppression or TAILLE_SUPPRESSION
+    notifications = (queryset if queryset is not None else Notification.objects).filter(
+        statut__in=statuts, date_creation__lte=avant
+    )
+    manifestes = []
+    dernier_id = 0
+    while True:
+        tranche = (
+            notifications.filter(pk__gt=dernier_id)
+            .order_by("pk")
+            .values(*CHAMPS)[:par_fichier]
+        )
+        manifeste, ids = _ecrire_fichier(tranche.iterator(chunk_size=TAILLE_LECTURE), storage)
+        if manifeste is None:
+            break
+        manifestes.append(manifeste)
+        dernier_id = manifeste.dernier_id
+        for i in range(0, len(ids), taille_suppression):
+            with transaction.atomic():
+                Notification.objects.filter(pk__in=ids[i : i + taille_suppression]).delete()
+        logger.info(f"[Archive] {manifeste.nombre} notifications archivées dans {manifeste.fichier}")
+        if manifeste.nombre < par_fichier:
+            break
+    return manifestes
+
+
+def _json(valeur):
+    # Dates en ISO 8601 complet (DjangoJSONEncoder tronque les microsecondes)
+    return valeur.isoformat() if hasattr(valeur, "isoformat") else str(valeur)
+
+
+def _ecrire_fichier(lignes, storage):
+    """Écrit les lignes dans un nouveau fichier d'archive ; (manifeste, ids) ou (None, [])."""
+    ids = []
+    date_min = date_max = None
+    with tempfile.TemporaryFile() as tmp:
+        with gzip.open(tmp, "wt", compresslevel=6, encoding="utf-8") as gz:
+            for ligne in lignes:
+                gz.write(json.dumps(ligne, default=_json, ensure_ascii=False))
+                gz.write("\n")
+                ids.append(ligne["id"])
+                cree = ligne["date_creation"]
+                date_min = cree if date_min is None else min(date_min, cree)
+                date_max = cree if date_max is None else max(date_max, cree)
+        if not ids:
+            return None, []
+        taille = tmp.tell()
+        nom = storage.save(
+            f"{ARCHIVE_DIR}/{timezone.now():%Y/%m}/notifications_{ids[0]}-{ids[-1]}.jsonl.gz",
+            File(tmp),
+        )
+    manifeste = NotificationArchive.objects.create(
+        fichier=nom,
+        nombre=len(ids),
+        premier_id=ids[0],
+        dernier_id=ids[-1],
+        date_min=date_min,
+        date_max=date_max,
+        taille=taille,
+    )
+    return manifeste, ids
+
+
+def lire(manifeste, storage=None):
+    """Itère les notifications (dict, valeurs JSON) d'un fichier d'archive."""
+    storage = storage or default_storage
+    with storage.open(manifeste.fichier, "rb") as fichier:
+        with gzip.open(fichier, "rt", encoding="utf-8") as gz:
+            for ligne in gz:
+                yield json.loads(ligne)
+
+
+def rechercher(
+    telephone=None, destinataire_id=None, depuis=None, jusqua=None, ids=None, storage=None
+):
+    """
+    Itère les notifications archivées correspondant aux critères. Seuls les
+    fichiers dont la plage de dates (manifeste) recoupe [depuis, jusqua] sont lus.
+    """
+    manifestes = NotificationArchive.objects.all()
+    if depuis:
+        manifestes = manifestes.filter(date_max__gte=depuis)
+    if jusqua:
+        manifestes = manifestes.filter(date_min__lte=jusqua)
+    if ids:
+        ids = set(ids)
+        manifestes = manifestes.filter(premier_id__lte=max(ids), dernier_id__gte=min(ids))
+
+    champ_date = Notification._meta.get_field("date_creation")
+    for manifeste in manifestes:
+        for notification in lire(manifeste, storage):
+            if telephone and notification["telephone_destinataire"] != telephone:
+                continue
+            if destinataire_id and notification["destinataire_id"] != destinataire_id:
+                continue
+            if ids and notification["id"] not in ids:
+                continue
+            if depuis or jusqua:
+                cree = champ_date.to_python(notification["date_creation"])
+                if (depuis and cree < depuis) or (jusqua and cree > jusqua):
+                    continue
+            yield notification
+
+
+def restaurer(notifications, taille_lot=TAILLE_LECTURE):
+    """
+    Réinsère des notifications archivées (dicts de rechercher/lire) avec leur
+    identifiant d'origine ; les liens vers un utilisateur, colis ou lot
+    supprimé depuis sont vidés. Retourne le nombre de notifications restaurées.
+    """
+    restaurees = 0
+    lot = []
+    for notification in notifications:
+        lot.append(notification)
+        if len(lot) >= taille_lot:
+            restaurees += _restaurer_lot(lot)
+            lot = []
+    if lot:
+        restaurees += _restaurer_lot(lot)
+    return restaurees
+
+
+def _restaurer_lot(lignes):
+    champs = {f.attname: f for f in Notification._meta.concrete_fields}
+    existants = {}
+    for attname in ("destinataire_id", "colis_id", "lot_id"):
+        modele = champs[attname].related_model
+        valeurs = {ligne[attname] for ligne in lignes if ligne.get(attname)}
+        existants[attname] = set(
+            modele._default_manager.filter(pk__in=valeurs).values_list("pk", flat=True)
+        )
+
+    objets = []
+    for ligne in lignes:
+        valeurs = {
+            attname: champs[attname].to_python(valeur)
+            for attname, valeur in ligne.items()
+            if attname in champs
+        }
+        for attname, pks in existants.items():
+            if valeurs.get(attname) not in pks:
+                valeurs[attname] = None
+        objets.append(Notification(**valeurs))
+
+    deja = set(
+        Notification.objects.filter(pk__in=[o.pk for o in objets]).values_list("pk", flat=True)
+    )
+    objets = [o for o in objets if o.pk not in deja]
+    dates = {o.pk: o.date_creation for o in objets}
+    Notification.objects.bulk_create(objets)
+    # auto_now_add a remplacé date_creation à l'insertion : dates d'origine
+    for objet in objets:
+        objet.date_creation = dates[objet.pk]
+    Notification.objects.bulk_update(objets, ["date_creation"])
+    return len(objets)
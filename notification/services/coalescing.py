@@ -0,0 +1,162 @@
+"""
+Regroupement des notifications de suivi par client.
+
+Un client dont les colis sont répartis sur plusieurs lots recevait un message
+par événement (colis réceptionné, lot fermé, expédié, arrivé, livré...).
+Les notifications de ces catégories ne partent plus directement : elles sont
+mises en attente (NotificationEvent) par (client, famille, région) pendant
+`fenetre_regroupement_minutes` à compter du premier événement. À l'échéance,
+flush() envoie l'événement seul tel quel, ou un récapitulatif unique
+listant les titres de tous les événements de la fenêtre.
+"""
+
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from ..models import ConfigurationNotification, Notification, NotificationEvent
+
+# Catégorie -> famille de regroupement
+FAMILLES = {
+    "colis_recu": "expedition",
+    "lot_ferme": "expedition",
+    "lot_expedie": "expedition",
+    "lot_arrive": "arrivee",
+    "colis_arrive": "arrivee",
+    "colis_livre": "arrivee",
+}
+
+ENTETES = {
+    "expedition": "📦 *{nb} nouvelles de vos colis en Chine*",
+    "arrivee": "📍 *{nb} nouvelles de vos colis à destination*",
+}
+
+RECAPITULATIF = (
+    "Bonjour *{nom}*,\n\n"
+    "{entete}\n\n"
+    "{lignes}\n\n"
+    "🌐 Détails et suivi de vos colis : https://ts-aircargo.com/login\n"
+    "——\n"
+    "*Équipe TS AIR CARGO* 🇨🇳 🇲🇱 🇨🇮"
+)
+
+
+def window_minutes():
+    return ConfigurationNotification.get_solo().fenetre_regroupement_minutes
+
+
+def buffer(notifications, now=None):
+    """
+    Met en attente de regroupement les notifications de suivi et retourne
+    celles à envoyer immédiatement (autres catégories, images, regroupement
+    désactivé). Retourne aussi le délai (secondes) avant la prochaine échéance,
+    ou None si rien n'a été mis en attente.
+    """
+    regroupables = [
+        n
+        for n in notifications
+        if n.categorie in FAMILLES and n.destinataire_id and not n.media_url
+    ]
+    fenetre = window_minutes() if regroupables else 0
+    if not fenetre:
+        return notifications, None
+
+    now = now or timezone.now()
+    # Fenêtres déjà ouvertes : les nouveaux événements partent avec elles
+    ouvertes = {
+        (e["destinataire_id"], e["famille"], e["region"]): e["envoyer_apres"]
+        for e in NotificationEvent.objects.filter(
+            destinataire_id__in={n.destinataire_id for n in regroupables},
+            envoyer_apres__gt=now,
+        )
+        .values("destinataire_id", "famille", "region")
+        .annotate(envoyer_apres=Min("envoyer_apres"))
+    }
+    events = []
+    for n in regroupables:
+        cle = (n.destinataire_id, FAMILLES[n.categorie], n.region)
+        envoyer_apres = ouvertes.setdefault(cle, now + timezone.timedelta(minutes=fenetre))
+        events.append(
+            NotificationEvent(
+                destinataire_id=n.destinataire_id,
+                famille=cle[1],
+                region=n.region,
+                categorie=n.categorie,
+                titre=n.titre,
+                message=n.message,
+                telephone_destinataire=n.telephone_destinataire,
+                email_destinataire=n.email_destinataire,
+                colis=n.colis,
+                lot=n.lot,
+                date_creation=now,
+                envoyer_apres=envoyer_apres,
+            )
+        )
+    NotificationEvent.objects.bulk_create(events, batch_size=500)
+
+    mis_en_attente = {id(n) for n in regroupables}
+    immediates = [n for n in notifications if id(n) not in mis_en_attente]
+    prochaine = min(e.envoyer_apres for e in events)
+    return immediates, max(0, (prochaine - now).total_seconds())
+
+
+def render(events):
+    """Notification (non enregistrée) regroupant les événements d'un client."""
+    premier = events[0]
+    if len(events) == 1:
+        return Notification(
+            destinataire=premier.destinataire,
+            telephone_destinataire=premier.telephone_destinataire,
+            email_destinataire=premier.email_destinataire,
+            message=premier.message,
+            categorie=premier.categorie,
+            titre=premier.titre,
+            region=premier.region,
+            colis=premier.colis,
+            lot=premier.lot,
+        )
+
+    user = premier.destinataire
+    message = RECAPITULATIF.format(
+        nom=user.get_full_name() or user.username,
+        entete=ENTETES[premier.famille].format(nb=len(events)),
+        lignes="\n".join(f"   • {e.titre or e.message.splitlines()[0]}" for e in events),
+    )
+    return Notification(
+        destinataire=user,
+        telephone_destinataire=events[-1].telephone_destinataire,
+        email_destinataire=events[-1].email_destinataire,
+        message=message,
+        categorie="recapitulatif",
+        titre=f"Récapitulatif : {len(events)} mises à jour",
+        region=premier.region,
+    )
+
+
+def flush(now=None):
+    """
+    Envoie (met dans l'outbox) les regroupements arrivés à échéance.
+    Retourne le nombre de notifications créées.
+    """
+    from .notification_service import notification_service
+
+    now = now or timezone.now()
+    with transaction.atomic():
+        events = list(
+            NotificationEvent.objects.select_for_update(skip_locked=True)
+            .filter(envoyer_apres__lte=now)
+            .select_related("destinataire")
+            .order_by("date_creation", "pk")
+        )
+        if not events:
+            return 0
+        groupes = {}
+        for event in events:
+            groupes.setdefault(
+                (event.destinataire_id, event.famille, event.region), []
+            ).append(event)
+        notifications = notification_service.enqueue(
+            [render(groupe) for groupe in groupes.values()], coalesce=False
+        )
+        NotificationEvent.objects.filter(pk__in=[e.pk for e in events]).delete()
+    return len(notifications)
@@ -0,0 +1,156 @@
+"""
+Compteurs glissants des envois de notifications, par région et par statut.
+
+marquer_comme_envoye / marquer_comme_echec incrémentent le seau de la minute
+courante de (région, statut) quand la notification atteint un état final
+('envoye' ou 'echec_permanent') ; une fenêtre (1h, 24h...) se lit en sommant
+ses seaux, sans parcourir la table Notification. Les échecs temporaires
+(relancés) ne comptent pas : une notification relancée deux fois puis
+envoyée compte 1 'envoye'.
+
+Les seaux sont partagés entre workers via Redis (un hash par (région, statut),
+un champ par minute) ; sans Redis (développement, tests), des compteurs en
+mémoire du processus les remplacent.
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+KEY = "notif:compteurs:{}:{}"
+BUCKET = 60  # secondes
+RETENTION = 25 * 3600  # plus longue fenêtre lue (24h) + marge
+
+REGIONS = ("chine", "mali", "cote_divoire", "system", "auto")
+STATUTS = ("envoye", "echec_permanent")  # états finaux
+FENETRE_24H = 24 * 3600
+
+
+def _bucket(now):
+    return int(now // BUCKET)
+
+
+class MemoryCounters:
+    """Compteurs locaux au processus (tests et développement sans Redis)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = defaultdict(dict)  # (région, statut) -> {minute: nombre}
+
+    def incr(self, region, statut, n, now):
+        minute = _bucket(now)
+        with self._lock:
+            buckets = self._buckets[region, statut]
+            buckets[minute] = buckets.get(minute, 0) + n
+            if len(buckets) > RETENTION // BUCKET:
+                limite = minute - RETENTION // BUCKET
+                for ancienne in [m for m in buckets if m <= limite]:
+                    del buckets[ancienne]
+
+    def sums(self, cles, debut, fin):
+        with self._lock:
+            return {
+                cle: sum(
+                    n for minute, n in self._buckets.get(cle, {}).items() if debut <= minute <= fin
+                )
+                for cle in cles
+            }
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisCounters:
+    """Compteurs partagés entre workers (Redis du cache, REDIS_CACHE_URL)."""
+
+    def __init__(self, url):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+
+    def incr(self, region, statut, n, now):
+        key = KEY.format(region, statut)
+        pipe = self._client.pipeline(transaction=False)
+        pipe.hincrby(key, _bucket(now), n)
+        pipe.expire(key, RETENTION)
+        pipe.execute()
+
+    def sums(self, cles, debut, fin):
+        pipe = self._client.pipeline(transaction=False)
+        for region, statut in cles:
+            pipe.hgetall(KEY.format(region, statut))
+        resultats = {}
+        obsoletes = []
+        for cle, buckets in zip(cles, pipe.execute()):
+            total = 0
+            for minute, n in buckets.items():
+                minute = int(minute)
+                if debut <= minute <= fin:
+                    total += int(n)
+                elif minute < fin - RETENTION // BUCKET:
+                    obsoletes.append((cle, minute))
+            resultats[cle] = total
+        if obsoletes:
+            # Le hash garde son TTL tant qu'il est écrit : on purge les vieux champs
+            pipe = self._client.pipeline(transaction=False)
+            for (region, statut), minute in obsoletes:
+                pipe.hdel(KEY.format(region, statut), minute)
+            pipe.execute()
+        return resultats
+
+
+_counters = None
+
+
+def get_counters():
+    global _counters
+    if _counters is None:
+        url = getattr(settings, "REDIS_CACHE_URL", None)
+        _counters = RedisCounters(url) if url else MemoryCounters()
+    return _counters
+
+
+def incrementer(region, statut, n=1, now=None):
+    """Compte `n` notifications arrivées à l'état final `statut` dans la région."""
+    try:
+        get_counters().incr(region or "auto", statut, n, time.time() if now is None else now)
+    except Exception as e:
+        # Redis indisponible : les métriques ne doivent pas bloquer l'envoi
+        logger.warning(f"[Metrics] Compteur indisponible ({e})")
+
+
+def compter(regions=REGIONS, fenetre=FENETRE_24H, now=None):
+    """
+    {région: {statut: nombre, ..., "total": nombre}} sur les `fenetre`
+    dernières secondes. Retourne None si les compteurs sont indisponibles.
+    """
+    fin = _bucket(time.time() if now is None else now)
+    debut = fin - fenetre // BUCKET + 1
+    cles = [(region, statut) for region in regions for statut in STATUTS]
+    try:
+        sommes = get_counters().sums(cles, debut, fin)
+    except Exception as e:
+        logger.warning(f"[Metrics] Compteurs indisponibles ({e})")
+        return None
+    stats = {}
+    for region in regions:
+        stats[region] = {statut: sommes[region, statut] for statut in STATUTS}
+        stats[region]["total"] = sum(stats[region].values())
+    return stats
+
+
+def totaux(regions=REGIONS, fenetre=FENETRE_24H, now=None):
+    """Comme compter(), cumulé sur les régions : {statut: nombre, "total": nombre}."""
+    stats = compter(regions, fenetre, now)
+    if stats is None:
+        return None
+    return {
+        champ: sum(par_statut[champ] for par_statut in stats.values())
+        for champ in (*STATUTS, "total")
+    }
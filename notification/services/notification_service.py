@@ -1,8 +1,10 @@
 import logging
+from django.db import transaction
+from django.db.models import Count, Q
 from django.utils import timezone
-from ..models import Notification, ConfigurationNotification
+from ..models import Notification
+from . import coalescing, metrics
 from .wachap_service import wachap_service
-from .alert_system import alert_system
 
 logger = logging.getLogger(__name__)
 
@@ -10,14 +12,36 @@ logger = logging.getLogger(__name__)
 class NotificationService:
     """
     Service de façade pour la gestion des notifications
+
+    Outbox : les vues et tâches ne font qu'insérer des Notification 'en_attente'
+    (en masse, dans la transaction de la modification métier). L'envoi WhatsApp
+    est fait par la tâche dispatch_notifications, qui réclame les lignes par lots
+    (select_for_update skip_locked) : un message n'est jamais perdu si Celery
+    est indisponible au moment du COMMIT, le beat reprend la file.
     """
 
     @staticmethod
-    def send_notification(
-        destinataire, message, categorie="autre", titre="", media_url=None, region=None
+    def get_phone(destinataire):
+        """Numéro du destinataire : User.telephone, User.phone ou Client.telephone"""
+        phone = getattr(destinataire, "telephone", "") or getattr(
+            destinataire, "phone", ""
+        )
+        if not phone and hasattr(destinataire, "client_profile"):
+            phone = getattr(destinataire.client_profile, "telephone", "")
+        return phone
+
+    @staticmethod
+    def build_notification(
+        destinataire,
+        message,
+        categorie="autre",
+        titre="",
+        media_url=None,
+        region=None,
+        **liens,
     ):
         """
-        Envoie une notification (WhatsApp par défaut)
+        Prépare (sans l'enregistrer) une notification WhatsApp en attente d'envoi.
 
         Args:
             destinataire: User instance
@@ -26,95 +50,215 @@ class NotificationService:
             titre: Titre (pour log/historique)
             media_url: URL d'une image/média à joindre (optionnel)
             region: Region WaChap ('chine', 'mali', 'system') - Optionnel
+            liens: colis= / lot= (optionnel)
         """
-        try:
-            # 1. Vérifier si les notifications sont actives globalement
-            config = ConfigurationNotification.get_solo()
-            # On pourrait ajouter un switch global ici, pour l'instant on suppose actif
+        return Notification(
+            destinataire=destinataire,
+            telephone_destinataire=NotificationService.get_phone(destinataire),
+            email_destinataire=getattr(destinataire, "email", ""),
+            message=message,
+            media_url=media_url or "",
+            categorie=categorie,
+            titre=titre,
+            type_notification="whatsapp",
+            statut="en_attente",
+            region=region,
+            **liens,
+        )
 
-            # 2. Récupérer le numéro de téléphone intelligemment
-            # On cherche sur User.telephone, User.phone, ou Client.telephone
-            phone = getattr(destinataire, "telephone", "") or getattr(
-                destinataire, "phone", ""
+    @staticmethod
+    def enqueue(notifications, coalesce=True):
+        """
+        Enregistre les notifications en une requête et réveille le dispatcher
+        après COMMIT de la transaction en cours.
+
+        Les notifications de suivi de colis sont d'abord mises en attente de
+        regroupement par client (services.coalescing) ; seules les notifications
+        envoyées immédiatement sont retournées.
+        """
+        if coalesce:
+            notifications, delai = coalescing.buffer(notifications)
+            if delai is not None:
+                transaction.on_commit(lambda: _schedule_flush(delai))
+        notifications = Notification.objects.bulk_create(notifications, batch_size=500)
+        if notifications:
+            transaction.on_commit(_wake_dispatcher)
+        return notifications
+
+    @staticmethod
+    def send_notification(
+        destinataire, message, categorie="autre", titre="", media_url=None, region=None
+    ):
+        """
+        Met en file une notification (WhatsApp par défaut), envoyée par le dispatcher.
+        Retourne (True, notification), notification None si mise en attente de regroupement.
+        """
+        notifications = NotificationService.enqueue(
+            [
+                NotificationService.build_notification(
+                    destinataire, message, categorie, titre, media_url, region
+                )
+            ]
+        )
+        return True, (notifications[0] if notifications else None)
+
+    @staticmethod
+    def to_message(notification):
+        """Arguments de wachap_service.send_message_with_type pour la notification."""
+        return {
+            "phone": notification.telephone_destinataire,
+            "message": notification.message,
+            "message_type": "image" if notification.media_url else "text",
+            "media_url": notification.media_url or None,
+            "region": notification.region,
+        }
+
+    @staticmethod
+    def apply_result(notification, result, registered=True):
+        """
+        Met à jour le statut de la notification selon le résultat
+        (success, message, message_id) de WaChap, sans l'enregistrer.
+        registered : le numéro est-il inscrit sur WhatsApp (vérifié après un échec).
+        """
+        success, error_msg, message_id = result
+        if success:
+            notification.marquer_comme_envoye(message_id, save=False)
+            logger.info(
+                f"Notification {notification.id} envoyée à {notification.telephone_destinataire}"
             )
+            return True
 
-            if not phone and hasattr(destinataire, "client_profile"):
-                phone = getattr(destinataire.client_profile, "telephone", "")
-
-            # 3. Créer l'objet Notification
-            notification = Notification.objects.create(
-                destinataire=destinataire,
-                telephone_destinataire=phone,
-                email_destinataire=getattr(destinataire, "email", ""),
-                message=message,
-                categorie=categorie,
-                titre=titre,
-                type_notification="whatsapp",
-                statut="en_attente",
-                region=region,
+        if not registered:
+            notification.marquer_comme_echec(
+                "Numéro non inscrit sur WA", erreur_type="permanent", save=False
             )
+        else:
+            notification.marquer_comme_echec(error_msg, save=False)
+        logger.error(f"Échec notification {notification.id}: {notification.erreur_envoi}")
+        return False
 
-            # 3. Envoyer via WaChap
-            success = False
-            error_msg = ""
-            message_id = ""
+    @staticmethod
+    def registrations(notifications):
+        """
+        {numéro formaté: inscrit sur WhatsApp} des notifications, vérifiés en
+        groupe (cache WhatsAppRegistration, un appel API par compte et région).
+        """
+        by_region = {}
+        for notification in notifications:
+            by_region.setdefault(notification.region, []).append(
+                notification.telephone_destinataire
+            )
+        statuses = {}
+        for region, phones in by_region.items():
+            statuses.update(wachap_service.check_numbers_registered(phones, region=region))
+        return statuses
 
-            phone = notification.telephone_destinataire
-            if not phone:
-                error_msg = "Pas de numéro de téléphone"
-            else:
-                # Déterminer si media
-                msg_type = "image" if media_url else "text"
-
-                success, error_msg, message_id = wachap_service.send_message_with_type(
-                    phone=phone,
-                    message=message,
-                    message_type=msg_type,
-                    media_url=media_url,
-                    region=region,
-                )
+    @staticmethod
+    def deliver_many(notifications, reserved=False, skip_unregistered=True):
+        """
+        Envoie les notifications en parallèle (wachap_service.send_many) et met
+        à jour leurs statuts sans les enregistrer (le dispatcher fait un
+        bulk_update du lot). reserved : créneaux du limiteur de débit déjà
+        réservés par l'appelant. Retourne le nombre d'envois réussis.
 
-            # 4. Mettre à jour le statut
-            if success:
-                notification.marquer_comme_envoye(message_id)
-                logger.info(f"Notification {notification.id} envoyée à {phone}")
+        Les numéros connus comme non inscrits sur WhatsApp ne sont pas envoyés
+        (sauf skip_unregistered=False : relance forcée) ; l'inscription des
+        numéros en échec est vérifiée en groupe.
+        """
+        unregistered = (
+            wachap_service.known_unregistered(n.telephone_destinataire for n in notifications)
+            if skip_unregistered
+            else set()
+        )
+        a_envoyer = []
+        for notification in notifications:
+            if not notification.telephone_destinataire:
+                notification.marquer_comme_echec(
+                    "Pas de numéro de téléphone", erreur_type="permanent", save=False
+                )
+            elif wachap_service.format_phone(notification.telephone_destinataire) in unregistered:
+                notification.marquer_comme_echec(
+                    "Numéro non inscrit sur WA", erreur_type="permanent", save=False
+                )
             else:
-                # Vérifier si le numéro est bien sur WhatsApp
-                is_on_wa = wachap_service.check_number_registered(phone, region=region)
-                if not is_on_wa:
-                    error_msg = "Numéro non inscrit sur WA"
-                    notification.marquer_comme_echec(error_msg, erreur_type="permanent")
-                else:
-                    notification.marquer_comme_echec(error_msg)
+                a_envoyer.append(notification)
 
-                logger.error(f"Échec notification {notification.id}: {error_msg}")
-
-                # Alerte si échec critique (optionnel, géré par AlertSystem périodique)
+        results = wachap_service.send_many(
+            [NotificationService.to_message(n) for n in a_envoyer], reserved=reserved
+        )
+        echecs = [n for n, (success, _msg, _id) in zip(a_envoyer, results) if not success]
+        registered = NotificationService.registrations(echecs) if echecs else {}
+        return sum(
+            NotificationService.apply_result(
+                notification,
+                result,
+                registered.get(
+                    wachap_service.format_phone(notification.telephone_destinataire), True
+                ),
+            )
+            for notification, result in zip(a_envoyer, results)
+        )
 
-            return success, notification
+    @staticmethod
+    def deliver(notification, reserved=False):
+        """Envoie une seule notification (voir deliver_many)."""
+        return NotificationService.deliver_many([notification], reserved=reserved) == 1
 
-        except Exception as e:
-            logger.exception(f"Exception send_notification: {e}")
-            # Tenter de sauver l'échec si la notif a été créée
-            if "notification" in locals():
-                notification.marquer_comme_echec(str(e))
-            return False, None
+    @staticmethod
+    def stats_region(region):
+        """
+        Notifications de la région terminées sur 24h glissantes
+        {total, envoye, echec_permanent} (badges des listes de notifications),
+        lues dans les compteurs par minute ; repli sur la table si les
+        compteurs sont indisponibles.
+        """
+        stats = metrics.compter((region,))
+        if stats is not None:
+            return stats[region]
+        return Notification.objects.filter(
+            region=region,
+            statut__in=metrics.STATUTS,
+            date_creation__gte=timezone.now() - timezone.timedelta(seconds=metrics.FENETRE_24H),
+        ).aggregate(
+            total=Count("id"),
+            envoye=Count("id", filter=Q(statut="envoye")),
+            echec_permanent=Count("id", filter=Q(statut="echec_permanent")),
+        )
 
     @staticmethod
     def send_mass_notification(queryset_users, message, categorie="autre", region=None):
         """
-        Envoie une notification à une liste d'utilisateurs (utilisé par Celery)
+        Met en file une notification pour une liste d'utilisateurs
         """
-        results = {"success": 0, "failed": 0}
-        for user in queryset_users:
-            success, _ = NotificationService.send_notification(
-                user, message, categorie, region=region
-            )
-            if success:
-                results["success"] += 1
-            else:
-                results["failed"] += 1
-        return results
+        notifications = NotificationService.enqueue(
+            [
+                NotificationService.build_notification(
+                    user, message, categorie, region=region
+                )
+                for user in queryset_users
+            ]
+        )
+        return {"queued": len(notifications)}
+
+
+def _schedule_flush(delai):
+    from ..tasks import flush_coalesced_notifications
+
+    try:
+        flush_coalesced_notifications.apply_async(countdown=int(delai) + 1)
+    except Exception as e:
+        # Broker indisponible : le beat reprendra les regroupements échus
+        logger.warning(f"Envoi des regroupements non programmé: {e}")
+
+
+def _wake_dispatcher():
+    from ..tasks import dispatch_notifications
+
+    try:
+        dispatch_notifications.delay()
+    except Exception as e:
+        # Broker indisponible : les lignes restent en file, le beat les reprendra
+        logger.warning(f"Dispatcher de notifications non réveillé: {e}")
 
 
 # Instance globale
@@ -0,0 +1,165 @@
+"""
+Limiteur de débit (token bucket) des envois WhatsApp, par compte WaChap.
+
+Chaque accountId a un seau de `burst` jetons rechargé à `rate` jetons/seconde
+(réglages dans ConfigurationNotification). Un envoi réserve un jeton :
+  - jeton disponible ou disponible dans moins de `max_wait` secondes : la
+    réservation est prise et l'appelant attend le délai retourné ;
+  - sinon rien n'est réservé et le délai retourné est l'ETA du prochain jeton
+    (le dispatcher remet la notification en file pour cette date).
+
+Le seau est partagé entre tous les workers via Redis (script Lua atomique) ;
+sans Redis (développement, tests), un seau en mémoire du processus le remplace.
+"""
+
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+KEY = "wachap:bucket:{}"
+
+# Réservation atomique : retourne {accordé (0/1), délai en secondes}
+RESERVE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local max_wait = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens < 1 then wait = (1 - tokens) / rate end
+local granted = 0
+if wait <= max_wait then
+    tokens = tokens - 1
+    granted = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 60)
+return {granted, tostring(wait)}
+"""
+
+
+class MemoryTokenBucket:
+    """Seau local au processus (tests et développement sans Redis)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def reserve(self, key, rate, burst, max_wait, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, ts = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + max(0, now - ts) * rate)
+            wait = (1 - tokens) / rate if tokens < 1 else 0
+            granted = wait <= max_wait
+            if granted:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+        return granted, wait
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisTokenBucket:
+    """Seau partagé entre workers (Redis du cache, REDIS_CACHE_URL)."""
+
+    def __init__(self, url):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(RESERVE_SCRIPT)
+
+    def reserve(self, key, rate, burst, max_wait, now=None):
+        now = time.time() if now is None else now
+        granted, wait = self._script(keys=[key], args=[rate, burst, now, max_wait])
+        return bool(granted), float(wait)
+
+
+_limiter = None
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        url = getattr(settings, "REDIS_CACHE_URL", None)
+        _limiter = RedisTokenBucket(url) if url else MemoryTokenBucket()
+    return _limiter
+
+
+def reserve(account_id, rate_per_minute, burst, max_wait=0):
+    """
+    Réserve un envoi sur le compte `account_id`.
+    Retourne (accordé, délai en secondes) : voir la docstring du module.
+    """
+    if not rate_per_minute or rate_per_minute <= 0:
+        return True, 0
+    try:
+        return get_limiter().reserve(
+            KEY.format(account_id), rate_per_minute / 60, max(1, burst), max_wait
+        )
+    except Exception as e:
+        # Redis indisponible : on n'empêche pas l'envoi
+        logger.warning(f"[RateLimit] Limiteur indisponible ({e}), envoi non limité")
+        return True, 0
+
+
+# ----------------------------------------------------------------------
+# Métriques : attente en file (création -> envoi) par région WaChap
+# ----------------------------------------------------------------------
+
+WAIT_KEY = "wachap:queue_wait:{}:{}"
+WAIT_TTL = 7 * 24 * 3600
+
+
+def record_queue_wait(region, seconds):
+    """Cumule le nombre d'envois et l'attente totale (ms) de la région."""
+    region = region or "auto"
+    millis = max(0, int(seconds * 1000))
+    for champ, valeur in (("count", 1), ("total_ms", millis)):
+        key = WAIT_KEY.format(region, champ)
+        if not cache.add(key, valeur, timeout=WAIT_TTL):
+            try:
+                cache.incr(key, valeur)
+            except ValueError:
+                cache.set(key, valeur, timeout=WAIT_TTL)
+    key_max = WAIT_KEY.format(region, "max_ms")
+    if millis > (cache.get(key_max) or 0):
+        cache.set(key_max, millis, timeout=WAIT_TTL)
+
+
+def queue_wait_stats(regions=("chine", "mali", "cote_divoire", "system", "auto")):
+    """{région: {"count", "moyenne_s", "max_s"}} pour les régions ayant envoyé."""
+    keys = [
+        WAIT_KEY.format(region, champ)
+        for region in regions
+        for champ in ("count", "total_ms", "max_ms")
+    ]
+    valeurs = cache.get_many(keys)
+    stats = {}
+    for region in regions:
+        count = valeurs.get(WAIT_KEY.format(region, "count"), 0)
+        if not count:
+            continue
+        total_ms = valeurs.get(WAIT_KEY.format(region, "total_ms"), 0)
+        stats[region] = {
+            "count": count,
+            "moyenne_s": round(total_ms / count / 1000, 3),
+            "max_s": round(valeurs.get(WAIT_KEY.format(region, "max_ms"), 0) / 1000, 3),
+        }
+    return stats
+
+
+def eta_seconds(wait):
+    """Délai arrondi à la seconde supérieure (countdown Celery)."""
+    return max(1, math.ceil(wait))
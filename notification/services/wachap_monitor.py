@@ -15,8 +15,19 @@ logger = logging.getLogger(__name__)
 class WaChapMonitor:
     """
     Système de monitoring des instances WaChap avec alertes automatiques
+
+    Le statut des instances est publié dans le cache partagé (snapshot) par
+    check_wachap_status_periodic et par la tâche de rafraîchissement à la
+    demande refresh_wachap_status ; les vues lisent ce snapshot et ne font
+    jamais l'appel HTTP à WaChap elles-mêmes.
     """
 
+    SNAPSHOT_KEY = "wachap:status:snapshot"
+    SNAPSHOT_TTL = 24 * 3600  # un snapshot ancien reste affiché (avec son âge)
+    SNAPSHOT_MAX_AGE = 5 * 60  # au-delà, la lecture demande un rafraîchissement
+    REFRESH_LOCK_KEY = "wachap:status:refresh"
+    REFRESH_LOCK_TTL = 60  # un seul rafraîchissement en cours (> timeout HTTP)
+
     def __init__(self):
         """Initialise le monitoring avec les configurations"""
         self.base_url = "https://wachap.app/api"
@@ -151,6 +162,53 @@ class WaChapMonitor:
 
         return results
 
+    def publish_snapshot(self, status: Dict[str, Dict]):
+        """Publie le statut des instances dans le cache partagé"""
+        cache.set(
+            self.SNAPSHOT_KEY,
+            {"instances": status, "checked_at": timezone.now().isoformat()},
+            timeout=self.SNAPSHOT_TTL,
+        )
+
+    def get_snapshot(self) -> Optional[Dict]:
+        """
+        Dernier statut publié : {"instances", "checked_at", "age_seconds"},
+        ou None si aucune vérification n'a encore été publiée.
+        """
+        snapshot = cache.get(self.SNAPSHOT_KEY)
+        if not snapshot:
+            return None
+        checked_at = datetime.fromisoformat(snapshot["checked_at"])
+        snapshot["age_seconds"] = int((timezone.now() - checked_at).total_seconds())
+        return snapshot
+
+    def request_refresh(self) -> bool:
+        """
+        Demande une vérification en arrière-plan (refresh_wachap_status).
+        Single-flight : une seule tâche en cours quel que soit le nombre de
+        demandes. Retourne True si une vérification est en cours.
+        """
+        if not cache.add(self.REFRESH_LOCK_KEY, True, timeout=self.REFRESH_LOCK_TTL):
+            return True
+        try:
+            from notification.tasks import refresh_wachap_status
+
+            refresh_wachap_status.delay()
+            return True
+        except Exception as e:
+            cache.delete(self.REFRESH_LOCK_KEY)
+            logger.warning(f"Rafraîchissement du statut WaChap non programmé: {e}")
+            return False
+
+    def refresh_snapshot(self) -> Dict[str, Dict]:
+        """Vérifie les instances et publie le snapshot (tâche refresh_wachap_status)"""
+        try:
+            status = self.check_all_instances()
+            self.publish_snapshot(status)
+            return status
+        finally:
+            cache.delete(self.REFRESH_LOCK_KEY)
+
     def should_send_alert(self, region: str) -> bool:
         """Vérifie si une alerte doit être envoyée (anti-spam)"""
         cache_key = f"wachap_alert_sent_{region}"
@@ -205,6 +263,7 @@ class WaChapMonitor:
 
         try:
             all_status = self.check_all_instances()
+            self.publish_snapshot(all_status)
 
             connected_count = 0
             disconnected_instances = []
@@ -3,11 +3,17 @@ Service WaChap V4 — API https://api.wachap.com/v1
 Auth : Bearer secret_key global + accountId par région.
 """
 
+import asyncio
 import requests
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from typing import Optional, Tuple
 from django.core.cache import cache
-from ..models import ConfigurationNotification
+from core.phone import format_e164, region_telephone
+from ..models import ConfigurationNotification, WhatsAppRegistration
+from . import rate_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -28,8 +34,36 @@ class WaChapService:
         "mali": ["chine", "system"],
     }
 
+    # Attente max d'un créneau du limiteur de débit pour un envoi direct (secondes)
+    SEND_MAX_WAIT = 30
+
+    # Connexions HTTP gardées ouvertes par processus (keep-alive vers l'API)
+    POOL_MAXSIZE = 16
+    # Envois simultanés par compte WaChap dans send_many
+    CONCURRENCY_PER_ACCOUNT = 4
+    _session = None
+
+    def __init__(self, base_url=None, config=None):
+        """base_url / config : serveur et configuration imposés (bouchon de test, benchmark)."""
+        if base_url:
+            self.BASE_URL = base_url
+        self._config = config
+
+    @property
+    def session(self):
+        """Session HTTP partagée : un envoi réutilise une connexion TLS déjà ouverte."""
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.POOL_MAXSIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._session = session
+        return self._session
+
     def _get_config(self):
         """Config singleton avec cache 5 min."""
+        if self._config is not None:
+            return self._config
         config = cache.get("config_notification")
         if not config:
             config = ConfigurationNotification.get_solo()
@@ -56,31 +90,15 @@ class WaChapService:
     @staticmethod
     def format_phone(phone: str) -> str:
         """Formate un numéro en +XXXXXXXXXXX (requis par V4)."""
-        clean = (
-            str(phone)
-            .replace(" ", "")
-            .replace("-", "")
-            .replace("(", "")
-            .replace(")", "")
-        )
-        if clean.startswith("00"):
-            clean = "+" + clean[2:]
-        elif not clean.startswith("+"):
-            clean = "+" + clean
-        return clean
+        return format_e164(phone)
 
     def _determine_region(self, phone: str, sender_role: str = None) -> str:
         """Détermine la région depuis le rôle ou le préfixe téléphonique."""
         if sender_role == "system":
             return "system"
 
-        clean = str(phone).replace("+", "").replace(" ", "")
-        if clean.startswith("86"):
-            return "chine"
-        if clean.startswith("225"):
-            return "cote_divoire"
-        # 223 ou inconnu → mali par défaut
-        return "mali"
+        # 86 → chine, 225 → cote_divoire, 223 ou inconnu → mali par défaut
+        return region_telephone(phone)
 
     def _resolve_account(self, region: str, accounts: dict) -> Tuple[str, str]:
         """
@@ -102,6 +120,43 @@ class WaChapService:
 
         return "", region  # Aucun compte dispo
 
+    def reserve(self, phone, region=None, sender_role=None, max_wait=0):
+        """
+        Réserve un créneau d'envoi sur le compte WaChap qui enverra à `phone`.
+        Retourne (accordé, délai en secondes) : voir services.rate_limiter.
+        """
+        account_id = self._account_for(phone, region, sender_role)
+        if not account_id:
+            return True, 0  # L'envoi échouera sur la configuration
+        return self._reserve_account(account_id, max_wait)
+
+    def _account_for(self, phone, region=None, sender_role=None):
+        if not region:
+            region = self._determine_region(self.format_phone(phone), sender_role)
+        account_id, _ = self._resolve_account(region, self._get_accounts())
+        return account_id
+
+    def _reserve_account(self, account_id, max_wait):
+        config = self._get_config()
+        return rate_limiter.reserve(
+            account_id,
+            config.wachap_messages_par_minute,
+            config.wachap_rafale_max,
+            max_wait,
+        )
+
+    def _wait_for_slot(self, account_id, region):
+        """Attend un créneau du limiteur ; retourne un message d'erreur si trop lointain."""
+        granted, wait = self._reserve_account(account_id, self.SEND_MAX_WAIT)
+        if not granted:
+            logger.warning(
+                f"[WaChap V4] Limite de débit atteinte pour '{region}' (prochain créneau dans {wait:.1f}s)"
+            )
+            return f"Limite de débit WaChap atteinte, réessayer dans {wait:.0f}s"
+        if wait:
+            time.sleep(wait)
+        return None
+
     # ------------------------------------------------------------------
     # Envoi de messages
     # ------------------------------------------------------------------
@@ -112,9 +167,12 @@ class WaChapService:
         message: str,
         sender_role: str = None,
         region: str = None,
+        reserved: bool = False,
     ) -> Tuple[bool, str, Optional[str]]:
         """
         Envoie un message texte via WaChap API V4.
+        Sauf si un créneau a déjà été réservé (reserved=True, dispatcher),
+        attend le limiteur de débit du compte.
 
         Returns:
             (success: bool, message: str, message_id: str|None)
@@ -148,6 +206,11 @@ class WaChapService:
                 None,
             )
 
+        if not reserved:
+            limited = self._wait_for_slot(account_id, used_region)
+            if limited:
+                return False, limited, None
+
         headers = {
             "Authorization": f"Bearer {secret_key}",
             "Content-Type": "application/json",
@@ -167,7 +230,7 @@ class WaChapService:
         )
 
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.BASE_URL}/whatsapp/messages/send",
                 json=payload,
                 headers=headers,
@@ -213,45 +276,66 @@ class WaChapService:
         Retourne True s'il est inscrit ou en cas d'erreur de vérification.
         Retourne False uniquement si l'API confirme qu'il n'est PAS sur WhatsApp.
         """
-        config = self._get_config()
-        secret_key = config.wachap_v4_secret_key
-        if not secret_key:
-            return True  # Par précaution, on autorise si pas de config
+        return self.check_numbers_registered([phone], region=region)[self.format_phone(phone)]
 
-        formatted_phone = self.format_phone(phone)
-        if not region:
-            region = self._determine_region(formatted_phone)
+    def known_unregistered(self, phones) -> set:
+        """Numéros formatés connus (vérification encore valide) comme non inscrits sur WhatsApp."""
+        statuses = WhatsAppRegistration.fresh(
+            self.format_phone(phone) for phone in phones if phone
+        )
+        return {phone for phone, is_on in statuses.items() if not is_on}
 
-        accounts = self._get_accounts()
-        account_id, _ = self._resolve_account(region, accounts)
+    def check_numbers_registered(self, phones, region: str = None) -> dict:
+        """
+        Version groupée de check_number_registered : {numéro formaté: inscrit}.
+        Les numéros vérifiés depuis moins de WhatsAppRegistration.REGISTRATION_TTL
+        sont lus en base ; les autres sont vérifiés en un appel
+        /whatsapp/contacts/check par compte WaChap, puis mis en cache.
+        """
+        formatted = {self.format_phone(phone) for phone in phones if phone}
+        statuses = WhatsAppRegistration.fresh(formatted)
+        unknown = formatted - statuses.keys()
+        # Par précaution, un numéro non vérifiable est considéré inscrit
+        statuses.update(dict.fromkeys(unknown, True))
 
-        if not account_id:
-            return True
+        config = self._get_config()
+        secret_key = config.wachap_v4_secret_key
+        if not unknown or not secret_key:
+            return statuses
+
+        by_account = {}
+        for phone in unknown:
+            account_id = self._account_for(phone, region)
+            if account_id:
+                by_account.setdefault(account_id, []).append(phone)
 
         headers = {
             "Authorization": f"Bearer {secret_key}",
             "Content-Type": "application/json",
         }
-
-        payload = {"accountId": account_id, "phones": [formatted_phone]}
-
-        try:
-            response = requests.post(
-                f"{self.BASE_URL}/whatsapp/contacts/check",
-                json=payload,
-                headers=headers,
-                timeout=10,
-            )
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("success"):
-                    results = data.get("results", [])
-                    if results:
-                        return results[0].get("isOnWhatsApp", True)
-            return True
-        except Exception as e:
-            logger.error(f"[WaChap V4] Erreur check_number_registered: {e}")
-            return True
+        checked = {}
+        for account_id, account_phones in by_account.items():
+            payload = {"accountId": account_id, "phones": account_phones}
+            try:
+                response = self.session.post(
+                    f"{self.BASE_URL}/whatsapp/contacts/check",
+                    json=payload,
+                    headers=headers,
+                    timeout=10,
+                )
+                if response.status_code == 200:
+                    data = response.json()
+                    if data.get("success"):
+                        for phone, result in zip(account_phones, data.get("results", [])):
+                            phone = self.format_phone(result.get("phone") or phone)
+                            checked[phone] = result.get("isOnWhatsApp", True)
+            except Exception as e:
+                logger.error(f"[WaChap V4] Erreur check_numbers_registered: {e}")
+
+        if checked:
+            WhatsAppRegistration.store(checked)
+            statuses.update(checked)
+        return statuses
 
     def send_message_with_type(
         self,
@@ -262,6 +346,7 @@ class WaChapService:
         region: str = None,
         media_url: str = None,
         media_file=None,
+        reserved: bool = False,
     ) -> Tuple[bool, str, Optional[str]]:
         """
         Envoie un message texte ou image via l'API WaChap V4.
@@ -269,7 +354,7 @@ class WaChapService:
         if message_type != "image" or not media_url:
             # Fallback direct vers le texte
             return self.send_message(
-                phone, message, sender_role=sender_role, region=region
+                phone, message, sender_role=sender_role, region=region, reserved=reserved
             )
 
         # Si c'est une image, on structure le payload selon WaChap V4
@@ -300,6 +385,11 @@ class WaChapService:
             logger.error(f"[WaChap V4] AccountId introuvable pour région='{region}'")
             return False, f"Configuration WaChap absente pour région '{region}'.", None
 
+        if not reserved:
+            limited = self._wait_for_slot(account_id, used_region)
+            if limited:
+                return False, limited, None
+
         url = f"{self.BASE_URL}/whatsapp/messages/send"
         headers = {
             "Authorization": f"Bearer {api_key}",
@@ -317,7 +407,7 @@ class WaChapService:
         }
 
         try:
-            response = requests.post(url, json=payload, headers=headers, timeout=15)
+            response = self.session.post(url, json=payload, headers=headers, timeout=15)
             # Accepte 200 et potentiellement 201/202 selon l'API
             if response.status_code in (200, 201, 202):
                 data = response.json()
@@ -335,6 +425,52 @@ class WaChapService:
             logger.error(f"[WaChap V4] Timeout ou Exception: {e}")
             return False, f"Erreur de réseau : {str(e)}", None
 
+    # ------------------------------------------------------------------
+    # Envois en masse
+    # ------------------------------------------------------------------
+
+    def send_many(self, messages, reserved=False, concurrency=None):
+        """
+        Envoie une liste de messages en parallèle et retourne, dans le même ordre,
+        les (success, message, message_id) de send_message_with_type.
+
+        Chaque message est un dict d'arguments de send_message_with_type
+        (phone, message, message_type, region, media_url...). Au plus
+        `concurrency` (CONCURRENCY_PER_ACCOUNT) envois simultanés par compte
+        WaChap, sur les connexions keep-alive de la session partagée.
+        """
+        if not messages:
+            return []
+        # Résolu ici (accès BDD synchrone) : la configuration est ensuite lue
+        # depuis le cache par les threads d'envoi
+        accounts = [
+            self._account_for(m["phone"], m.get("region"), m.get("sender_role"))
+            for m in messages
+        ]
+        return asyncio.run(self._send_many(messages, accounts, reserved, concurrency))
+
+    async def _send_many(self, messages, accounts, reserved, concurrency):
+        concurrency = concurrency or self.CONCURRENCY_PER_ACCOUNT
+        semaphores = {account: asyncio.Semaphore(concurrency) for account in set(accounts)}
+        workers = min(self.POOL_MAXSIZE, concurrency * len(semaphores))
+        loop = asyncio.get_running_loop()
+
+        def envoyer(message):
+            try:
+                return self.send_message_with_type(**message, reserved=reserved)
+            except Exception as e:
+                logger.error(f"[WaChap V4] Exception send_many: {e}")
+                return False, str(e), None
+
+        async def envoyer_limite(message, account):
+            async with semaphores[account]:
+                return await loop.run_in_executor(executor, envoyer, message)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return await asyncio.gather(
+                *(envoyer_limite(m, a) for m, a in zip(messages, accounts))
+            )
+
 
 # Instance globale
 wachap_service = WaChapService()
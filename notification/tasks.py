@@ -1,5 +1,8 @@
 import logging
+import time
 from celery import shared_task
+from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 from django.conf import settings
 from .models import Notification, ConfigurationNotification
@@ -11,49 +14,170 @@ from django.apps import apps
 logger = logging.getLogger(__name__)
 
 
-@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+# Taille d'un lot réclamé par le dispatcher
+DISPATCH_BATCH_SIZE = 50
+DISPATCH_MAX_BATCHES = 20
+# Attente max d'un créneau du limiteur de débit ; au-delà, la notification est
+# remise en file pour l'heure du prochain créneau (secondes)
+DISPATCH_MAX_WAIT = 2
+# Bail d'un lot réclamé ('en_cours') : passé ce délai sans résultat (worker
+# mort pendant l'envoi), le lot est repris par le dispatcher (secondes)
+DISPATCH_LEASE = 300
+# Notifications par sous-tâche de relance (balayage des échecs)
+RETRY_CHUNK_SIZE = 100
+# Rétention des notifications terminées avant archivage (jours)
+NOTIFICATION_RETENTION_DAYS = 7
+
+
+@shared_task
 def send_notification_async(
-    self, user_id, message, categorie="autre", titre="", media_url=None, region=None
+    user_id, message, categorie="autre", titre="", media_url=None, region=None
 ):
     """
-    Tâche asynchrone pour envoyer une notification avec retry.
-    En cas d'échec définitif (max_retries atteint), la notification reste en BDD
-    avec statut 'echec' pour être relancée par retry_failed_notifications_periodic.
+    Met en file une notification pour un utilisateur (conservée pour les tâches
+    déjà en file ; les vues insèrent directement via notification_service.enqueue).
     """
+    User = apps.get_model(settings.AUTH_USER_MODEL)
     try:
-        # Récupérer l'utilisateur (User ou Client)
-        User = apps.get_model(settings.AUTH_USER_MODEL)
-        try:
-            user = User.objects.get(pk=user_id)
-        except User.DoesNotExist:
-            logger.error(f"User {user_id} not found for notification")
-            return
-
-        success, notification = notification_service.send_notification(
-            destinataire=user,
-            message=message,
-            categorie=categorie,
-            titre=titre,
-            media_url=media_url,
-            region=region,
-        )
+        user = User.objects.get(pk=user_id)
+    except User.DoesNotExist:
+        logger.error(f"User {user_id} not found for notification")
+        return
+
+    notification_service.send_notification(
+        destinataire=user,
+        message=message,
+        categorie=categorie,
+        titre=titre,
+        media_url=media_url,
+        region=region,
+    )
+
+
+@shared_task
+def dispatch_notifications(batch_size=DISPATCH_BATCH_SIZE, max_batches=DISPATCH_MAX_BATCHES):
+    """
+    Dispatcher de l'outbox : envoie les notifications 'en_attente' par lots.
+    Chaque lot est réclamé dans une transaction courte
+    (select_for_update(skip_locked=True), plusieurs workers ne prennent jamais
+    les mêmes lignes) qui les passe 'en_cours' avec un bail de DISPATCH_LEASE
+    secondes (prochaine_tentative). Le lot est ensuite envoyé en parallèle hors
+    transaction (wachap_service.send_many, concurrence bornée par compte), puis
+    ses statuts sont enregistrés en un seul bulk_update. Si le worker meurt
+    pendant l'envoi, le lot est repris à l'expiration du bail (livraison au
+    moins une fois).
+
+    Chaque envoi réserve un créneau du limiteur de débit de son compte WaChap ;
+    si le créneau est trop lointain, la notification reste en attente avec
+    prochaine_tentative = ETA du créneau et le dispatcher est reprogrammé à cette heure.
+    """
+    from .services.rate_limiter import eta_seconds, record_queue_wait
+    from .services.wachap_service import wachap_service
 
-        if not success:
-            logger.warning(
-                f"[send_notification_async] Échec initial de l'envoi pour user_id={user_id}. "
-                f"La notification est enregistrée en statut 'echec' et sera prise en charge par le retry périodique."
+    count_success = count_fail = count_deferred = 0
+    next_slot = None
+    for _ in range(max_batches):
+        now = timezone.now()
+        with transaction.atomic():
+            batch = list(
+                Notification.objects.select_for_update(skip_locked=True)
+                .filter(type_notification="whatsapp")
+                .filter(
+                    Q(
+                        Q(prochaine_tentative__isnull=True)
+                        | Q(prochaine_tentative__lte=now),
+                        statut="en_attente",
+                    )
+                    | Q(statut="en_cours", prochaine_tentative__lte=now)  # bail expiré
+                )
+                .order_by("date_creation")[:batch_size]
+            )
+            if not batch:
+                break
+            a_envoyer = []
+            start_after = 0
+            for notification in batch:
+                if notification.telephone_destinataire:
+                    granted, wait = wachap_service.reserve(
+                        notification.telephone_destinataire,
+                        region=notification.region,
+                        max_wait=DISPATCH_MAX_WAIT,
+                    )
+                    if not granted:
+                        notification.statut = "en_attente"
+                        notification.prochaine_tentative = timezone.now() + timezone.timedelta(
+                            seconds=wait
+                        )
+                        next_slot = wait if next_slot is None else min(next_slot, wait)
+                        count_deferred += 1
+                        continue
+                    start_after = max(start_after, wait)
+                notification.statut = "en_cours"
+                notification.prochaine_tentative = now + timezone.timedelta(
+                    seconds=DISPATCH_LEASE
+                )
+                a_envoyer.append(notification)
+            Notification.objects.bulk_update(batch, ["statut", "prochaine_tentative"])
+
+        # Hors transaction : attente du dernier créneau réservé, puis envoi
+        # parallèle du lot
+        for notification in a_envoyer:
+            notification.prochaine_tentative = None
+        if start_after:
+            time.sleep(start_after)
+        sent = notification_service.deliver_many(a_envoyer, reserved=True)
+        count_success += sent
+        count_fail += len(a_envoyer) - sent
+        for notification in a_envoyer:
+            record_queue_wait(
+                notification.region,
+                (timezone.now() - notification.date_creation).total_seconds(),
             )
+        Notification.objects.bulk_update(a_envoyer, Notification.CHAMPS_ENVOI)
+        if len(batch) < batch_size:
+            break
+    else:
+        # File encore pleine : on passe la main plutôt que de monopoliser le worker
+        dispatch_notifications.delay(batch_size, max_batches)
 
-    except Exception as e:
-        logger.error(f"[send_notification_async] Erreur inattendue: {e}")
+    if next_slot is not None:
+        # Débit atteint : reprise à l'heure précise du prochain créneau
+        dispatch_notifications.apply_async(
+            (batch_size, max_batches), countdown=eta_seconds(next_slot)
+        )
+
+    if count_success or count_fail or count_deferred:
+        logger.info(
+            f"[Dispatch] {count_success} envoyées, {count_fail} échecs, "
+            f"{count_deferred} différées (limite de débit)."
+        )
+    return (
+        f"Dispatch terminé: {count_success} succès, {count_fail} échecs, "
+        f"{count_deferred} différées."
+    )
+
+
+@shared_task
+def flush_coalesced_notifications():
+    """Met dans l'outbox les regroupements de notifications arrivés à échéance."""
+    from .services.coalescing import flush
+
+    count = flush()
+    return f"Regroupements envoyés: {count} notifications."
 
 
 @shared_task
 def check_wachap_status_periodic():
-    """Vérifie l'état des instances WaChap (toutes les 15min)"""
+    """Vérifie l'état des instances WaChap (toutes les 5min) et publie le snapshot"""
     return wachap_monitor.run_monitoring_check()
 
 
+@shared_task
+def refresh_wachap_status():
+    """Rafraîchit le snapshot du statut WaChap à la demande (voir wachap_monitor.request_refresh)"""
+    return wachap_monitor.refresh_snapshot()
+
+
 @shared_task
 def check_system_health_periodic():
     """Vérifie la santé du système de notification (horaire)"""
@@ -127,7 +251,7 @@ def send_parcel_reminders_periodic():
         reminders_data[user_id]["colis_list"].append(colis)
         reminders_data[user_id]["total_montant"] += max(0, montant_a_payer)
 
-    count_notifs = 0
+    notifications = []
 
     for user_id, data in reminders_data.items():
         user = data["user"]
@@ -170,123 +294,158 @@ def send_parcel_reminders_periodic():
             )
             titre = f"Rappel : {nb_colis} Colis disponibles"
 
-        # Envoyer notif
-        notification_service.send_notification(
-            destinataire=user,
-            message=message,
-            categorie="rappel_colis",
-            titre=titre,
+        notifications.append(
+            notification_service.build_notification(
+                destinataire=user,
+                message=message,
+                categorie="rappel_colis",
+                titre=titre,
+            )
         )
-        count_notifs += 1
 
-    return f"Rappels envoyés: {count_notifs} clients notifiés for {len(colis_to_remind)} colis."
+    notification_service.enqueue(notifications)
+    return f"Rappels envoyés: {len(notifications)} clients notifiés for {len(colis_to_remind)} colis."
+
+
+def _retry_queryset(force_retry_all, region=None):
+    """Notifications en échec à relancer maintenant."""
+    if force_retry_all:
+        notifications = Notification.objects.filter(statut__in=["echec", "echec_permanent"])
+    else:
+        notifications = Notification.objects.filter(
+            statut="echec",
+            prochaine_tentative__lte=timezone.now(),
+        ).exclude(nombre_tentatives__gte=5)
+    if region:
+        notifications = notifications.filter(region=region)
+    return notifications
 
 
 @shared_task
 def retry_failed_notifications_periodic(force_retry_all=False, region=None):
     """
     File d'attente WhatsApp : retente l'envoi des notifications en échec.
-    - Récupère toutes les Notification avec statut='echec' et prochaine_tentative <= now()
-    - Tente de les renvoyer via wachap_service
-    - Met à jour le statut (envoye / echec avec backoff / echec_permanent si >= 5 tentatives)
+    - Sélectionne les Notification avec statut='echec' et prochaine_tentative <= now()
+    - Les répartit en lots de RETRY_CHUNK_SIZE traités par retry_failed_notifications_chunk
+      (en parallèle sur les workers disponibles)
     Appelée toutes les 5 minutes par le beat schedule, et sur reconnexion d'une instance.
     Si force_retry_all=True, reprend aussi les echec_permanent peu importe le nb de tentatives.
     """
-    from .services.wachap_service import wachap_service
+    ids = list(
+        _retry_queryset(force_retry_all, region)
+        .order_by("prochaine_tentative", "pk")
+        .values_list("pk", flat=True)
+    )
+    for i in range(0, len(ids), RETRY_CHUNK_SIZE):
+        retry_failed_notifications_chunk.delay(ids[i : i + RETRY_CHUNK_SIZE], force_retry_all)
+
+    chunks = -(-len(ids) // RETRY_CHUNK_SIZE)
+    logger.info(f"[Retry] {len(ids)} notifications à relancer en {chunks} lots.")
+    return f"Retry planifié: {len(ids)} notifications en {chunks} lots."
 
-    if force_retry_all:
-        notifications_to_retry = Notification.objects.filter(
-            statut__in=["echec", "echec_permanent"]
-        )
-    else:
-        notifications_to_retry = Notification.objects.filter(
-            statut="echec",
-            prochaine_tentative__lte=timezone.now(),
-        ).exclude(nombre_tentatives__gte=5)
-        
-    if region:
-        notifications_to_retry = notifications_to_retry.filter(region=region)
 
-    count_success = 0
-    count_fail = 0
+@shared_task
+def retry_failed_notifications_chunk(ids, force_retry_all=False):
+    """
+    Relance un lot de notifications en échec.
+    Le lot est réclamé dans une transaction courte avec
+    select_for_update(skip_locked=True) et les critères de relance sont
+    revérifiés : une ligne déjà prise par un autre worker, ou déjà relancée par
+    un balayage précédent (envoyée, ou prochaine_tentative repoussée par le
+    backoff), est ignorée. Les numéros sont mis à jour depuis le profil et
+    chaque relance réserve un créneau du limiteur de débit comme le dispatcher :
+    sans créneau, la ligne reste inchangée avec prochaine_tentative = ETA du
+    créneau et le lot est reprogrammé à cette heure (pas de tentative consommée).
+    Les lignes réclamées passent 'en_cours' (bail DISPATCH_LEASE, reprises par le
+    dispatcher si le worker meurt) ; les envois partent en parallèle hors
+    transaction et les compteurs/statuts sont enregistrés en un seul bulk_update.
+    """
+    from .services.rate_limiter import eta_seconds
+    from .services.wachap_service import wachap_service
 
-    for notification in notifications_to_retry:
-        # --- MISE À JOUR DU NUMÉRO SI RÉPARÉ DANS LE PROFIL ---
-        if notification.destinataire:
+    a_envoyer = []
+    differees = []
+    next_slot = None
+    start_after = 0
+    with transaction.atomic():
+        now = timezone.now()
+        batch = list(
+            _retry_queryset(force_retry_all)
+            .filter(pk__in=ids)
+            .order_by("pk")
+            .select_for_update(skip_locked=True, of=("self",))
+            .select_related("destinataire__client_profile")
+        )
+        for notification in batch:
+            # --- MISE À JOUR DU NUMÉRO SI RÉPARÉ DANS LE PROFIL ---
+            phone = notification.telephone_destinataire
             user = notification.destinataire
-            # Priorité au profil client s'il existe
-            new_phone = ""
-            if hasattr(user, "client_profile") and user.client_profile:
-                new_phone = user.client_profile.telephone
-            elif user.phone:
-                new_phone = user.phone
-
-            if new_phone and new_phone != notification.telephone_destinataire:
+            if user:
+                # Priorité au profil client s'il existe
+                client = getattr(user, "client_profile", None)
+                phone = (client.telephone if client else "") or user.phone or phone
+
+            if phone:
+                granted, wait = wachap_service.reserve(
+                    phone, region=notification.region, max_wait=DISPATCH_MAX_WAIT
+                )
+                if not granted:
+                    notification.prochaine_tentative = now + timezone.timedelta(seconds=wait)
+                    next_slot = wait if next_slot is None else min(next_slot, wait)
+                    differees.append(notification)
+                    continue
+                start_after = max(start_after, wait)
+
+            if phone != notification.telephone_destinataire:
                 logger.info(
                     f"[Retry] Mise à jour du numéro pour Notification {notification.id}: "
-                    f"{notification.telephone_destinataire} -> {new_phone}"
+                    f"{notification.telephone_destinataire} -> {phone}"
                 )
-                notification.telephone_destinataire = new_phone
-                notification.save(update_fields=["telephone_destinataire"])
+                notification.telephone_destinataire = phone
 
-        if not notification.telephone_destinataire:
-            notification.marquer_comme_echec(
-                "Pas de numéro de téléphone", erreur_type="permanent"
-            )
-            count_fail += 1
-            continue
-
-        # Déterminer le type de message
-        msg_type = "text"
-
-        # Remise à zéro puis incrément d'une relance forcée sur échec permanent
-        if force_retry_all and notification.statut == "echec_permanent":
-            notification.nombre_tentatives = 1
-        else:
-            # Incrémenter le compteur avant l'envoi normal
-            notification.nombre_tentatives += 1
-
-        notification.save(update_fields=["nombre_tentatives"])
-
-        try:
-            success, error_msg, message_id = wachap_service.send_message_with_type(
-                phone=notification.telephone_destinataire,
-                message=notification.message,
-                message_type=msg_type,
-            )
-
-            if success:
-                notification.marquer_comme_envoye(message_id)
-                count_success += 1
-                logger.info(
-                    f"[Retry] Notification {notification.id} renvoyée avec succès à "
-                    f"{notification.telephone_destinataire}"
-                )
+            # Remise à zéro d'une relance forcée sur échec permanent, sinon incrément
+            if force_retry_all and notification.statut == "echec_permanent":
+                notification.nombre_tentatives = 1
             else:
-                # Vérifier si le numéro est bien sur WhatsApp
-                is_on_wa = wachap_service.check_number_registered(
-                    notification.telephone_destinataire
-                )
-                if not is_on_wa:
-                    error_msg = "Numéro non inscrit sur WA"
-                    notification.marquer_comme_echec(error_msg, erreur_type="permanent")
-                else:
-                    error_msg = f"{error_msg} (Inscrit sur WhatsApp)"
-                    notification.marquer_comme_echec(error_msg)
-
-                count_fail += 1
-                logger.warning(
-                    f"[Retry] Notification {notification.id} - échec #{notification.nombre_tentatives}: {error_msg}"
-                )
+                notification.nombre_tentatives += 1
+            notification.statut = "en_cours"
+            notification.prochaine_tentative = now + timezone.timedelta(seconds=DISPATCH_LEASE)
+            a_envoyer.append(notification)
+
+        Notification.objects.bulk_update(differees, ["prochaine_tentative"])
+        Notification.objects.bulk_update(
+            a_envoyer,
+            ["statut", "prochaine_tentative", "telephone_destinataire", "nombre_tentatives"],
+        )
+
+    if next_slot is not None:
+        # Débit atteint : reprise des lignes différées à l'heure du prochain créneau
+        retry_failed_notifications_chunk.apply_async(
+            ([n.pk for n in differees], force_retry_all),
+            countdown=eta_seconds(next_slot),
+        )
 
-        except Exception as e:
-            notification.marquer_comme_echec(str(e))
-            count_fail += 1
-            logger.error(f"[Retry] Exception sur notification {notification.id}: {e}")
+    # Hors transaction : attente du dernier créneau réservé, puis renvoi en
+    # parallèle (concurrence bornée par compte WaChap) ; numéros connus comme
+    # non inscrits ignorés sauf relance forcée
+    for notification in a_envoyer:
+        notification.prochaine_tentative = None
+    if start_after:
+        time.sleep(start_after)
+    count_success = notification_service.deliver_many(
+        a_envoyer, reserved=True, skip_unregistered=not force_retry_all
+    )
+    Notification.objects.bulk_update(a_envoyer, Notification.CHAMPS_ENVOI)
 
-    total = count_success + count_fail
-    logger.info(f"[Retry] Terminé: {count_success}/{total} renvoyées avec succès.")
-    return f"Retry terminé: {count_success} succès, {count_fail} échecs sur {total} tentatives."
+    count_fail = len(a_envoyer) - count_success
+    logger.info(
+        f"[Retry] Lot terminé: {count_success}/{len(a_envoyer)} renvoyées avec succès, "
+        f"{len(differees)} différées (limite de débit)."
+    )
+    return (
+        f"Retry terminé: {count_success} succès, {count_fail} échecs sur "
+        f"{len(a_envoyer)} tentatives, {len(differees)} différées."
+    )
 
 
 @shared_task
@@ -378,44 +537,10 @@ def send_daily_report_mali():
 
         total_sorties = total_depenses + total_transferts
 
-        # --- Solde de la veille ---
-        from django.db.models import Case, When, Value, DecimalField
-        recettes_avant = (
-            Colis.objects.filter(
-                lot__destination=mali,
-                status="LIVRE",
-            ).filter(
-                Q(date_encaissement__lt=today) |
-                Q(date_encaissement__isnull=True, date_livraison__lt=today) |
-                Q(date_encaissement__isnull=True, date_livraison__isnull=True)
-            ).aggregate(
-                total=Sum(
-                    Case(
-                        When(paye_en_chine=True, then=Value(0)),
-                        default=F("prix_final") - F("montant_jc") - F("reste_a_payer"),
-                        output_field=DecimalField()
-                    )
-                )
-            )["total"]
-            or 0
-        )
-        try:
-            dep_avant = (
-                Depense.objects.filter(pays=mali, is_china_indicative=False, date__lt=today).aggregate(
-                    total=Sum("montant")
-                )["total"]
-                or 0
-            )
-            trans_avant = (
-                TransfertArgent.objects.filter(
-                    pays_expediteur=mali, date__lt=today
-                ).aggregate(total=Sum("montant"))["total"]
-                or 0
-            )
-        except Exception:
-            dep_avant = trans_avant = 0
+        # --- Solde de la veille (clôture DailyCashBalance) ---
+        from report.caisse import solde_veille as solde_caisse_veille
 
-        solde_veille = recettes_avant - (dep_avant + trans_avant)
+        solde_veille = solde_caisse_veille(mali, today)
         solde_jour = solde_veille + total_recettes - total_sorties
 
         # --- Construction du message ---
@@ -469,22 +594,24 @@ def send_daily_report_mali():
 @shared_task
 def cleanup_old_notifications_periodic():
     """
-    Supprime de la base de données toutes les notifications avec statut 'envoye'
-    et 'echec_permanent' datant de plus de 7 jours, afin d'économiser de l'espace disque.
+    Archive (gzip JSONL dans le stockage média, voir services.archive) puis
+    supprime par petits lots les notifications avec statut 'envoye' et
+    'echec_permanent' datant de plus de NOTIFICATION_RETENTION_DAYS jours,
+    afin d'économiser de l'espace disque.
     """
-    from .models import Notification
+    from .services.archive import archiver
 
-    threshold_date = timezone.now() - timezone.timedelta(days=7)
+    threshold_date = timezone.now() - timezone.timedelta(days=NOTIFICATION_RETENTION_DAYS)
 
     try:
-        deleted_count, _ = Notification.objects.filter(
-            statut="envoye", created_at__lte=threshold_date
-        ).delete()
+        manifestes = archiver(threshold_date)
+        archived_count = sum(m.nombre for m in manifestes)
 
         logger.info(
-            f"[Cleanup] Suppression de {deleted_count} anciennes notifications terminée."
+            f"[Cleanup] {archived_count} anciennes notifications archivées "
+            f"({len(manifestes)} fichiers) et supprimées."
         )
-        return f"Nettoyage terminé : {deleted_count} entrées supprimées."
+        return f"Nettoyage terminé : {archived_count} entrées archivées et supprimées."
     except Exception as e:
         logger.error(f"[Cleanup] Erreur lors du nettoyage : {e}")
         return f"Erreur nettoyage : {e}"
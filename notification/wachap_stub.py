@@ -0,0 +1,136 @@
+"""
+Serveur bouchon de l'API WaChap V4 (tests et benchmark, jamais en production).
+
+Répond à /whatsapp/messages/send et /whatsapp/contacts/check comme l'API réelle,
+en HTTP/1.1 keep-alive, avec une latence simulée. Compte les requêtes et les
+envois simultanés par accountId.
+
+    with WaChapStubServer(latency=0.05) as stub:
+        service = WaChapService(base_url=stub.url, config=stub.config())
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .models import ConfigurationNotification
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])) or b"{}")
+        if self.path.endswith("/whatsapp/contacts/check"):
+            phones = body.get("phones", [])
+            payload = {
+                "success": True,
+                "results": [
+                    {"phone": phone, "isOnWhatsApp": phone not in stub.unregistered}
+                    for phone in phones
+                ],
+            }
+            stub.record(body.get("accountId"), "check")
+        else:
+            account = body.get("data", {}).get("accountId")
+            with stub.track(account):
+                time.sleep(stub.latency)
+            numero = stub.record(account, "send")
+            if body.get("data", {}).get("to") in stub.failing:
+                payload = {"success": False, "message": "Envoi refusé (bouchon)"}
+            else:
+                payload = {"success": True, "messageId": f"stub-{numero}"}
+
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class WaChapStubServer:
+    ACCOUNTS = {
+        "chine": "stub-chine",
+        "mali": "stub-mali",
+        "cote_divoire": "stub-ci",
+        "system": "stub-system",
+    }
+
+    def __init__(self, latency=0.02, unregistered=(), failing=()):
+        """unregistered : numéros non inscrits sur WhatsApp ; failing : envois refusés."""
+        self.latency = latency
+        self.unregistered = set(unregistered)
+        self.failing = set(failing) | self.unregistered
+        self.requests = defaultdict(int)  # (accountId, "send"/"check") -> nombre
+        self.in_flight = defaultdict(int)
+        self.max_in_flight = defaultdict(int)  # accountId -> envois simultanés max
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def config(self, **kwargs):
+        """Configuration (non enregistrée) pointant les régions sur les comptes bouchon."""
+        kwargs.setdefault("wachap_messages_par_minute", 0)
+        return ConfigurationNotification(
+            wachap_v4_secret_key="stub",
+            wachap_account_chine=self.ACCOUNTS["chine"],
+            wachap_account_mali=self.ACCOUNTS["mali"],
+            wachap_account_cote_divoire=self.ACCOUNTS["cote_divoire"],
+            wachap_account_system=self.ACCOUNTS["system"],
+            **kwargs,
+        )
+
+    def record(self, account, kind):
+        with self._lock:
+            self.requests[account, kind] += 1
+            return sum(self.requests.values())
+
+    @contextmanager
+    def track(self, account):
+        with self._lock:
+            self.in_flight[account] += 1
+            self.max_in_flight[account] = max(
+                self.max_in_flight[account], self.in_flight[account]
+            )
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight[account] -= 1
+
+    def sent(self):
+        return sum(n for (_account, kind), n in self.requests.items() if kind == "send")
+
+    def __enter__(self):
+        stub = self
+
+        class _Server(ThreadingHTTPServer):
+            daemon_threads = True
+
+            def get_request(self):
+                request = super().get_request()
+                with stub._lock:
+                    stub.connections += 1
+                return request
+
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.stub = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,348 @@
+"""
+Soldes de caisse journaliers (DailyCashBalance).
+
+Chaque écran garde sa propre définition du solde (formule) ; le mouvement de
+caisse d'un jour J pour un pays est :
+  + recettes, ventilées par type de transport :
+    - LIVRAISON (page Aujourd'hui Mali, rapport WhatsApp du soir) : colis LIVRÉS
+      vers ce pays, datés par date_encaissement (à défaut date_livraison), pour
+      leur montant net (prix_final - JC - reste à payer, 0 si payé en Chine) ;
+    - ENCAISSEMENT (rapport PDF journalier Mali) : journal EncaissementColis ;
+    - PAIEMENT (Côte d'Ivoire) : colis LIVRÉS et payés, datés par leur dernière
+      modification (updated_at), pour prix_final - JC ;
+  - dépenses du pays (hors dépenses indicatives Chine, sauf formule PAIEMENT) ;
+  - transferts d'argent émis par le pays.
+
+Une ligne est clôturée pour chaque jour passé (tâche nocturne, ou à la demande) :
+solde_cloture = solde_ouverture + recettes - dépenses - transferts, et l'ouverture
+d'un jour est la clôture de la veille. Le solde veille d'une date est donc une
+lecture indexée, plus le mouvement des jours non encore clôturés (aujourd'hui).
+
+Une saisie antidatée (colis, dépense, transfert) recalcule le jour concerné et
+décale d'autant les soldes des jours suivants (patcher).
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from core.models import Colis, EncaissementColis, Lot
+
+from .models import DailyCashBalance, Depense, TransfertArgent
+
+ZERO = Decimal("0")
+
+RECETTE_NETTE = Case(
+    When(paye_en_chine=True, then=Value(0)),
+    default=F("prix_final") - F("montant_jc") - F("reste_a_payer"),
+    output_field=DecimalField(),
+)
+
+CHAMPS_RECETTES = {
+    "CARGO": "recettes_cargo",
+    "EXPRESS": "recettes_express",
+    "BATEAU": "recettes_bateau",
+}
+
+
+LIVRAISON = "livraison"
+ENCAISSEMENT = "encaissement"
+PAIEMENT = "paiement"
+FORMULES = (LIVRAISON, ENCAISSEMENT, PAIEMENT)
+
+
+def _aujourdhui():
+    return timezone.now().date()
+
+
+def _recettes(pays_id, formule):
+    """Recettes de la formule, annotées jour, transport et montant_net."""
+    if formule == ENCAISSEMENT:
+        return EncaissementColis.objects.filter(
+            colis__lot__destination_id=pays_id
+        ).annotate(
+            jour=F("date"),
+            transport=F("colis__lot__type_transport"),
+            montant_net=F("montant"),
+        )
+    colis = Colis.objects.filter(lot__destination_id=pays_id, status="LIVRE")
+    if formule == PAIEMENT:
+        return colis.filter(est_paye=True).annotate(
+            jour=TruncDate("updated_at"),
+            transport=F("lot__type_transport"),
+            montant_net=F("prix_final") - F("montant_jc"),
+        )
+    return colis.annotate(
+        jour=Coalesce("date_encaissement", "date_livraison"),
+        transport=F("lot__type_transport"),
+        montant_net=RECETTE_NETTE,
+    )
+
+
+def _depenses(pays_id, formule):
+    depenses = Depense.objects.filter(pays_id=pays_id)
+    if formule != PAIEMENT:
+        depenses = depenses.filter(is_china_indicative=False)
+    return depenses
+
+
+def mouvements(pays_id, debut, fin, formule=LIVRAISON):
+    """
+    Mouvements de caisse par jour sur [debut, fin] (3 requêtes groupées).
+    Retourne {jour: {recettes_cargo, recettes_express, recettes_bateau, depenses, transferts}}.
+    """
+    jours = defaultdict(
+        lambda: {
+            "recettes_cargo": ZERO,
+            "recettes_express": ZERO,
+            "recettes_bateau": ZERO,
+            "depenses": ZERO,
+            "transferts": ZERO,
+        }
+    )
+    if debut > fin:
+        return jours
+
+    recettes = (
+        _recettes(pays_id, formule)
+        .filter(jour__gte=debut, jour__lte=fin)
+        .values("jour", "transport")
+        .annotate(total=Sum("montant_net"))
+        .order_by()
+    )
+    for ligne in recettes:
+        champ = CHAMPS_RECETTES.get(ligne["transport"])
+        if champ:
+            jours[ligne["jour"]][champ] += ligne["total"] or ZERO
+
+    depenses = (
+        _depenses(pays_id, formule)
+        .filter(date__gte=debut, date__lte=fin)
+        .values("date")
+        .annotate(total=Sum("montant"))
+        .order_by()
+    )
+    for ligne in depenses:
+        jours[ligne["date"]]["depenses"] += ligne["total"] or ZERO
+
+    transferts = (
+        TransfertArgent.objects.filter(
+            pays_expediteur_id=pays_id, date__gte=debut, date__lte=fin
+        )
+        .values("date")
+        .annotate(total=Sum("montant"))
+        .order_by()
+    )
+    for ligne in transferts:
+        jours[ligne["date"]]["transferts"] += ligne["total"] or ZERO
+
+    return jours
+
+
+def _net(valeurs):
+    return (
+        valeurs["recettes_cargo"]
+        + valeurs["recettes_express"]
+        + valeurs["recettes_bateau"]
+        - valeurs["depenses"]
+        - valeurs["transferts"]
+    )
+
+
+def solde_historique(pays_id, avant, formule=LIVRAISON):
+    """
+    Solde cumulé de tout l'historique avant `avant` (calcul complet, coûteux).
+    Sert uniquement à amorcer la première ligne d'un pays.
+    """
+    recettes = (
+        _recettes(pays_id, formule)
+        .filter(Q(jour__lt=avant) | Q(jour__isnull=True))
+        .aggregate(total=Sum("montant_net"))["total"]
+        or ZERO
+    )
+    depenses = (
+        _depenses(pays_id, formule)
+        .filter(date__lt=avant)
+        .aggregate(total=Sum("montant"))["total"]
+        or ZERO
+    )
+    transferts = (
+        TransfertArgent.objects.filter(
+            pays_expediteur_id=pays_id, date__lt=avant
+        ).aggregate(total=Sum("montant"))["total"]
+        or ZERO
+    )
+    return recettes - depenses - transferts
+
+
+def cloturer_jusqua(pays_id, jour, formule=LIVRAISON):
+    """
+    Crée les lignes manquantes jusqu'au jour `jour` inclus (jour passé uniquement)
+    et retourne la ligne de `jour`, ou None si `jour` précède le premier jour suivi.
+    """
+    jour = min(jour, _aujourdhui() - timedelta(days=1))
+    lignes_pays = DailyCashBalance.objects.filter(pays_id=pays_id, formule=formule)
+    derniere = lignes_pays.filter(date__lte=jour).order_by("-date").first()
+    if derniere and derniere.date == jour:
+        return derniere
+
+    if derniere is None:
+        if lignes_pays.filter(date__gt=jour).exists():
+            # Date antérieure au suivi : pas de ligne (calcul complet par l'appelant)
+            return None
+        debut = jour
+        solde = solde_historique(pays_id, jour, formule)
+    else:
+        debut = derniere.date + timedelta(days=1)
+        solde = derniere.solde_cloture
+
+    valeurs_par_jour = mouvements(pays_id, debut, jour, formule)
+    lignes = []
+    courant = debut
+    while courant <= jour:
+        valeurs = valeurs_par_jour[courant]
+        cloture = solde + _net(valeurs)
+        lignes.append(
+            DailyCashBalance(
+                pays_id=pays_id,
+                formule=formule,
+                date=courant,
+                solde_ouverture=solde,
+                solde_cloture=cloture,
+                **valeurs,
+            )
+        )
+        solde = cloture
+        courant += timedelta(days=1)
+
+    # Lignes déjà créées par un autre processus : on les garde
+    DailyCashBalance.objects.bulk_create(lignes, ignore_conflicts=True)
+    return lignes_pays.get(date=jour)
+
+
+def solde_veille(pays, jour, formule=LIVRAISON):
+    """Solde de caisse à l'ouverture de `jour` : clôture de la veille + jours non clôturés."""
+    pays_id = getattr(pays, "pk", pays)
+    aujourdhui = _aujourdhui()
+    limite = min(jour, aujourdhui)
+
+    ligne = cloturer_jusqua(pays_id, limite - timedelta(days=1), formule)
+    if ligne is None:
+        return solde_historique(pays_id, jour, formule)
+
+    solde = ligne.solde_cloture
+    if jour > limite:
+        # Date future : on ajoute le mouvement des jours ouverts (aujourd'hui inclus)
+        ouverts = mouvements(pays_id, limite, jour - timedelta(days=1), formule)
+        solde += sum((_net(v) for v in ouverts.values()), ZERO)
+    return solde
+
+
+def patcher(pays_id, jour, formule=LIVRAISON):
+    """
+    Répercute une saisie antidatée au `jour` donné : recalcule le jour et décale
+    les soldes des jours suivants. Sans effet pour aujourd'hui ou un jour non suivi.
+    """
+    if not pays_id or jour is None or jour >= _aujourdhui():
+        return
+
+    lignes_pays = DailyCashBalance.objects.filter(pays_id=pays_id, formule=formule)
+    with transaction.atomic():
+        ligne = lignes_pays.select_for_update().filter(date=jour).first()
+        if ligne is not None:
+            valeurs = mouvements(pays_id, jour, jour, formule)[jour]
+            delta = _net(valeurs) - ligne.mouvement_net
+            for champ, valeur in valeurs.items():
+                setattr(ligne, champ, valeur)
+            ligne.solde_cloture += delta
+            ligne.save()
+            suivantes = lignes_pays.filter(date__gt=jour)
+        else:
+            premiere = lignes_pays.order_by("date").first()
+            if premiere is None or jour > premiere.date:
+                return
+            # Jour antérieur au suivi : l'ouverture de la première ligne change
+            delta = (
+                solde_historique(pays_id, premiere.date, formule)
+                - premiere.solde_ouverture
+            )
+            suivantes = lignes_pays
+
+        if delta:
+            suivantes.update(
+                solde_ouverture=F("solde_ouverture") + delta,
+                solde_cloture=F("solde_cloture") + delta,
+                updated_at=timezone.now(),
+            )
+
+
+def patcher_colis(colis_list):
+    """
+    Répercute les changements de recette des colis (snapshot d'origine vs état
+    actuel) dans les formules LIVRAISON et PAIEMENT.
+    """
+    a_traiter = []
+    for colis in colis_list:
+        ancien = getattr(colis, "_caisse_origine", None) or {}
+        nouveau = colis.caisse_snapshot()
+        if ancien == nouveau:
+            continue
+        a_traiter.append((colis.lot_id, ancien, nouveau))
+
+    if not a_traiter:
+        return
+
+    lots_destination = dict(
+        Lot.objects.filter(pk__in={lot_id for lot_id, _a, _n in a_traiter}).values_list(
+            "pk", "destination_id"
+        )
+    )
+    jours = {
+        (formule, lots_destination.get(lot_id), snapshot[0])
+        for lot_id, ancien, nouveau in a_traiter
+        for formule in (LIVRAISON, PAIEMENT)
+        for snapshot in (ancien.get(formule), nouveau.get(formule))
+        if snapshot is not None and snapshot[0] is not None
+    }
+    for formule, pays_id, jour in sorted(jours, key=lambda j: (j[0], j[1] or 0, j[2])):
+        patcher(pays_id, jour, formule)
+
+
+def patcher_encaissements(jours):
+    """Répercute dans la formule ENCAISSEMENT les encaissements antidatés {(colis_id, date)}."""
+    champ_date = EncaissementColis._meta.get_field("date")
+    jours = {(colis_id, champ_date.to_python(date)) for colis_id, date in jours}
+    jours = {(colis_id, date) for colis_id, date in jours if date and date < _aujourdhui()}
+    if not jours:
+        return
+    colis_pays = dict(
+        Colis.objects.filter(pk__in={colis_id for colis_id, _d in jours}).values_list(
+            "pk", "lot__destination_id"
+        )
+    )
+    for pays_id, jour in sorted(
+        {(colis_pays.get(colis_id), date) for colis_id, date in jours},
+        key=lambda j: (j[0] or 0, j[1]),
+    ):
+        patcher(pays_id, jour, ENCAISSEMENT)
+
+
+def recalculer(pays_id, depuis=None, formule=LIVRAISON):
+    """
+    Supprime et reconstruit les lignes d'un pays à partir de `depuis` (toutes si None).
+    À utiliser après des modifications hors ORM (QuerySet.update, recalcul des prix...).
+    """
+    lignes = DailyCashBalance.objects.filter(pays_id=pays_id, formule=formule)
+    if depuis is not None:
+        lignes = lignes.filter(date__gte=depuis)
+    with transaction.atomic():
+        lignes.delete()
+        if depuis is not None:
+            # Réamorce le suivi à partir de `depuis`, puis clôture jusqu'à hier
+            cloturer_jusqua(pays_id, depuis, formule)
+        return cloturer_jusqua(pays_id, _aujourdhui() - timedelta(days=1), formule)
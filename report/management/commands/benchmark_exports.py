@@ -0,0 +1,87 @@
+import csv
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from core.csv_export import CHUNK_SIZE, streaming_csv
+from core.models import Client, Country
+
+PREFIXE = "benchmark-export"
+ENTETE = ["Nom", "Prénom", "Téléphone", "Pays (Code)", "Adresse"]
+
+
+def _export_en_memoire(clients):
+    """Ancien chemin : instances Client, pays chargé par client, réponse en mémoire."""
+    response = HttpResponse(content_type="text/csv")
+    writer = csv.writer(response)
+    writer.writerow(ENTETE)
+    for client in clients:
+        writer.writerow(
+            [
+                client.nom,
+                client.prenom,
+                client.telephone,
+                client.country.code,
+                client.adresse,
+            ]
+        )
+    return [response.content]
+
+
+def _export_streaming(clients):
+    lignes = clients.values_list(
+        "nom", "prenom", "telephone", "country__code", "adresse"
+    ).iterator(chunk_size=CHUNK_SIZE)
+    return streaming_csv("clients.csv", ENTETE, lignes).streaming_content
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le premier octet, la durée et le pic mémoire (tracemalloc) de "
+        "l'export CSV des clients : réponse construite en mémoire contre "
+        "core.csv_export en streaming, sur des clients factices"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lignes", type=int, default=100_000)
+
+    def _mesurer(self, libelle, exporter, clients):
+        tracemalloc.start()
+        debut = time.perf_counter()
+        premier_octet = None
+        taille = 0
+        for morceau in exporter(clients):
+            if premier_octet is None:
+                premier_octet = time.perf_counter() - debut
+            taille += len(morceau)
+        duree = time.perf_counter() - debut
+        _, pic = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(
+            f"{libelle:<12} premier octet {premier_octet * 1000:8.1f} ms  "
+            f"total {duree:6.2f}s  pic mémoire {pic / 1024 / 1024:7.1f} Mo  "
+            f"({taille / 1024 / 1024:.1f} Mo de CSV)"
+        )
+
+    def handle(self, *args, **options):
+        pays, _ = Country.objects.get_or_create(code="ML", defaults={"name": "Mali"})
+        Client.objects.bulk_create(
+            (
+                Client(
+                    nom=f"{PREFIXE} {i}",
+                    prenom="Aïssata",
+                    telephone=f"+2239{i:07d}",
+                    adresse="Bamako, Hamdallaye ACI 2000",
+                    country=pays,
+                )
+                for i in range(options["lignes"])
+            ),
+            batch_size=5_000,
+        )
+        clients = Client.objects.filter(nom__startswith=PREFIXE).order_by("pk")
+        try:
+            self._mesurer("En mémoire", _export_en_memoire, clients)
+            self._mesurer("Streaming", _export_streaming, clients)
+        finally:
+            clients.delete()
@@ -0,0 +1,32 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from core.models import Country
+from report.caisse import FORMULES, recalculer
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les soldes de caisse journaliers (DailyCashBalance) jusqu'à hier"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pays", help="Code du pays (par défaut : tous sauf CN)")
+        parser.add_argument(
+            "--depuis",
+            type=date.fromisoformat,
+            help="Date (AAAA-MM-JJ) à partir de laquelle reconstruire (par défaut : tout)",
+        )
+
+    def handle(self, *args, **options):
+        pays_qs = Country.objects.exclude(code="CN")
+        if options["pays"]:
+            pays_qs = Country.objects.filter(code=options["pays"].upper())
+
+        for pays in pays_qs:
+            for formule in FORMULES:
+                ligne = recalculer(pays.pk, options["depuis"], formule)
+                solde = ligne.solde_cloture if ligne else "-"
+                self.stdout.write(
+                    f"{pays.code} ({formule}) : solde de clôture d'hier {solde} FCFA"
+                )
+
+        self.stdout.write(self.style.SUCCESS("Succès : soldes de caisse reconstruits."))
@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-17 03:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0034_colisevent'),
+        ('report', '0005_depense_is_china_indicative_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCashBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('solde_ouverture', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('recettes_cargo', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('recettes_express', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('recettes_bateau', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('depenses', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('transferts', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('solde_cloture', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('pays', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='soldes_journaliers', to='core.country')),
+            ],
+            options={
+                'verbose_name': 'Solde de caisse journalier',
+                'verbose_name_plural': 'Soldes de caisse journaliers',
+                'ordering': ['-date'],
+                'constraints': [models.UniqueConstraint(fields=('pays', 'date'), name='unique_solde_caisse_par_jour')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2 on 2026-10-17 03:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0034_colisevent'),
+        ('report', '0006_dailycashbalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyCountryStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('annee', models.PositiveSmallIntegerField()),
+                ('mois', models.PositiveSmallIntegerField()),
+                ('ca_avion', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('ca_bateau', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('poids_total', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('frais_transport_avion', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('frais_transport_bateau', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('frais_douane_avion', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('frais_douane_bateau', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('autres_depenses', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('total_transferts', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('nb_lots', models.IntegerField(default=0)),
+                ('nb_colis_expedies_avion', models.IntegerField(default=0)),
+                ('nb_colis_expedies_bateau', models.IntegerField(default=0)),
+                ('nb_colis_livres_avion', models.IntegerField(default=0)),
+                ('nb_colis_livres_bateau', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('pays', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats_mensuelles', to='core.country')),
+            ],
+            options={
+                'verbose_name': 'Statistiques mensuelles par pays',
+                'verbose_name_plural': 'Statistiques mensuelles par pays',
+                'ordering': ['-annee', '-mois'],
+                'constraints': [models.UniqueConstraint(fields=('pays', 'annee', 'mois'), name='unique_stats_mensuelles_pays')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-17 05:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0007_monthlycountrystats'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='dailycashbalance',
+            name='unique_solde_caisse_par_jour',
+        ),
+        migrations.AddField(
+            model_name='dailycashbalance',
+            name='formule',
+            field=models.CharField(choices=[('livraison', "Colis livrés (Aujourd'hui Mali)"), ('encaissement', 'Journal des encaissements (rapport PDF Mali)'), ('paiement', "Colis livrés et payés (Côte d'Ivoire)")], default='livraison', max_length=20),
+        ),
+        migrations.AddConstraint(
+            model_name='dailycashbalance',
+            constraint=models.UniqueConstraint(fields=('pays', 'formule', 'date'), name='unique_solde_caisse_par_jour'),
+        ),
+    ]
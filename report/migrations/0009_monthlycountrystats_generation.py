@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-17 05:19
+
+from django.db import migrations, models
+
+
+def marquer_calculees(apps, schema_editor):
+    """Les lignes existantes sont à jour (invalidation par suppression jusqu'ici)."""
+    apps.get_model("report", "MonthlyCountryStats").objects.update(generation_calculee=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0008_dailycashbalance_formule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monthlycountrystats',
+            name='generation',
+            field=models.PositiveIntegerField(default=0, help_text="Incrémentée à chaque modification d'une donnée du mois"),
+        ),
+        migrations.AddField(
+            model_name='monthlycountrystats',
+            name='generation_calculee',
+            field=models.PositiveIntegerField(blank=True, help_text='Génération des indicateurs enregistrés', null=True),
+        ),
+        migrations.RunPython(marquer_calculees, migrations.RunPython.noop),
+    ]
@@ -138,3 +138,126 @@ class PaiementAgent(models.Model):
 
     def __str__(self):
         return f"Paiement de {self.montant} FCFA à {self.agent.username} ({self.periode_mois}/{self.periode_annee})"
+
+
+class DailyCashBalance(models.Model):
+    """
+    Solde de caisse journalier d'un pays (clôturé chaque nuit).
+    Le « solde veille » d'une date se lit sur une seule ligne au lieu de
+    re-sommer tout l'historique des colis, dépenses et transferts.
+    Une série de lignes par formule de calcul (chaque écran garde la sienne).
+    Calcul et mise à jour : voir report.caisse.
+    """
+
+    FORMULE_CHOICES = [
+        ("livraison", _("Colis livrés (Aujourd'hui Mali)")),
+        ("encaissement", _("Journal des encaissements (rapport PDF Mali)")),
+        ("paiement", _("Colis livrés et payés (Côte d'Ivoire)")),
+    ]
+
+    pays = models.ForeignKey(
+        Country, on_delete=models.CASCADE, related_name="soldes_journaliers"
+    )
+    formule = models.CharField(max_length=20, choices=FORMULE_CHOICES, default="livraison")
+    date = models.DateField()
+    solde_ouverture = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    recettes_cargo = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    recettes_express = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    recettes_bateau = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    depenses = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    transferts = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    solde_cloture = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-date"]
+        verbose_name = _("Solde de caisse journalier")
+        verbose_name_plural = _("Soldes de caisse journaliers")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["pays", "formule", "date"], name="unique_solde_caisse_par_jour"
+            )
+        ]
+
+    def __str__(self):
+        return f"Caisse {self.pays} ({self.formule}) {self.date} : {self.solde_cloture} FCFA"
+
+    @property
+    def recettes(self):
+        return self.recettes_cargo + self.recettes_express + self.recettes_bateau
+
+    @property
+    def mouvement_net(self):
+        return self.recettes - self.depenses - self.transferts
+
+
+class MonthlyCountryStats(models.Model):
+    """
+    Indicateurs d'un pays pour un mois clos (colis, lots, dépenses, transferts).
+    Calculés une fois puis relus tels quels par les tableaux de bord et les
+    archives ; la ligne est périmée (recalculée au prochain accès) quand une
+    donnée du mois change. Calcul et invalidation : voir report.stats.
+    """
+
+    pays = models.ForeignKey(
+        Country, on_delete=models.CASCADE, related_name="stats_mensuelles"
+    )
+    annee = models.PositiveSmallIntegerField()
+    mois = models.PositiveSmallIntegerField()
+
+    ca_avion = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    ca_bateau = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    poids_total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    frais_transport_avion = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    frais_transport_bateau = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    frais_douane_avion = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    frais_douane_bateau = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    autres_depenses = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    total_transferts = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    nb_lots = models.IntegerField(default=0)
+    nb_colis_expedies_avion = models.IntegerField(default=0)
+    nb_colis_expedies_bateau = models.IntegerField(default=0)
+    nb_colis_livres_avion = models.IntegerField(default=0)
+    nb_colis_livres_bateau = models.IntegerField(default=0)
+
+    generation = models.PositiveIntegerField(
+        default=0, help_text=_("Incrémentée à chaque modification d'une donnée du mois")
+    )
+    generation_calculee = models.PositiveIntegerField(
+        null=True, blank=True, help_text=_("Génération des indicateurs enregistrés")
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    KPI_FIELDS = (
+        "ca_avion",
+        "ca_bateau",
+        "poids_total",
+        "frais_transport_avion",
+        "frais_transport_bateau",
+        "frais_douane_avion",
+        "frais_douane_bateau",
+        "autres_depenses",
+        "total_transferts",
+        "nb_lots",
+        "nb_colis_expedies_avion",
+        "nb_colis_expedies_bateau",
+        "nb_colis_livres_avion",
+        "nb_colis_livres_bateau",
+    )
+
+    class Meta:
+        ordering = ["-annee", "-mois"]
+        verbose_name = _("Statistiques mensuelles par pays")
+        verbose_name_plural = _("Statistiques mensuelles par pays")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["pays", "annee", "mois"], name="unique_stats_mensuelles_pays"
+            )
+        ]
+
+    def __str__(self):
+        return f"Stats {self.pays} {self.mois:02d}/{self.annee}"
+
+    def kpis(self):
+        return {field: getattr(self, field) for field in self.KPI_FIELDS}
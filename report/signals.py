@@ -0,0 +1,129 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.cache import bump_namespaces
+from core.models import (
+    Colis,
+    Country,
+    EncaissementColis,
+    Lot,
+    colis_bulk_updated,
+    lot_stats_updated,
+)
+
+from .caisse import FORMULES, PAIEMENT, patcher, patcher_colis, patcher_encaissements
+from .models import Depense, PaiementAgent, TransfertArgent
+from .stats import invalider, invalider_lots
+
+# Champ pays et filtre de caisse (par formule) de chaque mouvement
+MOUVEMENTS_CAISSE = {
+    Depense: (
+        "pays_id",
+        lambda obj, formule: formule == PAIEMENT or not obj.is_china_indicative,
+    ),
+    TransfertArgent: ("pays_expediteur_id", lambda obj, formule: True),
+}
+
+
+def _jour(instance):
+    """(pays_id, date) du mouvement."""
+    champ_pays, _en_caisse = MOUVEMENTS_CAISSE[type(instance)]
+    date = instance._meta.get_field("date").to_python(instance.date)
+    if hasattr(date, "date"):
+        date = date.date()
+    return getattr(instance, champ_pays), date
+
+
+def _jours_caisse(instance):
+    """{(formule, pays_id, date)} des formules de caisse où le mouvement compte."""
+    _champ_pays, en_caisse = MOUVEMENTS_CAISSE[type(instance)]
+    return {(formule, *_jour(instance)) for formule in FORMULES if en_caisse(instance, formule)}
+
+
+@receiver(pre_save, sender=Depense)
+@receiver(pre_save, sender=TransfertArgent)
+def mouvement_avant_save(sender, instance, **kwargs):
+    """Mémorise le jour d'origine (un changement de date touche deux jours)."""
+    ancien = sender.objects.filter(pk=instance.pk).first() if instance.pk else None
+    instance._jour_origine = _jour(ancien) if ancien else None
+    instance._caisse_origine = _jours_caisse(ancien) if ancien else set()
+
+
+@receiver(post_save, sender=Depense)
+@receiver(post_save, sender=TransfertArgent)
+@receiver(post_delete, sender=Depense)
+@receiver(post_delete, sender=TransfertArgent)
+def mouvement_modifie(sender, instance, **kwargs):
+    """Met à jour les soldes journaliers, les statistiques des mois clos et le cache."""
+    jours_caisse = getattr(instance, "_caisse_origine", set()) | _jours_caisse(instance)
+    for formule, pays_id, date in sorted(jours_caisse, key=lambda j: (j[0], j[2])):
+        patcher(pays_id, date, formule)
+
+    jours = set(filter(None, {getattr(instance, "_jour_origine", None), _jour(instance)}))
+    for pays_id, date in jours:
+        invalider(pays_id, date)
+    bump_namespaces(
+        *Country.objects.filter(pk__in={pays_id for pays_id, _d in jours}).values_list(
+            "code", flat=True
+        )
+    )
+
+
+@receiver(post_save, sender=Colis)
+def colis_modifie(sender, instance, **kwargs):
+    patcher_colis([instance])
+
+
+@receiver(colis_bulk_updated, sender=Colis)
+def colis_modifies_en_masse(sender, colis_list, **kwargs):
+    patcher_colis(colis_list)
+
+
+@receiver(pre_save, sender=EncaissementColis)
+def encaissement_avant_save(sender, instance, **kwargs):
+    instance._jour_origine = (
+        sender.objects.filter(pk=instance.pk).values_list("colis_id", "date").first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=EncaissementColis)
+@receiver(post_delete, sender=EncaissementColis)
+def encaissement_modifie(sender, instance, **kwargs):
+    """Encaissement antidaté : soldes journaliers de la formule ENCAISSEMENT."""
+    date = instance._meta.get_field("date").to_python(instance.date)
+    jours = {(instance.colis_id, date), getattr(instance, "_jour_origine", None)}
+    patcher_encaissements(set(filter(None, jours)))
+
+
+@receiver(lot_stats_updated)
+def lot_stats_modifies(sender, lot_ids, **kwargs):
+    invalider_lots(lot_ids)
+
+
+@receiver(pre_save, sender=Lot)
+def lot_avant_save(sender, instance, **kwargs):
+    instance._mois_origine = (
+        Lot.objects.filter(pk=instance.pk)
+        .values_list("destination_id", "date_arrivee", "date_expedition")
+        .first()
+        if instance.pk
+        else None
+    )
+
+
+@receiver(post_save, sender=Lot)
+@receiver(post_delete, sender=Lot)
+def lot_modifie(sender, instance, **kwargs):
+    """Frais, dates ou destination d'un lot : les mois clos concernés sont recalculés."""
+    origine = getattr(instance, "_mois_origine", None)
+    if origine:
+        invalider(*origine)
+    invalider(instance.destination_id, instance.date_arrivee, instance.date_expedition)
+
+
+@receiver(post_save, sender=PaiementAgent)
+@receiver(post_delete, sender=PaiementAgent)
+def paiement_agent_modifie(sender, **kwargs):
+    bump_namespaces("agents")
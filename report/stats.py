@@ -0,0 +1,167 @@
+"""
+Indicateurs financiers par pays et par mois (tableaux de bord Admin Chine, archives).
+
+Les indicateurs colis sont lus dans LotStats (une requête groupée par type de
+transport), ceux des lots dans une seconde requête groupée, puis les dépenses
+et transferts de la période.
+
+Un mois clos est calculé une seule fois et conservé dans MonthlyCountryStats.
+Toute modification d'une donnée du mois (colis via LotStats, lot, dépense,
+transfert) incrémente la génération de la ligne concernée (voir
+report.signals) ; elle est recalculée au prochain accès. Un calcul n'est
+enregistré que si la génération n'a pas changé pendant le calcul : une
+modification concurrente n'est jamais masquée par un résultat périmé.
+"""
+
+from decimal import Decimal
+
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from core.models import Country, Lot, LotStats
+
+from .models import Depense, MonthlyCountryStats, TransfertArgent
+
+TRANSPORTS_AVION = ("CARGO", "EXPRESS")
+ZERO = Decimal("0")
+
+
+def _suffixe(type_transport):
+    return "avion" if type_transport in TRANSPORTS_AVION else "bateau"
+
+
+def mois_clos(year, month):
+    now = timezone.localtime()
+    return (year, month) < (now.year, now.month)
+
+
+def kpis_periode(country_code, year=None, month=None):
+    """Calcule les indicateurs d'un pays (tout l'historique si year/month absents)."""
+    lots = Lot.objects.filter(destination__code=country_code)
+    stats = LotStats.objects.filter(lot__destination__code=country_code)
+    depenses = Depense.objects.filter(pays__code=country_code)
+    transferts = TransfertArgent.objects.filter(pays_expediteur__code=country_code)
+
+    if year and month:
+        # Chine : fait générateur = expédition ; destinations : arrivée
+        champ_date = "date_expedition" if country_code == "CN" else "date_arrivee"
+        filtre_date = {f"{champ_date}__year": year, f"{champ_date}__month": month}
+        lots = lots.filter(**filtre_date)
+        stats = stats.filter(**{f"lot__{k}": v for k, v in filtre_date.items()})
+        depenses = depenses.filter(date__year=year, date__month=month)
+        transferts = transferts.filter(date__year=year, date__month=month)
+
+    if country_code != "CN":
+        # Les dépenses indicatives Chine ne sortent pas de la caisse du pays
+        depenses = depenses.filter(is_china_indicative=False)
+
+    kpis = {
+        field: 0 if field.startswith("nb_") else ZERO
+        for field in MonthlyCountryStats.KPI_FIELDS
+    }
+
+    lignes_colis = (
+        stats.values("lot__type_transport")
+        .annotate(
+            recettes_total=Sum("recettes", default=0),
+            jc_total=Sum("montant_jc", default=0),
+            poids_total=Sum("poids", default=0),
+            nb=Sum("nb_colis", default=0),
+            nb_livres=Sum("nb_colis", filter=Q(status="LIVRE"), default=0),
+        )
+        .order_by()
+    )
+    for ligne in lignes_colis:
+        suffixe = _suffixe(ligne["lot__type_transport"])
+        kpis[f"ca_{suffixe}"] += ligne["recettes_total"] - ligne["jc_total"]
+        kpis["poids_total"] += ligne["poids_total"]
+        kpis[f"nb_colis_expedies_{suffixe}"] += ligne["nb"]
+        kpis[f"nb_colis_livres_{suffixe}"] += ligne["nb_livres"]
+
+    lignes_lots = (
+        lots.values("type_transport")
+        .annotate(
+            nb=Count("id"),
+            transport=Sum("frais_transport", default=0),
+            douane=Sum("frais_douane", default=0),
+        )
+        .order_by()
+    )
+    for ligne in lignes_lots:
+        suffixe = _suffixe(ligne["type_transport"])
+        kpis["nb_lots"] += ligne["nb"]
+        kpis[f"frais_transport_{suffixe}"] += ligne["transport"]
+        kpis[f"frais_douane_{suffixe}"] += ligne["douane"]
+
+    kpis["autres_depenses"] = depenses.aggregate(total=Sum("montant", default=0))["total"]
+    kpis["total_transferts"] = transferts.aggregate(total=Sum("montant", default=0))[
+        "total"
+    ]
+    return kpis
+
+
+def kpis_pays(country_code, year=None, month=None):
+    """Indicateurs d'un pays ; un mois clos est lu (ou enregistré) dans MonthlyCountryStats."""
+    if not (year and month and mois_clos(year, month)):
+        return kpis_periode(country_code, year, month)
+
+    archive = MonthlyCountryStats.objects.filter(
+        pays__code=country_code, annee=year, mois=month
+    ).first()
+    if archive is None:
+        pays = Country.objects.filter(code=country_code).first()
+        if pays is None:
+            return kpis_periode(country_code, year, month)
+        # Ligne créée avant le calcul : une invalidation pendant le calcul la marque
+        archive, _created = MonthlyCountryStats.objects.get_or_create(
+            pays=pays, annee=year, mois=month
+        )
+    elif archive.generation_calculee == archive.generation:
+        return archive.kpis()
+
+    generation = archive.generation
+    kpis = kpis_periode(country_code, year, month)
+    # Sans effet si le mois a été invalidé depuis la lecture de la génération
+    MonthlyCountryStats.objects.filter(pk=archive.pk, generation=generation).update(
+        generation_calculee=generation, updated_at=timezone.now(), **kpis
+    )
+    return kpis
+
+
+def _filtre_mois(pays_id, dates):
+    filtre = Q()
+    for date in dates:
+        if not date or not pays_id:
+            continue
+        if hasattr(date, "tzinfo") and timezone.is_aware(date):
+            date = timezone.localtime(date)
+        if mois_clos(date.year, date.month):
+            filtre |= Q(pays_id=pays_id, annee=date.year, mois=date.month)
+    return filtre
+
+
+def _perimer(filtre):
+    MonthlyCountryStats.objects.filter(filtre).update(
+        generation=F("generation") + 1, updated_at=timezone.now()
+    )
+
+
+def invalider(pays_id, *dates):
+    """Périme les mois clos du pays contenant les dates données."""
+    filtre = _filtre_mois(pays_id, dates)
+    if filtre:
+        _perimer(filtre)
+
+
+def invalider_lots(lot_ids):
+    """Périme les mois clos (arrivée / expédition) des lots donnés."""
+    lot_ids = {lot_id for lot_id in lot_ids if lot_id}
+    if not lot_ids:
+        return
+    filtre = Q()
+    for destination_id, date_arrivee, date_expedition in Lot.objects.filter(
+        pk__in=lot_ids
+    ).values_list("destination_id", "date_arrivee", "date_expedition"):
+        filtre |= _filtre_mois(destination_id, (date_arrivee, date_expedition))
+    if filtre:
+        _perimer(filtre)
@@ -0,0 +1,27 @@
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.utils import timezone
+
+from core.models import Country
+from report.caisse import FORMULES, cloturer_jusqua
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def cloturer_caisses_journalieres():
+    """Clôture le solde de caisse de la veille pour chaque pays de destination et formule."""
+    hier = timezone.now().date() - timedelta(days=1)
+    for pays in Country.objects.exclude(code="CN"):
+        for formule in FORMULES:
+            ligne = cloturer_jusqua(pays.pk, hier, formule)
+            if ligne is not None:
+                logger.info(
+                    "Caisse %s (%s) clôturée au %s : %s FCFA",
+                    pays.code,
+                    formule,
+                    hier,
+                    ligne.solde_cloture,
+                )
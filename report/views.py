@@ -1,5 +1,4 @@
 from django.shortcuts import render
-from django.http import HttpResponse
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, TemplateView, View
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy
@@ -7,6 +6,7 @@ from django.contrib import messages
 from django.utils import timezone
 from .models import Depense, TransfertArgent
 from django.db.models import Sum, F, Q
+from core.mixins import DestinationAgentRequiredMixin
 from core.models import Colis
 
 
@@ -463,41 +463,219 @@ class RapportExportView(LoginRequiredMixin, View):
         }
 
         if export_format == "csv":
-            import csv
+            from core.csv_export import CHUNK_SIZE, choix, streaming_csv
 
-            response = HttpResponse(content_type="text/csv")
-            response["Content-Disposition"] = (
-                f'attachment; filename="rapport_financier_{month}_{year}.csv"'
+            categories = choix(Depense, "categorie")
+            depenses = (
+                depenses_qs.order_by("date", "pk")
+                .values_list("date", "categorie", "description", "montant")
+                .iterator(chunk_size=CHUNK_SIZE)
+            )
+            return streaming_csv(
+                f"rapport_financier_{month}_{year}.csv",
+                ["Date", "Catégorie", "Description", "Montant"],
+                (
+                    (date, categories.get(categorie, categorie), description, montant)
+                    for date, categorie, description, montant in depenses
+                ),
+                preambule=[
+                    ["Rapport Financier", f"{month}/{year}"],
+                    ["Généré par", request.user.get_full_name()],
+                    [],
+                    ["Total Recettes", total_recettes],
+                    ["Total Dépenses", total_depenses_reelles],
+                    ["Total Transferts", total_transferts],
+                    ["Solde Période", solde],
+                    [],
+                    ["Détail des Dépenses"],
+                ],
             )
-            response.write("\ufeff".encode("utf8"))  # BOM pour Excel
-
-            writer = csv.writer(response)
-            writer.writerow(["Rapport Financier", f"{month}/{year}"])
-            writer.writerow(["Généré par", request.user.get_full_name()])
-            writer.writerow([])
-            writer.writerow(["Total Recettes", total_recettes])
-            writer.writerow(["Total Dépenses", total_depenses])
-            writer.writerow(["Total Transferts", total_transferts])
-            writer.writerow(["Solde Période", solde])
-            writer.writerow([])
-            writer.writerow(["Détail des Dépenses"])
-            writer.writerow(["Date", "Catégorie", "Description", "Montant"])
-
-            for depense in depenses_qs.order_by("date"):
-                writer.writerow(
-                    [
-                        depense.date,
-                        depense.get_categorie_display(),
-                        depense.description,
-                        depense.montant,
-                    ]
-                )
-            return response
 
         else:  # PDF by default
             from core.utils_pdf import render_to_pdf_playwright
 
             filename = f"rapport_financier_{month}_{year}.pdf"
+            # Mois clos : servi depuis le cache tant que ses données ne changent pas
             return render_to_pdf_playwright(
-                "mali/pdf/rapport_financier.html", context, request, filename=filename
+                "mali/pdf/rapport_financier.html",
+                context,
+                request,
+                filename=filename,
+                cache=(year, month) < (today.year, today.month),
+                volatile=("date_generation",),
+            )
+
+
+def _periode_export(request):
+    """
+    (debut, fin) inclus : ?debut=&fin= (AAAA-MM-JJ), sinon le mois ?year=&month=
+    (mois courant par défaut).
+    """
+    import calendar
+    from datetime import date
+    from django.utils.dateparse import parse_date
+
+    try:
+        debut = parse_date(request.GET.get("debut", ""))
+        fin = parse_date(request.GET.get("fin", ""))
+    except ValueError:
+        debut = fin = None
+    if debut and fin:
+        return debut, fin
+
+    today = timezone.now()
+    try:
+        year = int(request.GET.get("year", today.year))
+        month = int(request.GET.get("month", today.month))
+        debut = date(year, month, 1)
+    except ValueError:
+        year, month = today.year, today.month
+        debut = date(year, month, 1)
+    return debut, date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _destination_export(request):
+    """Pays de l'agent ; seul le GLOBAL_ADMIN choisit avec ?destination=ML."""
+    from core.models import Country
+
+    if request.user.role == "GLOBAL_ADMIN" and request.GET.get("destination"):
+        return Country.objects.filter(code=request.GET["destination"]).first()
+    return request.user.country
+
+
+def _oui_non(valeur):
+    return "Oui" if valeur else "Non"
+
+
+class ColisExportView(LoginRequiredMixin, DestinationAgentRequiredMixin, View):
+    """Registre CSV des colis reçus sur une période, pour une destination (streaming)."""
+
+    def get(self, request):
+        from core.csv_export import CHUNK_SIZE, choix, streaming_csv
+        from core.models import Lot
+
+        debut, fin = _periode_export(request)
+        country = _destination_export(request)
+
+        colis_qs = Colis.objects.filter(created_at__date__range=(debut, fin))
+        if country:
+            colis_qs = colis_qs.filter(lot__destination=country)
+        lignes = (
+            colis_qs.order_by("created_at", "pk")
+            .values_list(
+                "reference",
+                "created_at",
+                "lot__numero",
+                "lot__type_transport",
+                "lot__destination__code",
+                "client__nom",
+                "client__prenom",
+                "client__telephone",
+                "type_colis",
+                "poids",
+                "cbm",
+                "nombre_pieces",
+                "prix_final",
+                "montant_jc",
+                "reste_a_payer",
+                "paye_en_chine",
+                "status",
+                "date_livraison",
+                "date_encaissement",
+            )
+            .iterator(chunk_size=CHUNK_SIZE)
+        )
+        transports = choix(Lot, "type_transport")
+        types = choix(Colis, "type_colis")
+        statuts = choix(Colis, "status")
+
+        def formater(ligne):
+            ligne = list(ligne)
+            ligne[1] = timezone.localtime(ligne[1]).strftime("%Y-%m-%d %H:%M")
+            ligne[3] = transports.get(ligne[3], ligne[3])
+            ligne[8] = types.get(ligne[8], ligne[8])
+            ligne[15] = _oui_non(ligne[15])
+            ligne[16] = statuts.get(ligne[16], ligne[16])
+            ligne[17] = ligne[17] or ""
+            ligne[18] = ligne[18] or ""
+            return ligne
+
+        code = country.code if country else "tous"
+        return streaming_csv(
+            f"colis_{code}_{debut}_{fin}.csv",
+            [
+                "Référence",
+                "Reçu le",
+                "Lot",
+                "Transport",
+                "Destination",
+                "Nom",
+                "Prénom",
+                "Téléphone",
+                "Type",
+                "Poids (kg)",
+                "CBM",
+                "Pièces",
+                "Prix final",
+                "Remise (JC)",
+                "Reste à payer",
+                "Payé en Chine",
+                "Statut",
+                "Livré le",
+                "Encaissé le",
+            ],
+            map(formater, lignes),
+        )
+
+
+class EncaissementExportView(
+    LoginRequiredMixin, DestinationAgentRequiredMixin, View
+):
+    """Journal CSV des encaissements d'une période, pour une destination (streaming)."""
+
+    def get(self, request):
+        from core.csv_export import CHUNK_SIZE, choix, streaming_csv
+        from core.models import EncaissementColis
+
+        debut, fin = _periode_export(request)
+        country = _destination_export(request)
+
+        encaissements = EncaissementColis.objects.filter(date__range=(debut, fin))
+        if country:
+            encaissements = encaissements.filter(colis__lot__destination=country)
+        lignes = (
+            encaissements.order_by("date", "pk")
+            .values_list(
+                "date",
+                "colis__reference",
+                "colis__lot__numero",
+                "colis__client__nom",
+                "colis__client__prenom",
+                "colis__client__telephone",
+                "montant",
+                "methode",
+                "enregistre_par__username",
             )
+            .iterator(chunk_size=CHUNK_SIZE)
+        )
+        methodes = choix(EncaissementColis, "methode")
+
+        code = country.code if country else "tous"
+        return streaming_csv(
+            f"encaissements_{code}_{debut}_{fin}.csv",
+            [
+                "Date",
+                "Référence colis",
+                "Lot",
+                "Nom",
+                "Prénom",
+                "Téléphone",
+                "Montant",
+                "Méthode",
+                "Enregistré par",
+            ],
+            (
+                (*ligne[:7], methodes.get(ligne[7], ligne[7]), ligne[8])
+                for ligne in lignes
+            ),
+        )